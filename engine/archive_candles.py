@@ -0,0 +1,120 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.config import db
+from engine.models.core import Candle
+from engine.helpers import TIMEFRAME_MS
+from engine.services.candle_archive import candle_archive, BLOCK_ROWS
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_coverage import candle_coverage
+from engine.services.candle_loader import iter_candles_from_db
+from engine.services.candle_partitions import candle_partitions
+from engine.services.candle_store import candle_store, CANDLE_COLUMNS, CANDLE_DTYPE
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+_DELETE_SQL = (
+    'DELETE FROM "candle_data" '
+    'WHERE "instrument_id" = (SELECT "id" FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?) '
+    'AND "timeframe" = ? AND "timestamp" < ?'
+)
+
+def candle_databases():
+    """
+    Every database holding candles: the main one plus the per-symbol partitions.
+    """
+    databases = [Candle._meta.database]
+    if candle_partitions.enabled:
+        databases += [database for _, database in candle_partitions.partitions()]
+    return databases
+
+def archive_series(exchange, symbol, timeframe, before_ts):
+    """
+    Move candles of one series older than before_ts from SQLite and the candle store into
+    the archive. Returns the number of candles moved.
+    """
+    timeframe_ms = TIMEFRAME_MS.get(timeframe)
+    if timeframe_ms:
+        # Seed coverage while the candles are still in SQLite so imports won't refetch them
+        candle_coverage.intervals(exchange, symbol, timeframe, timeframe_ms)
+
+    # Candles the store holds but SQLite doesn't (e.g. from a file import) go along
+    stored = candle_store.read_range(exchange, symbol, timeframe, 0, before_ts - 1)
+    if stored is None:
+        stored = np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+    store_cursor = 0
+
+    # Streamed in whole blocks; written (and fsynced) before the delete, so a crash
+    # leaves duplicates, never a gap
+    moved = 0
+    for candles in iter_candles_from_db(exchange, symbol, timeframe, 0, before_ts - 1, chunk_size=BLOCK_ROWS * 16):
+        store_end = np.searchsorted(stored[:, 0], candles[-1, 0], side='right')
+        window = stored[store_cursor:store_end]
+        store_cursor = store_end
+        extra = window[~np.isin(window[:, 0], candles[:, 0])]
+        if len(extra):
+            candles = np.concatenate([candles, extra])
+        candle_archive.append(exchange, symbol, timeframe, candles)
+        moved += len(candles)
+    if store_cursor < len(stored):
+        candle_archive.append(exchange, symbol, timeframe, stored[store_cursor:])
+        moved += len(stored) - store_cursor
+    del stored
+    if moved == 0:
+        return 0
+
+    database = candle_partitions.database_for(exchange, symbol)
+    with database.atomic():
+        database.execute_sql(_DELETE_SQL, (exchange, symbol, timeframe, before_ts))
+    # The loader reads the store first, so the archived rows have to leave it too
+    candle_store.trim_before(exchange, symbol, timeframe, before_ts)
+
+    candle_cache.invalidate(exchange, symbol, timeframe)
+    return moved
+
+def archive_candles(older_than_days, exchange=None, symbol=None, vacuum=False):
+    """
+    Move candles older than `older_than_days` days from SQLite into the compressed archive.
+    """
+    before_ts = int(time.time() * 1000) - older_than_days * DAY_MS
+    moved = 0
+    for database in candle_databases():
+        moved_here = 0
+        database.connect(reuse_if_open=True)
+        series = database.execute_sql(
+            'SELECT DISTINCT "exchange", "symbol", "timeframe" FROM "candle" ORDER BY 1, 2, 3'
+        ).fetchall()
+        for series_exchange, series_symbol, timeframe in series:
+            if exchange and series_exchange != exchange:
+                continue
+            if symbol and series_symbol != symbol:
+                continue
+            count = archive_series(series_exchange, series_symbol, timeframe, before_ts)
+            if count:
+                print(f"  {series_exchange} {series_symbol} {timeframe}: archived {count} candles")
+            moved_here += count
+
+        moved += moved_here
+        if vacuum and moved_here:
+            database.execute_sql('VACUUM')
+
+    print(f"Archived {moved} candles older than {older_than_days} days.")
+    return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old candles from SQLite into the compressed archive.")
+    parser.add_argument('--older-than-days', type=int, required=True)
+    parser.add_argument('--exchange')
+    parser.add_argument('--symbol')
+    parser.add_argument('--vacuum', action='store_true', help="VACUUM the databases afterwards to shrink the files")
+    args = parser.parse_args()
+
+    archive_candles(args.older_than_days, args.exchange, args.symbol, args.vacuum)
+    if not db.is_closed():
+        db.close()
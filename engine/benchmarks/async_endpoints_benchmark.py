@@ -0,0 +1,93 @@
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import argparse
+import threading
+import numpy as np
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# The app opens DB_NAME on import
+tmp_dir = tempfile.TemporaryDirectory()
+os.environ['DB_NAME'] = os.path.join(tmp_dir.name, 'bench.sqlite3')
+
+import httpx
+from fastapi.testclient import TestClient
+from engine.main import app
+from engine.init_db import init_db
+from engine.models.core import Task, Candle
+from engine.services import db_async
+from engine.services.candle_loader import load_candles_from_db
+
+CANDLES = 200_000
+
+def populate():
+    init_db()
+    Task.create(id='bench', type='backtest', status='processing', created_at=0, updated_at=0)
+    rows = [{
+        'timestamp': i * 60000, 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.5, 'volume': 1.0,
+        'exchange': 'Binance', 'symbol': 'BENCH', 'timeframe': '1m'
+    } for i in range(CANDLES)]
+    with Candle._meta.database.atomic():
+        for i in range(0, CANDLES, 1000):
+            Candle.insert_many(rows[i:i + 1000]).execute()
+
+    client = TestClient(app)
+    client.post("/api/v1/auth/register", json={"username": "bench", "password": "password123"})
+    token = client.post("/api/v1/auth/login",
+                        data={"username": "bench", "password": "password123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def backtest_load(stop):
+    # Stands in for a running backtest: repeated bulk candle reads on another thread
+    while not stop.is_set():
+        load_candles_from_db('Binance', 'BENCH', '1m', 0, CANDLES * 60000)
+
+async def poll(headers, clients, requests, logins, interval):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_client():
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.get("/api/v1/tasks/bench", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(interval)
+
+        async def one_login():
+            # Other users signing in meanwhile: a user lookup plus password verification
+            for _ in range(requests // 4):
+                await client.post("/api/v1/auth/login", data={"username": "bench", "password": "password123"})
+
+        await asyncio.gather(*[one_client() for _ in range(clients)], *[one_login() for _ in range(logins)])
+    return np.array(latencies) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of /tasks/{id} under concurrent polling and a backtest.")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1, help="Seconds between polls of one client")
+    parser.add_argument('--logins', type=int, default=0, help="Clients signing in at the same time")
+    args = parser.parse_args()
+
+    headers = populate()
+    executor = db_async._executor
+    for label, pool in (("on event loop", None), ("db thread pool", executor)):
+        db_async._executor = pool
+        stop = threading.Event()
+        loader = threading.Thread(target=backtest_load, args=(stop,))
+        loader.start()
+        try:
+            latencies = asyncio.run(poll(headers, args.clients, args.requests, args.logins, args.interval))
+        finally:
+            stop.set()
+            loader.join()
+        print(f"{label:<16} {len(latencies):>6} requests  p50 {np.percentile(latencies, 50):8.1f}ms  "
+              f"p99 {np.percentile(latencies, 99):8.1f}ms  max {latencies.max():8.1f}ms")
+
+if __name__ == "__main__":
+    main()
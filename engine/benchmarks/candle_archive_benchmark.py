@@ -0,0 +1,77 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle
+from engine.services.candle_archive import CandleArchive
+from engine.services.candle_loader import load_candles_from_db
+
+EXCHANGE = 'Yahoo'
+SYMBOL = 'EURUSD=X'
+TIMEFRAME = '1m'
+
+def make_candles(rows):
+    # FX-like series: 5 decimal prices, small moves, integer volume
+    rng = np.random.default_rng(0)
+    candles = np.empty((rows, 6))
+    candles[:, 0] = np.arange(rows, dtype=np.int64) * 60000
+    price = np.round(1.1 + np.cumsum(rng.normal(0, 0.00005, rows)), 5)
+    candles[:, 1] = price
+    candles[:, 2] = np.round(price + 0.0002, 5)
+    candles[:, 3] = np.round(price - 0.0002, 5)
+    candles[:, 4] = np.round(price + 0.00001, 5)
+    candles[:, 5] = rng.integers(0, 500, rows)
+    return candles
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(result):>10} rows  {elapsed:8.3f}s  {len(result) / elapsed:>14,.0f} rows/sec")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite and compressed archive size and read speed.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    candles = make_candles(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.sqlite3')
+        database = SqliteDatabase(path)
+        database.bind([Candle], bind_refs=False, bind_backrefs=False)
+        database.create_tables([Candle])
+        with database.atomic():
+            database.execute_sql('INSERT INTO instrument (exchange, symbol) VALUES (?, ?)', (EXCHANGE, SYMBOL))
+            database.connection().executemany(
+                'INSERT INTO candle_data (instrument_id, timeframe, timestamp, open, high, low, close, volume) '
+                f"VALUES (1, '{TIMEFRAME}', ?, ?, ?, ?, ?, ?)",
+                ((int(c[0]), c[1], c[2], c[3], c[4], c[5]) for c in candles.tolist())
+            )
+        database.execute_sql('VACUUM')
+
+        archive = CandleArchive(os.path.join(tmp_dir, 'archive'))
+        archive.append(EXCHANGE, SYMBOL, TIMEFRAME, candles)
+        stats = archive.stats(EXCHANGE, SYMBOL, TIMEFRAME)
+
+        print(f"{'SQLite file':<28} {os.path.getsize(path) / 2 ** 20:>10.1f} MiB")
+        print(f"{'Archive blocks':<28} {stats['compressed_bytes'] / 2 ** 20:>10.1f} MiB  ({stats['blocks']} blocks)")
+        print(f"{'Raw float64':<28} {candles.nbytes / 2 ** 20:>10.1f} MiB")
+
+        end_ts = args.rows * 60000
+        timed("SQLite bulk loader", lambda: load_candles_from_db(EXCHANGE, SYMBOL, TIMEFRAME, 0, end_ts))
+        cold = timed("Archive (all blocks)", lambda: archive.read_range(EXCHANGE, SYMBOL, TIMEFRAME, 0, end_ts))
+        timed("Archive (one day)", lambda: archive.read_range(EXCHANGE, SYMBOL, TIMEFRAME, 0, 1440 * 60000 - 1))
+        assert np.array_equal(cold, candles)
+
+        database.close()
+
+if __name__ == "__main__":
+    main()
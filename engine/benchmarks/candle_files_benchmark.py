@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from unittest.mock import patch
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import CandleSeries
+from engine.services import candle_files
+from engine.services.candle_store import CandleStore
+from engine.services.candle_files import export_candles, import_candle_file, FORMATS
+
+EXCHANGE = 'Binance'
+SYMBOL = 'BTC-USDT'
+TIMEFRAME = '1m'
+
+def make_candles(rows):
+    candles = np.empty((rows, 6))
+    candles[:, 0] = np.arange(rows, dtype=np.int64) * 60000
+    price = 20000 + np.cumsum(np.random.default_rng(0).normal(0, 5, rows))
+    candles[:, 1] = price
+    candles[:, 2] = price + 10
+    candles[:, 3] = price - 10
+    candles[:, 4] = price + 1
+    candles[:, 5] = 12.5
+    return candles
+
+def timed(label, rows, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {rows:>10} rows  {elapsed:8.3f}s  {rows / elapsed:>14,.0f} rows/sec")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Parquet/Arrow export and import throughput of the candle store.")
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'))
+        database.bind([CandleSeries], bind_refs=False, bind_backrefs=False)
+        database.create_tables([CandleSeries])
+        store = CandleStore(os.path.join(tmp_dir, 'candles'))
+
+        with patch.object(candle_files, 'candle_store', store):
+            print(f"Writing {args.rows:,} candles to the candle store...")
+            store.append(EXCHANGE, SYMBOL, TIMEFRAME, make_candles(args.rows))
+            end_ts = args.rows * 60000
+
+            for file_format in FORMATS:
+                path = os.path.join(tmp_dir, f'candles.{file_format}')
+                timed(f"Export {file_format}", args.rows,
+                      lambda: export_candles(EXCHANGE, SYMBOL, TIMEFRAME, 0, end_ts, path, file_format))
+                print(f"{'':<24} {os.path.getsize(path) / 2 ** 20:>10.1f} MiB")
+                timed(f"Import {file_format}", args.rows,
+                      lambda: import_candle_file(path, symbol=f'{SYMBOL}-{file_format}'))
+                assert np.array_equal(store.open(EXCHANGE, f'{SYMBOL}-{file_format}', TIMEFRAME),
+                                      store.open(EXCHANGE, SYMBOL, TIMEFRAME))
+
+        database.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle
+from engine.services.candle_loader import load_candles_from_db
+
+EXCHANGE = 'Binance'
+SYMBOL = 'BTC-USDT'
+TIMEFRAME = '1m'
+
+def populate(database, rows):
+    ts = np.arange(rows, dtype=np.int64) * 60000
+    price = 20000 + np.cumsum(np.random.default_rng(0).normal(0, 5, rows))
+    data = zip(ts.tolist(), price.tolist(), (price + 10).tolist(), (price - 10).tolist(), (price + 1).tolist(),
+               np.full(rows, 12.5).tolist())
+    with database.atomic():
+        database.execute_sql('DELETE FROM candle')
+        database.connection().executemany(
+            'INSERT INTO candle (timestamp, open, high, low, close, volume, exchange, symbol, timeframe) '
+            f"VALUES (?, ?, ?, ?, ?, ?, '{EXCHANGE}', '{SYMBOL}', '{TIMEFRAME}')",
+            data
+        )
+
+def load_with_orm(start_ts, end_ts):
+    # The row-by-row loop run_backtest used before candle_loader existed
+    query = Candle.select().where(
+        (Candle.exchange == EXCHANGE) &
+        (Candle.symbol == SYMBOL) &
+        (Candle.timeframe == TIMEFRAME) &
+        (Candle.timestamp >= start_ts) &
+        (Candle.timestamp <= end_ts)
+    ).order_by(Candle.timestamp)
+    candles_list = []
+    for c in query:
+        candles_list.append([c.timestamp, float(c.open), float(c.high), float(c.low), float(c.close), float(c.volume)])
+    return np.array(candles_list)
+
+def timed(label, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {len(result):>10} rows  {elapsed:8.3f}s  {len(result) / elapsed:>14,.0f} rows/sec")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ORM vs bulk candle loading.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'), pragmas={'journal_mode': 'wal'})
+        database.bind([Candle], bind_refs=False, bind_backrefs=False)
+        database.connect()
+        database.create_tables([Candle])
+
+        print(f"Populating {args.rows:,} candles...")
+        populate(database, args.rows)
+
+        end_ts = args.rows * 60000
+        before = timed("ORM (Candle + Decimal)", lambda: load_with_orm(0, end_ts))
+        after = timed("Bulk loader", lambda: load_candles_from_db(EXCHANGE, SYMBOL, TIMEFRAME, 0, end_ts))
+        assert np.allclose(before, after)
+
+        database.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from unittest.mock import patch
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries
+from engine.services.candle_store import CandleStore, candle_dicts_to_array
+from engine.services.candle_validation import validate_candles
+from engine.modes import import_candles_mode
+
+HOUR = 3600000
+
+def make_batch(rows):
+    # Adapter output: a list of dicts, with a few broken rows mixed in
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 0.2, rows))
+    batch = [{'timestamp': i * HOUR, 'open': c - 0.05, 'high': c + 0.3, 'low': c - 0.3, 'close': c, 'volume': 10.0}
+             for i, c in enumerate(close.tolist())]
+    for i in rng.choice(rows, rows // 1000, replace=False).tolist():
+        batch[i]['high'] = batch[i]['low'] - 1
+    return batch
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation cost relative to writing a fetched batch.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    batch = make_batch(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'))
+        database.bind([Candle, CandleSeries], bind_refs=False, bind_backrefs=False)
+        database.create_tables([Candle, CandleSeries])
+
+        # Same steps as run_import; the validated array is handed on to _save_candles
+        started = time.perf_counter()
+        candles, _, issues = validate_candles(candle_dicts_to_array(batch), HOUR)
+        validation = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with patch.object(import_candles_mode, 'candle_store', CandleStore(os.path.join(tmp_dir, 'candles'))), \
+                patch('builtins.print'):
+            import_candles_mode._save_candles('Binance', 'BENCH', '1h', candles)
+        saving = time.perf_counter() - started
+        database.close()
+
+    print(f"{'validate':<10} {args.rows:>10} rows  {validation:8.3f}s  {len(issues)} findings")
+    print(f"{'save':<10} {len(candles):>10} rows  {saving:8.3f}s")
+    print(f"Validation adds {validation / saving * 100:.1f}% to writing the batch (network time not included)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import threading
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import SQLITE_PRAGMAS
+from engine.services.connection_pool import MeteredPooledSqliteDatabase
+
+def populate(path, rows):
+    database = SqliteDatabase(path, pragmas=SQLITE_PRAGMAS)
+    database.execute_sql('CREATE TABLE "task" ("id" TEXT PRIMARY KEY, "status" TEXT)')
+    with database.atomic():
+        database.connection().executemany('INSERT INTO "task" VALUES (?, ?)',
+                                          ((f"task-{i}", 'completed') for i in range(rows)))
+    database.close()
+
+def serve(database, threads, requests):
+    # Each "request" connects, reads one task and closes, like a request handler reading through `reading()`
+    def client(offset):
+        for i in range(requests):
+            database.connect()
+            database.execute_sql('SELECT "status" FROM "task" WHERE "id" = ?', (f"task-{offset + i}",)).fetchone()
+            database.close()
+
+    workers = [threading.Thread(target=client, args=(n * requests,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Connect-per-request vs pooled read connections.")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--pool-size', type=int, default=8)
+    args = parser.parse_args()
+
+    total = args.threads * args.requests
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.sqlite3')
+        populate(path, total)
+
+        plain = SqliteDatabase(path, pragmas=SQLITE_PRAGMAS, timeout=10)
+        elapsed = serve(plain, args.threads, args.requests)
+        print(f"{'connect per request':<22} {total:>8} reads  {elapsed:8.3f}s  {total / elapsed:>10,.0f} req/sec  "
+              f"{total} connections opened")
+
+        pooled = MeteredPooledSqliteDatabase(path, pragmas={'query_only': 1}, max_connections=args.pool_size)
+        elapsed = serve(pooled, args.threads, args.requests)
+        stats = pooled.stats()
+        print(f"{'pooled readers':<22} {total:>8} reads  {elapsed:8.3f}s  {total / elapsed:>10,.0f} req/sec  "
+              f"{stats['opened']} connections opened, waited {stats['exhausted']} times, "
+              f"max wait {stats['max_wait_seconds'] * 1000:.1f}ms")
+        pooled.close_all()
+
+if __name__ == "__main__":
+    main()
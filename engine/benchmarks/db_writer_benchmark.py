@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import threading
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import SQLITE_PRAGMAS
+from engine.models.core import Task
+from engine.services.db_writer import DatabaseWriter
+
+def run_jobs(jobs, updates, write):
+    # Each job reports progress on its own task row, like import_task/backtest_task
+    slowest = [0.0] * jobs
+
+    def job(n):
+        for step in range(updates):
+            started = time.perf_counter()
+            write(f"job-{n}", step, wait=step == updates - 1)
+            slowest[n] = max(slowest[n], time.perf_counter() - started)
+
+    threads = [threading.Thread(target=job, args=(n,)) for n in range(jobs)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, max(slowest)
+
+def main():
+    parser = argparse.ArgumentParser(description="Direct per-thread writes vs the single writer queue.")
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--updates', type=int, default=300)
+    args = parser.parse_args()
+
+    total = args.jobs * args.updates
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'), pragmas=SQLITE_PRAGMAS, timeout=10)
+        database.bind([Task], bind_refs=False, bind_backrefs=False)
+        database.create_tables([Task])
+        with database.atomic():
+            for n in range(args.jobs):
+                Task.create(id=f"job-{n}", type='import', status='queued', created_at=0, updated_at=0)
+
+        def direct(task_id, step, wait):
+            Task.update(status='processing', updated_at=step).where(Task.id == task_id).execute()
+
+        elapsed, slowest = run_jobs(args.jobs, args.updates, direct)
+        print(f"{'direct':<8} {total:>8} updates  {elapsed:8.3f}s  {total / elapsed:>10,.0f} updates/sec  "
+              f"slowest call {slowest * 1000:.1f}ms")
+
+        writer = DatabaseWriter()
+        writer.start()
+
+        def queued(task_id, step, wait):
+            future = writer.update(Task, task_id, status='processing', updated_at=step)
+            if wait:
+                future.result()
+
+        elapsed, slowest = run_jobs(args.jobs, args.updates, queued)
+        writer.stop()
+        stats = writer.stats()
+        print(f"{'queued':<8} {total:>8} updates  {elapsed:8.3f}s  {total / elapsed:>10,.0f} updates/sec  "
+              f"slowest call {slowest * 1000:.1f}ms  {stats['transactions']} transactions, "
+              f"{stats['statements']} statements, lock wait {stats['lock_wait_seconds'] * 1000:.1f}ms total")
+        database.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import numpy as np
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle
+from engine.convert_prices import convert_prices
+from engine.services import candle_loader
+
+def populate(database, rows):
+    ts = np.arange(rows, dtype=np.int64) * 60000
+    price = np.round(20000 + np.cumsum(np.random.default_rng(0).normal(0, 5, rows)), 2)
+    volume = np.round(np.random.default_rng(1).exponential(3, rows), 5)
+    data = zip(ts.tolist(), price.tolist(), (price + 10).tolist(), (price - 10).tolist(), (price + 1).tolist(),
+               volume.tolist())
+    with database.atomic():
+        database.connection().executemany(
+            'INSERT INTO candle (timestamp, open, high, low, close, volume, exchange, symbol, timeframe) '
+            "VALUES (?, ?, ?, ?, ?, ?, 'Binance', 'BTC-USDT', '1m')",
+            data
+        )
+
+def measure(database, path, rows, repeat):
+    database.execute_sql('VACUUM')
+    size = os.path.getsize(path)
+    # Best of `repeat`: the first read after VACUUM also pays for warming the page cache
+    elapsed = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        # The loader decodes with the scales stored on the instrument row, whatever PRICE_ENCODING says
+        candles = candle_loader.load_candles_from_db('Binance', 'BTC-USDT', '1m', 0, rows * 60000)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    return size, elapsed, candles
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare decimal vs fixed-point candle storage.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.sqlite3')
+        database = SqliteDatabase(path)
+        database.bind([Candle], bind_refs=False, bind_backrefs=False)
+        database.connect()
+        database.execute_sql('CREATE TABLE "option" ("id" INTEGER PRIMARY KEY, "type" VARCHAR(255) UNIQUE, "json" TEXT)')
+        database.create_tables([Candle])
+
+        print(f"Populating {args.rows:,} candles...")
+        populate(database, args.rows)
+
+        decimal_size, decimal_time, before = measure(database, path, args.rows, args.repeat)
+        convert_prices('fixed', database=database, vacuum=False)
+        fixed_size, fixed_time, after = measure(database, path, args.rows, args.repeat)
+        assert np.array_equal(before, after)
+
+        print(f"{'decimal (REAL)':<16} {decimal_size / 2**20:8.1f} MiB  bulk read {decimal_time:6.3f}s")
+        print(f"{'fixed (int64)':<16} {fixed_size / 2**20:8.1f} MiB  bulk read {fixed_time:6.3f}s")
+        database.close()
+
+if __name__ == "__main__":
+    main()
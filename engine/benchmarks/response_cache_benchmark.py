@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+import time
+import tempfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.exchanges.binance import Binance
+from engine.services.rate_limiter import TokenBucket
+from engine.services.response_cache import ResponseCache
+
+MINUTE = 60 * 1000
+
+class KlinesHandler(BaseHTTPRequestHandler):
+    """
+    Local /api/v3/klines with a fixed latency per request, standing in for the network.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        start, end = int(query['startTime']), int(query['endTime'])
+        rows = [[ts, "1.0", "2.0", "0.5", str(ts), "10.0", ts + MINUTE - 1]
+                for ts in range(start, end + 1, MINUTE)][:int(query['limit'])]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def fetch(server, cache, candles):
+    exchange = Binance(base_url=f"http://127.0.0.1:{server.server_address[1]}", weight=TokenBucket(10 ** 9, 60),
+                       cache=cache)
+    started = time.perf_counter()
+    count = sum(len(page) for page in exchange.iter_ohlcv('BTC-USDT', '1m', 0, (candles - 1) * MINUTE))
+    elapsed = time.perf_counter() - started
+    exchange.session.close()
+    assert count == candles, count
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-fetching a cached kline range versus downloading it.")
+    parser.add_argument('--candles', type=int, default=200_000)
+    parser.add_argument('--latency', type=float, default=0.15, help="seconds per request")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KlinesHandler)
+    server.daemon_threads = True
+    server.latency = args.latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        uncached = fetch(server, ResponseCache(tmp_dir, 'off'), args.candles)
+        cold = fetch(server, ResponseCache(tmp_dir, 'on'), args.candles)
+        warm = fetch(server, ResponseCache(tmp_dir, 'on'), args.candles)
+        offline = fetch(server, ResponseCache(tmp_dir, 'offline'), args.candles)
+
+        stored = [os.path.join(root, name) for root, _, names in os.walk(tmp_dir) for name in names]
+        size = sum(os.path.getsize(path) for path in stored)
+        started = time.perf_counter()
+        for path in stored:
+            with open(path, 'rb') as f:
+                f.read()
+        disk = time.perf_counter() - started
+
+    server.shutdown()
+    print(f"{args.candles} 1m candles, {len(stored)} pages, {args.latency * 1000:.0f} ms per request")
+    print(f"  no cache:          {uncached:7.2f} s")
+    print(f"  cold cache:        {cold:7.2f} s")
+    print(f"  warm cache:        {warm:7.2f} s")
+    print(f"  offline replay:    {offline:7.2f} s")
+    print(f"  reading the files: {disk:7.2f} s ({size / 2 ** 20:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
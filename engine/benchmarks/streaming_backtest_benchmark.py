@@ -0,0 +1,75 @@
+import sys
+import os
+import time
+import tempfile
+import argparse
+import tracemalloc
+import numpy as np
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, BacktestSession
+from engine.strategies.Strategy import Strategy
+from engine.services.candle_cache import candle_cache
+from engine.modes.backtest_mode import run_backtest
+
+EXCHANGE = 'Sandbox'
+SYMBOL = 'BTC-USDT'
+TIMEFRAME = '1m'
+START_DATE = '2015-01-01'
+START_TS = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+
+class WatchStrategy(Strategy):
+    # Reads a short lookback every bar but never trades, so the run measures the candle feed
+    lookback = 60
+
+    def should_long(self):
+        closes = self.candles[-60:, 4]
+        return closes[-1] > closes.max()
+
+def populate(database, rows):
+    ts = START_TS + np.arange(rows, dtype=np.int64) * 60000
+    price = 20000 + np.cumsum(np.random.default_rng(0).normal(0, 5, rows))
+    data = zip(ts.tolist(), price.tolist(), (price + 10).tolist(), (price - 10).tolist(), (price + 1).tolist(),
+               np.full(rows, 12.5).tolist())
+    with database.atomic():
+        database.execute_sql('INSERT INTO instrument (exchange, symbol) VALUES (?, ?)', (EXCHANGE, SYMBOL))
+        database.connection().executemany(
+            'INSERT INTO candle_data (instrument_id, timeframe, timestamp, open, high, low, close, volume) '
+            f"VALUES (1, '{TIMEFRAME}', ?, ?, ?, ?, ?, ?)",
+            data
+        )
+
+def measure(label, rows, **options):
+    end_date = time.strftime("%Y-%m-%d", time.localtime((START_TS + rows * 60000) / 1000))
+    candle_cache.clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = run_backtest(EXCHANGE, SYMBOL, TIMEFRAME, START_DATE, end_date, WatchStrategy, **options)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {rows:>10} rows  {elapsed:8.2f}s  peak {peak / 2 ** 20:8.1f} MiB  {result.final_balance:.2f}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of in-memory vs streaming backtests.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[200_000, 800_000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'))
+            database.bind([Candle, BacktestSession], bind_refs=False, bind_backrefs=False)
+            database.create_tables([Candle, BacktestSession])
+            populate(database, rows)
+
+            in_memory = measure("in-memory", rows)
+            streamed = measure("streaming", rows, stream=True, chunk_rows=20_000, window_rows=100)
+            assert in_memory.final_balance == streamed.final_balance
+            database.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import sys
+import os
+import json
+import time
+import tempfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+from peewee import SqliteDatabase
+
+# Add parent dir to path so 'engine' package can be resolved
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.exchanges.binance import Binance
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue, WatchedSeries
+from engine.services.candle_store import CandleStore
+from engine.services.rate_limiter import TokenBucket
+from engine.services.tail_importer import TailImporter
+
+MINUTE = 60 * 1000
+MODELS = [Candle, CandleSeries, CandleCoverage, CandleIssue, WatchedSeries]
+
+class KlinesHandler(BaseHTTPRequestHandler):
+    """
+    Local /api/v3/klines with a fixed latency per request: 1m candles up to `last_ts`.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        start = -(-int(query['startTime']) // MINUTE) * MINUTE
+        end = min(int(query.get('endTime', self.server.last_ts)), self.server.last_ts)
+        rows = [[ts, "1.0", "2.0", "0.5", "1.5", "10.0", ts + MINUTE - 1]
+                for ts in range(start, end + 1, MINUTE)][:int(query['limit'])]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to append the newest 1m candles of many watched symbols.")
+    parser.add_argument('--symbols', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.15, help="seconds per request")
+    parser.add_argument('--behind', type=int, default=3, help="candles each series is behind")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KlinesHandler)
+    server.daemon_threads = True
+    server.latency = args.latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    last_closed = (int(time.time() * 1000) // MINUTE - 1) * MINUTE
+    today = time.strftime('%Y-%m-%d')
+
+    for workers in (1, 4):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = SqliteDatabase(os.path.join(tmp_dir, 'bench.sqlite3'), check_same_thread=False)
+            database.bind(MODELS, bind_refs=False, bind_backrefs=False)
+            database.create_tables(MODELS)
+            series = [WatchedSeries.create(exchange='Binance', symbol=f'SYM{i}-USDT', timeframe='1m', start_date=today,
+                                           created_at=0) for i in range(args.symbols)]
+            tail = TailImporter(delay=0, workers=workers)
+            driver = Binance(base_url=url, workers=workers, weight=TokenBucket(10 ** 9, 60))
+            with patch('engine.modes.import_candles_mode.candle_store', CandleStore(os.path.join(tmp_dir, 'store'))), \
+                    patch('engine.services.tail_importer.get_driver', return_value=driver), \
+                    patch('builtins.print'):
+                # Backfill up to a few candles ago, then those candles close
+                server.last_ts = last_closed - args.behind * MINUTE
+                tail.refresh(series)
+                server.last_ts = last_closed
+                cycle = tail.refresh(list(WatchedSeries.select()))
+            driver.session.close()
+            database.close()
+
+        print(f"{args.symbols} symbols, {workers} at once, {args.latency * 1000:.0f} ms per request: "
+              f"{cycle['seconds']:.2f} s for {cycle['fetched']} new candles, {cycle['failed']} failed")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
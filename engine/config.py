@@ -1,18 +1,130 @@
 import os
-from peewee import SqliteDatabase
+from engine.services.connection_pool import MeteredPooledSqliteDatabase, WriterSqliteDatabase
 
 # Database Configuration
 DB_NAME = os.getenv('DB_NAME', 'db.sqlite3')
 
 # Use a higher timeout to prevent "database is locked" errors
 # Enable WAL (Write-Ahead Logging) mode for better concurrency
-db = SqliteDatabase(DB_NAME, pragmas={
+# auto_vacuum has to come before journal_mode: it only applies to a file without tables
+# (existing databases switch on the next VACUUM, see engine/maintain_db.py)
+SQLITE_PRAGMAS = {
+    'auto_vacuum': 'incremental',
     'journal_mode': 'wal',
     'cache_size': -1024 * 64,  # 64MB
     'foreign_keys': 1,
     'ignore_check_constraints': 0,
     'synchronous': 1
-}, timeout=10) # 10 seconds timeout
+}
+
+# Connections are pooled and reused across requests instead of reopened each time.
+# `db` is the writer that models are bound to: a single connection that threads take turns
+# on, one statement or transaction at a time. Read-only queries (API reads, candle loading)
+# check out one of DB_READ_POOL_SIZE connections from `read_db` instead, see
+# engine/services/connection_pool.py. DB_POOL_WAIT_SECONDS bounds the wait for the writer
+# or a free reader; connections older than DB_POOL_STALE_SECONDS are reopened.
+DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', '8'))
+DB_POOL_WAIT_SECONDS = int(os.getenv('DB_POOL_WAIT_SECONDS', '10'))
+DB_POOL_STALE_SECONDS = int(os.getenv('DB_POOL_STALE_SECONDS', '3600'))
+
+db = WriterSqliteDatabase(DB_NAME, pragmas=SQLITE_PRAGMAS, busy_timeout=10, # 10 seconds timeout
+                          wait_timeout=DB_POOL_WAIT_SECONDS, stale_timeout=DB_POOL_STALE_SECONDS)
+read_db = MeteredPooledSqliteDatabase(DB_NAME, pragmas={'query_only': 1, 'cache_size': SQLITE_PRAGMAS['cache_size']},
+                                      busy_timeout=10, wait_timeout=DB_POOL_WAIT_SECONDS,
+                                      max_connections=DB_READ_POOL_SIZE, stale_timeout=DB_POOL_STALE_SECONDS)
+
+# Columnar candle files (one memory-mapped file per exchange/symbol/timeframe)
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', 'storage/candles')
+
+# Raw exchange responses cached on disk (engine/services/response_cache.py): 'off', 'on'
+# (read through, store downloads) or 'offline' (replay only, fail on a miss). Closed
+# candles are kept for good; responses that can still change expire after
+# RESPONSE_CACHE_OPEN_TTL seconds, Yahoo's adjusted history after RESPONSE_CACHE_ADJUSTED_TTL
+RESPONSE_CACHE_MODE = os.getenv('RESPONSE_CACHE', 'off')
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', 'storage/responses')
+RESPONSE_CACHE_OPEN_TTL = int(os.getenv('RESPONSE_CACHE_OPEN_TTL', '60'))
+RESPONSE_CACHE_ADJUSTED_TTL = int(os.getenv('RESPONSE_CACHE_ADJUSTED_TTL', '86400'))
+
+# Compressed block archive for old candles (see engine/archive_candles.py)
+CANDLE_ARCHIVE_DIR = os.getenv('CANDLE_ARCHIVE_DIR', 'storage/archive')
+
+# How prices/quantities are stored: 'decimal' (DecimalField) or 'fixed' (scaled int64).
+# Existing databases are switched with engine/convert_prices.py.
+PRICE_ENCODING = os.getenv('PRICE_ENCODING', 'decimal')
+
+# 'none': all candles live in DB_NAME. 'symbol': one SQLite file per exchange/symbol under
+# CANDLE_PARTITION_DIR, so imports of different symbols don't share a writer lock.
+CANDLE_PARTITIONING = os.getenv('CANDLE_PARTITIONING', 'none')
+CANDLE_PARTITION_DIR = os.getenv('CANDLE_PARTITION_DIR', 'storage/partitions')
+
+# Higher timeframes kept resampled from 1m candles and updated on every 1m import.
+# Other multiples of 1m are materialized the first time a backtest asks for them.
+CANDLE_AGGREGATE_TIMEFRAMES = [t for t in os.getenv('CANDLE_AGGREGATE_TIMEFRAMES', '5m,15m,1h,4h,1d').split(',') if t]
+
+# Task and backtest session state is written by one thread (engine/services/db_writer.py):
+# it waits up to DB_WRITER_INTERVAL_MS for more writes and commits at most
+# DB_WRITER_MAX_BATCH of them per transaction
+DB_WRITER_INTERVAL_MS = int(os.getenv('DB_WRITER_INTERVAL_MS', '10'))
+DB_WRITER_MAX_BATCH = int(os.getenv('DB_WRITER_MAX_BATCH', '500'))
+
+# Threads that run the database work of async request handlers (engine/services/db_async.py);
+# at most the reader pool size, so a query never waits for a connection. 0 runs the queries
+# on the event loop itself.
+DB_ASYNC_WORKERS = int(os.getenv('DB_ASYNC_WORKERS', str(DB_READ_POOL_SIZE)))
+
+# Background SQLite maintenance (engine/services/db_maintenance.py): seconds between runs
+# (0 disables the scheduler), seconds without an import before a run may start, and pages
+# returned to the OS per incremental vacuum step
+DB_MAINTENANCE_INTERVAL = int(os.getenv('DB_MAINTENANCE_INTERVAL', '900'))
+DB_MAINTENANCE_IDLE_SECONDS = int(os.getenv('DB_MAINTENANCE_IDLE_SECONDS', '60'))
+DB_VACUUM_STEP_PAGES = int(os.getenv('DB_VACUUM_STEP_PAGES', '256'))
+
+# Memory budget of the in-process candle cache shared by backtest runs
+CANDLE_CACHE_MAX_BYTES = int(os.getenv('CANDLE_CACHE_MB', '512')) * 1024 * 1024
+
+# Streaming backtests: candles read per chunk, and how many trailing candles the
+# strategy sees (must cover its longest lookback for results to match in-memory mode)
+BACKTEST_CHUNK_ROWS = int(os.getenv('BACKTEST_CHUNK_ROWS', '100000'))
+BACKTEST_WINDOW_ROWS = int(os.getenv('BACKTEST_WINDOW_ROWS', '1000'))
+
+# Binance kline downloads (engine/exchanges/binance.py): ranges are split into pages that
+# BINANCE_FETCH_WORKERS threads fetch over one keep-alive session. Requests are paced by
+# a token bucket of BINANCE_WEIGHT_PER_MINUTE, kept below the exchange's 6000 per IP so
+# other clients on the same address have room.
+BINANCE_BASE_URL = os.getenv('BINANCE_BASE_URL', 'https://api.binance.com')
+BINANCE_FETCH_WORKERS = int(os.getenv('BINANCE_FETCH_WORKERS', '4'))
+BINANCE_WEIGHT_PER_MINUTE = int(os.getenv('BINANCE_WEIGHT_PER_MINUTE', '5000'))
+
+# Exchange requests (engine/services/rate_limiter.py): tries per request, and the backoff
+# before retry n, drawn from [0, min(MAX, BACKOFF * 2^(n-1))] seconds. A throttled request
+# waits for its Retry-After, unless that is longer than RETRY_AFTER_MAX (e.g. an IP ban):
+# then it fails and the import can be resumed later
+EXCHANGE_RETRY_ATTEMPTS = int(os.getenv('EXCHANGE_RETRY_ATTEMPTS', '5'))
+EXCHANGE_BACKOFF_SECONDS = float(os.getenv('EXCHANGE_BACKOFF_SECONDS', '0.5'))
+EXCHANGE_BACKOFF_MAX_SECONDS = float(os.getenv('EXCHANGE_BACKOFF_MAX_SECONDS', '30'))
+EXCHANGE_RETRY_AFTER_MAX_SECONDS = float(os.getenv('EXCHANGE_RETRY_AFTER_MAX_SECONDS', '120'))
+
+# Tickers that share one multi-ticker yfinance download (engine/exchanges/yahoo.py), and
+# downloads per minute across all Yahoo imports (Yahoo publishes no limit; this stays
+# clear of its throttling)
+YAHOO_TICKERS_PER_REQUEST = int(os.getenv('YAHOO_TICKERS_PER_REQUEST', '20'))
+YAHOO_REQUESTS_PER_MINUTE = int(os.getenv('YAHOO_REQUESTS_PER_MINUTE', '60'))
+
+# Imports write each fetched page while the next ones download; at most
+# IMPORT_PREFETCH_PAGES pages wait between the two (engine/modes/import_candles_mode.py)
+IMPORT_PREFETCH_PAGES = int(os.getenv('IMPORT_PREFETCH_PAGES', '4'))
+
+# Imports running at once in the process, in total and against one exchange
+# (engine/services/import_scheduler.py); the rest wait for a slot
+IMPORT_MAX_CONCURRENT = int(os.getenv('IMPORT_MAX_CONCURRENT', '4'))
+IMPORT_MAX_PER_EXCHANGE = int(os.getenv('IMPORT_MAX_PER_EXCHANGE', '2'))
+
+# Tail import (engine/services/tail_importer.py): watched series are refreshed this many
+# seconds after each of their candles closes, at most TAIL_IMPORT_WORKERS at once.
+# TAIL_IMPORT=off keeps the scheduler from starting with the API
+TAIL_IMPORT_ENABLED = os.getenv('TAIL_IMPORT', 'on').lower() == 'on'
+TAIL_IMPORT_DELAY_SECONDS = float(os.getenv('TAIL_IMPORT_DELAY_SECONDS', '2'))
+TAIL_IMPORT_WORKERS = int(os.getenv('TAIL_IMPORT_WORKERS', str(BINANCE_FETCH_WORKERS)))
 
 # Global Configuration
 config = {
@@ -21,6 +133,69 @@ config = {
     },
     'database': {
         'name': DB_NAME,
-        'engine': 'sqlite'
+        'engine': 'sqlite',
+        'price_encoding': PRICE_ENCODING,
+        'read_pool_size': DB_READ_POOL_SIZE,
+        'pool_wait_seconds': DB_POOL_WAIT_SECONDS,
+        'pool_stale_seconds': DB_POOL_STALE_SECONDS,
+        'writer_interval_ms': DB_WRITER_INTERVAL_MS,
+        'writer_max_batch': DB_WRITER_MAX_BATCH,
+        'async_workers': DB_ASYNC_WORKERS
+    },
+    'candle_store': {
+        'path': CANDLE_STORE_DIR
+    },
+    'candle_archive': {
+        'path': CANDLE_ARCHIVE_DIR
+    },
+    'response_cache': {
+        'mode': RESPONSE_CACHE_MODE,
+        'path': RESPONSE_CACHE_DIR,
+        'open_ttl': RESPONSE_CACHE_OPEN_TTL,
+        'adjusted_ttl': RESPONSE_CACHE_ADJUSTED_TTL
+    },
+    'candle_aggregates': {
+        'timeframes': CANDLE_AGGREGATE_TIMEFRAMES
+    },
+    'candle_partitions': {
+        'mode': CANDLE_PARTITIONING,
+        'path': CANDLE_PARTITION_DIR
+    },
+    'backtest': {
+        'chunk_rows': BACKTEST_CHUNK_ROWS,
+        'window_rows': BACKTEST_WINDOW_ROWS
+    },
+    'db_maintenance': {
+        'interval': DB_MAINTENANCE_INTERVAL,
+        'idle_seconds': DB_MAINTENANCE_IDLE_SECONDS,
+        'vacuum_step_pages': DB_VACUUM_STEP_PAGES
+    },
+    'candle_cache': {
+        'max_bytes': CANDLE_CACHE_MAX_BYTES
+    },
+    'yahoo': {
+        'tickers_per_request': YAHOO_TICKERS_PER_REQUEST,
+        'requests_per_minute': YAHOO_REQUESTS_PER_MINUTE
+    },
+    'import': {
+        'prefetch_pages': IMPORT_PREFETCH_PAGES,
+        'max_concurrent': IMPORT_MAX_CONCURRENT,
+        'max_per_exchange': IMPORT_MAX_PER_EXCHANGE
+    },
+    'tail_import': {
+        'enabled': TAIL_IMPORT_ENABLED,
+        'delay_seconds': TAIL_IMPORT_DELAY_SECONDS,
+        'workers': TAIL_IMPORT_WORKERS
+    },
+    'exchange_requests': {
+        'retry_attempts': EXCHANGE_RETRY_ATTEMPTS,
+        'backoff_seconds': EXCHANGE_BACKOFF_SECONDS,
+        'backoff_max_seconds': EXCHANGE_BACKOFF_MAX_SECONDS,
+        'retry_after_max_seconds': EXCHANGE_RETRY_AFTER_MAX_SECONDS
+    },
+    'binance': {
+        'base_url': BINANCE_BASE_URL,
+        'fetch_workers': BINANCE_FETCH_WORKERS,
+        'weight_per_minute': BINANCE_WEIGHT_PER_MINUTE
     }
 }
@@ -8,7 +8,11 @@ from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from typing import Optional
 from passlib.context import CryptContext
+from peewee import IntegrityError
 from engine.models.core import User
+from engine.services.connection_pool import reading
+from engine.services.db_async import run_db
+from engine.services.db_writer import db_writer
 
 router = APIRouter()
 
@@ -41,6 +45,34 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def find_user(username: str) -> Optional[User]:
+    with reading(User._meta.database) as reader:
+        return User.select().where(User.username == username).get_or_none(reader)
+
+def create_user(username: str, password: str, email: Optional[str] = None) -> bool:
+    """
+    Hash the password and store the user. Returns False if the username is taken.
+    """
+    if find_user(username) is not None:
+        return False
+    try:
+        db_writer.execute(User.insert(
+            username=username,
+            password_hash=get_password_hash(password),
+            email=email,
+            created_at=int(time.time())
+        )).result()
+    except IntegrityError:
+        # Registered by a concurrent request in the meantime
+        return False
+    return True
+
+def authenticate_user(username: str, password: str) -> Optional[User]:
+    user = find_user(username)
+    if not user or not verify_password(password, user.password_hash):
+        return None
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -65,30 +97,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    user = User.get_or_none(User.username == username)
+    user = await run_db(find_user, username)
     if user is None:
         raise credentials_exception
     return user
 
 @router.post("/auth/register", response_model=MessageResponse)
 async def register(request: RegisterRequest):
-    # Check if user exists
-    if User.select().where(User.username == request.username).exists():
+    # Lookup, hashing and insert run off the event loop
+    if not await run_db(create_user, request.username, request.password, request.email):
         raise HTTPException(status_code=400, detail="Username already registered")
-    
-    hashed_password = get_password_hash(request.password)
-    User.create(
-        username=request.username,
-        password_hash=hashed_password,
-        email=request.email,
-        created_at=int(time.time())
-    )
     return {"message": "User created successfully"}
 
 @router.post("/auth/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = User.get_or_none(User.username == form_data.username)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await run_db(authenticate_user, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
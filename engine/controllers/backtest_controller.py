@@ -3,15 +3,19 @@ from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List, Union
 from engine.modes.backtest_mode import run_backtest
+from engine.config import BACKTEST_WINDOW_ROWS
 from engine.strategies.simple_strategy import SimpleStrategy
 from engine.strategies.golden_cross_strategy import GoldenCrossStrategy
 from engine.controllers.auth_controller import get_current_user
 from engine.models.core import User, Task, Log, BacktestSession
+from engine.services.connection_pool import reading
+from engine.services.db_writer import db_writer
 from engine.schemas import BacktestResult, TradeResult
 import uuid
 import time
 import json
 import os
+import asyncio
 
 router = APIRouter()
 
@@ -23,6 +27,9 @@ class BacktestRequest(BaseModel):
     end_date: str
     strategy_name: str
     run_in_background: Optional[bool] = False
+    # Stream candles in chunks, keeping only `window_rows` candles of history
+    stream: Optional[bool] = False
+    window_rows: Optional[int] = BACKTEST_WINDOW_ROWS
 
 class BacktestResponse(BaseModel):
     status: str
@@ -107,16 +114,17 @@ def cancel_backtest(request: Dict[str, str], current_user: User = Depends(get_cu
     if not session_id:
         raise HTTPException(status_code=400, detail="Session ID is required")
         
-    try:
-        session = BacktestSession.get(BacktestSession.id == session_id)
-        if session.status in ['processing', 'queued']:
-            session.status = 'cancelled'
-            session.save()
-            return {"message": f"Backtest {session_id} requested for cancellation"}
-        else:
-            return {"message": f"Backtest {session_id} is already {session.status}"}
-    except BacktestSession.DoesNotExist:
+    # Only a queued or running session can be cancelled; checked in the same statement
+    cancelled = db_writer.execute(BacktestSession.update(status='cancelled').where(
+        (BacktestSession.id == session_id) & BacktestSession.status.in_(['processing', 'queued'])
+    )).result()
+    if cancelled:
+        return {"message": f"Backtest {session_id} requested for cancellation"}
+
+    session = BacktestSession.get_or_none(BacktestSession.id == session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": f"Backtest {session_id} is already {session.status}"}
 
 @router.get("/logs/{session_id}", response_model=LogsResponse)
 def get_logs(session_id: str, current_user: User = Depends(get_current_user)):
@@ -138,7 +146,7 @@ def purge_sessions(request: Dict[str, int], current_user: User = Depends(get_cur
         
     cutoff_time = int(time.time() * 1000) - (days_old * 86400 * 1000) # ms
     query = BacktestSession.delete().where(BacktestSession.created_at < cutoff_time)
-    deleted_count = query.execute()
+    deleted_count = db_writer.execute(query).result()
     
     return {"message": f"Successfully purged {deleted_count} session(s)", "deleted_count": deleted_count}
 
@@ -147,9 +155,9 @@ def get_backtest_session_chart_data(session_id: str, current_user: User = Depend
     """
     Get chart data for a specific backtest session.
     """
-    try:
-        session = BacktestSession.get(BacktestSession.id == session_id)
-    except BacktestSession.DoesNotExist:
+    with reading(BacktestSession._meta.database) as reader:
+        session = BacktestSession.select().where(BacktestSession.id == session_id).get_or_none(reader)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
         
     return {"chart_data": session.chart_data_json}
@@ -160,8 +168,9 @@ def get_backtest_sessions(pagination: PaginationRequest, current_user: User = De
     Get a list of backtest sessions sorted by most recently updated.
     """
     query = BacktestSession.select().order_by(BacktestSession.updated_at.desc())
-    count = query.count()
-    sessions = query.limit(pagination.limit).offset(pagination.offset)
+    with reading(BacktestSession._meta.database) as reader:
+        count = query.count(reader)
+        sessions = list(query.limit(pagination.limit).offset(pagination.offset).execute(reader))
     
     session_list = []
     for s in sessions:
@@ -204,9 +213,9 @@ def get_backtest_session(session_id: str, current_user: User = Depends(get_curre
     """
     Get a single backtest session by ID.
     """
-    try:
-        s = BacktestSession.get(BacktestSession.id == session_id)
-    except BacktestSession.DoesNotExist:
+    with reading(BacktestSession._meta.database) as reader:
+        s = BacktestSession.select().where(BacktestSession.id == session_id).get_or_none(reader)
+    if s is None:
         raise HTTPException(status_code=404, detail="Session not found")
         
     return BacktestSessionResponse(
@@ -235,7 +244,7 @@ def remove_backtest_session(session_id: str, current_user: User = Depends(get_cu
     Remove a backtest session from the database.
     """
     query = BacktestSession.delete().where(BacktestSession.id == session_id)
-    deleted_count = query.execute()
+    deleted_count = db_writer.execute(query).result()
     
     if deleted_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -247,34 +256,29 @@ def update_session_state(request: UpdateSessionStateRequest, current_user: User
     """
     Update the state of a backtest session.
     """
-    try:
-        session = BacktestSession.get(BacktestSession.id == request.id)
-        session.state = json.dumps(request.state)
-        session.updated_at = int(time.time() * 1000)
-        session.save()
-        return {"message": "Backtest session state updated successfully"}
-    except BacktestSession.DoesNotExist:
+    updated = db_writer.update(BacktestSession, request.id, state=json.dumps(request.state),
+                               updated_at=int(time.time() * 1000)).result()
+    if not updated:
         raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Backtest session state updated successfully"}
 
 @router.post("/sessions/{session_id}/notes", response_model=MessageResponse)
 def update_session_notes(session_id: str, request: UpdateSessionNotesRequest, current_user: User = Depends(get_current_user)):
     """
     Update the notes (title, description, strategy_codes) of a backtest session.
     """
-    try:
-        session = BacktestSession.get(BacktestSession.id == session_id)
-        if request.title is not None:
-            session.title = request.title
-        if request.description is not None:
-            session.description = request.description
-        if request.strategy_codes is not None:
-            session.strategy_codes = json.dumps(request.strategy_codes)
-        
-        session.updated_at = int(time.time() * 1000)
-        session.save()
-        return {"message": "Backtest session notes updated successfully"}
-    except BacktestSession.DoesNotExist:
+    fields = {}
+    if request.title is not None:
+        fields['title'] = request.title
+    if request.description is not None:
+        fields['description'] = request.description
+    if request.strategy_codes is not None:
+        fields['strategy_codes'] = json.dumps(request.strategy_codes)
+
+    updated = db_writer.update(BacktestSession, session_id, updated_at=int(time.time() * 1000), **fields).result()
+    if not updated:
         raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Backtest session notes updated successfully"}
 
 @router.post("/sessions/{session_id}/strategy-code", response_model=StrategyCodeResponse)
 def get_backtest_session_strategy_codes(session_id: str, current_user: User = Depends(get_current_user)):
@@ -291,10 +295,7 @@ def get_backtest_session_strategy_codes(session_id: str, current_user: User = De
 def backtest_task(task_id: str, request: BacktestRequest, strategy_class):
     try:
         # Update session to processing
-        session = BacktestSession.get(BacktestSession.id == task_id)
-        session.status = "processing"
-        session.updated_at = int(time.time() * 1000)
-        session.save()
+        db_writer.update(BacktestSession, task_id, status="processing", updated_at=int(time.time() * 1000))
         
         results = run_backtest(
             request.exchange,
@@ -303,31 +304,31 @@ def backtest_task(task_id: str, request: BacktestRequest, strategy_class):
             request.start_date,
             request.end_date,
             strategy_class,
-            task_id=task_id
+            task_id=task_id,
+            stream=request.stream,
+            window_rows=request.window_rows
         )
         
         # Update BacktestSession with results
-        session = BacktestSession.get(BacktestSession.id == task_id)
-        session.status = "completed"
-        session.metrics = json.dumps({
-            "initial_balance": results.initial_balance,
-            "final_balance": results.final_balance,
-            "pnl_percent": results.pnl_percent
-        })
-        session.trades = json.dumps([t.model_dump() for t in results.trades])
-        session.closed_trades = json.dumps([t.model_dump() for t in results.closed_trades])
-        session.updated_at = int(time.time() * 1000)
-        session.save()
+        db_writer.update(
+            BacktestSession, task_id,
+            status="completed",
+            metrics=json.dumps({
+                "initial_balance": results.initial_balance,
+                "final_balance": results.final_balance,
+                "pnl_percent": results.pnl_percent
+            }),
+            trades=json.dumps([t.model_dump() for t in results.trades]),
+            closed_trades=json.dumps([t.model_dump() for t in results.closed_trades]),
+            updated_at=int(time.time() * 1000)
+        ).result()
         
     except Exception as e:
         print(f"Backtest failed: {e}")
         # Update status to failed
         try:
-            session = BacktestSession.get(BacktestSession.id == task_id)
-            session.status = "failed"
-            session.exception = str(e)
-            session.updated_at = int(time.time() * 1000)
-            session.save()
+            db_writer.update(BacktestSession, task_id, status="failed", exception=str(e),
+                             updated_at=int(time.time() * 1000)).result()
         except:
             pass
 
@@ -344,12 +345,12 @@ async def trigger_backtest(request: BacktestRequest, background_tasks: Backgroun
     
     # Create BacktestSession immediately with queued status
     try:
-        BacktestSession.create(
+        await asyncio.wrap_future(db_writer.execute(BacktestSession.insert(
             id=task_id,
             status="queued",
             created_at=int(time.time() * 1000),
             updated_at=int(time.time() * 1000)
-        )
+        )))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
 
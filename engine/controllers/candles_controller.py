@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from typing import Optional
+from engine.controllers.auth_controller import get_current_user
+from engine.models.core import User
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_files import export_candles, import_candle_file, FORMATS
+from engine.services.candle_loader import MAX_TIMESTAMP
+from engine.services.db_maintenance import db_maintenance
+
+MEDIA_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+router = APIRouter()
+
+class CandleCacheStatsResponse(BaseModel):
+    entries: int
+    size_bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+class MessageResponse(BaseModel):
+    message: str
+
+class CandleFileImportResponse(BaseModel):
+    message: str
+    rows: int
+
+@router.get("/candles/cache-stats", response_model=CandleCacheStatsResponse)
+def get_candle_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Hit/miss/eviction counters and memory usage of the in-process candle cache.
+    """
+    return candle_cache.stats()
+
+@router.post("/candles/clear-cache", response_model=MessageResponse)
+def clear_candle_cache(current_user: User = Depends(get_current_user)):
+    """
+    Drop every cached candle range.
+    """
+    candle_cache.clear()
+    return {"message": "Candle cache cleared"}
+
+@router.get("/candles/export")
+def export_candle_file(exchange: str, symbol: str, timeframe: str, start_ts: int = 0, end_ts: int = MAX_TIMESTAMP,
+                       format: str = 'parquet', current_user: User = Depends(get_current_user)):
+    """
+    Download a candle range as a Parquet or Arrow IPC file (timestamps in ms).
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format}. Use one of {FORMATS}.")
+
+    # Written in batches to a temporary file on this thread, then streamed from disk
+    fd, path = tempfile.mkstemp(suffix=f".{format}")
+    os.close(fd)
+    try:
+        export_candles(exchange, symbol, timeframe, start_ts, end_ts, path, format)
+    except Exception:
+        os.remove(path)
+        raise
+
+    filename = f"{exchange}_{symbol.replace('/', '-')}_{timeframe}.{format}"
+    return FileResponse(path, media_type=MEDIA_TYPES[format], filename=filename,
+                        background=BackgroundTask(os.remove, path))
+
+@router.post("/candles/import-file", response_model=CandleFileImportResponse)
+def import_candles_from_file(file: UploadFile = File(...), exchange: Optional[str] = Form(None),
+                             symbol: Optional[str] = Form(None), timeframe: Optional[str] = Form(None),
+                             current_user: User = Depends(get_current_user)):
+    """
+    Load an uploaded Parquet or Arrow IPC file into the candle store.
+    Exchange, symbol and timeframe default to the file metadata.
+    """
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            shutil.copyfileobj(file.file, target)
+        with db_maintenance.activity():
+            rows = import_candle_file(path, exchange, symbol, timeframe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.remove(path)
+
+    return {"message": f"Imported {rows} candles", "rows": rows}
@@ -4,6 +4,10 @@ from typing import List, Optional
 from engine.models.core import ExchangeApiKeys, User
 from playhouse.shortcuts import model_to_dict
 from engine.controllers.auth_controller import get_current_user
+from engine.services.connection_pool import reading
+from engine.services.db_async import run_db
+from engine.services.db_writer import db_writer
+import asyncio
 
 router = APIRouter()
 
@@ -46,10 +50,14 @@ async def get_supported_exchanges(current_user: User = Depends(get_current_user)
     # TODO: Dynamically discover these from the exchanges directory or registry
     return {"exchanges": ["binance", "yahoo", "sandbox"]}
 
+def _list_api_keys():
+    with reading(ExchangeApiKeys._meta.database) as reader:
+        return list(ExchangeApiKeys.select().execute(reader))
+
 @router.get("/exchange/api-keys", response_model=List[ExchangeApiKeyResponse])
 async def get_api_keys(current_user: User = Depends(get_current_user)):
     keys = []
-    for key in ExchangeApiKeys.select():
+    for key in await run_db(_list_api_keys):
         k = model_to_dict(key)
         # Mask secret
         k['api_secret'] = '********'
@@ -59,13 +67,13 @@ async def get_api_keys(current_user: User = Depends(get_current_user)):
 @router.post("/exchange/api-keys/store", response_model=StatusResponse)
 async def store_api_key(request: StoreExchangeApiKeyRequestJson, current_user: User = Depends(get_current_user)):
     try:
-        ExchangeApiKeys.create(
+        await asyncio.wrap_future(db_writer.execute(ExchangeApiKeys.insert(
             exchange_name=request.exchange_name,
             name=request.name,
             api_key=request.api_key,
             api_secret=request.api_secret,
             additional_fields=request.additional_fields
-        )
+        )))
         return {"status": "success", "message": "API key stored"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -74,7 +82,7 @@ async def store_api_key(request: StoreExchangeApiKeyRequestJson, current_user: U
 async def delete_api_key(request: DeleteExchangeApiKeyRequestJson, current_user: User = Depends(get_current_user)):
     try:
         query = ExchangeApiKeys.delete().where(ExchangeApiKeys.id == request.id)
-        rows = query.execute()
+        rows = await asyncio.wrap_future(db_writer.execute(query))
         if rows == 0:
              raise HTTPException(status_code=404, detail="API key not found")
         return {"status": "success", "message": "API key deleted"}
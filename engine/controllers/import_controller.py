@@ -1,12 +1,23 @@
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from pydantic import BaseModel
 from engine.modes.import_candles_mode import run_import
+from engine.services.db_maintenance import db_maintenance
+from engine.services.db_writer import db_writer
+from engine.services.db_async import run_db
+from engine.services.connection_pool import reading
+from engine.services.import_scheduler import import_scheduler
+from engine.services.tail_importer import tail_importer
+from engine.services.candle_coverage import candle_coverage
+from engine.helpers import TIMEFRAME_MS
 from engine.controllers.auth_controller import get_current_user
-from engine.models.core import User, Task
-from typing import Optional
+from engine.models.core import User, Task, WatchedSeries
+from typing import Optional, List, Dict, Any
+from functools import partial
 import uuid
 import time
 import json
+import asyncio
+import threading
 
 router = APIRouter()
 
@@ -16,33 +27,153 @@ class ImportRequest(BaseModel):
     start_date: str
     timeframe: Optional[str] = '1h'
 
+class ImportBatchRequest(BaseModel):
+    items: List[ImportRequest]
+
 class ImportResponse(BaseModel):
     message: str
     status: str
     task_id: str
 
-def import_task(task_id: str, exchange: str, symbol: str, start_date: str, timeframe: str):
+class WatchRequest(BaseModel):
+    exchange: str
+    symbol: str
+    timeframe: Optional[str] = '1h'
+    # Only used when nothing is stored yet: the first refresh imports from here
+    start_date: Optional[str] = None
+
+class WatchedSeriesResponse(BaseModel):
+    id: int
+    exchange: str
+    symbol: str
+    timeframe: str
+    start_date: Optional[str] = None
+    last_timestamp: Optional[int] = None
+    last_refresh_at: Optional[int] = None
+    last_error: Optional[str] = None
+    created_at: int
+
+class WatchlistResponse(BaseModel):
+    series: List[WatchedSeriesResponse]
+    last_cycle: Optional[Dict[str, Any]] = None
+
+def import_task(task_id: str, exchange: str, symbol: str, start_date: str, timeframe: str, resume_from: int = None):
+    def checkpoint(timestamp):
+        # Coalesced by the writer: a burst of pages costs one row update
+        db_writer.update(Task, task_id, checkpoint=timestamp, updated_at=int(time.time()))
+
     try:
-        # Update status to processing
-        Task.update(status="processing", updated_at=int(time.time())).where(Task.id == task_id).execute()
+        # Waits for a free import slot, queued until then; background database maintenance
+        # waits until imports have gone quiet
+        with import_scheduler.slot(exchange), db_maintenance.activity():
+            db_writer.update(Task, task_id, status="processing", updated_at=int(time.time()))
+            summary = run_import(exchange, symbol, start_date, timeframe, task_id=task_id,
+                                 resume_from=resume_from, on_checkpoint=checkpoint)
         
-        run_import(exchange, symbol, start_date, timeframe)
+        result = {"message": "Import successful"}
+        if isinstance(summary, dict):
+            # fetched / skipped / rejected candle counts and validation findings per rule
+            result.update(summary)
         
         # Update status to completed
-        Task.update(
+        db_writer.update(
+            Task, task_id,
             status="completed", 
-            result=json.dumps({"message": "Import successful"}),
+            result=json.dumps(result),
             updated_at=int(time.time())
-        ).where(Task.id == task_id).execute()
+        ).result()
         
     except Exception as e:
         print(f"Import failed: {e}")
-        # Update status to failed
-        Task.update(
+        # Update status to failed; the checkpoint stays for a resume
+        db_writer.update(
+            Task, task_id,
             status="failed", 
             error=str(e),
             updated_at=int(time.time())
-        ).where(Task.id == task_id).execute()
+        ).result()
+
+def import_batch_task(task_id: str, items: List[dict]):
+    """
+    Import the items of a batch task, as many at once as the import scheduler allows.
+    `items` is the task's progress list: the request fields of each item plus its status,
+    checkpoint and result or error, published as the task result while the batch runs.
+    Completed items are skipped and the others continue from their checkpoints, so a
+    failed batch is resumed by running it again with its saved progress.
+    """
+    lock = threading.Lock()
+    started = []
+
+    def publish(item, **fields):
+        with lock:
+            item.update(fields)
+            # Coalesced by the writer: items checkpointing together cost one row update
+            return db_writer.update(Task, task_id, result=json.dumps(items), updated_at=int(time.time()))
+
+    def run(item):
+        # Runs in an import slot: the batch stays queued until its first item gets one
+        with lock:
+            if not started:
+                started.append(item)
+                db_writer.update(Task, task_id, status="processing", error=None, updated_at=int(time.time()))
+        publish(item, status="processing", error=None)
+        try:
+            summary = run_import(item['exchange'], item['symbol'], item['start_date'], item['timeframe'],
+                                 task_id=task_id, resume_from=item.get('checkpoint'),
+                                 on_checkpoint=lambda timestamp: publish(item, checkpoint=timestamp))
+            publish(item, status="completed", result=summary)
+        except Exception as e:
+            print(f"Import of {item['symbol']} from {item['exchange']} failed: {e}")
+            publish(item, status="failed", error=str(e))
+
+    try:
+        with db_maintenance.activity():
+            import_scheduler.run_all([(item['exchange'], partial(run, item))
+                                      for item in items if item.get('status') != 'completed'])
+
+        failed = sum(item['status'] == 'failed' for item in items)
+        if failed:
+            db_writer.update(Task, task_id, status="failed", error=f"{failed} of {len(items)} imports failed",
+                             updated_at=int(time.time())).result()
+        else:
+            db_writer.update(Task, task_id, status="completed", updated_at=int(time.time())).result()
+
+    except Exception as e:
+        print(f"Batch import failed: {e}")
+        db_writer.update(Task, task_id, status="failed", error=str(e), updated_at=int(time.time())).result()
+
+def _batch_progress(items: List[dict]) -> List[dict]:
+    return [dict(item, status="queued", checkpoint=None) for item in items]
+
+def _run_saved_import(task: Task):
+    params = json.loads(task.params)
+    if task.type == 'import_batch':
+        # The progress published so far says which items are done and where the rest stopped
+        import_batch_task(task.id, json.loads(task.result) if task.result else _batch_progress(params))
+        return
+    import_task(task.id, params['exchange'], params['symbol'], params['start_date'], params['timeframe'],
+                resume_from=task.checkpoint)
+
+def resume_interrupted_imports() -> Optional[threading.Thread]:
+    """
+    Restart imports a previous server process left queued or processing (it was stopped or
+    crashed mid-import), each from its checkpoint. They run one after another on a
+    background thread, which is returned; None if there is nothing to resume.
+    """
+    tasks = list(Task.select().where(
+        Task.type.in_(['import', 'import_batch']) & Task.status.in_(['queued', 'processing']) & Task.params.is_null(False)
+    ).order_by(Task.created_at))
+    if not tasks:
+        return None
+
+    def run():
+        for task in tasks:
+            print(f"Resuming interrupted import {task.id}...")
+            _run_saved_import(task)
+
+    thread = threading.Thread(target=run, name='import-resume', daemon=True)
+    thread.start()
+    return thread
 
 @router.post("/import", response_model=ImportResponse)
 async def trigger_import(request: ImportRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
@@ -51,14 +182,15 @@ async def trigger_import(request: ImportRequest, background_tasks: BackgroundTas
     """
     task_id = str(uuid.uuid4())
     
-    # Create Task record
-    Task.create(
+    # Create Task record; committed before the task id is handed out
+    await asyncio.wrap_future(db_writer.execute(Task.insert(
         id=task_id,
         type="import",
         status="queued",
+        params=json.dumps(request.model_dump()),
         created_at=int(time.time()),
         updated_at=int(time.time())
-    )
+    )))
     
     background_tasks.add_task(import_task, task_id, request.exchange, request.symbol, request.start_date, request.timeframe)
     
@@ -67,3 +199,134 @@ async def trigger_import(request: ImportRequest, background_tasks: BackgroundTas
         "status": "queued",
         "task_id": task_id
     }
+
+@router.post("/import/batch", response_model=ImportResponse)
+async def trigger_import_batch(request: ImportBatchRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    """
+    Trigger one background task importing several symbols, possibly from several exchanges.
+    The task result lists the progress of every item.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="A batch needs at least one import")
+
+    task_id = str(uuid.uuid4())
+    params = [item.model_dump() for item in request.items]
+    progress = _batch_progress(params)
+
+    await asyncio.wrap_future(db_writer.execute(Task.insert(
+        id=task_id,
+        type="import_batch",
+        status="queued",
+        params=json.dumps(params),
+        result=json.dumps(progress),
+        created_at=int(time.time()),
+        updated_at=int(time.time())
+    )))
+
+    background_tasks.add_task(import_batch_task, task_id, progress)
+
+    return {
+        "message": f"Batch import started for {len(params)} symbols",
+        "status": "queued",
+        "task_id": task_id
+    }
+
+@router.post("/import/{task_id}/resume", response_model=ImportResponse)
+async def resume_import(task_id: str, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    """
+    Run a failed import again, continuing after the last candle it committed.
+    """
+    task = await run_db(_find_import, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Import task not found")
+    if task.params is None:
+        raise HTTPException(status_code=400, detail="Import task has no saved parameters")
+
+    # Only a failed import is resumed; checked in the same statement so it can't start twice
+    requeued = await asyncio.wrap_future(db_writer.execute(Task.update(
+        status="queued", error=None, updated_at=int(time.time())
+    ).where((Task.id == task_id) & (Task.status == 'failed'))))
+    if not requeued:
+        raise HTTPException(status_code=409, detail=f"Import task is {task.status}, only failed imports can be resumed")
+
+    background_tasks.add_task(_run_saved_import, task)
+    params = json.loads(task.params)
+    if task.type == 'import_batch':
+        message = f"Batch import resumed for {len(params)} symbols"
+    else:
+        message = f"Import resumed for {params['symbol']} from {params['exchange']}"
+    return {
+        "message": message,
+        "status": "queued",
+        "task_id": task_id
+    }
+
+def _find_import(task_id):
+    with reading(Task._meta.database) as reader:
+        return Task.select().where(
+            (Task.id == task_id) & Task.type.in_(['import', 'import_batch'])
+        ).get_or_none(reader)
+
+@router.get("/import/watchlist", response_model=WatchlistResponse)
+async def get_watchlist(current_user: User = Depends(get_current_user)):
+    """
+    Series kept current by the tail importer, with the outcome of their last refresh and
+    a summary of the last refresh cycle.
+    """
+    series = await run_db(_watchlist)
+    return {"series": [s.__data__ for s in series], "last_cycle": tail_importer.last_cycle}
+
+@router.post("/import/watchlist", response_model=WatchedSeriesResponse)
+async def watch_series(request: WatchRequest, current_user: User = Depends(get_current_user)):
+    """
+    Keep a series current: its newest closed candles are appended after every candle close.
+    """
+    if request.exchange.lower() not in ('binance', 'yahoo'):
+        raise HTTPException(status_code=400, detail=f"Exchange {request.exchange} not supported")
+    if request.timeframe not in TIMEFRAME_MS:
+        raise HTTPException(status_code=400, detail=f"Timeframe {request.timeframe} has no fixed candle close")
+    if request.start_date is None:
+        last = await run_db(candle_coverage.last_stored, request.exchange, request.symbol, request.timeframe)
+        if last is None:
+            raise HTTPException(status_code=400, detail="Nothing stored for this series yet, give a start_date")
+
+    existing = await run_db(_find_watched, request.exchange, request.symbol, request.timeframe)
+    if existing is not None:
+        raise HTTPException(status_code=409, detail="Series is already watched")
+
+    fields = dict(request.model_dump(), created_at=int(time.time()))
+    series_id = await asyncio.wrap_future(db_writer.execute(WatchedSeries.insert(**fields)))
+    # Caught up right away rather than at the next candle close
+    tail_importer.changed()
+    return dict(fields, id=series_id)
+
+@router.delete("/import/watchlist/{series_id}")
+async def unwatch_series(series_id: int, current_user: User = Depends(get_current_user)):
+    """
+    Stop keeping a series current. Its candles stay stored.
+    """
+    deleted = await asyncio.wrap_future(db_writer.execute(
+        WatchedSeries.delete().where(WatchedSeries.id == series_id)
+    ))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Watched series not found")
+    tail_importer.changed()
+    return {"message": "Series is no longer watched"}
+
+@router.post("/import/watchlist/refresh", response_model=Dict[str, Any])
+def refresh_watchlist(current_user: User = Depends(get_current_user)):
+    """
+    Refresh every watched series now, without waiting for the next candle close.
+    """
+    return tail_importer.refresh(_watchlist())
+
+def _watchlist():
+    with reading(WatchedSeries._meta.database) as reader:
+        return list(WatchedSeries.select().order_by(WatchedSeries.id).execute(reader))
+
+def _find_watched(exchange, symbol, timeframe):
+    with reading(WatchedSeries._meta.database) as reader:
+        return WatchedSeries.select().where(
+            (WatchedSeries.exchange == exchange) & (WatchedSeries.symbol == symbol) &
+            (WatchedSeries.timeframe == timeframe)
+        ).get_or_none(reader)
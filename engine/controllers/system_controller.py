@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from typing import Optional, Any, List, Dict
+from engine.config import db, read_db
+from engine.controllers.auth_controller import get_current_user
+from engine.models.core import User
+from engine.services.db_maintenance import db_maintenance
+from engine.services.db_writer import db_writer
+from engine.exchanges.binance import binance_requests
+from engine.exchanges.yahoo import yahoo_requests
+
+router = APIRouter()
+
+class DatabaseStatusResponse(BaseModel):
+    idle: bool
+    databases: List[Dict[str, Any]]
+    last_maintenance: Optional[Dict[str, Any]] = None
+    pools: Dict[str, Dict[str, Any]]
+    writer: Dict[str, Any]
+
+@router.get("/system/database", response_model=DatabaseStatusResponse)
+def get_database_status(current_user: User = Depends(get_current_user)):
+    """
+    Size, WAL size and fragmentation of every SQLite file, the last maintenance run, and
+    connection churn and wait times of the writer and reader pools, and the write queue.
+    """
+    databases = []
+    for database in db_maintenance.databases():
+        opened = database.connect(reuse_if_open=True)
+        try:
+            databases.append(db_maintenance.report(database))
+        finally:
+            if opened:
+                database.close()
+
+    return {
+        "idle": db_maintenance.is_idle(),
+        "databases": databases,
+        "last_maintenance": db_maintenance.last_run,
+        "pools": {"writer": db.stats(), "reader": read_db.stats()},
+        "writer": db_writer.stats()
+    }
+
+@router.post("/system/database/maintenance", response_model=Dict[str, Any])
+def run_database_maintenance(current_user: User = Depends(get_current_user)):
+    """
+    Run maintenance now, without waiting for imports to go quiet. Steps still give way
+    to a writer holding the lock.
+    """
+    return db_maintenance.run(require_idle=False)
+
+@router.get("/system/exchanges", response_model=Dict[str, Any])
+def get_exchange_requests(current_user: User = Depends(get_current_user)):
+    """
+    Request rate, retries, throttle events and remaining budget of each exchange adapter.
+    """
+    return {
+        "binance": binance_requests.stats(),
+        "yahoo": yahoo_requests.stats()
+    }
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
-from engine.models.core import Task, User
+from engine.models.core import Task, User, CandleIssue
 from engine.controllers.auth_controller import get_current_user
+from engine.services.connection_pool import reading
+from engine.services.db_async import run_db
 from playhouse.shortcuts import model_to_dict
 from pydantic import BaseModel
 from typing import Optional, Any, List, Dict, Union
@@ -14,12 +16,17 @@ class TaskResponse(BaseModel):
     status: str
     result: Optional[Union[Dict[str, Any], List[Any], str]] = None
     error: Optional[str] = None
+    checkpoint: Optional[int] = None
     created_at: int
     updated_at: int
 
+def _find_task(task_id):
+    with reading(Task._meta.database) as reader:
+        return Task.select().where(Task.id == task_id).get_or_none(reader)
+
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
 async def get_task(task_id: str, current_user: User = Depends(get_current_user)):
-    task = Task.get_or_none(Task.id == task_id)
+    task = await run_db(_find_task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -33,9 +40,44 @@ async def get_task(task_id: str, current_user: User = Depends(get_current_user))
             
     return task_dict
 
+class CandleIssueResponse(BaseModel):
+    exchange: str
+    symbol: str
+    timeframe: str
+    timestamp: int
+    rule: str
+    action: str
+    detail: Optional[str] = None
+
+def _find_issues(task_id, rule, limit, offset):
+    # None if the task doesn't exist
+    with reading(Task._meta.database) as reader:
+        if not Task.select().where(Task.id == task_id).exists(reader):
+            return None
+
+        query = CandleIssue.select().where(CandleIssue.task_id == task_id)
+        if rule:
+            query = query.where(CandleIssue.rule == rule)
+        return list(query.order_by(CandleIssue.timestamp, CandleIssue.id).limit(limit).offset(offset).execute(reader))
+
+@router.get("/tasks/{task_id}/issues", response_model=List[CandleIssueResponse])
+async def get_task_issues(task_id: str, rule: Optional[str] = None, limit: int = 1000, offset: int = 0,
+                          current_user: User = Depends(get_current_user)):
+    """
+    Candle validation findings recorded by an import task, in timestamp order.
+    """
+    issues = await run_db(_find_issues, task_id, rule, limit, offset)
+    if issues is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return [model_to_dict(issue) for issue in issues]
+
+def _list_tasks(limit, offset):
+    with reading(Task._meta.database) as reader:
+        return list(Task.select().order_by(Task.created_at.desc()).limit(limit).offset(offset).execute(reader))
+
 @router.get("/tasks", response_model=List[TaskResponse])
 async def list_tasks(limit: int = 20, offset: int = 0, current_user: User = Depends(get_current_user)):
-    tasks = Task.select().order_by(Task.created_at.desc()).limit(limit).offset(offset)
+    tasks = await run_db(_list_tasks, limit, offset)
     result_list = []
     for t in tasks:
         t_dict = model_to_dict(t)
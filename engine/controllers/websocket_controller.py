@@ -1,8 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, status
 from typing import List
 from jose import jwt, JWTError
-from engine.controllers.auth_controller import SECRET_KEY, ALGORITHM
-from engine.models.core import User
+from engine.controllers.auth_controller import SECRET_KEY, ALGORITHM, find_user
+from engine.services.db_async import run_db
 
 router = APIRouter()
 
@@ -32,8 +32,7 @@ async def get_user_from_token(token: str):
     except JWTError:
         return None
     
-    user = User.get_or_none(User.username == username)
-    return user
+    return await run_db(find_user, username)
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
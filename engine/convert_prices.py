@@ -0,0 +1,179 @@
+import sys
+import os
+import json
+import argparse
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from peewee import DecimalField
+from engine.config import db, PRICE_ENCODING
+from engine.models import CandleData, CandleAggregate, ClosedTrade, Order, Trade, Ticker
+from engine.models.core import candle_view_sql
+from engine.models.fields import FixedPointField, PRICE_DECIMAL_PLACES, INT64_MAX
+from engine.services.candle_partitions import candle_partitions
+from engine.services.candle_scales import fitting_scale, MAX_SCALE
+
+# Models whose price/quantity columns follow PRICE_ENCODING with one scale per column
+PRICE_MODELS = [ClosedTrade, Order, Trade, Ticker]
+# Candle tables, scaled per symbol by the scales of its instrument row
+CANDLE_MODELS = [CandleData, CandleAggregate]
+ENCODINGS = ('decimal', 'fixed')
+
+_PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+def price_columns(model):
+    return [f.column_name for f in model._meta.sorted_fields if isinstance(f, (DecimalField, FixedPointField))]
+
+def stored_price_encoding(database):
+    """
+    Encoding recorded in the database. Databases created before fixed-point support are 'decimal'.
+    """
+    row = database.execute_sql('SELECT "json" FROM "option" WHERE "type" = ?', ('price_encoding',)).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0])['encoding']
+
+def record_price_encoding(database, encoding):
+    database.execute_sql(
+        'INSERT OR REPLACE INTO "option" ("type", "json") VALUES (?, ?)',
+        ('price_encoding', json.dumps({'encoding': encoding, 'decimal_places': PRICE_DECIMAL_PLACES}))
+    )
+
+def check_price_encoding(database=db):
+    """
+    Make sure the models (PRICE_ENCODING) and the stored data agree. Called from init_db().
+    """
+    stored = stored_price_encoding(database)
+    if stored is None:
+        has_rows = any(database.execute_sql(f'SELECT 1 FROM "{m._meta.table_name}" LIMIT 1').fetchone()
+                       for m in PRICE_MODELS + CANDLE_MODELS)
+        # A fresh database takes the configured encoding, an older one holds decimals
+        stored = 'decimal' if has_rows else PRICE_ENCODING
+        record_price_encoding(database, stored)
+
+    if stored != PRICE_ENCODING:
+        raise RuntimeError(
+            f"Database stores prices as '{stored}' but PRICE_ENCODING is '{PRICE_ENCODING}'. "
+            f"Run `python engine/convert_prices.py --to {PRICE_ENCODING}` first."
+        )
+
+def convert_prices(target, database=db, vacuum=True):
+    """
+    Rewrite every price/quantity column to the target encoding in place.
+    """
+    if target not in ENCODINGS:
+        raise ValueError(f"Unknown price encoding {target}. Use one of {ENCODINGS}.")
+
+    database.connect(reuse_if_open=True)
+    current = stored_price_encoding(database) or 'decimal'
+    if current == target:
+        print(f"Prices are already stored as '{target}'.")
+        return False
+
+    with database.atomic():
+        _convert_tables(database, PRICE_MODELS, target)
+        _convert_candles(database, target)
+        record_price_encoding(database, target)
+
+    # Per-symbol candle partitions share the encoding of the main database
+    partitions = candle_partitions.partitions()
+    for path, partition in partitions:
+        print(f"Partition {path}:")
+        with partition.atomic():
+            _convert_candles(partition, target)
+
+    if vacuum:
+        print("Reclaiming space (VACUUM)...")
+        for target_db in [database] + [partition for _, partition in partitions]:
+            target_db.execute_sql('VACUUM')
+
+    print(f"Prices converted from '{current}' to '{target}'. Set PRICE_ENCODING={target} before starting the engine.")
+    return True
+
+def _convert_tables(database, models, target):
+    scale = 10 ** PRICE_DECIMAL_PLACES
+    for model in models:
+        table = model._meta.table_name
+        if not database.table_exists(table):
+            continue
+        for column in price_columns(model):
+            if target == 'fixed':
+                largest = database.execute_sql(f'SELECT MAX(ABS("{column}")) FROM "{table}"').fetchone()[0]
+                if largest is not None and largest * scale > INT64_MAX:
+                    raise ValueError(f"{table}.{column} holds {largest}, too large for fixed-point storage.")
+                sql = f'UPDATE "{table}" SET "{column}" = CAST(ROUND("{column}" * {scale}) AS INTEGER) WHERE "{column}" IS NOT NULL'
+            else:
+                sql = f'UPDATE "{table}" SET "{column}" = CAST("{column}" AS REAL) / {scale} WHERE "{column}" IS NOT NULL'
+            rows = database.execute_sql(sql).rowcount
+            print(f"  {table}.{column}: {rows} rows")
+
+def _convert_candles(database, target):
+    """
+    Convert candle_data and candle_aggregate one symbol at a time. Going to fixed-point,
+    each symbol gets the smallest scales that hold its imported candles exactly.
+    """
+    if not database.table_exists('instrument'):
+        return
+    instruments = database.execute_sql('SELECT "id", "exchange", "symbol", "price_scale", "volume_scale" '
+                                       'FROM "instrument"').fetchall()
+    for instrument_id, exchange, symbol, price_scale, volume_scale in instruments:
+        if target != 'fixed' and price_scale is None:
+            continue
+        if target == 'fixed':
+            price_scale = _candle_scale(database, instrument_id, _PRICE_COLUMNS)
+            volume_scale = _candle_scale(database, instrument_id, ('volume',))
+            encode = 'CAST(ROUND("{column}" * {scale}) AS INTEGER)'
+        else:
+            encode = 'CAST("{column}" AS REAL) / {scale}'
+
+        rows = 0
+        for table in ('candle_data', 'candle_aggregate'):
+            assignments = ', '.join(
+                f'"{column}" = ' + encode.format(column=column, scale=scale)
+                for columns, scale in ((_PRICE_COLUMNS, price_scale), (('volume',), volume_scale))
+                for column in columns
+            )
+            rows += database.execute_sql(f'UPDATE "{table}" SET {assignments} WHERE "instrument_id" = ?',
+                                         (instrument_id,)).rowcount
+        scales = (price_scale, volume_scale) if target == 'fixed' else (None, None)
+        database.execute_sql('UPDATE "instrument" SET "price_scale" = ?, "volume_scale" = ? WHERE "id" = ?',
+                             scales + (instrument_id,))
+        print(f"  {exchange} {symbol}: {rows} candles, scales {scales[0]}/{scales[1]}")
+
+    # The view's triggers scale what is written through it according to the encoding
+    database.execute_sql('DROP VIEW IF EXISTS "candle"')
+    for sql in candle_view_sql(target):
+        database.execute_sql(sql)
+
+def _candle_scale(database, instrument_id, columns):
+    """
+    Smallest power of ten up to MAX_SCALE that holds the symbol's imported values in
+    `columns` exactly, lowered until the largest one (aggregates included) fits in int64.
+    """
+    scales = [10 ** k for k in range(PRICE_DECIMAL_PLACES + 1)]
+    # One scan counting, for every candidate scale, the values it cannot represent
+    inexact = ', '.join(
+        'SUM(' + ' OR '.join(f'ROUND("{c}" * {s}) / {s} != "{c}"' for c in columns) + ')' for s in scales
+    )
+    counts = database.execute_sql(f'SELECT {inexact} FROM "candle_data" WHERE "instrument_id" = ?',
+                                  (instrument_id,)).fetchone()
+    scale = next((s for s, count in zip(scales, counts) if not count), MAX_SCALE)
+
+    largest = 0.0
+    maxima = ', '.join(f'MAX(ABS("{c}"))' for c in columns)
+    for table in ('candle_data', 'candle_aggregate'):
+        row = database.execute_sql(f'SELECT {maxima} FROM "{table}" WHERE "instrument_id" = ?',
+                                   (instrument_id,)).fetchone()
+        largest = max([largest] + [value for value in row if value is not None])
+    return fitting_scale(scale, largest)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored prices between decimal and fixed-point encoding.")
+    parser.add_argument('--to', dest='target', choices=ENCODINGS, required=True)
+    parser.add_argument('--no-vacuum', action='store_true', help="Skip VACUUM after converting")
+    args = parser.parse_args()
+
+    convert_prices(args.target, vacuum=not args.no_vacuum)
+    if not db.is_closed():
+        db.close()
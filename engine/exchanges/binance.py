@@ -1,71 +1,149 @@
 import requests
 import time
-from typing import List, Dict, Any
+import json
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Iterator
 from engine.exchanges.exchange import Exchange
 from engine.models.core import Order
+from engine.config import BINANCE_BASE_URL, BINANCE_FETCH_WORKERS, BINANCE_WEIGHT_PER_MINUTE, RESPONSE_CACHE_OPEN_TTL
+from engine.services.rate_limiter import TokenBucket, RequestScheduler
+from engine.services.response_cache import ResponseCache, response_cache
+from engine.services.candle_store import CANDLE_COLUMNS, CANDLE_DTYPE
+from engine.helpers import TIMEFRAME_MS
+
+KLINES_LIMIT = 1000
+# Request weight of one /api/v3/klines call
+KLINES_WEIGHT = 2
+
+# Binance limits request weight per IP, so all instances draw from one budget
+binance_weight = TokenBucket(BINANCE_WEIGHT_PER_MINUTE, 60)
+binance_requests = RequestScheduler(binance_weight)
 
 class Binance(Exchange):
-    def __init__(self):
+    def __init__(self, base_url: str = None, workers: int = None, weight: TokenBucket = None,
+                 cache: ResponseCache = None):
         super().__init__('Binance')
-        self.base_url = "https://api.binance.com"
+        self.base_url = base_url or BINANCE_BASE_URL
+        self.workers = max(1, workers or BINANCE_FETCH_WORKERS)
+        # Retries and throttling share the budget's scheduler; a budget of its own gets its own
+        self.requests = binance_requests if weight is None else RequestScheduler(weight)
+        self.weight = self.requests.budget
+        self.cache = cache or response_cache
+        # Keep-alive connections, one per worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def fetch_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> List[Dict[str, Any]]:
+        candles = []
+        for page in self.iter_ohlcv(symbol, timeframe, start_ts, end_ts):
+            for timestamp, open_, high, low, close, volume in page.tolist():
+                candles.append({
+                    'timestamp': int(timestamp),
+                    'open': open_,
+                    'high': high,
+                    'low': low,
+                    'close': close,
+                    'volume': volume
+                })
+        return candles
+
+    def iter_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> Iterator[np.ndarray]:
         # Convert symbol format if necessary (e.g., BTC-USDT -> BTCUSDT)
         symbol_clean = symbol.replace('-', '').replace('/', '')
-        
-        limit = 1000
-        candles = []
-        current_start = start_ts
-
-        while True:
-            params = {
-                'symbol': symbol_clean,
-                'interval': timeframe,
-                'startTime': current_start,
-                'limit': limit
-            }
-            if end_ts:
-                params['endTime'] = end_ts
-
-            try:
-                response = requests.get(f"{self.base_url}/api/v3/klines", params=params)
-                response.raise_for_status()
-                data = response.json()
-            except Exception as e:
-                print(f"Error fetching data from Binance: {e}")
-                break
 
-            if not data:
-                break
+        for rows in self._fetch_pages(symbol_clean, timeframe, start_ts, end_ts):
+            # Binance format: [timestamp, open, high, low, close, volume, close_time, ...];
+            # numpy parses the quoted prices of the whole page at once
+            yield np.array([row[:CANDLE_COLUMNS] for row in rows], dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS)
 
-            for row in data:
-                # Binance format: [timestamp, open, high, low, close, volume, close_time, ...]
-                candle = {
-                    'timestamp': int(row[0]),
-                    'open': float(row[1]),
-                    'high': float(row[2]),
-                    'low': float(row[3]),
-                    'close': float(row[4]),
-                    'volume': float(row[5])
-                }
-                candles.append(candle)
-
-            # Check if we fetched fewer than limit, meaning we reached the end
-            if len(data) < limit:
-                break
-            
-            # Update start time for next batch (last candle timestamp + 1ms)
-            last_ts = int(data[-1][0])
-            current_start = last_ts + 1
-            
-            # Safety break if we passed end_ts
-            if end_ts and current_start > end_ts:
+    def _fetch_pages(self, symbol: str, interval: str, start_ts: int, end_ts: int = None) -> Iterator[list]:
+        """
+        Raw kline rows of [start_ts, end_ts], one list per page, in time order.
+
+        The range is cut into windows of one full page each, downloaded by `workers` threads
+        at once. Unlike paging from the last candle, a gap in the exchange's history doesn't
+        end the download early. A page that still fails after the scheduler's retries raises
+        once the pages before it are yielded, so the caller keeps a gap-free prefix of the
+        range and knows it is incomplete.
+        """
+        interval_ms = TIMEFRAME_MS.get(interval)
+        if interval_ms is None:
+            # Irregular intervals (e.g. '1M') can't be cut into windows up front: page serially
+            yield self._fetch_window(symbol, interval, start_ts, end_ts)
+            return
+
+        end = end_ts if end_ts is not None else int(time.time() * 1000)
+        span = KLINES_LIMIT * interval_ms
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='binance-fetch')
+        pending = deque()
+        try:
+            for window_start in range(start_ts, end + 1, span):
+                # A few windows ahead of the consumer, not the whole range
+                while len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+                # Each window holds at most one page of candles
+                window_end = min(window_start + span - 1, end)
+                pending.append(executor.submit(self._fetch_page, symbol, interval, window_start, window_end))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _fetch_window(self, symbol: str, interval: str, start_ts: int, end_ts: int = None) -> list:
+        """
+        All rows of [start_ts, end_ts], page after page.
+        """
+        rows = []
+        cursor = start_ts
+        while end_ts is None or cursor <= end_ts:
+            data = self._fetch_page(symbol, interval, cursor, end_ts)
+            rows += data
+
+            # Fewer than limit means the window (or the available history) is exhausted
+            if len(data) < KLINES_LIMIT:
                 break
-                
-            # Respect rate limits
-            time.sleep(0.1)
+            # Next page starts after the last candle
+            cursor = int(data[-1][0]) + 1
+        return rows
 
-        return candles
+    def _fetch_page(self, symbol: str, interval: str, start_ts: int, end_ts: int = None) -> list:
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': start_ts,
+            'limit': KLINES_LIMIT
+        }
+        if end_ts is not None:
+            params['endTime'] = end_ts
+        return self._get_klines(params)
+
+    def _get_klines(self, params: dict) -> list:
+        url = f"{self.base_url}/api/v3/klines"
+        # Cached pages cost no request weight
+        request = dict(params, url=url)
+        body = self.cache.get('binance', request)
+        if body is not None:
+            return json.loads(body)
+
+        def send():
+            response = self.session.get(url, params=params, timeout=30)
+            used = response.headers.get('X-MBX-USED-WEIGHT-1M')
+            if used is not None:
+                self.weight.sync(int(used))
+            response.raise_for_status()
+            return response
+
+        response = self.requests.call(send, KLINES_WEIGHT)
+        rows = response.json()
+        self.cache.put('binance', request, response.content, ttl=_klines_ttl(params, rows))
+        return rows
 
     def market_order(self, symbol: str, qty: float, current_price: float, side: str, reduce_only: bool) -> Order:
         raise NotImplementedError("Live trading not implemented for Binance yet.")
@@ -84,3 +162,19 @@ class Binance(Exchange):
 
     def _fetch_precisions(self) -> None:
         pass
+
+
+def _klines_ttl(params: dict, rows: list):
+    """
+    None (keep for good) when every candle the request can return has closed, else the TTL
+    of a page that may still change.
+    """
+    now = time.time() * 1000
+    interval_ms = TIMEFRAME_MS.get(params['interval'])
+    if interval_ms is not None and 'endTime' in params:
+        # The last candle of the range opens at endTime at the latest
+        closed = params['endTime'] + interval_ms <= now
+    else:
+        # Irregular intervals: a full page whose last candle has closed can't change
+        closed = len(rows) == KLINES_LIMIT and int(rows[-1][6]) < now
+    return None if closed else RESPONSE_CACHE_OPEN_TTL
@@ -1,6 +1,8 @@
+import numpy as np
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterator
 from engine.models.core import Order
+from engine.services.candle_store import candle_dicts_to_array
 
 class Exchange(ABC):
     def __init__(self, name: str):
@@ -13,6 +15,16 @@ class Exchange(ABC):
         """
         pass
 
+    def iter_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> Iterator[np.ndarray]:
+        """
+        Fetch OHLCV data page by page, each page an (n, 6) array in time order, so the
+        import can write candles while later pages are still downloading.
+
+        Adapters that page through the exchange override this; by default the whole
+        `fetch_ohlcv` result is one page.
+        """
+        yield candle_dicts_to_array(self.fetch_ohlcv(symbol, timeframe, start_ts, end_ts))
+
     @abstractmethod
     def market_order(self, symbol: str, qty: float, current_price: float, side: str, reduce_only: bool) -> Order:
         pass
@@ -1,12 +1,56 @@
+import io
+import time
 import yfinance as yf
-from typing import List, Dict, Any
+from yfinance.exceptions import YFRateLimitError, YFPricesMissingError
+import numpy as np
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from engine.exchanges.exchange import Exchange
 from engine.models.core import Order
+from engine.config import (YAHOO_TICKERS_PER_REQUEST, YAHOO_REQUESTS_PER_MINUTE,
+                           RESPONSE_CACHE_OPEN_TTL, RESPONSE_CACHE_ADJUSTED_TTL)
+from engine.services.rate_limiter import TokenBucket, RequestScheduler
+from engine.services.response_cache import ResponseCache, response_cache
+from engine.helpers import TIMEFRAME_MS
+from engine.services.candle_store import CANDLE_COLUMNS, CANDLE_DTYPE
 import pandas as pd
 
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Map timeframe to yfinance interval
+# yfinance supports: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
+INTERVAL_MAP = {
+    '1m': '1m',
+    '5m': '5m',
+    '15m': '15m',
+    '30m': '30m',
+    '1h': '1h',
+    '1d': '1d',
+    '1w': '1wk',
+    '1M': '1mo'
+}
+
+# Intraday history Yahoo serves: (longest range of one request, how far back from now).
+# Requests outside these limits come back empty instead of failing.
+INTRADAY_LIMITS = {
+    '1m': (7 * DAY_MS, 30 * DAY_MS),
+    '5m': (60 * DAY_MS, 60 * DAY_MS),
+    '15m': (60 * DAY_MS, 60 * DAY_MS),
+    '30m': (60 * DAY_MS, 60 * DAY_MS),
+    '1h': (730 * DAY_MS, 730 * DAY_MS),
+}
+
+# Keeps the oldest window clear of the lookback boundary, which moves while we fetch
+LOOKBACK_MARGIN_MS = 60 * 60 * 1000
+
+_FRAME_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# One download budget for every Yahoo import in the process
+yahoo_requests = RequestScheduler(TokenBucket(YAHOO_REQUESTS_PER_MINUTE, 60), throttle_errors=(YFRateLimitError,))
+
 class Yahoo(Exchange):
-    def __init__(self):
+    def __init__(self, cache: ResponseCache = None):
         super().__init__('Yahoo')
+        self.cache = cache or response_cache
 
     def fetch_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> List[Dict[str, Any]]:
         """
@@ -17,57 +61,115 @@ class Yahoo(Exchange):
         :param start_ts: Start timestamp in milliseconds
         :param end_ts: End timestamp in milliseconds (optional)
         """
-        
-        # Map timeframe to yfinance interval
-        # yfinance supports: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
-        interval_map = {
-            '1m': '1m',
-            '5m': '5m',
-            '15m': '15m',
-            '30m': '30m',
-            '1h': '1h',
-            '1d': '1d',
-            '1w': '1wk',
-            '1M': '1mo'
-        }
-        
-        interval = interval_map.get(timeframe)
-        if not interval:
+        candles = []
+        for page in self.iter_ohlcv(symbol, timeframe, start_ts, end_ts):
+            for timestamp, open_, high, low, close, volume in page.tolist():
+                candles.append({
+                    'timestamp': int(timestamp),
+                    'open': open_,
+                    'high': high,
+                    'low': low,
+                    'close': close,
+                    'volume': volume
+                })
+        return candles
+
+    def iter_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> Iterator[np.ndarray]:
+        # One page per request window
+        for start, end in self._windows(timeframe, start_ts, end_ts):
+            yield self._download([symbol], timeframe, start, end)[symbol]
+
+    def fetch_ohlcv_many(self, symbols: List[str], timeframe: str, start_ts: int,
+                         end_ts: int = None) -> Dict[str, np.ndarray]:
+        """
+        Candles of several tickers over the same range, as one (n, 6) array per symbol.
+        Up to YAHOO_TICKERS_PER_REQUEST tickers share each multi-ticker download.
+        """
+        pages = {symbol: [] for symbol in symbols}
+        for start, end in self._windows(timeframe, start_ts, end_ts):
+            for i in range(0, len(symbols), YAHOO_TICKERS_PER_REQUEST):
+                batch = symbols[i:i + YAHOO_TICKERS_PER_REQUEST]
+                for symbol, candles in self._download(batch, timeframe, start, end).items():
+                    pages[symbol].append(candles)
+        return {symbol: np.concatenate(parts) if parts else _empty() for symbol, parts in pages.items()}
+
+    def _windows(self, timeframe: str, start_ts: int, end_ts: Optional[int]) -> List[Tuple[int, int]]:
+        """
+        [start, end) ranges Yahoo accepts in one request, covering [start_ts, end_ts].
+        Intraday ranges are clipped to the available history and cut into chunks.
+        """
+        if timeframe not in INTERVAL_MAP:
             raise ValueError(f"Timeframe {timeframe} not supported by Yahoo Finance adapter.")
 
-        # Convert timestamps (ms) to datetime objects or strings
-        start_date = pd.to_datetime(start_ts, unit='ms')
-        end_date = pd.to_datetime(end_ts, unit='ms') if end_ts else None
+        now = int(time.time() * 1000)
+        # Yahoo's end is exclusive, the adapter's end bound is inclusive
+        end = (end_ts + 1) if end_ts is not None else now
+        limits = INTRADAY_LIMITS.get(timeframe)
+        if limits is None:
+            return [(start_ts, end)]
+
+        span, lookback = limits
+        earliest = now - lookback + LOOKBACK_MARGIN_MS
+        if start_ts < earliest:
+            print(f"Yahoo Finance keeps {timeframe} candles for the last {lookback // DAY_MS} days only; "
+                  f"fetching from {pd.to_datetime(earliest, unit='ms', utc=True)} instead of "
+                  f"{pd.to_datetime(start_ts, unit='ms', utc=True)}.")
+            start_ts = earliest
+        return [(start, min(start + span, end)) for start in range(start_ts, end, span)]
+
+    def _download(self, symbols: List[str], timeframe: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        request = {'symbols': symbols, 'interval': INTERVAL_MAP[timeframe], 'start': start, 'end': end,
+                   'auto_adjust': True}
+        body = self.cache.get('yahoo', request)
+        if body is not None:
+            # One array per symbol, in request order
+            stored = np.load(io.BytesIO(body))
+            return {symbol: stored[f'arr_{i}'] for i, symbol in enumerate(symbols)}
+
+        candles = self._fetch(symbols, timeframe, start, end)
+        if self.cache.enabled:
+            buffer = io.BytesIO()
+            np.savez(buffer, *[candles[symbol] for symbol in symbols])
+            self.cache.put('yahoo', request, buffer.getvalue(), ttl=_download_ttl(timeframe, end))
+        return candles
 
+    def _fetch(self, symbols: List[str], timeframe: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        frame = yahoo_requests.call(lambda: yf.download(
+            symbols,
+            start=pd.to_datetime(start, unit='ms', utc=True),
+            end=pd.to_datetime(end, unit='ms', utc=True),
+            interval=INTERVAL_MAP[timeframe],
+            group_by='ticker',
+            auto_adjust=True,
+            ignore_tz=False,
+            threads=True,
+            progress=False
+        ))
+        candles = {symbol: _frame_to_array(_ticker_frame(frame, symbol)) for symbol in symbols}
+        for symbol in symbols:
+            if len(candles[symbol]) == 0:
+                candles[symbol] = self._fetch_one(symbol, timeframe, start, end)
+        return candles
+
+    def _fetch_one(self, symbol: str, timeframe: str, start: int, end: int) -> np.ndarray:
+        """
+        One ticker on its own, raising its errors. yf.download logs a failed ticker and
+        returns it empty, like a ticker without candles in the range, so empty tickers are
+        asked again: a failure then raises (after the scheduler's retries) instead of
+        passing for a range with no candles, and only Yahoo's "no price data" answer
+        comes back empty.
+        """
         try:
-            ticker = yf.Ticker(symbol)
-            # fetch data
-            df = ticker.history(start=start_date, end=end_date, interval=interval)
-            
-            if df.empty:
-                return []
-
-            candles = []
-            for index, row in df.iterrows():
-                # Yahoo Finance index is the timestamp
-                # Convert to ms
-                ts = int(index.timestamp() * 1000)
-                
-                candle = {
-                    'timestamp': ts,
-                    'open': float(row['Open']),
-                    'high': float(row['High']),
-                    'low': float(row['Low']),
-                    'close': float(row['Close']),
-                    'volume': float(row['Volume'])
-                }
-                candles.append(candle)
-                
-            return candles
-
-        except Exception as e:
-            print(f"Error fetching data from Yahoo Finance: {e}")
-            return []
+            frame = yahoo_requests.call(lambda: yf.Ticker(symbol).history(
+                start=pd.to_datetime(start, unit='ms', utc=True),
+                end=pd.to_datetime(end, unit='ms', utc=True),
+                interval=INTERVAL_MAP[timeframe],
+                auto_adjust=True,
+                raise_errors=True
+            ))
+        except YFPricesMissingError:
+            return _empty()
+        return _frame_to_array(frame)
 
     def market_order(self, symbol: str, qty: float, current_price: float, side: str, reduce_only: bool) -> Order:
         raise NotImplementedError("Live trading not implemented for Yahoo yet.")
@@ -86,3 +188,47 @@ class Yahoo(Exchange):
 
     def _fetch_precisions(self) -> None:
         pass
+
+
+def _ticker_frame(frame: Optional[pd.DataFrame], symbol: str) -> Optional[pd.DataFrame]:
+    """
+    The OHLCV columns of one ticker in a (possibly multi-ticker) download.
+    """
+    if frame is None or frame.empty:
+        return None
+    if isinstance(frame.columns, pd.MultiIndex):
+        for level in range(frame.columns.nlevels):
+            if symbol in frame.columns.get_level_values(level):
+                return frame.xs(symbol, axis=1, level=level)
+        return None
+    return frame
+
+def _frame_to_array(frame: Optional[pd.DataFrame]) -> np.ndarray:
+    """
+    Whole-column conversion of a yfinance frame to an (n, 6) candle array. Rows without a
+    close (other tickers' timestamps in a multi-ticker download) are left out.
+    """
+    if frame is None or frame.empty:
+        return _empty()
+
+    index = frame.index
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    candles = np.empty((len(frame), CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+    candles[:, 0] = index.values.astype('datetime64[ms]').astype(np.int64)
+    candles[:, 1:] = frame[_FRAME_COLUMNS].to_numpy(dtype=CANDLE_DTYPE)
+    return candles[~np.isnan(candles[:, 4])]
+
+def _download_ttl(timeframe: str, end: int) -> int:
+    """
+    Closed candles of a download stay valid until Yahoo adjusts them for a later split or
+    dividend (auto_adjust), so they get the long TTL; a range reaching into open candles
+    the short one.
+    """
+    # 1M candles aren't in TIMEFRAME_MS: assume the longest month
+    interval_ms = TIMEFRAME_MS.get(timeframe, 31 * DAY_MS)
+    closed = end + interval_ms <= time.time() * 1000
+    return RESPONSE_CACHE_ADJUSTED_TTL if closed else RESPONSE_CACHE_OPEN_TTL
+
+def _empty() -> np.ndarray:
+    return np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
@@ -0,0 +1,39 @@
+from typing import Optional
+
+# Timeframe string -> duration in milliseconds
+TIMEFRAME_MS = {
+    '1m': 60 * 1000,
+    '3m': 3 * 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '2h': 2 * 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '6h': 6 * 60 * 60 * 1000,
+    '8h': 8 * 60 * 60 * 1000,
+    '12h': 12 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '3d': 3 * 24 * 60 * 60 * 1000,
+    '1w': 7 * 24 * 60 * 60 * 1000,
+}
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """
+    Convert a timeframe string (e.g. '1h') to milliseconds.
+    """
+    if timeframe not in TIMEFRAME_MS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return TIMEFRAME_MS[timeframe]
+
+def timeframe_to_one_minutes(timeframe: str) -> int:
+    return timeframe_to_ms(timeframe) // TIMEFRAME_MS['1m']
+
+def ms_to_timeframe(ms: int) -> Optional[str]:
+    """
+    Reverse lookup of TIMEFRAME_MS. Returns None for durations that are not a known timeframe.
+    """
+    for timeframe, duration in TIMEFRAME_MS.items():
+        if duration == ms:
+            return timeframe
+    return None
@@ -1,16 +1,19 @@
 import numpy as np
 
+# copy=False keeps these as views when candles are already float64
+# (e.g. slices of the memory-mapped candle store)
+
 def opens(candles):
-    return candles[:, 1].astype(float)
+    return candles[:, 1].astype(float, copy=False)
 
 def highs(candles):
-    return candles[:, 2].astype(float)
+    return candles[:, 2].astype(float, copy=False)
 
 def lows(candles):
-    return candles[:, 3].astype(float)
+    return candles[:, 3].astype(float, copy=False)
 
 def closes(candles):
-    return candles[:, 4].astype(float)
+    return candles[:, 4].astype(float, copy=False)
 
 def volumes(candles):
-    return candles[:, 5].astype(float)
+    return candles[:, 5].astype(float, copy=False)
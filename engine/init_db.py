@@ -5,19 +5,23 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from engine.config import db
+from engine.migrate_db import migrate_db
+from engine.convert_prices import check_price_encoding
 from engine.models import (
-    Candle, ClosedTrade, Order, Trade, Log, Option, ExchangeApiKeys,
+    Candle, Instrument, CandleData, CandleAggregate, ClosedTrade, Order, Trade, Log, Option, ExchangeApiKeys,
     Ticker, Orderbook, DailyBalance, MonteCarloSession, OptimizationSession, NotificationApiKeys,
-    User, Task, BacktestSession
+    User, Task, BacktestSession, CandleSeries, CandleCoverage, CandleIssue, WatchedSeries
 )
 
 def init_db():
     db.connect(reuse_if_open=True)
+    migrate_db(db)
     db.create_tables([
-        Candle, ClosedTrade, Order, Trade, Log, Option, ExchangeApiKeys,
+        Instrument, CandleData, CandleAggregate, Candle, ClosedTrade, Order, Trade, Log, Option, ExchangeApiKeys,
         Ticker, Orderbook, DailyBalance, MonteCarloSession, OptimizationSession, NotificationApiKeys,
-        User, Task, BacktestSession
+        User, Task, BacktestSession, CandleSeries, CandleCoverage, CandleIssue, WatchedSeries
     ])
+    check_price_encoding(db)
     if not db.is_closed():
         db.close()
     print("Database initialized.")
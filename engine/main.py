@@ -4,34 +4,29 @@ import os
 # Add parent dir to path so 'engine' package can be resolved
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from engine.config import db
 from engine.controllers import (
     import_controller, 
     backtest_controller, 
+    candles_controller, 
     websocket_controller, 
     lsp_controller, 
     config_controller,
     auth_controller,
     exchange_controller,
-    task_controller
+    task_controller,
+    system_controller
 )
 from engine.init_db import init_db
+from engine.services.db_maintenance import db_maintenance
+from engine.services.db_writer import db_writer
+from engine.services.tail_importer import tail_importer
 
 app = FastAPI(title="FXBot Engine API", version="1.0.0")
 
-# Database Connection Management Middleware
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    if db.is_closed():
-        db.connect()
-    try:
-        response = await call_next(request)
-    finally:
-        if not db.is_closed():
-            db.close()
-    return response
+# No per-request connection: db has a single connection, which each statement or
+# transaction checks out for itself (see WriterSqliteDatabase), and reads go through read_db
 
 # CORS
 app.add_middleware(
@@ -45,16 +40,29 @@ app.add_middleware(
 # Include Routers
 app.include_router(import_controller.router, prefix="/api/v1", tags=["Import"])
 app.include_router(backtest_controller.router, prefix="/api/v1", tags=["Backtest"])
+app.include_router(candles_controller.router, prefix="/api/v1", tags=["Candles"])
 app.include_router(lsp_controller.router, prefix="/api/v1", tags=["LSP"])
 app.include_router(config_controller.router, prefix="/api/v1", tags=["Config"])
 app.include_router(auth_controller.router, prefix="/api/v1", tags=["Auth"])
 app.include_router(exchange_controller.router, prefix="/api/v1", tags=["Exchange"])
 app.include_router(task_controller.router, prefix="/api/v1", tags=["Tasks"])
+app.include_router(system_controller.router, prefix="/api/v1", tags=["System"])
 app.include_router(websocket_controller.router, tags=["WebSocket"])
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    db_writer.start()
+    db_maintenance.start()
+    import_controller.resume_interrupted_imports()
+    tail_importer.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    tail_importer.stop()
+    db_maintenance.stop()
+    # Commits what is still queued
+    db_writer.stop()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,51 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.services.db_maintenance import db_maintenance
+
+def enable_incremental_vacuum():
+    """
+    Switch existing databases to auto_vacuum=incremental. New files get it from
+    SQLITE_PRAGMAS; an existing file only changes with a full VACUUM, which rewrites it
+    and blocks writers while it runs, so stop imports first.
+    """
+    switched = 0
+    for database in db_maintenance.databases():
+        database.connect(reuse_if_open=True)
+        try:
+            if database.execute_sql('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                continue
+            database.execute_sql('PRAGMA auto_vacuum = INCREMENTAL')
+            database.execute_sql('VACUUM')
+            switched += 1
+            print(f"Enabled incremental vacuum in {database.database}")
+        finally:
+            database.close()
+    return switched
+
+def maintain_db():
+    """
+    One maintenance pass over the main database and the candle partitions.
+    """
+    result = db_maintenance.run(require_idle=False)
+    for entry in result['databases']:
+        before, after = entry['before'], entry['after']
+        status = f"stopped: {entry['stopped']}" if entry['stopped'] else "done"
+        print(f"{after['path']}: {before['size_bytes'] + before['wal_bytes']} -> "
+              f"{after['size_bytes'] + after['wal_bytes']} bytes (file + WAL), "
+              f"{entry['freed_pages']} pages freed, fragmentation {after['fragmentation']:.1%}, {status}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoint, analyze and vacuum the SQLite databases.")
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help="Switch existing databases to incremental auto-vacuum first (runs a full VACUUM)")
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+    maintain_db()
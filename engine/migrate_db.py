@@ -0,0 +1,166 @@
+import sys
+import os
+import json
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playhouse.migrate import SqliteMigrator, migrate
+from peewee import CharField, TextField, BigIntegerField
+from engine.config import db
+from engine.models.core import Instrument, CandleData, candle_view_sql
+from engine.models.fields import PRICE_DECIMAL_PLACES
+from engine.helpers import ms_to_timeframe
+
+# Timeframe given to legacy candles whose resolution cannot be inferred
+# (run_import used to default to '1h')
+LEGACY_TIMEFRAME = '1h'
+
+def _columns(database, table):
+    return [c.name for c in database.get_columns(table)]
+
+def _indexes(database, table):
+    return [i.name for i in database.get_indexes(table)]
+
+def infer_timeframes(database):
+    """
+    Guess the timeframe of each legacy (exchange, symbol) series from the most common
+    gap between consecutive timestamps.
+    """
+    cursor = database.execute_sql("""
+        SELECT exchange, symbol, gap, COUNT(*) AS n FROM (
+            SELECT exchange, symbol,
+                   timestamp - LAG(timestamp) OVER (PARTITION BY exchange, symbol ORDER BY timestamp) AS gap
+            FROM candle
+        )
+        WHERE gap IS NOT NULL
+        GROUP BY exchange, symbol, gap
+        ORDER BY exchange, symbol, n DESC
+    """)
+    timeframes = {}
+    for exchange, symbol, gap, _ in cursor.fetchall():
+        if (exchange, symbol) not in timeframes:
+            timeframes[(exchange, symbol)] = ms_to_timeframe(gap) or LEGACY_TIMEFRAME
+    return timeframes
+
+def migrate_candle_timeframe(database):
+    """
+    Add `candle.timeframe` and re-key the candle indexes on (exchange, symbol, timeframe, timestamp).
+    """
+    if not database.table_exists('candle') or 'timeframe' in _columns(database, 'candle'):
+        return False
+
+    print("Migrating candle table: adding timeframe column...")
+    migrator = SqliteMigrator(database)
+    timeframes = infer_timeframes(database)
+
+    with database.atomic():
+        operations = [migrator.add_column('candle', 'timeframe', CharField(default=LEGACY_TIMEFRAME))]
+        if 'candle_exchange_symbol_timestamp' in _indexes(database, 'candle'):
+            operations.append(migrator.drop_index('candle', 'candle_exchange_symbol_timestamp'))
+        migrate(*operations)
+
+        for (exchange, symbol), timeframe in timeframes.items():
+            if timeframe == LEGACY_TIMEFRAME:
+                continue
+            database.execute_sql(
+                "UPDATE candle SET timeframe = ? WHERE exchange = ? AND symbol = ?",
+                (timeframe, exchange, symbol)
+            )
+            print(f"  {exchange} {symbol}: {timeframe}")
+
+    # New indexes are created by create_tables() from the model definition
+    return True
+
+def migrate_candle_clustered(database):
+    """
+    Move rows of the old `candle` table into `instrument` + the WITHOUT ROWID `candle_data`
+    table. `candle` becomes a compatibility view (created by `Candle.create_table()`).
+    """
+    row = database.execute_sql("SELECT type FROM sqlite_master WHERE name = 'candle'").fetchone()
+    if row is None or row[0] != 'table':
+        return False
+
+    print("Migrating candle table to instrument + clustered candle_data...")
+    with database.bind_ctx([Instrument, CandleData], bind_refs=False, bind_backrefs=False):
+        with database.atomic():
+            database.create_tables([Instrument, CandleData])
+            database.execute_sql(
+                'INSERT INTO "instrument" ("exchange", "symbol") '
+                'SELECT DISTINCT c."exchange", c."symbol" FROM "candle" AS c '
+                'WHERE NOT EXISTS (SELECT 1 FROM "instrument" AS i WHERE i."exchange" = c."exchange" AND i."symbol" = c."symbol")'
+            )
+            moved = database.execute_sql(
+                'INSERT OR REPLACE INTO "candle_data" '
+                '("instrument_id", "timeframe", "timestamp", "open", "high", "low", "close", "volume") '
+                'SELECT i."id", c."timeframe", c."timestamp", c."open", c."high", c."low", c."close", c."volume" '
+                'FROM "candle" AS c JOIN "instrument" AS i ON i."exchange" = c."exchange" AND i."symbol" = c."symbol" '
+                'ORDER BY i."id", c."timeframe", c."timestamp"'
+            ).rowcount
+            database.execute_sql('DROP TABLE "candle"')
+
+    print(f"  moved {moved} candles. Run VACUUM to return the freed pages to the OS.")
+    return True
+
+def migrate_task_checkpoint(database):
+    """
+    Add `task.params` and `task.checkpoint`, which resumable imports need.
+    """
+    if not database.table_exists('task') or 'checkpoint' in _columns(database, 'task'):
+        return False
+
+    print("Migrating task table: adding params and checkpoint columns...")
+    migrator = SqliteMigrator(database)
+    with database.atomic():
+        migrate(
+            migrator.add_column('task', 'params', TextField(null=True)),
+            migrator.add_column('task', 'checkpoint', BigIntegerField(null=True))
+        )
+    return True
+
+def migrate_instrument_scales(database, encoding):
+    """
+    Add `instrument.price_scale`/`volume_scale` and recreate the candle view, which decodes
+    with them. Fixed-point candles stored before per-symbol scales were all scaled by
+    10^PRICE_DECIMAL_PLACES; `encoding` is the encoding the stored candles are in.
+    """
+    if not database.table_exists('instrument') or 'price_scale' in _columns(database, 'instrument'):
+        return False
+
+    print("Migrating instrument table: adding price and volume scales...")
+    migrator = SqliteMigrator(database)
+    with database.atomic():
+        migrate(
+            migrator.add_column('instrument', 'price_scale', BigIntegerField(null=True)),
+            migrator.add_column('instrument', 'volume_scale', BigIntegerField(null=True))
+        )
+        if encoding == 'fixed':
+            database.execute_sql('UPDATE "instrument" SET "price_scale" = ?, "volume_scale" = ?',
+                                 (10 ** PRICE_DECIMAL_PLACES, 10 ** PRICE_DECIMAL_PLACES))
+        # Dropping the view also drops its triggers
+        database.execute_sql('DROP VIEW IF EXISTS "candle"')
+        for sql in candle_view_sql(encoding):
+            database.execute_sql(sql)
+    return True
+
+def _stored_price_encoding(database):
+    # convert_prices.stored_price_encoding(), without importing the candle services
+    if not database.table_exists('option'):
+        return None
+    row = database.execute_sql('SELECT "json" FROM "option" WHERE "type" = ?', ('price_encoding',)).fetchone()
+    return None if row is None else json.loads(row[0])['encoding']
+
+def migrate_db(database=db):
+    """
+    Bring an existing database up to the current schema. Safe to run repeatedly.
+    """
+    database.connect(reuse_if_open=True)
+    migrate_candle_timeframe(database)
+    migrate_candle_clustered(database)
+    migrate_task_checkpoint(database)
+    migrate_instrument_scales(database, _stored_price_encoding(database) or 'decimal')
+
+if __name__ == "__main__":
+    migrate_db()
+    if not db.is_closed():
+        db.close()
@@ -1,5 +1,8 @@
 from engine.models.core import (
     Candle,
+    Instrument,
+    CandleData,
+    CandleAggregate,
     ClosedTrade,
     Order,
     Trade,
@@ -14,6 +17,10 @@ from engine.models.core import (
     NotificationApiKeys,
     User,
     Task,
-    BacktestSession
+    BacktestSession,
+    CandleSeries,
+    CandleCoverage,
+    CandleIssue,
+    WatchedSeries
 )
 from engine.models.base import BaseModel
@@ -1,27 +1,200 @@
 from peewee import *
 from engine.models.base import BaseModel
+from engine.config import PRICE_ENCODING
+from engine.models.fields import price_field, candle_price_field, PRICE_DECIMAL_PLACES
 import json
 
-class Candle(BaseModel):
-    timestamp = BigIntegerField()
-    open = DecimalField(max_digits=20, decimal_places=8)
-    high = DecimalField(max_digits=20, decimal_places=8)
-    low = DecimalField(max_digits=20, decimal_places=8)
-    close = DecimalField(max_digits=20, decimal_places=8)
-    volume = DecimalField(max_digits=20, decimal_places=8)
+class Instrument(BaseModel):
+    # Dictionary of (exchange, symbol) pairs so candle rows only carry an integer id
     exchange = CharField()
     symbol = CharField()
+    # Fixed-point scales of the symbol's candle_data/candle_aggregate rows (stored value =
+    # price * price_scale); NULL while prices are stored as REAL
+    price_scale = BigIntegerField(null=True)
+    volume_scale = BigIntegerField(null=True)
 
     class Meta:
         indexes = (
-            (('exchange', 'symbol', 'timestamp'), True),
+            (('exchange', 'symbol'), True),
         )
 
+class CandleData(BaseModel):
+    # Clustered candle storage: rows live in primary key order, so a range for one
+    # series is a contiguous run of pages
+    # The primary key already leads with instrument_id, so no separate FK index
+    instrument = ForeignKeyField(Instrument, column_name='instrument_id', index=False)
+    timeframe = CharField()
+    timestamp = BigIntegerField()
+    open = candle_price_field()
+    high = candle_price_field()
+    low = candle_price_field()
+    close = candle_price_field()
+    volume = candle_price_field()
+
+    class Meta:
+        table_name = 'candle_data'
+        primary_key = CompositeKey('instrument', 'timeframe', 'timestamp')
+        without_rowid = True
+
+class CandleAggregate(BaseModel):
+    # Higher-timeframe candles resampled from 1m base candles (engine/services/candle_aggregates.py),
+    # clustered like candle_data
+    instrument = ForeignKeyField(Instrument, column_name='instrument_id', index=False)
+    timeframe = CharField()
+    timestamp = BigIntegerField()
+    open = candle_price_field()
+    high = candle_price_field()
+    low = candle_price_field()
+    close = candle_price_field()
+    volume = candle_price_field()
+    # Timestamp of the last base candle folded into this bucket
+    last_timestamp = BigIntegerField()
+
+    class Meta:
+        table_name = 'candle_aggregate'
+        primary_key = CompositeKey('instrument', 'timeframe', 'timestamp')
+        without_rowid = True
+
+_INSTRUMENT_ID = (
+    '(SELECT "id" FROM "instrument" WHERE "exchange" = {row}."exchange" AND "symbol" = {row}."symbol")'
+)
+
+_OLD_KEY = (
+    '"instrument_id" = ' + _INSTRUMENT_ID.format(row='OLD') +
+    ' AND "timeframe" = OLD."timeframe" AND "timestamp" = OLD."timestamp"'
+)
+
+_PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# Scale of an instrument written through the view, which cannot look at the data first
+_VIEW_SCALE = 10 ** PRICE_DECIMAL_PLACES
+
+def _scale_of(column):
+    return f'(SELECT "{column}" FROM "instrument" WHERE "exchange" = NEW."exchange" AND "symbol" = NEW."symbol")'
+
+def _raise_scale(scale_column, columns):
+    """
+    Statements moving a series to _VIEW_SCALE when a value of the new row needs more
+    decimals than its current scale holds: stored rows first, then the instrument row.
+    """
+    scale = _scale_of(scale_column)
+    inexact = ' OR '.join(f'ROUND(NEW."{c}" * {scale}) / {scale} != NEW."{c}"' for c in columns)
+    condition = f'{scale} < {_VIEW_SCALE} AND ({inexact})'
+    rescale = ', '.join(f'"{c}" = "{c}" * ({_VIEW_SCALE} / {scale})' for c in columns)
+    return ''.join(
+        f'UPDATE "{table}" SET {rescale} WHERE "instrument_id" = {_INSTRUMENT_ID.format(row="NEW")} AND {condition}; '
+        for table in ('candle_data', 'candle_aggregate')
+    ) + (
+        f'UPDATE "instrument" SET "{scale_column}" = {_VIEW_SCALE} '
+        f'WHERE "exchange" = NEW."exchange" AND "symbol" = NEW."symbol" AND {condition}; '
+    )
+
+def _encoded(column, scale_column):
+    scale = _scale_of(scale_column)
+    return f'CASE WHEN {scale} IS NULL THEN NEW."{column}" ELSE CAST(ROUND(NEW."{column}" * {scale}) AS INTEGER) END'
+
+def _decoded(column, scale_column):
+    return (f'CASE WHEN i."{scale_column}" IS NULL THEN d."{column}" '
+            f'ELSE CAST(d."{column}" AS REAL) / i."{scale_column}" END AS "{column}"')
+
+def candle_view_sql(encoding=PRICE_ENCODING):
+    """
+    The `candle` view and its INSTEAD OF triggers. Values go through the view as plain
+    numbers in both encodings; with 'fixed', rows are scaled by their instrument's scales.
+    """
+    default_scale = _VIEW_SCALE if encoding == 'fixed' else 'NULL'
+    ensure_instrument = (
+        'INSERT INTO "instrument" ("exchange", "symbol", "price_scale", "volume_scale") '
+        f'SELECT NEW."exchange", NEW."symbol", {default_scale}, {default_scale} '
+        'WHERE NOT EXISTS (SELECT 1 FROM "instrument" WHERE "exchange" = NEW."exchange" AND "symbol" = NEW."symbol"); '
+    )
+    if encoding == 'fixed':
+        ensure_instrument += _raise_scale('price_scale', _PRICE_COLUMNS) + _raise_scale('volume_scale', ('volume',))
+    values = [_encoded(c, 'price_scale') for c in _PRICE_COLUMNS] + [_encoded('volume', 'volume_scale')]
+
+    return (
+        'CREATE VIEW IF NOT EXISTS "candle" AS '
+        'SELECT d."timestamp", ' +
+        ', '.join([_decoded(c, 'price_scale') for c in _PRICE_COLUMNS] + [_decoded('volume', 'volume_scale')]) +
+        ', i."exchange", i."symbol", d."timeframe" '
+        'FROM "candle_data" AS d JOIN "instrument" AS i ON i."id" = d."instrument_id"',
+
+        # The conflict clause of the outer statement (e.g. INSERT OR REPLACE) applies to these
+        'CREATE TRIGGER IF NOT EXISTS "candle_insert" INSTEAD OF INSERT ON "candle" BEGIN ' +
+        ensure_instrument +
+        'INSERT INTO "candle_data" ("instrument_id", "timeframe", "timestamp", "open", "high", "low", "close", "volume") '
+        'VALUES (' + _INSTRUMENT_ID.format(row='NEW') + ', NEW."timeframe", NEW."timestamp", ' +
+        ', '.join(values) + '); '
+        'END',
+
+        'CREATE TRIGGER IF NOT EXISTS "candle_update" INSTEAD OF UPDATE ON "candle" BEGIN ' +
+        ensure_instrument +
+        'UPDATE "candle_data" SET "instrument_id" = ' + _INSTRUMENT_ID.format(row='NEW') + ', '
+        '"timeframe" = NEW."timeframe", "timestamp" = NEW."timestamp", ' +
+        ', '.join(f'"{c}" = {v}' for c, v in zip(_PRICE_COLUMNS + ('volume',), values)) + ' '
+        'WHERE ' + _OLD_KEY + '; '
+        'END',
+
+        'CREATE TRIGGER IF NOT EXISTS "candle_delete" INSTEAD OF DELETE ON "candle" BEGIN '
+        'DELETE FROM "candle_data" WHERE ' + _OLD_KEY + '; '
+        'END',
+    )
+
+def create_candle_schema(database, safe=True):
+    """
+    Create instrument, candle_data, candle_aggregate and the candle view in `database`
+    without rebinding the models (used for the main database and for per-symbol partitions).
+    """
+    for model in (Instrument, CandleData, CandleAggregate):
+        SchemaManager(model, database).create_all(safe=safe)
+    for sql in candle_view_sql():
+        database.execute_sql(sql)
+
+class Candle(BaseModel):
+    """
+    Compatibility model over `candle_data` + `instrument`.
+
+    `candle` is a view with INSTEAD OF triggers, so selects, inserts (including
+    `on_conflict_replace()`), updates and deletes keep working with exchange/symbol
+    strings while the data is stored in the clustered `candle_data` table. The view
+    decodes fixed-point rows, so its price columns are plain decimals in both encodings.
+    """
+    timestamp = BigIntegerField()
+    open = DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+    high = DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+    low = DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+    close = DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+    volume = DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+    exchange = CharField()
+    symbol = CharField()
+    timeframe = CharField(default='1h')
+
+    class Meta:
+        primary_key = False
+
+    @classmethod
+    def create_table(cls, safe=True, **options):
+        create_candle_schema(cls._meta.database, safe=safe)
+
+    @classmethod
+    def drop_table(cls, safe=True, drop_sequences=True, **options):
+        database = cls._meta.database
+        # Dropping the view also drops its triggers
+        database.execute_sql('DROP VIEW IF EXISTS "candle"')
+        for model in (CandleAggregate, CandleData, Instrument):
+            SchemaManager(model, database).drop_all(safe=safe)
+
+    @classmethod
+    def table_exists(cls):
+        return cls._meta.database.execute_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'candle'"
+        ).fetchone() is not None
+
 class ClosedTrade(BaseModel):
-    entry_price = DecimalField(max_digits=20, decimal_places=8)
-    exit_price = DecimalField(max_digits=20, decimal_places=8)
-    qty = DecimalField(max_digits=20, decimal_places=8)
-    pnl = DecimalField(max_digits=20, decimal_places=8)
+    entry_price = price_field()
+    exit_price = price_field()
+    qty = price_field()
+    pnl = price_field()
     opened_at = BigIntegerField()
     closed_at = BigIntegerField()
     strategy_name = CharField()
@@ -30,8 +203,8 @@ class ClosedTrade(BaseModel):
 
 class Order(BaseModel):
     id = CharField(primary_key=True)
-    price = DecimalField(max_digits=20, decimal_places=8, null=True)
-    qty = DecimalField(max_digits=20, decimal_places=8)
+    price = price_field(null=True)
+    qty = price_field()
     type = CharField() # MARKET/LIMIT/STOP
     status = CharField() # ACTIVE/EXECUTED/CANCELED
     side = CharField() # buy/sell
@@ -43,9 +216,9 @@ class Order(BaseModel):
 
 class Trade(BaseModel):
     timestamp = BigIntegerField()
-    price = DecimalField(max_digits=20, decimal_places=8)
-    buy_qty = DecimalField(max_digits=20, decimal_places=8)
-    sell_qty = DecimalField(max_digits=20, decimal_places=8)
+    price = price_field()
+    buy_qty = price_field()
+    sell_qty = price_field()
     buy_count = IntegerField()
     sell_count = IntegerField()
     exchange = CharField()
@@ -70,10 +243,10 @@ class ExchangeApiKeys(BaseModel):
 
 class Ticker(BaseModel):
     timestamp = BigIntegerField()
-    last_price = DecimalField(max_digits=20, decimal_places=8)
-    high_price = DecimalField(max_digits=20, decimal_places=8)
-    low_price = DecimalField(max_digits=20, decimal_places=8)
-    volume = DecimalField(max_digits=20, decimal_places=8)
+    last_price = price_field()
+    high_price = price_field()
+    low_price = price_field()
+    volume = price_field()
     exchange = CharField()
     symbol = CharField()
 
@@ -120,6 +293,8 @@ class Task(BaseModel):
     status = CharField() # queued/processing/completed/failed
     result = TextField(null=True) # JSON
     error = TextField(null=True)
+    params = TextField(null=True) # JSON, what the task was started with (lets imports resume)
+    checkpoint = BigIntegerField(null=True) # last candle timestamp an import has committed
     created_at = BigIntegerField()
     updated_at = BigIntegerField()
 
@@ -174,3 +349,60 @@ class BacktestSession(BaseModel):
     def strategy_codes_json(self):
         return json.loads(self.strategy_codes) if self.strategy_codes else None
 
+
+class CandleSeries(BaseModel):
+    # Catalog entry for a columnar candle file (see engine/services/candle_store.py)
+    exchange = CharField()
+    symbol = CharField()
+    timeframe = CharField()
+    path = CharField()
+    count = BigIntegerField(default=0)
+    first_timestamp = BigIntegerField(null=True)
+    last_timestamp = BigIntegerField(null=True)
+    updated_at = BigIntegerField()
+
+    class Meta:
+        indexes = (
+            (('exchange', 'symbol', 'timeframe'), True),
+        )
+
+class CandleCoverage(BaseModel):
+    # Timestamp interval [start_timestamp, end_timestamp] already imported for a series
+    exchange = CharField()
+    symbol = CharField()
+    timeframe = CharField()
+    start_timestamp = BigIntegerField()
+    end_timestamp = BigIntegerField()
+
+    class Meta:
+        indexes = (
+            (('exchange', 'symbol', 'timeframe', 'start_timestamp'), True),
+        )
+
+class WatchedSeries(BaseModel):
+    # Series kept current by the tail importer (engine/services/tail_importer.py)
+    exchange = CharField()
+    symbol = CharField()
+    timeframe = CharField()
+    start_date = CharField(null=True) # where the first refresh starts when nothing is stored yet
+    last_timestamp = BigIntegerField(null=True) # newest stored candle after the last refresh
+    last_refresh_at = BigIntegerField(null=True)
+    last_error = TextField(null=True)
+    created_at = BigIntegerField()
+
+    class Meta:
+        indexes = (
+            (('exchange', 'symbol', 'timeframe'), True),
+        )
+
+class CandleIssue(BaseModel):
+    # Problem found in fetched candles by import validation (engine/services/candle_validation.py)
+    task_id = CharField(null=True, index=True)
+    exchange = CharField()
+    symbol = CharField()
+    timeframe = CharField()
+    timestamp = BigIntegerField()
+    rule = CharField() # invalid/ohlc/alignment/order/duplicate/outlier/zero_volume_spike
+    action = CharField() # dropped/repaired/flagged
+    detail = TextField(null=True)
+    created_at = BigIntegerField()
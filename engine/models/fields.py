@@ -0,0 +1,60 @@
+import decimal
+import numpy as np
+from peewee import BigIntegerField, DecimalField
+from engine.config import PRICE_ENCODING
+
+# Precision of every price/quantity column (matches the original DecimalField(20, 8))
+PRICE_DECIMAL_PLACES = 8
+
+INT64_MAX = 2 ** 63 - 1
+
+
+class FixedPointField(BigIntegerField):
+    """
+    Decimal value stored as a scaled int64: 1.5 with 8 decimal places is stored as 150000000.
+
+    Rows read through the ORM still come back as `Decimal`. Bulk readers that pull raw
+    integers from the cursor can decode a whole column at once with `to_float_array()`.
+    """
+
+    def __init__(self, decimal_places=PRICE_DECIMAL_PLACES, *args, **kwargs):
+        self.decimal_places = decimal_places
+        self.scale = 10 ** decimal_places
+        super().__init__(*args, **kwargs)
+
+    def db_value(self, value):
+        if value is None:
+            return None
+        scaled = (decimal.Decimal(str(value)) * self.scale).to_integral_value(rounding=decimal.ROUND_HALF_EVEN)
+        if abs(scaled) > INT64_MAX:
+            raise ValueError(f"{value} does not fit in a fixed-point column with {self.decimal_places} decimal places")
+        return int(scaled)
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return decimal.Decimal(int(value)).scaleb(-self.decimal_places)
+
+    def to_float_array(self, raw) -> np.ndarray:
+        return np.asarray(raw, dtype=np.float64) / self.scale
+
+
+def candle_price_field():
+    """
+    Price/volume column of candle_data and candle_aggregate. With PRICE_ENCODING=fixed
+    it holds an int64 scaled by the scales on the series' `Instrument` row
+    (engine/services/candle_scales.py), so unlike `FixedPointField` the column has no
+    scale of its own.
+    """
+    if PRICE_ENCODING == 'fixed':
+        return BigIntegerField()
+    return DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES)
+
+
+def price_field(null=False):
+    """
+    Column for prices and quantities, encoded according to PRICE_ENCODING.
+    """
+    if PRICE_ENCODING == 'fixed':
+        return FixedPointField(decimal_places=PRICE_DECIMAL_PLACES, null=null)
+    return DecimalField(max_digits=20, decimal_places=PRICE_DECIMAL_PLACES, null=null)
@@ -1,15 +1,28 @@
-from engine.models.core import Candle, BacktestSession, Order
+from engine.models.core import BacktestSession, Order
 from engine.store import Store
 from engine.exchanges.sandbox import Sandbox
 from engine.strategies.Strategy import Strategy
 from engine.schemas import BacktestResult
+from engine.services.candle_loader import load_candles, iter_candle_chunks
+from engine.config import BACKTEST_CHUNK_ROWS, BACKTEST_WINDOW_ROWS
 from engine.modes.utils import candle_includes_price, split_candle, get_executing_orders, sort_execution_orders
 import numpy as np
+import itertools
 import time
 import os
 import logging
 
-def run_backtest(exchange_name: str, symbol: str, timeframe: str, start_date: str, end_date: str, strategy_class, task_id: str = None):
+def run_backtest(exchange_name: str, symbol: str, timeframe: str, start_date: str, end_date: str, strategy_class, task_id: str = None,
+                 stream: bool = False, chunk_rows: int = BACKTEST_CHUNK_ROWS, window_rows: int = BACKTEST_WINDOW_ROWS):
+    """
+    Run a strategy over historical candles.
+
+    By default the whole range is loaded into one array and the strategy sees every candle
+    up to the current one. With `stream=True` candles are read `chunk_rows` at a time and
+    the strategy sees only the last `window_rows` candles, so memory stays flat however long
+    the range is. Both modes give the same results as long as `window_rows` covers the
+    strategy's declared `lookback`; streaming refuses to start otherwise.
+    """
 
     # Setup logging
     logger = None
@@ -45,23 +58,21 @@ def run_backtest(exchange_name: str, symbol: str, timeframe: str, start_date: st
         except ValueError:
             raise ValueError("Invalid date format. Use YYYY-MM-DD.")
 
-        candles_query = Candle.select().where(
-            (Candle.exchange == exchange_name) &
-            (Candle.symbol == symbol) &
-            (Candle.timestamp >= start_ts) &
-            (Candle.timestamp <= end_ts)
-        ).order_by(Candle.timestamp)
-        
-        # [timestamp, open, high, low, close, volume]
-        candles_list = []
-        for c in candles_query:
-            candles_list.append([c.timestamp, float(c.open), float(c.high), float(c.low), float(c.close), float(c.volume)])
-        
-        if not candles_list:
-            raise ValueError(f"No candles found for backtest for {symbol} on {exchange_name} between {start_date} and {end_date}.")
+        if stream:
+            _check_window(strategy_class, window_rows)
+            chunks = iter_candle_chunks(exchange_name, symbol, timeframe, start_ts, end_ts, chunk_rows)
+            first_chunk = next((chunk for chunk in chunks if len(chunk)), None)
+            if first_chunk is None:
+                raise ValueError(f"No candles found for backtest for {symbol} on {exchange_name} between {start_date} and {end_date}.")
+
+            log(f"Streaming candles in chunks of {chunk_rows} (window {window_rows}).")
+        else:
+            all_candles = load_candles(exchange_name, symbol, timeframe, start_ts, end_ts)
 
-        all_candles = np.array(candles_list)
-        log(f"Loaded {len(all_candles)} candles.")
+            if len(all_candles) == 0:
+                raise ValueError(f"No candles found for backtest for {symbol} on {exchange_name} between {start_date} and {end_date}.")
+
+            log(f"Loaded {len(all_candles)} candles.")
 
         # 2. Initialize Components
         local_store = Store()
@@ -74,7 +85,12 @@ def run_backtest(exchange_name: str, symbol: str, timeframe: str, start_date: st
         strategy.setUp()
 
         # 3. Run Simulation
-        _step_simulator(all_candles, local_store, sandbox, strategy, log, task_id, symbol)
+        if stream:
+            streamed = _step_simulator_streaming(itertools.chain([first_chunk], chunks), window_rows,
+                                                 local_store, sandbox, strategy, log, task_id, symbol)
+            log(f"Streamed {streamed} candles.")
+        else:
+            _step_simulator(all_candles, local_store, sandbox, strategy, log, task_id, symbol)
 
         # 4. Results
         strategy.terminate()
@@ -105,37 +121,81 @@ def run_backtest(exchange_name: str, symbol: str, timeframe: str, start_date: st
             if logger: logger.removeHandler(file_handler)
 
 
+WARMUP_PERIOD = 50
+
 def _step_simulator(candles, store, sandbox, strategy, log, task_id, symbol):
-    warmup_period = 50
-    
-    for i in range(warmup_period, len(candles)):
-        # Check for cancellation
-        if task_id and i % 100 == 0:
-            try:
-                session = BacktestSession.get(BacktestSession.id == task_id)
-                if session.status == 'cancelled':
-                    log(f"Task {task_id} cancelled by user.")
-                    return
-            except:
-                pass
-
-        current_candle = candles[i]
-        
-        # Update Store
-        store.price = current_candle[4] # Close
-        store.current_candle = current_candle
-        
-        # 1. Simulate Price Change (Execute Active Orders)
-        _simulate_price_change_effect(current_candle, store, sandbox, log)
-        
-        # 2. Update Strategy
-        strategy.candles = candles[:i+1]
-        
-        # 3. Execute Strategy Logic
-        strategy._execute()
-        
-        # 4. Process Strategy Intents (New Orders)
-        _process_strategy_intents(strategy, sandbox, store, symbol)
+    for i in range(WARMUP_PERIOD, len(candles)):
+        if _is_cancelled(i, task_id, log):
+            return
+
+        _step(candles[i], candles[:i+1], store, sandbox, strategy, log, symbol)
+
+
+def _check_window(strategy_class, window_rows):
+    lookback = strategy_class.lookback
+    if lookback is None:
+        raise ValueError(f"{strategy_class.__name__} does not declare a lookback, so a streaming backtest "
+                         f"cannot tell whether {window_rows} candles of history are enough. Set `lookback` "
+                         f"on the strategy or run without streaming.")
+    if window_rows < lookback:
+        raise ValueError(f"{strategy_class.__name__} looks back {lookback} candles but the streaming window "
+                         f"keeps only {window_rows}. Raise window_rows to at least {lookback}.")
+
+
+def _step_simulator_streaming(chunks, window_rows, store, sandbox, strategy, log, task_id, symbol):
+    """
+    Same loop as `_step_simulator`, fed chunk by chunk. Only the last `window_rows`
+    candles are kept between chunks. Returns the number of candles seen.
+    """
+    history = np.empty((0, 6))
+    i = 0
+    for chunk in chunks:
+        # Trailing window of the previous chunks followed by this chunk
+        candles = np.concatenate([history, chunk])
+        offset = len(history)
+
+        for j in range(len(chunk)):
+            if i >= WARMUP_PERIOD:
+                if _is_cancelled(i, task_id, log):
+                    return i
+
+                end = offset + j + 1
+                _step(candles[end - 1], candles[max(0, end - window_rows):end], store, sandbox, strategy, log, symbol)
+            i += 1
+
+        history = candles[-(window_rows - 1):] if window_rows > 1 else candles[:0]
+    return i
+
+
+def _is_cancelled(i, task_id, log):
+    # Check for cancellation
+    if task_id and i % 100 == 0:
+        try:
+            session = BacktestSession.get(BacktestSession.id == task_id)
+            if session.status == 'cancelled':
+                log(f"Task {task_id} cancelled by user.")
+                return True
+        except:
+            pass
+    return False
+
+
+def _step(current_candle, candles, store, sandbox, strategy, log, symbol):
+    # Update Store
+    store.price = current_candle[4] # Close
+    store.current_candle = current_candle
+
+    # 1. Simulate Price Change (Execute Active Orders)
+    _simulate_price_change_effect(current_candle, store, sandbox, log)
+
+    # 2. Update Strategy
+    strategy.candles = candles
+
+    # 3. Execute Strategy Logic
+    strategy._execute()
+
+    # 4. Process Strategy Intents (New Orders)
+    _process_strategy_intents(strategy, sandbox, store, symbol)
 
 
 def _simulate_price_change_effect(candle, store, sandbox, log):
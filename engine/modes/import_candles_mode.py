@@ -6,11 +6,42 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from engine.exchanges.binance import Binance
 from engine.exchanges.yahoo import Yahoo
-from engine.models.core import Candle
-from engine.config import db
+from engine.exchanges.exchange import Exchange
+from engine.services.candle_store import candle_store, candle_dicts_to_array
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_loader import load_candles_from_db, MAX_TIMESTAMP
+from engine.services.candle_coverage import candle_coverage, covered_pieces
+from engine.services.candle_partitions import candle_partitions
+from engine.services.candle_scales import prepare_instrument, encode_columns
+from engine.services.candle_aggregates import candle_aggregates
+from engine.services.candle_validation import validate_candles, record_issues, summarize, DROP_RULES
+from engine.helpers import TIMEFRAME_MS
+from engine.config import IMPORT_PREFETCH_PAGES
+from typing import Iterator, Callable
+import numpy as np
+import queue
+import threading
 import time
 
-def run_import(exchange_name: str, symbol: str, start_date: str, timeframe: str = '1h'):
+# Straight into the clustered table rather than through the `candle` view's triggers
+_INSERT_SQL = (
+    'INSERT OR REPLACE INTO "candle_data" '
+    '("instrument_id", "timeframe", "timestamp", "open", "high", "low", "close", "volume") '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+def get_driver(exchange_name: str) -> Exchange:
+    """
+    A new adapter for the exchange, with its own connection pool.
+    """
+    if exchange_name.lower() == 'binance':
+        return Binance()
+    if exchange_name.lower() == 'yahoo':
+        return Yahoo()
+    raise ValueError(f"Exchange {exchange_name} not supported.")
+
+def run_import(exchange_name: str, symbol: str, start_date: str, timeframe: str = '1h', task_id: str = None,
+               resume_from: int = None, on_checkpoint: Callable[[int], None] = None, driver: Exchange = None):
     """
     Import candles from an exchange.
     
@@ -18,16 +49,20 @@ def run_import(exchange_name: str, symbol: str, start_date: str, timeframe: str
     :param symbol: Symbol to fetch (e.g., 'BTC-USDT')
     :param start_date: Start date in 'YYYY-MM-DD' format
     :param timeframe: Timeframe to fetch (e.g., '1m', '1h', '1d')
+    :param task_id: Import task the validation findings are recorded under
+    :param resume_from: Last candle timestamp an earlier attempt of this import committed;
+                        nothing up to it is fetched again
+    :param on_checkpoint: Called with the last candle timestamp of every committed page
+    :param driver: Adapter to fetch with, e.g. one shared by many imports; a new one by default
+    :return: {'fetched': candles downloaded, 'skipped': candles already stored in the range,
+              'rejected': candles dropped by validation, 'issues': findings per validation rule,
+              'pages': pages downloaded, 'pages_per_second': pages fetched and stored per second}
     """
     print(f"Starting import for {symbol} from {exchange_name} since {start_date} ({timeframe})...")
     
     # 1. Resolve Driver
-    if exchange_name.lower() == 'binance':
-        driver = Binance()
-    elif exchange_name.lower() == 'yahoo':
-        driver = Yahoo()
-    else:
-        raise ValueError(f"Exchange {exchange_name} not supported.")
+    if driver is None:
+        driver = get_driver(exchange_name)
 
     # 2. Parse Date to Timestamp
     try:
@@ -35,44 +70,197 @@ def run_import(exchange_name: str, symbol: str, start_date: str, timeframe: str
     except ValueError:
         raise ValueError("Invalid date format. Use YYYY-MM-DD.")
 
-    # 3. Fetch Data
-    candles_data = driver.fetch_ohlcv(symbol, timeframe, start_ts)
-    
-    print(f"Fetched {len(candles_data)} candles.")
+    # 3. Work out which windows are missing
+    timeframe_ms = TIMEFRAME_MS.get(timeframe)
+    fetch_start = start_ts
+    if resume_from is not None:
+        fetch_start = max(start_ts, resume_from + (timeframe_ms or 1))
+        print(f"Resuming after {resume_from}.")
+    if timeframe_ms:
+        # Only closed candles: the last one opened a full timeframe before now
+        end_ts = (int(time.time() * 1000) // timeframe_ms) * timeframe_ms - timeframe_ms
+        windows = candle_coverage.missing(exchange_name, symbol, timeframe, timeframe_ms, fetch_start, end_ts)
+        skipped = candle_coverage.stored_count(exchange_name, symbol, timeframe, start_ts, end_ts)
+    else:
+        # Irregular timeframes (e.g. '1M') are not tracked, fetch everything
+        end_ts = None
+        windows = [(fetch_start, None)]
+        skipped = 0
+
+    if not windows:
+        print(f"Range already imported, skipped {skipped} candles.")
+        return {'fetched': 0, 'skipped': skipped, 'rejected': 0, 'issues': {}, 'pages': 0, 'pages_per_second': 0.0}
 
-    # 4. Store in DB
-    if not candles_data:
+    # 4. Fetch, validate and store each missing window. Pages are written as they arrive
+    # while the next ones download, so memory stays at a few pages and every committed
+    # page counts as imported even if a later one fails.
+    fetched = 0
+    rejected = 0
+    all_issues = []
+    page_count = 0
+    started = time.perf_counter()
+    # Pages filling gaps before the store's tail are merged into it once, at the end, instead
+    # of rewriting the store file for each of them
+    store_writer = candle_store.writer(exchange_name, symbol, timeframe)
+    try:
+        for window_start, window_end in windows:
+            # Adapters take an end bound on candle open time; keep the last candle of the window
+            fetch_end = None if window_end is None else window_end + timeframe_ms - 1
+            pages = _prefetch(driver.iter_ohlcv(symbol, timeframe, window_start, fetch_end), IMPORT_PREFETCH_PAGES)
+            window_fetched = 0
+            window_dropped = []
+            cursor = window_start
+            for candles in pages:
+                if window_end is not None:
+                    candles = candles[(candles[:, 0] >= window_start) & (candles[:, 0] <= window_end)]
+                window_fetched += len(candles)
+                page_count += 1
+
+                candles, _, issues = validate_candles(candles, timeframe_ms)
+                dropped = [issue['timestamp'] for issue in issues if issue['rule'] in DROP_RULES]
+                if issues:
+                    record_issues(task_id, exchange_name, symbol, timeframe, issues)
+                    print(f"Validation findings: {summarize(issues)}")
+                    all_issues += issues
+                    rejected += len(dropped)
+                    window_dropped += dropped
+                _save_candles(exchange_name, symbol, timeframe, candles, store_writer)
+
+                if not len(candles):
+                    continue
+                page_end = int(candles[-1, 0])
+                if window_end is not None:
+                    # Rejected candles stay uncovered so the next import asks for them again
+                    for piece_start, piece_end in covered_pieces(cursor, page_end, window_dropped, timeframe_ms):
+                        candle_coverage.add(exchange_name, symbol, timeframe, timeframe_ms, piece_start, piece_end)
+                    cursor = max(cursor, page_end + timeframe_ms)
+                if on_checkpoint is not None:
+                    on_checkpoint(page_end)
+
+            print(f"Fetched {window_fetched} candles.")
+            fetched += window_fetched
+            # Only reached once the window downloaded in full: a failed page raises out of the
+            # loop above (after its gap-free prefix is stored), so a short fetch never covers the rest
+            if window_end is not None and window_end < end_ts and cursor <= window_end:
+                # Hole between stored ranges: whatever the exchange returned is all there is
+                for piece_start, piece_end in covered_pieces(cursor, window_end, window_dropped, timeframe_ms):
+                    candle_coverage.add(exchange_name, symbol, timeframe, timeframe_ms, piece_start, piece_end)
+    finally:
+        _flush_store(exchange_name, symbol, timeframe, store_writer)
+
+    if fetched == 0:
         print("No data found.")
+
+    elapsed = time.perf_counter() - started
+    pages_per_second = round(page_count / elapsed, 2) if elapsed > 0 else 0.0
+    print(f"Import complete. Fetched {fetched} candles, skipped {skipped} already stored, rejected {rejected}; "
+          f"{page_count} pages at {pages_per_second} pages/s.")
+    return {'fetched': fetched, 'skipped': skipped, 'rejected': rejected, 'issues': summarize(all_issues),
+            'pages': page_count, 'pages_per_second': pages_per_second}
+
+def _prefetch(pages: Iterator[np.ndarray], depth: int) -> Iterator[np.ndarray]:
+    """
+    Iterate `pages` on a background thread, at most `depth` pages ahead of the caller, so
+    the next pages download while the current one is validated and written. An exception
+    from the adapter is raised in the caller once the pages before it are consumed.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+        finally:
+            # Adapter generators are closed on the thread that runs them
+            close = getattr(pages, 'close', None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name='import-fetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page, error = buffer.get()
+            if page is end:
+                if error is not None:
+                    raise error
+                return
+            yield page
+    finally:
+        stop.set()
+        producer.join()
+
+def _save_candles(exchange_name, symbol, timeframe, candles, store_writer=None):
+    """
+    Upsert candles into SQLite and the candle store, in one transaction. `candles` is an
+    (n, 6) array, or adapter dicts. With a `store_writer` (`CandleStore.writer()`), candles
+    before the store's tail wait for its flush (`_flush_store`).
+    """
+    if not isinstance(candles, np.ndarray):
+        candles = candle_dicts_to_array(candles)
+    if len(candles) == 0:
         return
 
-    print("Saving to database...")
-    
-    # Bulk insert is faster
-    # We need to map the dict to the model fields
-    batch_size = 500
-    total = len(candles_data)
-    
-    with db.atomic():
-        for i in range(0, total, batch_size):
-            batch = candles_data[i:i+batch_size]
-            data_to_insert = []
-            for c in batch:
-                data_to_insert.append({
-                    'timestamp': c['timestamp'],
-                    'open': c['open'],
-                    'high': c['high'],
-                    'low': c['low'],
-                    'close': c['close'],
-                    'volume': c['volume'],
-                    'exchange': exchange_name,
-                    'symbol': symbol
-                })
-            
-            # Upsert (replace if exists)
-            Candle.insert_many(data_to_insert).on_conflict_replace().execute()
-            print(f"Saved {min(i+batch_size, total)}/{total}")
-
-    print("Import complete.")
+    # Each symbol writes to its own partition file when partitioning is enabled
+    database = candle_partitions.database_for(exchange_name, symbol)
+    with database.atomic():
+        # With fixed-point prices this may raise the symbol's scales for the new candles
+        instrument_id, scales = prepare_instrument(database, exchange_name, symbol, candles)
+        # Columns go to the driver as-is instead of through one peewee value node per cell
+        columns = [candles[:, 0].astype(np.int64).tolist()] + encode_columns(candles, scales)
+        rows = ((instrument_id, timeframe) + row for row in zip(*columns))
+        # Upsert (replace if exists)
+        database.connection().executemany(_INSERT_SQL, rows)
+    print(f"Saved {len(candles)} candles.")
+
+    # Cached ranges of this series are stale now
+    candle_cache.invalidate(exchange_name, symbol, timeframe)
+
+    # Append to the columnar candle store used by backtests. Its first write of the series
+    # brings along what SQLite already holds, so the store has no holes between its bounds
+    new = candles
+    if candle_store.open(exchange_name, symbol, timeframe) is None:
+        candles = load_candles_from_db(exchange_name, symbol, timeframe, 0, MAX_TIMESTAMP)
+    if store_writer is None:
+        candle_store.append(exchange_name, symbol, timeframe, candles)
+    elif not store_writer.write(candles):
+        # Staged: aggregates are brought up to date once the store has the candles
+        return
+
+    # Higher timeframes built from 1m candles are refreshed where the new candles fall
+    _update_aggregates(exchange_name, symbol, timeframe, int(new[:, 0].min()), int(new[:, 0].max()))
+
+def _flush_store(exchange_name, symbol, timeframe, store_writer):
+    """
+    Merge the candles a store writer staged into the candle store, then refresh what
+    depends on them.
+    """
+    staged = store_writer.flush()
+    if staged is None:
+        return
+    print(f"Merged staged {timeframe} candles of {symbol} into the candle store.")
+    candle_cache.invalidate(exchange_name, symbol, timeframe)
+    _update_aggregates(exchange_name, symbol, timeframe, *staged)
+
+def _update_aggregates(exchange_name, symbol, timeframe, start_ts, end_ts):
+    if timeframe == candle_aggregates.base_timeframe:
+        buckets = candle_aggregates.update(exchange_name, symbol, start_ts, end_ts)
+        print(f"Updated {buckets} aggregated candles.")
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,88 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.config import db
+from engine.services.candle_partitions import candle_partitions
+from engine.services.candle_scales import prepare_instrument, raise_scales
+
+COVERAGE_COLUMNS = '"exchange", "symbol", "timeframe", "start_timestamp", "end_timestamp"'
+
+def partition_candles(database=db, keep=False):
+    """
+    Move candles (and their coverage) from the main database into per-symbol partition files.
+    Requires CANDLE_PARTITIONING=symbol. Safe to run repeatedly.
+    """
+    if not candle_partitions.enabled:
+        raise RuntimeError("Set CANDLE_PARTITIONING=symbol before partitioning candles.")
+
+    database.connect(reuse_if_open=True)
+    instruments = database.execute_sql(
+        'SELECT "id", "exchange", "symbol", "price_scale", "volume_scale" FROM "instrument" ORDER BY "id"'
+    ).fetchall()
+    if not instruments:
+        print("No candles in the main database.")
+        return 0
+
+    moved = 0
+    for instrument_id, exchange, symbol, *scales in instruments:
+        partition = candle_partitions.database_for(exchange, symbol)
+        with partition.atomic():
+            partition_id, partition_scales = prepare_instrument(partition, exchange, symbol)
+            # Fixed-point rows are copied as they are, so the partition needs at least these scales
+            partition_scales = raise_scales(partition, partition_id, partition_scales, tuple(scales))
+        # Factors taking the copied values from the main database's scales to the partition's
+        factors = [1 if scale is None else partition_scale // scale
+                   for scale, partition_scale in zip(scales, partition_scales)]
+        path = candle_partitions.path_for(exchange, symbol)
+
+        # Copy page by page inside SQLite instead of through Python
+        database.execute_sql('ATTACH DATABASE ? AS "part"', (path,))
+        try:
+            with database.atomic():
+                rows = database.execute_sql(
+                    'INSERT OR REPLACE INTO "part"."candle_data" '
+                    '("instrument_id", "timeframe", "timestamp", "open", "high", "low", "close", "volume") '
+                    'SELECT ?, "timeframe", "timestamp", "open" * ?, "high" * ?, "low" * ?, "close" * ?, "volume" * ? '
+                    'FROM "main"."candle_data" WHERE "instrument_id" = ? ORDER BY "timeframe", "timestamp"',
+                    (partition_id,) + (factors[0],) * 4 + (factors[1], instrument_id)
+                ).rowcount
+                database.execute_sql(
+                    f'INSERT INTO "part"."candlecoverage" ({COVERAGE_COLUMNS}) '
+                    f'SELECT {COVERAGE_COLUMNS} FROM "main"."candlecoverage" AS c '
+                    'WHERE c."exchange" = ? AND c."symbol" = ? AND NOT EXISTS ('
+                    'SELECT 1 FROM "part"."candlecoverage" AS p WHERE p."exchange" = c."exchange" '
+                    'AND p."symbol" = c."symbol" AND p."timeframe" = c."timeframe")',
+                    (exchange, symbol)
+                )
+                if not keep:
+                    database.execute_sql('DELETE FROM "main"."candle_data" WHERE "instrument_id" = ?', (instrument_id,))
+                    # Aggregates are derived data, the partition rebuilds them on first read
+                    database.execute_sql(
+                        'DELETE FROM "main"."candle_aggregate" WHERE "instrument_id" = ?', (instrument_id,)
+                    )
+                    database.execute_sql(
+                        'DELETE FROM "main"."candlecoverage" WHERE "exchange" = ? AND "symbol" = ?', (exchange, symbol)
+                    )
+        finally:
+            database.execute_sql('DETACH DATABASE "part"')
+
+        print(f"  {exchange} {symbol}: {rows} candles -> {path}")
+        moved += rows
+
+    print(f"Moved {moved} candles into {len(instruments)} partitions.")
+    if not keep:
+        print("Run VACUUM on the main database to return the freed pages to the OS.")
+    return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move candles from the main database into per-symbol partition files.")
+    parser.add_argument('--keep', action='store_true', help="Copy only, leave the candles in the main database")
+    args = parser.parse_args()
+
+    partition_candles(keep=args.keep)
+    if not db.is_closed():
+        db.close()
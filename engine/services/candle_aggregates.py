@@ -0,0 +1,336 @@
+import threading
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from engine.config import CANDLE_AGGREGATE_TIMEFRAMES
+from engine.helpers import TIMEFRAME_MS, timeframe_to_ms
+from engine.services.candle_archive import candle_archive
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_loader import iter_candle_chunks
+from engine.services.candle_partitions import candle_partitions
+from engine.services.candle_scales import prepare_instrument, instrument_scales, encode_columns, decode_columns
+from engine.services.candle_store import candle_store, CANDLE_COLUMNS, CANDLE_DTYPE
+
+# Timeframe every aggregate is built from
+BASE_TIMEFRAME = '1m'
+
+DAY_MS = TIMEFRAME_MS['1d']
+WEEK_MS = TIMEFRAME_MS['1w']
+# The epoch is a Thursday; weekly buckets open on Monday 00:00 UTC like exchange weekly candles
+WEEK_OFFSET_MS = 4 * DAY_MS
+
+# Base candles read per step while (re)building a range of buckets
+REBUILD_CHUNK_ROWS = 100000
+
+_INSTRUMENT_SQL = '(SELECT "id" FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?)'
+
+_RANGE_SQL = (
+    'SELECT "timestamp", "open", "high", "low", "close", "volume" FROM "candle_aggregate" '
+    'WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ? AND "timestamp" >= ? AND "timestamp" <= ? '
+    'ORDER BY "timestamp"'
+)
+
+# First bucket and newest base candle folded in so far
+_STATE_SQL = (
+    'SELECT MIN("timestamp"), MAX("last_timestamp") FROM "candle_aggregate" '
+    'WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ?'
+)
+
+_TIMEFRAMES_SQL = (
+    'SELECT DISTINCT "timeframe" FROM "candle_aggregate" WHERE "instrument_id" = ' + _INSTRUMENT_SQL
+)
+
+_BASE_BOUNDS_SQL = (
+    'SELECT MIN("timestamp"), MAX("timestamp") FROM "candle_data" '
+    'WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ?'
+)
+
+_DELETE_SQL = (
+    'DELETE FROM "candle_aggregate" WHERE "instrument_id" = ? AND "timeframe" = ? '
+    'AND "timestamp" >= ? AND "timestamp" <= ?'
+)
+
+_INSERT_SQL = (
+    'INSERT OR REPLACE INTO "candle_aggregate" '
+    '("instrument_id", "timeframe", "timestamp", "open", "high", "low", "close", "volume", "last_timestamp") '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+
+class CandleAggregates:
+    """
+    Higher-timeframe candles materialized from stored 1m candles.
+
+    Aggregates live in the `candle_aggregate` table next to the base candles (in the
+    symbol's partition when partitioning is enabled). `update()` recomputes only the
+    buckets touched by newly written base candles and runs after every 1m import for the
+    configured timeframes plus any already materialized, first folding in base candles
+    the table hasn't seen. Reads never write: buckets the table doesn't cover yet (another
+    multiple of 1m, or base candles stored without an import) are resampled from the 1m
+    candles on the fly.
+    """
+
+    def __init__(self, timeframes: List[str] = CANDLE_AGGREGATE_TIMEFRAMES, base_timeframe: str = BASE_TIMEFRAME):
+        self.timeframes = list(timeframes)
+        self.base_timeframe = base_timeframe
+        self._locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock(self, exchange: str, symbol: str, timeframe: str) -> threading.Lock:
+        """
+        The lock every rebuild of the series holds.
+        """
+        key = (exchange.lower(), symbol, timeframe)
+        with self._locks_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def serves(self, timeframe: str) -> bool:
+        """
+        Whether `timeframe` can be built from base candles.
+        """
+        timeframe_ms = TIMEFRAME_MS.get(timeframe)
+        return (timeframe != self.base_timeframe and timeframe_ms is not None
+                and timeframe_ms % TIMEFRAME_MS[self.base_timeframe] == 0)
+
+    def read_range(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> np.ndarray:
+        """
+        Aggregated candles with start_ts <= timestamp <= end_ts, as an (n, 6) array.
+        Empty if the symbol has no base candles.
+
+        Buckets before the table's first one and from the last one it has seen on (which
+        may have been partial) are resampled from base candles instead of read.
+        """
+        if not self.serves(timeframe):
+            raise ValueError(f"{timeframe} candles cannot be built from {self.base_timeframe} candles.")
+
+        base_first, _ = self._base_bounds(exchange, symbol)
+        if base_first is None:
+            return np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+
+        database = candle_partitions.database_for(exchange, symbol)
+        first_bucket, last_seen = database.execute_sql(_STATE_SQL, (exchange, symbol, timeframe)).fetchone()
+        if first_bucket is None:
+            return self._resampled(exchange, symbol, timeframe, start_ts, end_ts)
+
+        fx = is_fx_symbol(exchange, symbol)
+        stale_from = int(bucket_starts([last_seen], TIMEFRAME_MS[timeframe], fx)[0])
+        with database.atomic():
+            scales = instrument_scales(database, exchange, symbol)
+            rows = database.execute_sql(_RANGE_SQL, (exchange, symbol, timeframe, max(start_ts, first_bucket),
+                                                     min(end_ts, stale_from - 1))).fetchall()
+
+        parts = [decode_columns(np.array(rows, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS), scales)]
+        if start_ts < first_bucket and bucket_starts([base_first], TIMEFRAME_MS[timeframe], fx)[0] < first_bucket:
+            parts.insert(0, self._resampled(exchange, symbol, timeframe, start_ts, min(end_ts, first_bucket - 1)))
+        if end_ts >= stale_from:
+            parts.append(self._resampled(exchange, symbol, timeframe, max(start_ts, stale_from), end_ts))
+        return np.concatenate(parts)
+
+    def catch_up(self, exchange: str, symbol: str, timeframe: str) -> int:
+        """
+        Fold in base candles before the first bucket or after the newest base candle seen.
+        Returns the number of buckets written.
+        """
+        base_first, base_last = self._base_bounds(exchange, symbol)
+        if base_first is None:
+            return 0
+
+        database = candle_partitions.database_for(exchange, symbol)
+        first_bucket, last_seen = database.execute_sql(_STATE_SQL, (exchange, symbol, timeframe)).fetchone()
+        if first_bucket is None:
+            return self._rebuild(exchange, symbol, timeframe, base_first, base_last)
+
+        written = 0
+        fx = is_fx_symbol(exchange, symbol)
+        if bucket_starts([base_first], TIMEFRAME_MS[timeframe], fx)[0] < first_bucket:
+            written += self._rebuild(exchange, symbol, timeframe, base_first, first_bucket - 1)
+        if base_last > last_seen:
+            # The last bucket may have been partial: rebuild it together with the new ones
+            written += self._rebuild(exchange, symbol, timeframe, last_seen, base_last)
+        return written
+
+    def update(self, exchange: str, symbol: str, start_ts: int, end_ts: int,
+               timeframes: Optional[List[str]] = None) -> int:
+        """
+        Recompute every bucket overlapping [start_ts, end_ts] after base candles in that
+        range were written, after catching up with base candles the table hasn't seen.
+        Defaults to the configured and already materialized timeframes. Returns the number
+        of buckets written.
+        """
+        if timeframes is None:
+            timeframes = sorted(set(self.timeframes) | set(self.materialized(exchange, symbol)),
+                                key=lambda t: TIMEFRAME_MS.get(t, 0))
+
+        written = 0
+        for timeframe in timeframes:
+            if self.serves(timeframe):
+                written += self.catch_up(exchange, symbol, timeframe)
+                written += self._rebuild(exchange, symbol, timeframe, start_ts, end_ts)
+        return written
+
+    def materialized(self, exchange: str, symbol: str) -> List[str]:
+        database = candle_partitions.database_for(exchange, symbol)
+        return [row[0] for row in database.execute_sql(_TIMEFRAMES_SQL, (exchange, symbol)).fetchall()]
+
+    def drop(self, exchange: str, symbol: str, timeframe: str) -> None:
+        database = candle_partitions.database_for(exchange, symbol)
+        database.execute_sql(
+            'DELETE FROM "candle_aggregate" WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ?',
+            (exchange, symbol, timeframe)
+        )
+        candle_cache.invalidate(exchange, symbol, timeframe)
+
+    def _rebuild(self, exchange, symbol, timeframe, start_ts, end_ts):
+        timeframe_ms = timeframe_to_ms(timeframe)
+        fx = is_fx_symbol(exchange, symbol)
+        first_bucket, last_bucket = (int(b) for b in bucket_starts([start_ts, end_ts], timeframe_ms, fx))
+
+        database = candle_partitions.database_for(exchange, symbol)
+        written = 0
+        with self.lock(exchange, symbol, timeframe), database.atomic():
+            # Base candles may only exist in the candle store or the archive
+            instrument_id, scales = prepare_instrument(database, exchange, symbol)
+            database.execute_sql(_DELETE_SQL, (instrument_id, timeframe, first_bucket, last_bucket))
+            for chunk, aggregated, last_timestamps in self._iter_buckets(exchange, symbol, timeframe,
+                                                                         first_bucket, last_bucket):
+                if len(chunk):
+                    # Scales follow the base candles; sums of volumes are rounded to them
+                    _, scales = prepare_instrument(database, exchange, symbol, chunk)
+                written += _write(database, instrument_id, scales, timeframe, aggregated, last_timestamps)
+
+        candle_cache.invalidate(exchange, symbol, timeframe)
+        return written
+
+    def _resampled(self, exchange, symbol, timeframe, start_ts, end_ts) -> np.ndarray:
+        """
+        Buckets with start_ts <= open time <= end_ts resampled from base candles, without
+        writing them.
+        """
+        first_bucket, last_bucket = (int(b) for b in bucket_starts([start_ts, end_ts], timeframe_to_ms(timeframe),
+                                                                   is_fx_symbol(exchange, symbol)))
+        parts = [aggregated for _, aggregated, _ in self._iter_buckets(exchange, symbol, timeframe,
+                                                                       first_bucket, last_bucket)]
+        candles = np.concatenate(parts) if parts else np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+        return candles[candles[:, 0] >= start_ts]
+
+    def _iter_buckets(self, exchange, symbol, timeframe, first_bucket, last_bucket) -> Iterator[tuple]:
+        """
+        (base chunk, aggregated candles, timestamp of the last base candle in each) for
+        the buckets first_bucket ... last_bucket, one base chunk at a time. The buckets
+        carried past the last chunk come with an empty chunk.
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        fx = is_fx_symbol(exchange, symbol)
+        # FX weekend bars before a Monday bucket belong to it
+        lookback = 2 * DAY_MS if fx and timeframe_ms >= DAY_MS else 0
+
+        # Base rows of the last bucket of a chunk are carried into the next one,
+        # since the bucket may continue there
+        carry = np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+        chunks = iter_candle_chunks(exchange, symbol, self.base_timeframe, first_bucket - lookback,
+                                    last_bucket + timeframe_ms - 1, REBUILD_CHUNK_ROWS)
+        for chunk in chunks:
+            candles = np.concatenate([carry, chunk]) if len(carry) else chunk
+            keys = bucket_starts(candles[:, 0], timeframe_ms, fx)
+            split = np.searchsorted(keys, keys[-1], side='left')
+            yield (chunk,) + _in_range(candles[:split], timeframe_ms, fx, first_bucket, last_bucket)
+            carry = np.array(candles[split:])
+        yield (carry[:0],) + _in_range(carry, timeframe_ms, fx, first_bucket, last_bucket)
+
+    def _base_bounds(self, exchange, symbol) -> Tuple[Optional[int], Optional[int]]:
+        """
+        (first, last) base timestamp from the same tiers the candle loader reads.
+        """
+        bounds = []
+        stored = candle_store.bounds(exchange, symbol, self.base_timeframe)
+        if stored is not None:
+            bounds.append(stored)
+        database = candle_partitions.database_for(exchange, symbol)
+        first, last = database.execute_sql(_BASE_BOUNDS_SQL, (exchange, symbol, self.base_timeframe)).fetchone()
+        if first is not None:
+            bounds.append((first, last))
+        archived = candle_archive.stats(exchange, symbol, self.base_timeframe)
+        if archived['blocks']:
+            bounds.append((archived['first_timestamp'], archived['last_timestamp']))
+
+        if not bounds:
+            return None, None
+        return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+
+def is_fx_symbol(exchange: str, symbol: str) -> bool:
+    # Yahoo spot FX pairs (e.g. 'EURUSD=X') trade from Sunday ~22:00 to Friday ~22:00 UTC
+    return exchange.lower() == 'yahoo' and symbol.upper().endswith('=X')
+
+
+def bucket_starts(timestamps, timeframe_ms: int, fx: bool = False) -> np.ndarray:
+    """
+    Open time of the bucket each timestamp falls into.
+
+    Buckets are aligned to the epoch, except weekly ones which open on Monday 00:00 UTC.
+    With `fx`, the Sunday evening session (and any stray weekend bar) is part of Monday's
+    daily and weekly candle instead of a candle of its own.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if fx and timeframe_ms >= DAY_MS:
+        days = timestamps // DAY_MS
+        # Monday = 0; 1970-01-01 was a Thursday
+        weekday = (days + 3) % 7
+        timestamps = np.where(weekday >= 5, (days + 7 - weekday) * DAY_MS, timestamps)
+
+    offset = WEEK_OFFSET_MS if timeframe_ms % WEEK_MS == 0 else 0
+    return (timestamps - offset) // timeframe_ms * timeframe_ms + offset
+
+
+def resample(candles: np.ndarray, timeframe: str, fx: bool = False) -> np.ndarray:
+    """
+    Aggregate candles sorted by timestamp into `timeframe` candles: first open, highest
+    high, lowest low, last close and total volume of each bucket. Buckets without
+    candles (gaps, FX weekends) produce no candle.
+    """
+    aggregated, _ = _resample(candles, timeframe_to_ms(timeframe), fx)
+    return aggregated
+
+
+def _resample(candles, timeframe_ms, fx):
+    """
+    (aggregated candles, timestamp of the last candle in each bucket)
+    """
+    if len(candles) == 0:
+        return np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE), np.empty(0, dtype=np.int64)
+
+    keys = bucket_starts(candles[:, 0], timeframe_ms, fx)
+    starts = np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1])
+    ends = np.append(starts[1:], len(candles)) - 1
+
+    aggregated = np.empty((len(starts), CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+    aggregated[:, 0] = keys[starts]
+    aggregated[:, 1] = candles[starts, 1]
+    aggregated[:, 2] = np.maximum.reduceat(candles[:, 2], starts)
+    aggregated[:, 3] = np.minimum.reduceat(candles[:, 3], starts)
+    aggregated[:, 4] = candles[ends, 4]
+    aggregated[:, 5] = np.add.reduceat(candles[:, 5], starts)
+    return aggregated, candles[ends, 0].astype(np.int64)
+
+
+def _in_range(candles, timeframe_ms, fx, first_bucket, last_bucket):
+    aggregated, last_timestamps = _resample(candles, timeframe_ms, fx)
+    # Lookback rows can fall into buckets before the range
+    keep = (aggregated[:, 0] >= first_bucket) & (aggregated[:, 0] <= last_bucket)
+    return aggregated[keep], last_timestamps[keep]
+
+
+def _write(database, instrument_id, scales, timeframe, aggregated, last_timestamps):
+    if len(aggregated) == 0:
+        return 0
+
+    columns = ([aggregated[:, 0].astype(np.int64).tolist()] + encode_columns(aggregated, scales) +
+               [last_timestamps.tolist()])
+
+    rows = ((instrument_id, timeframe) + row for row in zip(*columns))
+    database.connection().executemany(_INSERT_SQL, rows)
+    return len(aggregated)
+
+
+candle_aggregates = CandleAggregates()
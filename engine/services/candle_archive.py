@@ -0,0 +1,204 @@
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from typing import Optional
+from engine.config import CANDLE_ARCHIVE_DIR
+from engine.services.candle_store import _normalize, CANDLE_COLUMNS, CANDLE_DTYPE
+
+# Candles per compressed block (one week of 1m candles)
+BLOCK_ROWS = 10080
+
+BLOCK_MAGIC = b'FXCB'
+BLOCK_VERSION = 1
+# magic, version, rows, encoding of each price/volume column
+BLOCK_HEADER = struct.Struct(f'<4sHI{CANDLE_COLUMNS - 1}B')
+
+# Column encodings: XOR of float64 bits, or delta of round(value * 10**k) stored as k + 1
+XOR_ENCODING = 0
+MAX_DECIMALS = 8
+
+# Index row: first_timestamp, last_timestamp, rows, offset, length
+INDEX_COLUMNS = 5
+INDEX_DTYPE = np.dtype('<i8')
+
+
+class CandleArchive:
+    """
+    Cold storage for old candles: one append-only block file per exchange/symbol/timeframe.
+
+    Each block holds up to BLOCK_ROWS candles. Timestamps are delta-encoded. A price/volume
+    column whose values are all exact decimals with at most MAX_DECIMALS places is stored
+    as deltas of the scaled integers, any other column is XOR-encoded against the previous
+    value's float64 bits. Either way regular series turn into runs of small integers.
+    The encoded columns are byte-shuffled and zlib-compressed. A small `.index` file next
+    to the blocks keeps the timestamp range, offset and length of every block, so a read
+    only decompresses the blocks it touches.
+    """
+
+    def __init__(self, base_dir: str = CANDLE_ARCHIVE_DIR):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+
+    def path_for(self, exchange: str, symbol: str, timeframe: str) -> str:
+        symbol_clean = symbol.replace('/', '-')
+        return os.path.join(self.base_dir, exchange.lower(), symbol_clean, f"{timeframe}.blocks")
+
+    def index(self, exchange: str, symbol: str, timeframe: str) -> Optional[np.ndarray]:
+        """
+        (blocks, 5) array of [first_timestamp, last_timestamp, rows, offset, length],
+        or None if nothing has been archived.
+        """
+        index_path = self._index_path(self.path_for(exchange, symbol, timeframe))
+        if not os.path.exists(index_path):
+            return None
+        return np.fromfile(index_path, dtype=INDEX_DTYPE).reshape(-1, INDEX_COLUMNS)
+
+    def read_range(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> Optional[np.ndarray]:
+        """
+        Candles with start_ts <= timestamp <= end_ts, decompressing only the overlapping blocks.
+        Returns None if the series has no archive.
+        """
+        index = self.index(exchange, symbol, timeframe)
+        if index is None:
+            return None
+
+        touched = index[(index[:, 0] <= end_ts) & (index[:, 1] >= start_ts)]
+        if len(touched) == 0:
+            return np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+
+        path = self.path_for(exchange, symbol, timeframe)
+        blocks = []
+        with open(path, 'rb') as f:
+            for _, _, _, offset, length in touched:
+                f.seek(offset)
+                blocks.append(decode_block(f.read(length)))
+
+        # Blocks written later win on duplicate timestamps
+        candles = _normalize(np.concatenate(blocks))
+        timestamps = candles[:, 0]
+        lo = np.searchsorted(timestamps, start_ts, side='left')
+        hi = np.searchsorted(timestamps, end_ts, side='right')
+        return candles[lo:hi]
+
+    def append(self, exchange: str, symbol: str, timeframe: str, candles: np.ndarray) -> int:
+        """
+        Compress candles into new blocks at the end of the series file.
+        Returns the number of blocks written.
+        """
+        candles = _normalize(np.asarray(candles, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS))
+        if len(candles) == 0:
+            return 0
+
+        path = self.path_for(exchange, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._lock:
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            entries = []
+            with open(path, 'ab') as f:
+                for start in range(0, len(candles), BLOCK_ROWS):
+                    rows = candles[start:start + BLOCK_ROWS]
+                    block = encode_block(rows)
+                    f.write(block)
+                    entries.append([int(rows[0, 0]), int(rows[-1, 0]), len(rows), offset, len(block)])
+                    offset += len(block)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # The index is written after the blocks, so a crash never points at missing data
+            with open(self._index_path(path), 'ab') as f:
+                f.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+        return len(entries)
+
+    def stats(self, exchange: str, symbol: str, timeframe: str) -> dict:
+        index = self.index(exchange, symbol, timeframe)
+        if index is None or len(index) == 0:
+            return {'blocks': 0, 'rows': 0, 'compressed_bytes': 0, 'first_timestamp': None, 'last_timestamp': None}
+        return {
+            'blocks': len(index),
+            'rows': int(index[:, 2].sum()),
+            'compressed_bytes': int(index[:, 4].sum()),
+            'first_timestamp': int(index[:, 0].min()),
+            'last_timestamp': int(index[:, 1].max())
+        }
+
+    def delete(self, exchange: str, symbol: str, timeframe: str) -> None:
+        path = self.path_for(exchange, symbol, timeframe)
+        for target in (self._index_path(path), path):
+            if os.path.exists(target):
+                os.remove(target)
+
+    def _index_path(self, path: str) -> str:
+        return os.path.splitext(path)[0] + '.index'
+
+
+def encode_block(candles: np.ndarray) -> bytes:
+    """
+    Encode an (n, 6) float64 candle array into one compressed block.
+    """
+    rows = len(candles)
+    columns = np.empty((CANDLE_COLUMNS, rows), dtype=np.uint64)
+    columns[0] = _zigzag_delta(candles[:, 0].astype(np.int64))
+
+    encodings = []
+    for i in range(1, CANDLE_COLUMNS):
+        decimals = _decimal_places(candles[:, i])
+        if decimals is None:
+            bits = np.ascontiguousarray(candles[:, i]).view(np.uint64)
+            columns[i] = bits ^ np.concatenate([np.zeros(1, dtype=np.uint64), bits[:-1]])
+            encodings.append(XOR_ENCODING)
+        else:
+            columns[i] = _zigzag_delta(np.round(candles[:, i] * 10 ** decimals).astype(np.int64))
+            encodings.append(decimals + 1)
+
+    # Byte-shuffle: group byte k of every value together so runs of zero bytes compress
+    shuffled = columns.view(np.uint8).reshape(CANDLE_COLUMNS, rows, 8).transpose(0, 2, 1)
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_VERSION, rows, *encodings) + zlib.compress(shuffled.tobytes())
+
+
+def decode_block(block: bytes) -> np.ndarray:
+    magic, version, rows, *encodings = BLOCK_HEADER.unpack_from(block)
+    if magic != BLOCK_MAGIC or version != BLOCK_VERSION:
+        raise ValueError("Not a candle archive block.")
+
+    raw = np.frombuffer(zlib.decompress(block[BLOCK_HEADER.size:]), dtype=np.uint8)
+    columns = np.ascontiguousarray(raw.reshape(CANDLE_COLUMNS, 8, rows).transpose(0, 2, 1)).view(np.uint64)
+    columns = columns.reshape(CANDLE_COLUMNS, rows)
+
+    candles = np.empty((rows, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+    candles[:, 0] = _undo_zigzag_delta(columns[0])
+    for i, encoding in enumerate(encodings, start=1):
+        if encoding == XOR_ENCODING:
+            candles[:, i] = np.bitwise_xor.accumulate(columns[i]).view(np.float64)
+        else:
+            candles[:, i] = _undo_zigzag_delta(columns[i]) / 10 ** (encoding - 1)
+    return candles
+
+
+def _decimal_places(values: np.ndarray) -> Optional[int]:
+    """
+    Smallest k such that every value is exactly round(value * 10**k) / 10**k, if any.
+    """
+    if not np.all(np.isfinite(values)) or np.abs(values).max(initial=0) * 10 ** MAX_DECIMALS >= 2 ** 53:
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10 ** decimals
+        if np.array_equal(np.round(values * scale) / scale, values):
+            return decimals
+    return None
+
+
+def _zigzag_delta(values: np.ndarray) -> np.ndarray:
+    deltas = np.diff(values, prepend=np.int64(0))
+    # Small negative deltas become small unsigned values
+    return ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+
+
+def _undo_zigzag_delta(encoded: np.ndarray) -> np.ndarray:
+    deltas = (encoded >> np.uint64(1)).view(np.int64) ^ -(encoded & np.uint64(1)).view(np.int64)
+    return np.cumsum(deltas)
+
+
+candle_archive = CandleArchive()
@@ -0,0 +1,129 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+from engine.config import CANDLE_CACHE_MAX_BYTES
+
+
+class CandleCache:
+    """
+    Process-wide LRU cache of loaded candle arrays.
+
+    Entries are keyed by (exchange, symbol, timeframe, start_ts, end_ts). A request for a
+    range contained in a cached entry of the same series is served by slicing that entry.
+    Cached arrays are marked read-only since they are shared between backtest runs.
+
+    It holds what the candle loader reads from SQLite, the archive and the aggregates;
+    ranges sliced from the memory-mapped candle store are views of the page cache already.
+
+    Every series has a generation that `invalidate` (and `clear`) bumps. A load that
+    started before a write to the series finished may have read the old candles, so it is
+    returned but not cached.
+    """
+
+    def __init__(self, max_bytes: int = CANDLE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self._generations: Dict[Tuple[str, str, str], int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int,
+                    loader: Callable[[str, str, str, int, int], np.ndarray]) -> np.ndarray:
+        generation = self.generation(exchange, symbol, timeframe)
+        candles = self.get(exchange, symbol, timeframe, start_ts, end_ts)
+        if candles is not None:
+            return candles
+
+        candles = loader(exchange, symbol, timeframe, start_ts, end_ts)
+        self.put(exchange, symbol, timeframe, start_ts, end_ts, candles, generation)
+        return candles
+
+    def generation(self, exchange: str, symbol: str, timeframe: str) -> Tuple[int, int]:
+        """
+        Changes whenever the cached ranges of the series are invalidated.
+        """
+        with self._lock:
+            return self._epoch, self._generations.get((exchange, symbol, timeframe), 0)
+
+    def get(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int):
+        key = (exchange, symbol, timeframe, start_ts, end_ts)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            # Serve a sub-range from any cached superset of the same series
+            for cached_key, candles in self._entries.items():
+                if cached_key[:3] == key[:3] and cached_key[3] <= start_ts and cached_key[4] >= end_ts:
+                    self._entries.move_to_end(cached_key)
+                    self.hits += 1
+                    timestamps = candles[:, 0]
+                    lo = np.searchsorted(timestamps, start_ts, side='left')
+                    hi = np.searchsorted(timestamps, end_ts, side='right')
+                    return candles[lo:hi]
+
+            self.misses += 1
+            return None
+
+    def put(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int, candles: np.ndarray,
+            generation: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Cache a loaded range. With `generation` (taken before loading), the range is
+        dropped if the series was invalidated meanwhile.
+        """
+        # Empty ranges are one index lookup to reload and, weighing nothing, would never be evicted
+        if len(candles) == 0 or candles.nbytes > self.max_bytes:
+            return
+
+        candles.flags.writeable = False
+        key = (exchange, symbol, timeframe, start_ts, end_ts)
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key[:3], 0)):
+                return
+            if key in self._entries:
+                self._size_bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = candles
+            self._size_bytes += candles.nbytes
+
+            while self._size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, exchange: str, symbol: str, timeframe: str) -> int:
+        """
+        Drop every cached range of a series. Returns the number of entries removed.
+        """
+        series = (exchange, symbol, timeframe)
+        with self._lock:
+            self._generations[series] = self._generations.get(series, 0) + 1
+            keys = [k for k in self._entries if k[:3] == series]
+            for key in keys:
+                self._size_bytes -= self._entries.pop(key).nbytes
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+candle_cache = CandleCache()
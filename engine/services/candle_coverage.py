@@ -0,0 +1,151 @@
+import numpy as np
+from typing import List, Tuple, Optional
+from peewee import fn
+from engine.models.core import Candle, CandleCoverage
+from engine.services.candle_partitions import candle_partitions
+
+Interval = Tuple[int, int]
+
+
+class CandleCoverageIndex:
+    """
+    Tracks which timestamp intervals of each (exchange, symbol, timeframe) have been imported,
+    so imports only request the missing windows.
+
+    Intervals are inclusive and stored merged: two intervals closer than one candle apart
+    become one. Series imported before coverage tracking are seeded from the candle table
+    the first time they are looked up. Coverage rows live next to the candles (in the
+    symbol's partition when partitioning is enabled).
+    """
+
+    def intervals(self, exchange: str, symbol: str, timeframe: str, timeframe_ms: int) -> List[Interval]:
+        rows = list(CandleCoverage.select(CandleCoverage.start_timestamp, CandleCoverage.end_timestamp).where(
+            (CandleCoverage.exchange == exchange) &
+            (CandleCoverage.symbol == symbol) &
+            (CandleCoverage.timeframe == timeframe)
+        ).order_by(CandleCoverage.start_timestamp).tuples().execute(candle_partitions.database_for(exchange, symbol)))
+
+        if not rows:
+            rows = self._seed_from_candles(exchange, symbol, timeframe, timeframe_ms)
+        return rows
+
+    def missing(self, exchange: str, symbol: str, timeframe: str, timeframe_ms: int,
+                start_ts: int, end_ts: int) -> List[Interval]:
+        """
+        Windows of [start_ts, end_ts] that are not covered yet.
+        """
+        gaps = []
+        cursor = start_ts
+        for interval_start, interval_end in self.intervals(exchange, symbol, timeframe, timeframe_ms):
+            if interval_end < cursor:
+                continue
+            if interval_start > end_ts:
+                break
+            if interval_start > cursor:
+                gaps.append((cursor, interval_start - timeframe_ms))
+            cursor = max(cursor, interval_end + timeframe_ms)
+
+        if cursor <= end_ts:
+            gaps.append((cursor, end_ts))
+        return gaps
+
+    def add(self, exchange: str, symbol: str, timeframe: str, timeframe_ms: int, start_ts: int, end_ts: int) -> None:
+        """
+        Mark [start_ts, end_ts] as imported and merge it with neighbouring intervals.
+        """
+        if end_ts < start_ts:
+            return
+
+        # IMMEDIATE takes the write lock before the read, so a concurrent add can't
+        # replace the intervals in between and lose either interval
+        with candle_partitions.database_for(exchange, symbol).atomic('IMMEDIATE'):
+            intervals = self.intervals(exchange, symbol, timeframe, timeframe_ms) + [(start_ts, end_ts)]
+            self._replace(exchange, symbol, timeframe, _merge(intervals, timeframe_ms))
+
+    def stored_count(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> int:
+        return Candle.select().where(
+            (Candle.exchange == exchange) &
+            (Candle.symbol == symbol) &
+            (Candle.timeframe == timeframe) &
+            (Candle.timestamp >= start_ts) &
+            (Candle.timestamp <= end_ts)
+        ).count(candle_partitions.database_for(exchange, symbol))
+
+    def last_stored(self, exchange: str, symbol: str, timeframe: str) -> Optional[int]:
+        """
+        Timestamp of the newest stored candle of the series, None if there is none.
+        """
+        return Candle.select(fn.MAX(Candle.timestamp)).where(
+            (Candle.exchange == exchange) &
+            (Candle.symbol == symbol) &
+            (Candle.timeframe == timeframe)
+        ).scalar(candle_partitions.database_for(exchange, symbol))
+
+    def clear(self, exchange: str, symbol: str, timeframe: str) -> None:
+        CandleCoverage.delete().where(
+            (CandleCoverage.exchange == exchange) &
+            (CandleCoverage.symbol == symbol) &
+            (CandleCoverage.timeframe == timeframe)
+        ).execute(candle_partitions.database_for(exchange, symbol))
+
+    def _replace(self, exchange, symbol, timeframe, intervals):
+        database = candle_partitions.database_for(exchange, symbol)
+        with database.atomic():
+            self.clear(exchange, symbol, timeframe)
+            if intervals:
+                CandleCoverage.insert_many([{
+                    'exchange': exchange,
+                    'symbol': symbol,
+                    'timeframe': timeframe,
+                    'start_timestamp': interval_start,
+                    'end_timestamp': interval_end
+                } for interval_start, interval_end in intervals]).execute(database)
+
+    def _seed_from_candles(self, exchange, symbol, timeframe, timeframe_ms):
+        cursor = candle_partitions.database_for(exchange, symbol).execute_sql(
+            'SELECT "timestamp" FROM "candle" WHERE "exchange" = ? AND "symbol" = ? AND "timeframe" = ? '
+            'ORDER BY "timestamp"',
+            (exchange, symbol, timeframe)
+        )
+        timestamps = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+        if len(timestamps) == 0:
+            return []
+
+        # A new run starts wherever consecutive candles are more than one candle apart
+        breaks = np.flatnonzero(np.diff(timestamps) > timeframe_ms)
+        starts = np.concatenate([timestamps[:1], timestamps[breaks + 1]])
+        ends = np.concatenate([timestamps[breaks], timestamps[-1:]])
+        intervals = list(zip(starts.tolist(), ends.tolist()))
+
+        self._replace(exchange, symbol, timeframe, intervals)
+        return intervals
+
+
+def _merge(intervals: List[Interval], timeframe_ms: int) -> List[Interval]:
+    merged = []
+    for interval_start, interval_end in sorted(intervals):
+        if merged and interval_start <= merged[-1][1] + timeframe_ms:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], interval_end))
+        else:
+            merged.append((interval_start, interval_end))
+    return merged
+
+
+def covered_pieces(start_ts: int, end_ts: int, holes: List[int], timeframe_ms: int) -> List[Interval]:
+    """
+    [start_ts, end_ts] split around the grid slots of the hole timestamps.
+    """
+    pieces = []
+    cursor = start_ts
+    for hole in sorted({ts // timeframe_ms * timeframe_ms for ts in holes}):
+        if hole < cursor or hole > end_ts:
+            continue
+        if hole > cursor:
+            pieces.append((cursor, hole - timeframe_ms))
+        cursor = hole + timeframe_ms
+    if cursor <= end_ts:
+        pieces.append((cursor, end_ts))
+    return pieces
+
+
+candle_coverage = CandleCoverageIndex()
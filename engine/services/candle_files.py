@@ -0,0 +1,161 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Iterator, Optional
+from engine.helpers import TIMEFRAME_MS
+from engine.services.candle_store import candle_store, CANDLE_COLUMNS, CANDLE_DTYPE
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_coverage import candle_coverage, covered_pieces
+from engine.services.candle_loader import iter_candles_from_db, MAX_TIMESTAMP
+from engine.services.candle_aggregates import candle_aggregates
+from engine.services.candle_validation import validate_candles, record_issues, summarize, DROP_RULES
+
+# Rows per record batch (and Parquet row group)
+BATCH_ROWS = 262144
+
+FORMATS = ('parquet', 'arrow')
+
+CANDLE_SCHEMA = pa.schema([
+    ('timestamp', pa.int64()),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.float64()),
+])
+
+
+def export_candles(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int,
+                   path: str, format: str = 'parquet', batch_rows: int = BATCH_ROWS) -> int:
+    """
+    Write candles with start_ts <= timestamp <= end_ts to a Parquet or Arrow IPC file.
+
+    Candles are read in batches from the memory-mapped candle store when the series is
+    there, otherwise streamed from SQLite, so the range never has to fit in memory.
+    Exchange, symbol and timeframe are stored in the schema metadata.
+    Returns the number of rows written.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown candle file format {format}. Use one of {FORMATS}.")
+
+    schema = CANDLE_SCHEMA.with_metadata({'exchange': exchange, 'symbol': symbol, 'timeframe': timeframe})
+    if format == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    rows = 0
+    with writer:
+        for candles in _iter_batches(exchange, symbol, timeframe, start_ts, end_ts, batch_rows):
+            writer.write_batch(_to_record_batch(candles, schema))
+            rows += len(candles)
+    return rows
+
+
+def import_candle_file(path: str, exchange: Optional[str] = None, symbol: Optional[str] = None,
+                       timeframe: Optional[str] = None, batch_rows: int = BATCH_ROWS) -> int:
+    """
+    Load a Parquet or Arrow IPC file into the candle store, batch by batch.
+
+    Exchange, symbol and timeframe default to the file's schema metadata (as written by
+    `export_candles`). Columns are copied straight from Arrow buffers into the store's
+    (n, 6) float64 layout. Each batch goes through the same validation as an exchange
+    import (findings are stored without a task id), and the file's range is marked as
+    covered, except for rejected candles, so imports don't fetch it again.
+    Returns the number of rows read.
+    """
+    batches, metadata = _open_batches(path, batch_rows)
+    exchange = exchange or metadata.get('exchange')
+    symbol = symbol or metadata.get('symbol')
+    timeframe = timeframe or metadata.get('timeframe')
+    if not (exchange and symbol and timeframe):
+        raise ValueError("exchange, symbol and timeframe are required (the file has no candle metadata).")
+
+    if candle_store.open(exchange, symbol, timeframe) is None:
+        # The store only reads other tiers outside its bounds, so it starts with SQLite's candles
+        for existing in iter_candles_from_db(exchange, symbol, timeframe, 0, MAX_TIMESTAMP, chunk_size=batch_rows):
+            candle_store.append(exchange, symbol, timeframe, existing)
+
+    timeframe_ms = TIMEFRAME_MS.get(timeframe)
+    rows = 0
+    bounds = []
+    cursor = None
+    for batch in batches:
+        candles = _from_record_batch(batch)
+        rows += len(candles)
+        candles, _, issues = validate_candles(candles, timeframe_ms)
+        dropped = [issue['timestamp'] for issue in issues if issue['rule'] in DROP_RULES]
+        if issues:
+            record_issues(None, exchange, symbol, timeframe, issues)
+            print(f"Validation findings: {summarize(issues)}")
+        if not len(candles):
+            continue
+
+        candle_store.append(exchange, symbol, timeframe, candles)
+        first, last = int(candles[0, 0]), int(candles[-1, 0])
+        bounds += [first, last]
+        if timeframe_ms:
+            # The file holds every candle between its batches: cover from where the last one ended
+            start = first if cursor is None else min(cursor, first)
+            for piece_start, piece_end in covered_pieces(start, last, dropped, timeframe_ms):
+                candle_coverage.add(exchange, symbol, timeframe, timeframe_ms, piece_start, piece_end)
+            cursor = last + timeframe_ms if cursor is None else max(cursor, last + timeframe_ms)
+
+    candle_cache.invalidate(exchange, symbol, timeframe)
+    if bounds and timeframe == candle_aggregates.base_timeframe:
+        candle_aggregates.update(exchange, symbol, min(bounds), max(bounds))
+    return rows
+
+
+def _iter_batches(exchange, symbol, timeframe, start_ts, end_ts, batch_rows) -> Iterator[np.ndarray]:
+    bounds = candle_store.bounds(exchange, symbol, timeframe)
+    if bounds is None:
+        yield from iter_candles_from_db(exchange, symbol, timeframe, start_ts, end_ts, chunk_size=batch_rows)
+        return
+
+    # Candles outside the store's bounds are only in SQLite
+    first, last = bounds
+    if start_ts < first:
+        yield from iter_candles_from_db(exchange, symbol, timeframe, start_ts, min(end_ts, first - 1),
+                                        chunk_size=batch_rows)
+    candles = candle_store.read_range(exchange, symbol, timeframe, start_ts, end_ts)
+    for offset in range(0, len(candles), batch_rows):
+        yield candles[offset:offset + batch_rows]
+    if end_ts > last:
+        yield from iter_candles_from_db(exchange, symbol, timeframe, max(start_ts, last + 1), end_ts,
+                                        chunk_size=batch_rows)
+
+
+def _to_record_batch(candles: np.ndarray, schema: pa.Schema) -> pa.RecordBatch:
+    columns = [pa.array(candles[:, 0].astype(np.int64))]
+    columns += [pa.array(np.ascontiguousarray(candles[:, i])) for i in range(1, CANDLE_COLUMNS)]
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _from_record_batch(batch: pa.RecordBatch) -> np.ndarray:
+    candles = np.empty((batch.num_rows, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+    for i, name in enumerate(CANDLE_SCHEMA.names):
+        column = batch.column(name)
+        if column.null_count:
+            raise ValueError(f"Column {name} has {column.null_count} missing values.")
+        candles[:, i] = column.to_numpy(zero_copy_only=False)
+    return candles
+
+
+def _open_batches(path: str, batch_rows: int):
+    """
+    (record batch iterator, metadata dict) of a Parquet or Arrow IPC file.
+    """
+    try:
+        parquet_file = pq.ParquetFile(path)
+    except pa.ArrowInvalid:
+        reader = pa.ipc.open_file(path)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        return batches, _decode_metadata(reader.schema)
+
+    schema = parquet_file.schema_arrow
+    return parquet_file.iter_batches(batch_size=batch_rows, columns=CANDLE_SCHEMA.names), _decode_metadata(schema)
+
+
+def _decode_metadata(schema: pa.Schema) -> dict:
+    return {key.decode(): value.decode() for key, value in (schema.metadata or {}).items()}
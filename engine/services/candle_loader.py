@@ -0,0 +1,180 @@
+import itertools
+import numpy as np
+from typing import Iterator
+from engine.services.candle_partitions import candle_partitions
+from engine.services.connection_pool import reading
+from engine.helpers import TIMEFRAME_MS
+from engine.services.candle_store import candle_store, _normalize, CANDLE_COLUMNS, CANDLE_DTYPE
+from engine.services.candle_archive import candle_archive
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_scales import instrument_scales, decode_columns
+
+# Rows pulled from the SQLite cursor per fetchmany() call
+CHUNK_SIZE = 50000
+
+# Upper bound for whole-series reads
+MAX_TIMESTAMP = 2 ** 62
+
+# Primary key range scan on the clustered candle_data table
+_INSTRUMENT_SQL = '(SELECT "id" FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?)'
+
+_RANGE_SQL = (
+    'SELECT "timestamp", "open", "high", "low", "close", "volume" FROM "candle_data" '
+    'WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ? AND "timestamp" >= ? AND "timestamp" <= ? '
+    'ORDER BY "timestamp"'
+)
+
+_COUNT_SQL = (
+    'SELECT COUNT(*) FROM "candle_data" '
+    'WHERE "instrument_id" = ' + _INSTRUMENT_SQL + ' AND "timeframe" = ? AND "timestamp" >= ? AND "timestamp" <= ?'
+)
+
+
+def load_candles(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> np.ndarray:
+    """
+    Load candles as an (n, 6) float64 array of [timestamp, open, high, low, close, volume].
+
+    The part of the range between the first and last candle of the memory-mapped candle
+    store is sliced from it without copying, so it isn't cached. The rest (or everything,
+    for series not in the store) is bulk-loaded from the SQLite candle table (in the
+    symbol's partition, if enabled), the compressed archive or the 1m aggregates through
+    the process-wide candle cache. All candle consumers should go through here.
+    """
+    bounds = candle_store.bounds(exchange, symbol, timeframe)
+    if bounds is None:
+        return candle_cache.get_or_load(exchange, symbol, timeframe, start_ts, end_ts, load_candles_from_tiers)
+
+    first, last = bounds
+    parts = []
+    if start_ts < first:
+        parts.append(candle_cache.get_or_load(exchange, symbol, timeframe, start_ts, min(end_ts, first - 1),
+                                              load_candles_from_tiers))
+    parts.append(candle_store.read_range(exchange, symbol, timeframe, start_ts, end_ts))
+    if end_ts > last:
+        parts.append(candle_cache.get_or_load(exchange, symbol, timeframe, max(start_ts, last + 1), end_ts,
+                                              load_candles_from_tiers))
+
+    parts = [part for part in parts if len(part)]
+    if len(parts) == 1:
+        # Entirely inside the store: the zero-copy view
+        return parts[0]
+    return np.concatenate(parts) if parts else np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+
+
+def iter_candle_chunks(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int,
+                       chunk_rows: int) -> Iterator[np.ndarray]:
+    """
+    Stream the range in timestamp order as arrays of at most `chunk_rows` candles, for
+    backtests over ranges that don't fit in memory. Bypasses the candle cache.
+
+    As in `load_candles`, candles within the store's bounds are sliced from the memory map
+    and the rest of the range is walked in consecutive time windows of `chunk_rows`
+    candles, each loaded from SQLite and the archive.
+    """
+    bounds = candle_store.bounds(exchange, symbol, timeframe)
+    if bounds is None:
+        yield from _iter_tier_chunks(exchange, symbol, timeframe, start_ts, end_ts, chunk_rows)
+        return
+
+    first, last = bounds
+    if start_ts < first:
+        yield from _iter_tier_chunks(exchange, symbol, timeframe, start_ts, min(end_ts, first - 1), chunk_rows)
+    candles = candle_store.read_range(exchange, symbol, timeframe, start_ts, end_ts)
+    for offset in range(0, len(candles), chunk_rows):
+        yield candles[offset:offset + chunk_rows]
+    if end_ts > last:
+        yield from _iter_tier_chunks(exchange, symbol, timeframe, max(start_ts, last + 1), end_ts, chunk_rows)
+
+
+def _iter_tier_chunks(exchange, symbol, timeframe, start_ts, end_ts, chunk_rows) -> Iterator[np.ndarray]:
+    timeframe_ms = TIMEFRAME_MS.get(timeframe)
+    if not timeframe_ms:
+        # Irregular timeframes (e.g. '1M') have no fixed window length
+        candles = load_candles_from_tiers(exchange, symbol, timeframe, start_ts, end_ts)
+        for offset in range(0, len(candles), chunk_rows):
+            yield candles[offset:offset + chunk_rows]
+        return
+
+    window_ms = chunk_rows * timeframe_ms
+    for window_start in range(start_ts, end_ts + 1, window_ms):
+        window_end = min(window_start + window_ms - 1, end_ts)
+        candles = load_candles_from_tiers(exchange, symbol, timeframe, window_start, window_end)
+        # Timestamps off the timeframe grid can put more than chunk_rows candles in a window
+        for offset in range(0, len(candles), chunk_rows):
+            yield candles[offset:offset + chunk_rows]
+
+
+def load_candles_from_tiers(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> np.ndarray:
+    """
+    Hot candles from SQLite plus cold ones from the archive. Only archive blocks that
+    overlap the range are decompressed. SQLite wins on duplicate timestamps.
+
+    A higher timeframe with no imported candles in the range is served from the
+    aggregates materialized from 1m candles.
+    """
+    # candle_aggregates reads its base candles through this module
+    from engine.services.candle_aggregates import candle_aggregates
+
+    hot = load_candles_from_db(exchange, symbol, timeframe, start_ts, end_ts)
+    cold = candle_archive.read_range(exchange, symbol, timeframe, start_ts, end_ts)
+    if cold is None or len(cold) == 0:
+        if len(hot) == 0 and candle_aggregates.serves(timeframe):
+            return candle_aggregates.read_range(exchange, symbol, timeframe, start_ts, end_ts)
+        return hot
+    return _normalize(np.concatenate([cold, hot]))
+
+
+def load_candles_from_db(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int,
+                         chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Bulk-load candles from SQLite without building `Candle` models or `Decimal`s.
+
+    Raw tuples are streamed from the cursor in chunks straight into a preallocated buffer,
+    and fixed-point columns are decoded with the symbol's scales a whole column at a time.
+    """
+    params = (exchange, symbol, timeframe, start_ts, end_ts)
+
+    # The statements run in one read transaction so the scales and count match the scan
+    with reading(candle_partitions.database_for(exchange, symbol)) as database, database.atomic():
+        scales = instrument_scales(database, exchange, symbol)
+        capacity = database.execute_sql(_COUNT_SQL, params).fetchone()[0]
+        buffer = np.empty((capacity, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+        cursor = database.execute_sql(_RANGE_SQL, params)
+
+        size = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            count = len(rows)
+            if size + count > capacity:
+                capacity = max(size + count, capacity * 2)
+                buffer = np.resize(buffer, (capacity, CANDLE_COLUMNS))
+
+            chunk = np.fromiter(itertools.chain.from_iterable(rows), dtype=CANDLE_DTYPE, count=count * CANDLE_COLUMNS)
+            buffer[size:size + count] = chunk.reshape(count, CANDLE_COLUMNS)
+            size += count
+
+    return decode_columns(buffer[:size], scales)
+
+
+def iter_candles_from_db(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int,
+                         chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Stream the range as consecutive (k, 6) arrays of at most `chunk_size` rows, so ranges
+    larger than memory can be exported. Consume it from the thread that started it.
+    """
+    params = (exchange, symbol, timeframe, start_ts, end_ts)
+
+    with reading(candle_partitions.database_for(exchange, symbol)) as database, database.atomic():
+        scales = instrument_scales(database, exchange, symbol)
+        cursor = database.execute_sql(_RANGE_SQL, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            count = len(rows)
+            chunk = np.fromiter(itertools.chain.from_iterable(rows), dtype=CANDLE_DTYPE, count=count * CANDLE_COLUMNS)
+            yield decode_columns(chunk.reshape(count, CANDLE_COLUMNS), scales)
@@ -0,0 +1,102 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+from peewee import SqliteDatabase, SchemaManager
+from engine.config import CANDLE_PARTITIONING, CANDLE_PARTITION_DIR, SQLITE_PRAGMAS, PRICE_ENCODING
+from engine.models.core import Candle, CandleCoverage, create_candle_schema
+from engine.migrate_db import migrate_instrument_scales
+
+PARTITION_MODES = ('none', 'symbol')
+PARTITION_SUFFIX = '.sqlite3'
+
+
+class CandlePartitions:
+    """
+    Routes candle storage to one SQLite file per exchange/symbol.
+
+    Each partition holds its own instrument, candle_data, candle view and candle_coverage
+    tables and has its own writer lock, so imports of different symbols commit in parallel
+    and never block writes to the main database (tasks, backtest sessions). Partitions are
+    opened (and their schema created) the first time a symbol is used.
+
+    With mode 'none' everything resolves to the main database the models are bound to.
+    """
+
+    def __init__(self, base_dir: str = CANDLE_PARTITION_DIR, mode: str = CANDLE_PARTITIONING):
+        if mode not in PARTITION_MODES:
+            raise ValueError(f"Unknown candle partitioning {mode}. Use one of {PARTITION_MODES}.")
+        self.base_dir = base_dir
+        self.mode = mode
+        self._databases: Dict[str, SqliteDatabase] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'none'
+
+    def path_for(self, exchange: str, symbol: str) -> str:
+        symbol_clean = symbol.replace('/', '-')
+        return os.path.join(self.base_dir, exchange.lower(), f"{symbol_clean}{PARTITION_SUFFIX}")
+
+    def database_for(self, exchange: str, symbol: str):
+        """
+        Database holding the candles of exchange/symbol.
+        """
+        if not self.enabled:
+            return Candle._meta.database
+        return self._open(self.path_for(exchange, symbol))
+
+    def partitions(self) -> List[Tuple[str, SqliteDatabase]]:
+        """
+        (path, database) of every partition file on disk.
+        """
+        found = []
+        if not os.path.isdir(self.base_dir):
+            return found
+        for root, _, files in os.walk(self.base_dir):
+            for name in sorted(files):
+                if name.endswith(PARTITION_SUFFIX):
+                    path = os.path.join(root, name)
+                    found.append((path, self._open(path)))
+        return found
+
+    def drop(self, exchange: str, symbol: str) -> bool:
+        """
+        Delete a symbol's partition file. Returns False if it does not exist.
+        """
+        path = self.path_for(exchange, symbol)
+        with self._lock:
+            database = self._databases.pop(path, None)
+        if database is not None and not database.is_closed():
+            database.close()
+
+        if not os.path.exists(path):
+            return False
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return True
+
+    def close_all(self) -> None:
+        with self._lock:
+            databases, self._databases = self._databases, {}
+        for database in databases.values():
+            if not database.is_closed():
+                database.close()
+
+    def _open(self, path: str) -> SqliteDatabase:
+        with self._lock:
+            database = self._databases.get(path)
+            if database is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                database = SqliteDatabase(path, pragmas=SQLITE_PRAGMAS, timeout=10)
+                # Partitions share the price encoding of the main database
+                migrate_instrument_scales(database, PRICE_ENCODING)
+                with database.atomic():
+                    create_candle_schema(database)
+                    SchemaManager(CandleCoverage, database).create_all(safe=True)
+                self._databases[path] = database
+            return database
+
+
+candle_partitions = CandlePartitions()
@@ -0,0 +1,165 @@
+import numpy as np
+from typing import Optional, Tuple
+from engine.config import PRICE_ENCODING
+from engine.models.fields import PRICE_DECIMAL_PLACES, INT64_MAX
+
+# Finest scale a series can get: the precision of DecimalField(20, 8)
+MAX_SCALE = 10 ** PRICE_DECIMAL_PLACES
+
+# (price_scale, volume_scale); (None, None) while prices are stored as REAL
+Scales = Tuple[Optional[int], Optional[int]]
+
+_ENSURE_SQL = (
+    'INSERT INTO "instrument" ("exchange", "symbol") SELECT ?, ? '
+    'WHERE NOT EXISTS (SELECT 1 FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?)'
+)
+
+_INSTRUMENT_SQL = (
+    'SELECT "id", "price_scale", "volume_scale" FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?'
+)
+
+_SCALES_SQL = 'SELECT "price_scale", "volume_scale" FROM "instrument" WHERE "exchange" = ? AND "symbol" = ?'
+
+_CANDLE_TABLES = ('candle_data', 'candle_aggregate')
+
+# Candle array columns and table columns under each scale
+_SCALED_COLUMNS = {
+    'price_scale': (slice(1, 5), ('open', 'high', 'low', 'close')),
+    'volume_scale': (slice(5, 6), ('volume',)),
+}
+
+
+def prepare_instrument(database, exchange: str, symbol: str, candles: np.ndarray = None,
+                       encoding: str = PRICE_ENCODING) -> Tuple[int, Scales]:
+    """
+    Instrument id of exchange/symbol and the scales to store `candles` with, creating the
+    instrument row if needed. Run inside the transaction that writes the candles.
+
+    With fixed-point storage each scale is the smallest power of ten (up to 10^8) that
+    holds the series' values exactly, lowered where needed so the largest value still
+    fits in int64. Scales only grow: stored rows are rescaled when new candles need
+    more decimals.
+    """
+    # A write first, so the transaction holds the write lock before it reads the scales
+    database.execute_sql(_ENSURE_SQL, (exchange, symbol, exchange, symbol))
+    instrument_id, price_scale, volume_scale = database.execute_sql(_INSTRUMENT_SQL, (exchange, symbol)).fetchone()
+    if encoding != 'fixed' or candles is None or len(candles) == 0:
+        return instrument_id, (price_scale, volume_scale)
+
+    wanted = []
+    for scale, (columns, names) in zip((price_scale, volume_scale), _SCALED_COLUMNS.values()):
+        values = np.asarray(candles[:, columns], dtype=np.float64)
+        largest = float(np.abs(values).max())
+        needed = exact_scale(values)
+        if scale is not None and needed <= scale:
+            _check_fits(largest, scale)
+            wanted.append(scale)
+            continue
+
+        if scale is not None:
+            largest = max(largest, _stored_largest(database, instrument_id, names) / scale)
+        new_scale = fitting_scale(needed, largest)
+        if scale is not None:
+            new_scale = max(new_scale, scale)
+            _check_fits(largest, new_scale)
+        wanted.append(new_scale)
+
+    return instrument_id, raise_scales(database, instrument_id, (price_scale, volume_scale), tuple(wanted))
+
+
+def raise_scales(database, instrument_id: int, current: Scales, wanted: Scales) -> Scales:
+    """
+    Move an instrument to the `wanted` scales where they are finer than its `current`
+    ones, multiplying its stored candles and aggregates. Returns the scales in effect.
+    """
+    scales = []
+    for (scale_column, (_, names)), scale, new_scale in zip(_SCALED_COLUMNS.items(), current, wanted):
+        if new_scale is not None and (scale is None or new_scale > scale):
+            if scale is not None:
+                _rescale(database, instrument_id, names, new_scale // scale)
+            database.execute_sql(f'UPDATE "instrument" SET "{scale_column}" = ? WHERE "id" = ?',
+                                 (new_scale, instrument_id))
+            scale = new_scale
+        scales.append(scale)
+    return tuple(scales)
+
+
+def instrument_scales(database, exchange: str, symbol: str) -> Scales:
+    """
+    Scales of the stored candles of exchange/symbol. Read them in the same transaction
+    as the candles, since an import can raise them in between.
+    """
+    row = database.execute_sql(_SCALES_SQL, (exchange, symbol)).fetchone()
+    return (None, None) if row is None else row
+
+
+def exact_scale(values: np.ndarray) -> int:
+    """
+    Smallest power of ten up to MAX_SCALE that represents every value exactly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 1
+    while scale < MAX_SCALE and not np.array_equal(np.round(values * scale) / scale, values):
+        scale *= 10
+    return scale
+
+
+def fitting_scale(scale: int, largest: float) -> int:
+    """
+    `scale`, divided by ten until `largest` fits in int64 once scaled.
+    """
+    while scale > 1 and largest * scale > INT64_MAX:
+        scale //= 10
+    _check_fits(largest, scale)
+    return scale
+
+
+def encode_columns(candles: np.ndarray, scales: Scales) -> list:
+    """
+    Price and volume columns of an (n, 6) array as lists ready for the driver: scaled
+    int64 values with fixed-point scales, floats otherwise.
+    """
+    columns = []
+    for column in range(1, 6):
+        scale = scales[0] if column < 5 else scales[1]
+        values = candles[:, column]
+        if scale is not None:
+            values = np.round(values * scale)
+            if len(values) and np.abs(values).max() > INT64_MAX:
+                raise ValueError(f"Candle column {column} does not fit in fixed-point storage with scale {scale}")
+            values = values.astype(np.int64)
+        columns.append(values.tolist())
+    return columns
+
+
+def decode_columns(candles: np.ndarray, scales: Scales) -> np.ndarray:
+    """
+    Turn the scaled integers of a raw (n, 6) array into prices and volumes, in place.
+    """
+    price_scale, volume_scale = scales
+    if price_scale is not None:
+        candles[:, 1:5] /= price_scale
+    if volume_scale is not None:
+        candles[:, 5] /= volume_scale
+    return candles
+
+
+def _check_fits(largest, scale):
+    if largest * scale > INT64_MAX:
+        raise ValueError(f"{largest} does not fit in fixed-point storage with scale {scale}")
+
+
+def _stored_largest(database, instrument_id, names):
+    largest = 0.0
+    for table in _CANDLE_TABLES:
+        expressions = ', '.join(f'MAX(ABS("{name}"))' for name in names)
+        row = database.execute_sql(f'SELECT {expressions} FROM "{table}" WHERE "instrument_id" = ?',
+                                   (instrument_id,)).fetchone()
+        largest = max([largest] + [value for value in row if value is not None])
+    return float(largest)
+
+
+def _rescale(database, instrument_id, names, factor):
+    assignments = ', '.join(f'"{name}" = "{name}" * {int(factor)}' for name in names)
+    for table in _CANDLE_TABLES:
+        database.execute_sql(f'UPDATE "{table}" SET {assignments} WHERE "instrument_id" = ?', (instrument_id,))
@@ -0,0 +1,285 @@
+import os
+import time
+import operator
+import itertools
+import tempfile
+import threading
+import numpy as np
+from typing import Dict, Optional, Tuple
+from engine.config import CANDLE_STORE_DIR
+from engine.models.core import CandleSeries
+
+# FXBot Candle Indices (same layout as the arrays used by backtest mode)
+# 0: Timestamp
+# 1: Open
+# 2: High
+# 3: Low
+# 4: Close
+# 5: Volume
+CANDLE_COLUMNS = 6
+CANDLE_DTYPE = np.dtype('<f8')
+ROW_BYTES = CANDLE_COLUMNS * CANDLE_DTYPE.itemsize
+
+
+class CandleStore:
+    """
+    On-disk candle store with one contiguous float64 file per exchange/symbol/timeframe.
+
+    Files hold rows of [timestamp, open, high, low, close, volume] sorted by timestamp,
+    so a range read is two binary searches on the timestamp column of an np.memmap and
+    returns a view into the mapped file without copying. The `CandleSeries` table keeps
+    the catalog (path, row count, first/last timestamp) in SQLite.
+
+    Writes to a series are serialized by a lock per exchange/symbol/timeframe; readers
+    keep mapping whichever file they opened, as a rewrite replaces it under a new inode.
+    """
+
+    def __init__(self, base_dir: str = CANDLE_STORE_DIR):
+        self.base_dir = base_dir
+        self._locks: Dict[Tuple[str, str, str], threading.RLock] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock(self, exchange: str, symbol: str, timeframe: str) -> threading.RLock:
+        """
+        The lock every write to the series holds.
+        """
+        key = (exchange.lower(), symbol, timeframe)
+        with self._locks_lock:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    def path_for(self, exchange: str, symbol: str, timeframe: str) -> str:
+        symbol_clean = symbol.replace('/', '-')
+        return os.path.join(self.base_dir, exchange.lower(), symbol_clean, f"{timeframe}.f64")
+
+    def open(self, exchange: str, symbol: str, timeframe: str) -> Optional[np.ndarray]:
+        """
+        Map the whole series read-only. Returns None if nothing has been stored yet.
+        """
+        path = self.path_for(exchange, symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+
+        rows = os.path.getsize(path) // ROW_BYTES
+        if rows == 0:
+            return np.empty((0, CANDLE_COLUMNS), dtype=CANDLE_DTYPE)
+
+        return np.memmap(path, dtype=CANDLE_DTYPE, mode='r', shape=(rows, CANDLE_COLUMNS))
+
+    def read_range(self, exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int) -> Optional[np.ndarray]:
+        """
+        Zero-copy slice of the candles with start_ts <= timestamp <= end_ts.
+        Returns None if the series does not exist in the store.
+        """
+        candles = self.open(exchange, symbol, timeframe)
+        if candles is None:
+            return None
+
+        timestamps = candles[:, 0]
+        lo = np.searchsorted(timestamps, start_ts, side='left')
+        hi = np.searchsorted(timestamps, end_ts, side='right')
+        return candles[lo:hi]
+
+    def bounds(self, exchange: str, symbol: str, timeframe: str) -> Optional[Tuple[int, int]]:
+        """
+        (first, last) timestamp held for the series, None if it has no candles in the store.
+        Candles outside these bounds live in the other tiers only.
+        """
+        candles = self.open(exchange, symbol, timeframe)
+        if candles is None or len(candles) == 0:
+            return None
+        return int(candles[0, 0]), int(candles[-1, 0])
+
+    def append(self, exchange: str, symbol: str, timeframe: str, candles: np.ndarray) -> int:
+        """
+        Add candles to a series. Rows newer than the last stored candle are appended to
+        the file in place; overlapping rows trigger a merge where incoming candles replace
+        stored ones with the same timestamp (same semantics as `on_conflict_replace`).
+
+        Returns the number of rows in the series afterwards.
+        """
+        new = _normalize(np.asarray(candles, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS))
+        with self.lock(exchange, symbol, timeframe):
+            existing = self.open(exchange, symbol, timeframe)
+            if len(new) == 0:
+                return 0 if existing is None else len(existing)
+
+            path = self.path_for(exchange, symbol, timeframe)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if existing is None or len(existing) == 0 or new[0, 0] > existing[-1, 0]:
+                with open(path, 'ab') as f:
+                    f.write(new.tobytes())
+            else:
+                merged = _normalize(np.concatenate([existing, new]))
+                del existing
+                _replace(path, merged)
+
+            series = self.open(exchange, symbol, timeframe)
+            self._update_catalog(exchange, symbol, timeframe, path, series)
+            return len(series)
+
+    def writer(self, exchange: str, symbol: str, timeframe: str) -> 'SeriesWriter':
+        """
+        A writer for many pages of one series, e.g. of one import: see `SeriesWriter`.
+        """
+        return SeriesWriter(self, exchange, symbol, timeframe)
+
+    def trim_before(self, exchange: str, symbol: str, timeframe: str, before_ts: int) -> int:
+        """
+        Drop the candles older than before_ts from a series, e.g. once they are archived.
+        Returns the number of rows dropped.
+        """
+        with self.lock(exchange, symbol, timeframe):
+            existing = self.open(exchange, symbol, timeframe)
+            if existing is None:
+                return 0
+            dropped = int(np.searchsorted(existing[:, 0], before_ts, side='left'))
+            if dropped == 0:
+                return 0
+            if dropped == len(existing):
+                del existing
+                self.delete(exchange, symbol, timeframe)
+                return dropped
+
+            path = self.path_for(exchange, symbol, timeframe)
+            _replace(path, existing[dropped:])
+            del existing
+
+            self._update_catalog(exchange, symbol, timeframe, path, self.open(exchange, symbol, timeframe))
+            return dropped
+
+    def delete(self, exchange: str, symbol: str, timeframe: str) -> None:
+        with self.lock(exchange, symbol, timeframe):
+            path = self.path_for(exchange, symbol, timeframe)
+            if os.path.exists(path):
+                os.remove(path)
+            CandleSeries.delete().where(
+                (CandleSeries.exchange == exchange) &
+                (CandleSeries.symbol == symbol) &
+                (CandleSeries.timeframe == timeframe)
+            ).execute()
+
+    def _update_catalog(self, exchange, symbol, timeframe, path, series):
+        CandleSeries.insert(
+            exchange=exchange,
+            symbol=symbol,
+            timeframe=timeframe,
+            path=path,
+            count=len(series),
+            first_timestamp=int(series[0, 0]),
+            last_timestamp=int(series[-1, 0]),
+            updated_at=int(time.time())
+        ).on_conflict(
+            conflict_target=[CandleSeries.exchange, CandleSeries.symbol, CandleSeries.timeframe],
+            preserve=[CandleSeries.path, CandleSeries.count, CandleSeries.first_timestamp,
+                      CandleSeries.last_timestamp, CandleSeries.updated_at]
+        ).execute()
+
+
+class SeriesWriter:
+    """
+    Adds the pages of one import to a series. Pages after the stored tail are appended
+    right away; pages landing before it (filling gaps) are appended to a staged segment
+    file instead, and `flush()` merges the segment into the series once, rather than
+    rewriting the whole file for every such page.
+
+    Staged candles are not in the store until `flush()`, so call it once the pages are
+    written, also when the import fails.
+    """
+
+    def __init__(self, store: CandleStore, exchange: str, symbol: str, timeframe: str):
+        self.store = store
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self._segment: Optional[str] = None
+        self._staged: Optional[Tuple[int, int]] = None
+
+    def write(self, candles: np.ndarray) -> bool:
+        """
+        Add candles to the series. Returns whether they are in the store already (False:
+        staged until `flush()`).
+        """
+        new = _normalize(np.asarray(candles, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS))
+        if len(new) == 0:
+            return True
+        with self.store.lock(self.exchange, self.symbol, self.timeframe):
+            bounds = self.store.bounds(self.exchange, self.symbol, self.timeframe)
+            if bounds is None or new[0, 0] > bounds[1]:
+                self.store.append(self.exchange, self.symbol, self.timeframe, new)
+                return True
+
+        if self._segment is None:
+            path = self.store.path_for(self.exchange, self.symbol, self.timeframe)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, self._segment = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.staged')
+            os.close(fd)
+        with open(self._segment, 'ab') as f:
+            f.write(new.tobytes())
+        first, last = int(new[0, 0]), int(new[-1, 0])
+        self._staged = (first, last) if self._staged is None else (min(self._staged[0], first),
+                                                                    max(self._staged[1], last))
+        return False
+
+    def flush(self) -> Optional[Tuple[int, int]]:
+        """
+        Merge the staged candles into the series. Returns their (first, last) timestamp,
+        None if nothing was staged.
+        """
+        if self._segment is None:
+            return None
+        segment, staged = self._segment, self._staged
+        self._segment = self._staged = None
+        try:
+            rows = os.path.getsize(segment) // ROW_BYTES
+            if rows:
+                candles = np.fromfile(segment, dtype=CANDLE_DTYPE, count=rows * CANDLE_COLUMNS)
+                self.store.append(self.exchange, self.symbol, self.timeframe, candles)
+        finally:
+            os.remove(segment)
+        return staged
+
+
+def _replace(path: str, candles: np.ndarray) -> None:
+    """
+    Atomically replace the file at `path` with `candles`, through a temporary file of
+    its own so concurrent rewrites of other series (or of this one) don't collide.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.ascontiguousarray(candles, dtype=CANDLE_DTYPE).tofile(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _normalize(candles: np.ndarray) -> np.ndarray:
+    """
+    Sort rows by timestamp and drop duplicate timestamps, keeping the last occurrence.
+    """
+    if len(candles) < 2:
+        return np.ascontiguousarray(candles)
+
+    order = np.argsort(candles[:, 0], kind='stable')
+    candles = candles[order]
+    timestamps = candles[:, 0]
+    keep = np.append(timestamps[1:] != timestamps[:-1], True)
+    return np.ascontiguousarray(candles[keep])
+
+
+_CANDLE_KEYS = operator.itemgetter('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def candle_dicts_to_array(candles_data) -> np.ndarray:
+    """
+    Convert exchange adapter output (list of dicts) to an (n, 6) float64 array.
+    """
+    values = itertools.chain.from_iterable(map(_CANDLE_KEYS, candles_data))
+    return np.fromiter(values, dtype=CANDLE_DTYPE, count=len(candles_data) * CANDLE_COLUMNS).reshape(-1, CANDLE_COLUMNS)
+
+
+candle_store = CandleStore()
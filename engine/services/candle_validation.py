@@ -0,0 +1,135 @@
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from engine.models.core import CandleIssue
+from engine.services.candle_store import CANDLE_COLUMNS, CANDLE_DTYPE
+
+# Rules whose rows are not written (and stay uncovered, so the next import fetches them again)
+DROP_RULES = ('invalid', 'ohlc')
+
+# Robust z-score of a close-to-close move or a high-low range above which a candle is flagged
+OUTLIER_THRESHOLD = 12.0
+# Batches shorter than this have too few moves for a meaningful median
+OUTLIER_MIN_ROWS = 50
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+INSERT_BATCH = 500
+
+
+def validate_candles(candles: np.ndarray, timeframe_ms: Optional[int]) -> Tuple[np.ndarray, np.ndarray, List[Dict]]:
+    """
+    Check a fetched batch before it is written. Returns the candles to store (sorted by
+    timestamp, one row per timestamp), the position of each of them in the input, and a
+    list of findings: `{'timestamp', 'rule', 'action', 'detail'}`.
+
+    - invalid: non-finite values, prices <= 0 or negative volume. Dropped.
+    - ohlc: high below low, or open/close outside [low, high]. Dropped.
+    - alignment: timestamp off the timeframe grid the rest of the batch is on (the
+      exchange's session offset, e.g. Yahoo daily bars at the exchange's midnight). Kept
+      with its timestamp, flagged; timestamps are never rewritten.
+    - order: timestamp earlier than the one before it. Sorted.
+    - duplicate: timestamp seen again later in the batch. The earlier row is dropped,
+      matching the `INSERT OR REPLACE` the import uses.
+    - outlier / zero_volume_spike: close-to-close move or high-low range far outside the
+      batch's own distribution (robust z-score above OUTLIER_THRESHOLD). Kept, flagged.
+
+    Every check is a whole-column NumPy operation; only findings are built in Python.
+    """
+    candles = np.asarray(candles, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_COLUMNS)
+    positions = np.arange(len(candles))
+    issues = []
+
+    invalid = (~np.isfinite(candles).all(axis=1) | (candles[:, 1:5] <= 0).any(axis=1) | (candles[:, 5] < 0))
+    _add(issues, candles[invalid], 'invalid', 'dropped', 'non-finite value, price <= 0 or negative volume')
+
+    opens, highs, lows, closes = candles[:, 1], candles[:, 2], candles[:, 3], candles[:, 4]
+    ohlc = ~invalid & ((highs < lows) | (np.maximum(opens, closes) > highs) | (np.minimum(opens, closes) < lows))
+    _add(issues, candles[ohlc], 'ohlc', 'dropped', 'high < low or open/close outside [low, high]')
+
+    valid = ~(invalid | ohlc)
+    candles, positions = candles[valid], positions[valid]
+    if len(candles) == 0:
+        return candles, positions, issues
+
+    if timeframe_ms:
+        timestamps = candles[:, 0].astype(np.int64)
+        phases = timestamps % timeframe_ms
+        values, counts = np.unique(phases, return_counts=True)
+        offset = int(values[np.argmax(counts)])
+        misaligned = phases != offset
+        _add(issues, candles[misaligned], 'alignment', 'flagged',
+             f"off the {timeframe_ms} ms grid at offset {offset} ms")
+
+    backwards = np.flatnonzero(candles[1:, 0] < candles[:-1, 0]) + 1
+    _add(issues, candles[backwards], 'order', 'repaired', 'earlier than the previous candle')
+
+    # Stable sort, then keep the last row of each timestamp
+    order = np.argsort(candles[:, 0], kind='stable')
+    candles, positions = candles[order], positions[order]
+    last = np.append(candles[1:, 0] != candles[:-1, 0], True)
+    _add(issues, candles[~last], 'duplicate', 'dropped', 'replaced by a later row with the same timestamp')
+    candles, positions = candles[last], positions[last]
+
+    if len(candles) >= OUTLIER_MIN_ROWS:
+        _flag_outliers(candles, issues)
+
+    return candles, positions, issues
+
+
+def record_issues(task_id: Optional[str], exchange: str, symbol: str, timeframe: str, issues: List[Dict]) -> int:
+    """
+    Store findings for an import task. Returns the number of rows written.
+    """
+    if not issues:
+        return 0
+
+    now = int(time.time())
+    rows = [dict(issue, task_id=task_id, exchange=exchange, symbol=symbol, timeframe=timeframe, created_at=now)
+            for issue in issues]
+    for i in range(0, len(rows), INSERT_BATCH):
+        CandleIssue.insert_many(rows[i:i + INSERT_BATCH]).execute()
+    return len(rows)
+
+
+def summarize(issues: List[Dict]) -> Dict[str, int]:
+    """
+    Number of findings per rule.
+    """
+    counts = {}
+    for issue in issues:
+        counts[issue['rule']] = counts.get(issue['rule'], 0) + 1
+    return counts
+
+
+def _flag_outliers(candles, issues):
+    closes = candles[:, 4]
+    moves = np.abs(_robust_z(np.diff(np.log(closes))))
+    ranges = _robust_z(np.log(candles[:, 2] / candles[:, 3]))
+
+    # A move belongs to the candle it ends in; the first candle has no move
+    score = np.maximum(np.append(0.0, moves), ranges)
+    outliers = np.flatnonzero(score > OUTLIER_THRESHOLD)
+    for i in outliers.tolist():
+        rule = 'zero_volume_spike' if candles[i, 5] == 0 else 'outlier'
+        issues.append(_issue(int(candles[i, 0]), rule, 'flagged', f"robust z-score {score[i]:.1f}"))
+
+
+def _robust_z(values):
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * MAD_SCALE
+    if mad == 0:
+        # Constant series (e.g. a pegged pair): nothing stands out by this measure
+        return np.zeros_like(values)
+    return (values - median) / mad
+
+
+def _add(issues, rows, rule, action, detail):
+    for timestamp in rows[:, 0].tolist():
+        issues.append(_issue(timestamp, rule, action, detail))
+
+
+def _issue(timestamp, rule, action, detail):
+    # Non-finite timestamps can't be stored; keep the finding with timestamp 0
+    timestamp = int(timestamp) if np.isfinite(timestamp) else 0
+    return {'timestamp': timestamp, 'rule': rule, 'action': action, 'detail': detail}
@@ -0,0 +1,215 @@
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+from playhouse.pool import PooledSqliteDatabase, MaxConnectionsExceeded
+
+
+class MeteredPooledSqliteDatabase(PooledSqliteDatabase):
+    """
+    Pooled SQLite database that counts its connection churn and pool waits.
+
+    `close()` hands the connection back to the pool instead of closing it, so a thread
+    that connects per unit of work (`WriterSqliteDatabase`) or per call (`reading()`) reuses an
+    open connection with its page cache. `wait_timeout` is how long `connect()` waits for
+    a free connection when `max_connections` are checked out (peewee's pool consumes the
+    usual `timeout` argument for this); `busy_timeout` is SQLite's lock timeout.
+    """
+
+    def __init__(self, database, busy_timeout: float = 10, wait_timeout: float = 10, **kwargs):
+        # A connection moves between threads through the pool, but only one uses it at a time
+        kwargs.setdefault('check_same_thread', False)
+        super().__init__(database, timeout=wait_timeout, **kwargs)
+        self._timeout = busy_timeout
+        self._stats_lock = threading.Lock()
+        self._opened = 0
+        self._closed = 0
+        self._checkouts = 0
+        self._exhausted = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def connect(self, reuse_if_open=False):
+        started = time.perf_counter()
+        opened = super().connect(reuse_if_open)
+        if opened:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_seconds += waited
+                self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        return opened
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool size and counters since start: `opened`/`closed` are real SQLite connections
+        (churn), `checkouts` are connects served by the pool, `exhausted` counts the times a
+        caller found every connection in use and had to wait.
+        """
+        with self._pool_lock:
+            in_use, idle = len(self._in_use), len(self._connections)
+        with self._stats_lock:
+            return {
+                'max_connections': self._max_connections,
+                'in_use': in_use,
+                'idle': idle,
+                'opened': self._opened,
+                'closed': self._closed,
+                'checkouts': self._checkouts,
+                'exhausted': self._exhausted,
+                'wait_seconds': self._wait_seconds,
+                'max_wait_seconds': self._max_wait_seconds,
+                'avg_wait_seconds': self._wait_seconds / self._checkouts if self._checkouts else 0.0
+            }
+
+    def _connect(self):
+        try:
+            return super()._connect()
+        except MaxConnectionsExceeded:
+            with self._stats_lock:
+                self._exhausted += 1
+            raise
+
+    def _add_conn_hooks(self, conn):
+        # Runs once per new SQLite connection, not for connections reused from the pool
+        super()._add_conn_hooks(conn)
+        with self._stats_lock:
+            self._opened += 1
+
+    def _close_raw(self, conn):
+        super()._close_raw(conn)
+        with self._stats_lock:
+            self._closed += 1
+
+
+class WriterSqliteDatabase(MeteredPooledSqliteDatabase):
+    """
+    The writer: a pool of exactly one connection, handed from thread to thread.
+
+    A thread holds the connection only while it uses it: for one statement outside a
+    transaction, for a whole `atomic()`/`transaction()` block, or between its own
+    `connect()` and `close()`. Other threads wait up to `wait_timeout` for it, so writers
+    queue in Python instead of contending for SQLite's write lock through many connections.
+    Rows of a statement run outside a transaction are read before the connection goes
+    back, so the caller can iterate them afterwards.
+
+    Don't wait on another thread's writes (e.g. a `db_writer` future) inside a
+    transaction or an explicit connect(): that thread needs the connection you hold.
+    """
+
+    def __init__(self, database, **kwargs):
+        kwargs['max_connections'] = 1
+        super().__init__(database, **kwargs)
+
+    def execute_sql(self, sql, params=None):
+        if not self.is_closed():
+            return super().execute_sql(sql, params)
+        self.connect()
+        try:
+            return _DetachedCursor(super().execute_sql(sql, params))
+        finally:
+            self.close()
+
+    def atomic(self, *args, **kwargs):
+        return _Held(self, super().atomic(*args, **kwargs))
+
+    def transaction(self, *args, **kwargs):
+        return _Held(self, super().transaction(*args, **kwargs))
+
+
+class _Held:
+    """
+    A transaction context that checks the writer connection out around itself, unless
+    the thread already holds it.
+    """
+
+    def __init__(self, database, context):
+        self.database = database
+        self.context = context
+        self.opened = False
+
+    def __enter__(self):
+        self.opened = self.database.is_closed()
+        if self.opened:
+            self.database.connect()
+        try:
+            return self.context.__enter__()
+        except BaseException:
+            self._release()
+            raise
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return self.context.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._release()
+
+    def _release(self):
+        if self.opened:
+            self.opened = False
+            self.database.close()
+
+
+class _DetachedCursor:
+    """
+    Cursor whose rows (if any) were read in full, so it no longer needs its connection.
+    """
+
+    def __init__(self, cursor):
+        rows = cursor.fetchall() if cursor.description is not None else []
+        self.description = cursor.description
+        # Read after the rows, which RETURNING statements need
+        self.rowcount = cursor.rowcount
+        self.lastrowid = cursor.lastrowid
+        cursor.close()
+        self._rows = iter(rows)
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return list(itertools.islice(self._rows, size))
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+def read_database(database):
+    """
+    Database to run read-only queries for `database` on: the reader pool for the main
+    database, `database` itself otherwise (candle partitions, or models bound elsewhere
+    as in the tests). Inside a write transaction the writer is kept, so the caller sees
+    its own uncommitted rows.
+    """
+    from engine.config import db, read_db
+    if database is not db or db.in_transaction():
+        return database
+    return read_db
+
+
+@contextmanager
+def reading(database):
+    """
+    Yield the database to run read-only queries for `database` on, e.g.
+    `with reading(Task._meta.database) as reader: Task.select().execute(reader)`.
+    A reader connection is checked out for the block and goes back to the pool afterwards
+    (unless the thread already had one open); other databases are used as they are.
+    """
+    reader = read_database(database)
+    if reader is database:
+        yield database
+        return
+
+    opened = reader.connect(reuse_if_open=True)
+    try:
+        yield reader
+    finally:
+        if opened:
+            reader.close()
@@ -0,0 +1,22 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from engine.config import DB_ASYNC_WORKERS
+
+# Bounded pool for the blocking peewee queries of async handlers, so they don't stall the
+# event loop. Sized to the reader pool: every worker can hold a read connection at once.
+_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_WORKERS, thread_name_prefix='db-async') if DB_ASYNC_WORKERS else None
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run `fn(*args, **kwargs)` on the database thread pool and await its result.
+
+    `fn` should do all of its database work (and other blocking work next to it, like
+    password hashing) in one call; reads inside it go through `reading()` so the worker
+    returns its reader to the pool. Writes belong on `db_writer` instead.
+    """
+    if _executor is None:
+        return fn(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
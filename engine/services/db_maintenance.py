@@ -0,0 +1,220 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from playhouse.pool import MaxConnectionsExceeded
+from engine.config import db, DB_MAINTENANCE_INTERVAL, DB_MAINTENANCE_IDLE_SECONDS, DB_VACUUM_STEP_PAGES
+from engine.services.candle_partitions import candle_partitions
+from engine.services.db_writer import db_writer
+
+# How long a maintenance step waits for a lock before giving up
+BUSY_TIMEOUT_MS = 100
+
+# Rows sampled per index by ANALYZE (via PRAGMA optimize), bounding its run time
+ANALYSIS_LIMIT = 1000
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class DatabaseMaintenance:
+    """
+    Background upkeep of the SQLite files (main database plus candle partitions).
+
+    A run checkpoints the WAL, refreshes query planner statistics with `PRAGMA optimize`,
+    returns free pages to the OS with `PRAGMA incremental_vacuum` in small steps, and
+    truncates the WAL once it has been copied back. It only starts when no import has
+    been active for `idle_seconds` and the write queue is empty; every step uses a short
+    busy timeout and stops the run instead of waiting when a writer holds the lock, so an
+    import that starts meanwhile is delayed by one step at most. Each step (and each
+    vacuum chunk) checks the connection out on its own and hands it back after, since
+    the main database's writer has a single connection that writes queue for.
+    """
+
+    def __init__(self, interval: int = DB_MAINTENANCE_INTERVAL, idle_seconds: int = DB_MAINTENANCE_IDLE_SECONDS,
+                 vacuum_step_pages: int = DB_VACUUM_STEP_PAGES):
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.vacuum_step_pages = vacuum_step_pages
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._active = 0
+        self._last_activity = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def activity(self):
+        """
+        Mark a write-heavy job (e.g. an import) as running; maintenance waits for it.
+        """
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_activity = time.time()
+
+    def is_idle(self) -> bool:
+        # Writes through the writer thread (task state, backtest sessions) count as activity too
+        if db_writer.pending():
+            return False
+        with self._lock:
+            return self._active == 0 and time.time() - self._last_activity >= self.idle_seconds
+
+    def databases(self) -> list:
+        databases = [db]
+        if candle_partitions.enabled:
+            databases += [database for _, database in candle_partitions.partitions()]
+        return databases
+
+    def report(self, database) -> Dict[str, Any]:
+        """
+        Size, WAL size and fragmentation (share of free pages) of one database.
+        """
+        path = database.database
+        page_size = database.execute_sql('PRAGMA page_size').fetchone()[0]
+        page_count = database.execute_sql('PRAGMA page_count').fetchone()[0]
+        free_pages = database.execute_sql('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = database.execute_sql('PRAGMA auto_vacuum').fetchone()[0]
+        return {
+            'path': path,
+            'size_bytes': _file_size(path),
+            'wal_bytes': _file_size(f"{path}-wal"),
+            'page_size': page_size,
+            'page_count': page_count,
+            'free_pages': free_pages,
+            'fragmentation': free_pages / page_count if page_count else 0.0,
+            'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum))
+        }
+
+    def maintain(self, database, require_idle: bool = True) -> Dict[str, Any]:
+        """
+        One maintenance pass over one database. Returns the steps taken and the report
+        before and after.
+        """
+        with _leased(database):
+            before = self.report(database)
+        result = {'before': before, 'checkpointed_frames': 0, 'freed_pages': 0,
+                  'optimized': False, 'wal_truncated': False, 'stopped': None}
+        try:
+            with _leased(database) as connection:
+                # PASSIVE never waits for readers or writers; it copies what it can
+                _, _, checkpointed = connection.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+                result['checkpointed_frames'] = max(checkpointed, 0)
+
+            with _leased(database) as connection:
+                connection.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+                connection.execute('PRAGMA optimize')
+                result['optimized'] = True
+
+            if before['auto_vacuum'] == 'incremental':
+                result['freed_pages'] = self._incremental_vacuum(database, require_idle)
+
+            if require_idle and not self.is_idle():
+                result['stopped'] = 'busy'
+            else:
+                with _leased(database) as connection:
+                    busy, _, _ = connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+                result['wal_truncated'] = busy == 0
+        except sqlite3.OperationalError as e:
+            # Locked by a writer: try again on the next run
+            result['stopped'] = str(e)
+        except MaxConnectionsExceeded:
+            # The writer connection stayed checked out by a write
+            result['stopped'] = 'busy'
+
+        with _leased(database):
+            result['after'] = self.report(database)
+        return result
+
+    def run(self, require_idle: bool = True) -> Dict[str, Any]:
+        """
+        Maintain every database.
+        """
+        started_at = int(time.time())
+        results: List[Dict[str, Any]] = []
+        for database in self.databases():
+            results.append(self.maintain(database, require_idle))
+            if require_idle and not self.is_idle():
+                break
+
+        self.last_run = {'started_at': started_at, 'finished_at': int(time.time()), 'databases': results}
+        return self.last_run
+
+    def tick(self) -> bool:
+        """
+        Run maintenance if the engine is idle. Returns whether it ran.
+        """
+        if not self.is_idle():
+            return False
+        self.run()
+        return True
+
+    def start(self) -> bool:
+        """
+        Start the background scheduler (no-op if disabled or already running).
+        """
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='db-maintenance', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Database maintenance failed: {e}")
+
+    def _incremental_vacuum(self, database, require_idle):
+        freed = 0
+        while True:
+            if require_idle and not self.is_idle():
+                return freed
+            with _leased(database) as connection:
+                free_pages = connection.execute('PRAGMA freelist_count').fetchone()[0]
+                if free_pages == 0:
+                    return freed
+                # executescript steps the pragma to completion (execute() would free one page);
+                # each step is its own short write transaction
+                connection.executescript(f'PRAGMA incremental_vacuum({self.vacuum_step_pages});')
+                freed += free_pages - connection.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+@contextmanager
+def _leased(database):
+    """
+    The database's connection for one maintenance step, with the short busy timeout.
+    It goes back afterwards (unless the thread had it open already), with the normal
+    busy timeout restored for its other users.
+    """
+    opened = database.connect(reuse_if_open=True)
+    try:
+        connection = database.connection()
+        connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        try:
+            yield connection
+        finally:
+            connection.execute(f'PRAGMA busy_timeout = {int(database.timeout * 1000)}')
+    finally:
+        if opened:
+            database.close()
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+db_maintenance = DatabaseMaintenance()
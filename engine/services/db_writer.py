@@ -0,0 +1,220 @@
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+from engine.config import DB_WRITER_INTERVAL_MS, DB_WRITER_MAX_BATCH
+
+
+class _Write:
+    __slots__ = ('query', 'model', 'key', 'fields', 'future')
+
+    def __init__(self, query=None, model=None, key=None, fields=None):
+        self.query = query
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.future = Future()
+
+    @property
+    def database(self):
+        model = self.query.model if self.query is not None else self.model
+        return model._meta.database
+
+    def apply(self):
+        if self.query is not None:
+            return self.query.execute(self.database)
+        model = self.model
+        return model.update(**self.fields).where(model._meta.primary_key == self.key).execute(self.database)
+
+
+class DatabaseWriter:
+    """
+    Single writer thread for task and backtest session state.
+
+    Callers queue writes and get a `concurrent.futures.Future` with the query result
+    (rows affected, or the new row id); `.result()` returns once the write is committed.
+    In async handlers wait with `await asyncio.wrap_future(future)`.
+
+    Every write goes to the database its model is bound to, with or without the thread.
+    The thread takes whatever is queued, waiting up to `interval` seconds for more, and
+    commits it in one `BEGIN IMMEDIATE` transaction per database. Repeated `update()`s of the same row
+    queued before the next commit are merged into one statement. If a batch fails, its
+    writes are retried one transaction each, so only the failing write reports an error.
+
+    Until `start()` is called (CLI scripts, unit tests) writes run directly on the
+    caller's thread and the future is already resolved.
+    """
+
+    def __init__(self, interval: float = DB_WRITER_INTERVAL_MS / 1000, max_batch: int = DB_WRITER_MAX_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue: List[_Write] = []
+        self._committing = 0
+        # Pending row updates that later updates of the same row can still be merged into
+        self._open_updates: Dict[tuple, _Write] = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'submitted': 0, 'coalesced': 0, 'statements': 0, 'transactions': 0, 'failed': 0,
+                       'max_batch': 0, 'lock_wait_seconds': 0.0, 'max_lock_wait_seconds': 0.0}
+
+    def update(self, model, key, **fields) -> Future:
+        """
+        Set `fields` on the `model` row with primary key `key`.
+        """
+        with self._condition:
+            self._stats['submitted'] += 1
+            if self._running:
+                pending = self._open_updates.get((model, key))
+                if pending is not None:
+                    pending.fields.update(fields)
+                    self._stats['coalesced'] += 1
+                    return pending.future
+
+            write = _Write(model=model, key=key, fields=dict(fields))
+            if self._running:
+                self._open_updates[(model, key)] = write
+                self._enqueue(write)
+                return write.future
+        return self._apply_now(write)
+
+    def execute(self, query) -> Future:
+        """
+        Run a peewee write query (insert, update or delete) in queue order.
+        """
+        write = _Write(query=query)
+        with self._condition:
+            self._stats['submitted'] += 1
+            if self._running:
+                # Later row updates must not be merged into writes queued before this one
+                self._open_updates.clear()
+                self._enqueue(write)
+                return write.future
+        return self._apply_now(write)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until everything queued so far is committed.
+        """
+        with self._condition:
+            futures = [write.future for write in self._queue]
+        for future in futures:
+            future.exception(timeout)
+
+    def pending(self) -> int:
+        """
+        Writes queued or being committed.
+        """
+        with self._condition:
+            return len(self._queue) + self._committing
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats, queued=len(self._queue), running=self._running)
+        stats['avg_batch'] = stats['statements'] / stats['transactions'] if stats['transactions'] else 0.0
+        return stats
+
+    def start(self) -> bool:
+        with self._condition:
+            if self._running:
+                return False
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """
+        Commit what is queued, then stop. Later writes run on the caller's thread again.
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def _enqueue(self, write):
+        self._queue.append(write)
+        self._condition.notify_all()
+
+    def _loop(self):
+        # Each batch checks the writer connection out for its transaction only
+        while True:
+            with self._condition:
+                while not self._queue and self._running:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                # Let concurrent jobs add to this tick's transaction
+                deadline = time.monotonic() + self.interval
+                while self._running and len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                taken = set(map(id, batch))
+                self._open_updates = {k: w for k, w in self._open_updates.items() if id(w) not in taken}
+                self._committing = len(batch)
+            try:
+                self._commit(batch)
+            finally:
+                with self._condition:
+                    self._committing = 0
+
+    def _commit(self, batch):
+        # One transaction per database, in the order each first appears in the batch
+        groups: Dict[int, List[_Write]] = {}
+        for write in batch:
+            groups.setdefault(id(write.database), []).append(write)
+        for writes in groups.values():
+            self._commit_to(writes[0].database, writes)
+
+    def _commit_to(self, database, writes):
+        started = time.perf_counter()
+        try:
+            with database.atomic('IMMEDIATE'):
+                waited = time.perf_counter() - started
+                results = [write.apply() for write in writes]
+        except Exception:
+            # Find the write that failed; the others are committed on their own
+            for write in writes:
+                self._run(write)
+            return
+
+        self._record(waited, len(writes))
+        for write, result in zip(writes, results):
+            write.future.set_result(result)
+
+    def _apply_now(self, write):
+        # No writer thread: write on the caller's thread
+        self._run(write)
+        return write.future
+
+    def _run(self, write):
+        started = time.perf_counter()
+        try:
+            with write.database.atomic('IMMEDIATE'):
+                waited = time.perf_counter() - started
+                result = write.apply()
+        except Exception as e:
+            with self._condition:
+                self._stats['failed'] += 1
+            write.future.set_exception(e)
+            return
+        self._record(waited, 1)
+        write.future.set_result(result)
+
+    def _record(self, waited, statements):
+        with self._condition:
+            stats = self._stats
+            stats['transactions'] += 1
+            stats['statements'] += statements
+            stats['max_batch'] = max(stats['max_batch'], statements)
+            stats['lock_wait_seconds'] += waited
+            stats['max_lock_wait_seconds'] = max(stats['max_lock_wait_seconds'], waited)
+
+
+db_writer = DatabaseWriter()
@@ -0,0 +1,100 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+from engine.config import IMPORT_MAX_CONCURRENT, IMPORT_MAX_PER_EXCHANGE
+
+
+class ImportScheduler:
+    """
+    Concurrency budget shared by every import in the process: at most `max_concurrent`
+    imports run at once, and at most `max_per_exchange` of them against one exchange.
+    Request rates are paced separately by each adapter's shared bucket (see
+    engine/services/rate_limiter.py), so parallel imports split one budget per exchange.
+    """
+
+    def __init__(self, max_concurrent: int = IMPORT_MAX_CONCURRENT, max_per_exchange: int = IMPORT_MAX_PER_EXCHANGE):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_exchange = max(1, max_per_exchange)
+        self._changed = threading.Condition()
+        self._running = 0
+        self._per_exchange: Dict[str, int] = {}
+        self._waiting = 0
+        self._completed = 0
+
+    def _has_room(self, key):
+        return self._running < self.max_concurrent and self._per_exchange.get(key, 0) < self.max_per_exchange
+
+    def _take(self, key):
+        self._running += 1
+        self._per_exchange[key] = self._per_exchange.get(key, 0) + 1
+
+    def _release(self, key):
+        with self._changed:
+            self._running -= 1
+            self._per_exchange[key] -= 1
+            self._completed += 1
+            self._changed.notify_all()
+
+    @contextmanager
+    def slot(self, exchange: str):
+        """
+        Hold one import slot for `exchange`, waiting until one is free.
+        """
+        key = exchange.lower()
+        with self._changed:
+            self._waiting += 1
+            self._changed.wait_for(lambda: self._has_room(key))
+            self._waiting -= 1
+            self._take(key)
+        try:
+            yield
+        finally:
+            self._release(key)
+
+    def run_all(self, jobs: List[Tuple[str, Callable[[], None]]]) -> None:
+        """
+        Run `(exchange, fn)` jobs in slots and return when all are done. Jobs start in list
+        order, except that a job whose exchange is at its limit doesn't hold up jobs for
+        other exchanges behind it. Each job runs on its own thread, so a batch never has more
+        threads than slots it holds.
+        """
+        pending = list(jobs)
+        threads = []
+
+        def run(key, fn):
+            try:
+                fn()
+            finally:
+                self._release(key)
+
+        with self._changed:
+            self._waiting += len(pending)
+            while pending:
+                ready = next((job for job in pending if self._has_room(job[0].lower())), None)
+                if ready is None:
+                    self._changed.wait()
+                    continue
+                pending.remove(ready)
+                self._waiting -= 1
+                key = ready[0].lower()
+                self._take(key)
+                thread = threading.Thread(target=run, args=(key, ready[1]), name=f'import-{key}', daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._changed:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_per_exchange': self.max_per_exchange,
+                'running': self._running,
+                'running_per_exchange': {k: v for k, v in self._per_exchange.items() if v},
+                'waiting': self._waiting,
+                'completed': self._completed
+            }
+
+
+import_scheduler = ImportScheduler()
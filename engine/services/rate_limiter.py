@@ -0,0 +1,245 @@
+import time
+import email.utils
+import random
+import threading
+import requests
+from collections import deque
+from typing import Callable, Optional, Tuple, Type, TypeVar
+from engine.config import (EXCHANGE_RETRY_ATTEMPTS, EXCHANGE_BACKOFF_SECONDS, EXCHANGE_BACKOFF_MAX_SECONDS,
+                           EXCHANGE_RETRY_AFTER_MAX_SECONDS)
+
+T = TypeVar('T')
+
+# Statuses exchanges throttle with: 429 too many requests, 418 Binance's IP ban after
+# ignoring 429s
+THROTTLE_STATUSES = (429, 418)
+
+
+class TokenBucket:
+    """
+    Request weight budget shared by the threads calling one exchange: `capacity` units,
+    refilled continuously over `period` seconds.
+
+    `acquire(weight)` blocks until the weight is available. `sync(used)` lines the local
+    budget up with the usage the exchange reports, e.g. Binance's X-MBX-USED-WEIGHT-1M
+    header, which also counts requests made by other processes from the same IP.
+
+    `throttle(seconds)` is for when the exchange pushes back anyway: the budget is emptied,
+    nobody acquires for `seconds`, and the refill rate halves. It climbs back to the full
+    rate over one `period` without further throttling.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.period = period
+        self.max_rate = capacity / period
+        self.rate = self.max_rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._throttles = 0
+
+    def _refill(self, now):
+        # Nothing accrues while paused after a throttle
+        elapsed = max(0.0, now - max(self._updated, self._paused_until))
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self.rate = min(self.max_rate, self.rate + elapsed * self.max_rate / self.period)
+        self._updated = now
+
+    def acquire(self, weight: float = 1) -> float:
+        """
+        Take `weight` units, waiting for the refill if needed. Returns the seconds waited.
+        """
+        started = time.monotonic()
+        slept = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= weight:
+                    self._tokens -= weight
+                    self._acquired += weight
+                    if not slept:
+                        return 0.0
+                    waited = now - started
+                    self._waits += 1
+                    self._wait_seconds += waited
+                    return waited
+                else:
+                    delay = (weight - self._tokens) / self.rate
+            time.sleep(delay)
+            slept = True
+
+    def sync(self, used: float) -> None:
+        """
+        The exchange reports `used` units spent in its current window: never assume more
+        is left than that.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, self.capacity - used)
+
+    def throttle(self, seconds: float) -> None:
+        """
+        The exchange refused a request for going too fast: back off for `seconds`, then
+        resume at half the current rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = 0.0
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._throttles += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'capacity': self.capacity,
+                'available': round(self._tokens, 2),
+                'rate_per_second': round(self.rate, 3),
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'wait_seconds': round(self._wait_seconds, 3),
+                'throttles': self._throttles
+            }
+
+
+class RequestScheduler:
+    """
+    Sends the requests of one exchange: each takes its weight from the shared `budget`,
+    and failures worth retrying are retried with exponential backoff and full jitter, up
+    to `attempts` tries in all.
+
+    - Throttling (429, 418, or one of `throttle_errors`) also slows the whole budget down
+      (`TokenBucket.throttle`), so every thread calling the exchange backs off, not just
+      the one that was refused. A Retry-After header sets the wait; a wait longer than
+      `max_retry_after` (e.g. an IP ban) fails the request instead, leaving it to a resume.
+    - 5xx responses, connection errors and timeouts are retried.
+    - Anything else (other 4xx, bad parameters) fails at once.
+
+    `send` raises `requests.HTTPError` for error statuses, e.g. via `raise_for_status()`.
+    """
+
+    def __init__(self, budget: TokenBucket, attempts: int = EXCHANGE_RETRY_ATTEMPTS,
+                 backoff: float = EXCHANGE_BACKOFF_SECONDS, max_backoff: float = EXCHANGE_BACKOFF_MAX_SECONDS,
+                 max_retry_after: float = EXCHANGE_RETRY_AFTER_MAX_SECONDS,
+                 throttle_errors: Tuple[Type[Exception], ...] = ()):
+        self.budget = budget
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.throttle_errors = throttle_errors
+        self._lock = threading.Lock()
+        self._started = None
+        self._recent = deque()
+        self._requests = 0
+        self._retries = 0
+        self._throttled = 0
+        self._failed = 0
+        self._backoff_seconds = 0.0
+
+    def call(self, send: Callable[[], T], weight: float = 1) -> T:
+        attempt = 0
+        while True:
+            attempt += 1
+            self.budget.acquire(weight)
+            try:
+                result = send()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    with self._lock:
+                        self._failed += 1
+                    raise
+                print(f"Request failed ({e}), retrying in {delay:.2f}s (attempt {attempt + 1} of {self.attempts}).")
+                with self._lock:
+                    self._retries += 1
+                    self._backoff_seconds += delay
+                time.sleep(delay)
+                continue
+            self._record_success()
+            return result
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before trying again, or None to give up.
+        """
+        status = _status(error)
+        throttled = status in THROTTLE_STATUSES or isinstance(error, self.throttle_errors)
+        retryable = (throttled or (status is not None and status >= 500)
+                     or isinstance(error, (requests.ConnectionError, requests.Timeout)))
+        if not retryable or attempt >= self.attempts:
+            return None
+
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if throttled:
+            retry_after = _retry_after(error)
+            if retry_after is not None:
+                if retry_after > self.max_retry_after:
+                    return None
+                delay = retry_after
+            with self._lock:
+                self._throttled += 1
+            self.budget.throttle(delay)
+        return delay
+
+    def _record_success(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._started is None:
+                self._started = now
+            self._requests += 1
+            self._recent.append(now)
+            while self._recent[0] < now - 60:
+                self._recent.popleft()
+
+    def stats(self) -> dict:
+        """
+        Counters, plus the successful requests per second over the last minute (since the
+        first request, if that was more recent).
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and self._recent[0] < now - 60:
+                self._recent.popleft()
+            span = min(60.0, now - self._started) if self._started is not None else 0.0
+            return {
+                'requests': self._requests,
+                'requests_per_second': round(len(self._recent) / span, 2) if span > 0 else 0.0,
+                'retries': self._retries,
+                'throttled': self._throttled,
+                'failed': self._failed,
+                'backoff_seconds': round(self._backoff_seconds, 3),
+                'budget': self.budget.stats()
+            }
+
+
+def _status(error: Exception) -> Optional[int]:
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Retry-After of the failed response in seconds, given as seconds or as an HTTP date.
+    """
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
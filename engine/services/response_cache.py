@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from typing import Optional
+from engine.config import RESPONSE_CACHE_MODE, RESPONSE_CACHE_DIR
+
+
+class ResponseCacheMiss(ConnectionError):
+    """
+    Offline mode and the response is not in the cache.
+    """
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw exchange responses, one file per request under
+    `base_dir/<namespace>/<hash[:2]>/<hash>`, where the hash is the SHA-256 of the
+    canonical JSON of the request parameters.
+
+    Each file is a JSON header line (expiry and the request, for inspection) followed by
+    the response body as the adapter stored it. Responses holding only closed candles
+    are stored without expiry; the adapter passes a TTL for anything that can still change.
+
+    Modes: 'off' never touches the disk, 'on' reads through the cache and stores what it
+    downloads, 'offline' only replays: a miss raises `ResponseCacheMiss` and expired
+    entries are served anyway.
+    """
+
+    MODES = ('off', 'on', 'offline')
+
+    def __init__(self, base_dir: str = RESPONSE_CACHE_DIR, mode: str = RESPONSE_CACHE_MODE):
+        if mode not in self.MODES:
+            raise ValueError(f"Response cache mode must be one of {', '.join(self.MODES)}, not {mode!r}")
+        self.base_dir = base_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._writes = 0
+        self._bytes_read = 0
+        self._bytes_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == 'offline'
+
+    def path_for(self, namespace: str, request: dict) -> str:
+        digest = hashlib.sha256(_canonical(request)).hexdigest()
+        return os.path.join(self.base_dir, namespace, digest[:2], digest)
+
+    def get(self, namespace: str, request: dict) -> Optional[bytes]:
+        """
+        The stored body of `request`, or None when the caller should download it. In
+        offline mode a miss raises instead.
+        """
+        if not self.enabled:
+            return None
+
+        path = self.path_for(namespace, request)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except FileNotFoundError:
+            body = None
+        except (OSError, ValueError):
+            # Torn or foreign file: treat as missing, the next download replaces it
+            body = None
+
+        if body is not None and not self.offline and header['expires'] is not None and header['expires'] <= time.time():
+            with self._lock:
+                self._expired += 1
+            body = None
+
+        with self._lock:
+            if body is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._bytes_read += len(body)
+
+        if body is None and self.offline:
+            raise ResponseCacheMiss(f"Offline and not cached: {namespace} {_canonical(request).decode()}")
+        return body
+
+    def put(self, namespace: str, request: dict, body: bytes, ttl: Optional[float] = None) -> None:
+        """
+        Store `body` as the response to `request`, for `ttl` seconds or (None) for good.
+        """
+        if self.mode != 'on':
+            return
+
+        path = self.path_for(namespace, request)
+        header = {'expires': None if ttl is None else time.time() + ttl, 'request': request}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see half a file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header, sort_keys=True).encode() + b'\n')
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            self._bytes_written += len(body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'path': self.base_dir,
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'writes': self._writes,
+                'bytes_read': self._bytes_read,
+                'bytes_written': self._bytes_written
+            }
+
+
+def _canonical(request: dict) -> bytes:
+    return json.dumps(request, sort_keys=True, separators=(',', ':')).encode()
+
+
+response_cache = ResponseCache()
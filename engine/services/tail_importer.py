@@ -0,0 +1,224 @@
+import time
+import threading
+import numpy as np
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Any
+from engine.config import TAIL_IMPORT_ENABLED, TAIL_IMPORT_DELAY_SECONDS, TAIL_IMPORT_WORKERS
+from engine.exchanges.exchange import Exchange
+from engine.helpers import TIMEFRAME_MS
+from engine.models.core import WatchedSeries
+from engine.modes.import_candles_mode import run_import, get_driver
+from engine.services.candle_coverage import candle_coverage
+from engine.services.db_maintenance import db_maintenance
+from engine.services.db_writer import db_writer
+from engine.services.import_scheduler import ImportScheduler
+
+
+class TailImporter:
+    """
+    Keeps the watched series (`WatchedSeries`) current: `delay` seconds after each
+    timeframe boundary, the series whose candle just closed get the candles after their
+    newest stored one appended. Series are refreshed in parallel through one adapter per
+    exchange, so they share its connection pool and request budget.
+
+    Refreshes go through `run_import` with `resume_from` set to the stored maximum, so
+    they are validated and stored like any import, but never look further back.
+    Tail refreshes have slots of their own, `workers` at once, and don't wait behind
+    long backfills holding the import scheduler's slots. Yahoo series of one timeframe
+    share a multi-ticker download (`Yahoo.fetch_ohlcv_many`) instead of one per series.
+    """
+
+    def __init__(self, delay: float = TAIL_IMPORT_DELAY_SECONDS, workers: int = TAIL_IMPORT_WORKERS,
+                 enabled: bool = TAIL_IMPORT_ENABLED):
+        self.delay = delay
+        self.enabled = enabled
+        self.scheduler = ImportScheduler(max_concurrent=workers, max_per_exchange=workers)
+        self.last_cycle: Optional[Dict[str, Any]] = None
+        self._drivers: Dict[str, Exchange] = {}
+        self._drivers_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def driver(self, exchange: str) -> Exchange:
+        """
+        The adapter shared by every refresh of `exchange`.
+        """
+        key = exchange.lower()
+        with self._drivers_lock:
+            if key not in self._drivers:
+                self._drivers[key] = get_driver(exchange)
+            return self._drivers[key]
+
+    def refresh(self, series: List[WatchedSeries], boundary: int = None) -> Dict[str, Any]:
+        """
+        Append the newest closed candles of each series; returns a summary of the cycle.
+        A failing series is recorded on its row and doesn't stop the others.
+        """
+        started = time.time()
+        results = {}
+        jobs = []
+        yahoo: Dict[str, List[WatchedSeries]] = {}
+        for entry in series:
+            if entry.exchange.lower() == 'yahoo':
+                yahoo.setdefault(entry.timeframe, []).append(entry)
+            else:
+                jobs.append((entry.exchange, partial(self._refresh_one, entry, results)))
+        for timeframe, entries in yahoo.items():
+            jobs.append((entries[0].exchange, partial(self._refresh_many, entries, timeframe, results)))
+
+        # Background database maintenance waits until the refreshes have gone quiet
+        with db_maintenance.activity():
+            self.scheduler.run_all(jobs)
+
+        cycle = {
+            'boundary': boundary,
+            'series': len(series),
+            'fetched': sum(r.get('fetched', 0) for r in results.values()),
+            'failed': sum('error' in r for r in results.values()),
+            # How long after the candle close the cycle started, and how long it took
+            'started_after_close': round(started - boundary / 1000, 3) if boundary is not None else None,
+            'seconds': round(time.time() - started, 3)
+        }
+        self.last_cycle = cycle
+        return cycle
+
+    def _refresh_one(self, entry: WatchedSeries, results: dict, driver=None):
+        try:
+            last = candle_coverage.last_stored(entry.exchange, entry.symbol, entry.timeframe)
+            if last is None and entry.start_date is None:
+                raise ValueError("Nothing stored yet and no start date to import from")
+            # run_import wants a start date; the tail starts after the stored maximum anyway
+            start_date = entry.start_date if last is None else time.strftime('%Y-%m-%d', time.localtime(last / 1000))
+            summary = run_import(entry.exchange, entry.symbol, start_date, entry.timeframe, resume_from=last,
+                                 driver=driver or self.driver(entry.exchange))
+            results[entry.id] = summary
+            # Committed before the next pass reads the watchlist
+            db_writer.update(
+                WatchedSeries, entry.id,
+                last_timestamp=candle_coverage.last_stored(entry.exchange, entry.symbol, entry.timeframe),
+                last_refresh_at=int(time.time()),
+                last_error=None
+            ).result()
+        except Exception as e:
+            self._failed(entry, results, e)
+
+    def _refresh_many(self, entries: List[WatchedSeries], timeframe: str, results: dict):
+        """
+        Refresh series of one multi-ticker exchange and timeframe from one download,
+        starting after the oldest of their stored maxima.
+        """
+        tails = []
+        for entry in entries:
+            last = candle_coverage.last_stored(entry.exchange, entry.symbol, timeframe)
+            if last is None:
+                # Nothing stored yet: a backfill from its start date, on its own
+                self._refresh_one(entry, results)
+            else:
+                tails.append((entry, last))
+        if not tails:
+            return
+
+        try:
+            start_ts = min(last for _, last in tails) + TIMEFRAME_MS[timeframe]
+            candles = self.driver(entries[0].exchange).fetch_ohlcv_many(
+                [entry.symbol for entry, _ in tails], timeframe, start_ts)
+        except Exception as e:
+            for entry, _ in tails:
+                self._failed(entry, results, e)
+            return
+        for entry, _ in tails:
+            self._refresh_one(entry, results, driver=_Downloaded(candles[entry.symbol]))
+
+    def _failed(self, entry: WatchedSeries, results: dict, error: Exception):
+        print(f"Tail import of {entry.symbol} ({entry.timeframe}) from {entry.exchange} failed: {error}")
+        results[entry.id] = {'error': str(error)}
+        db_writer.update(WatchedSeries, entry.id, last_refresh_at=int(time.time()), last_error=str(error)).result()
+
+    def changed(self) -> None:
+        """
+        The watchlist changed: new series are caught up right away and the next wake-up
+        is worked out again.
+        """
+        self._wake.set()
+
+    def start(self) -> bool:
+        """
+        Start the background scheduler (no-op if disabled or already running).
+        """
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='tail-import', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        boundary = None
+        catch_up = True
+        while not self._stop.is_set():
+            try:
+                self._wake.clear()
+                series = list(WatchedSeries.select())
+                # Everything after a (re)start, as imports stopped meanwhile; later on, the
+                # series added since the last pass
+                behind = series if catch_up else [entry for entry in series if entry.last_refresh_at is None]
+                catch_up = False
+                if behind:
+                    self.refresh(behind)
+
+                if boundary is not None and time.time() >= boundary / 1000 + self.delay:
+                    due = [entry for entry in series if _closes_at(entry.timeframe, boundary)]
+                    if due:
+                        self.refresh(due, boundary=boundary)
+                    boundary = None
+
+                # A cycle that overran later boundaries just fetches more next time
+                upcoming = next_boundary(int(time.time() * 1000), [entry.timeframe for entry in series])
+                if boundary is None or (upcoming is not None and upcoming < boundary):
+                    boundary = upcoming
+                timeout = None if boundary is None else max(0.0, boundary / 1000 + self.delay - time.time())
+                self._wake.wait(timeout)
+            except Exception as e:
+                print(f"Tail import failed: {e}")
+                self._stop.wait(1)
+
+
+class _Downloaded:
+    """
+    Adapter stand-in that hands run_import candles downloaded beforehand, e.g. one
+    symbol's share of a multi-ticker download.
+    """
+
+    def __init__(self, candles: np.ndarray):
+        self.candles = candles
+
+    def iter_ohlcv(self, symbol: str, timeframe: str, start_ts: int, end_ts: int = None) -> Iterator[np.ndarray]:
+        timestamps = self.candles[:, 0]
+        keep = timestamps >= start_ts
+        if end_ts is not None:
+            keep &= timestamps <= end_ts
+        yield self.candles[keep]
+
+
+def next_boundary(now_ms: int, timeframes: List[str]) -> Optional[int]:
+    """
+    The next time after `now_ms` a candle of one of the timeframes closes, None if none
+    is regular.
+    """
+    closes = [(now_ms // TIMEFRAME_MS[t] + 1) * TIMEFRAME_MS[t] for t in timeframes if t in TIMEFRAME_MS]
+    return min(closes) if closes else None
+
+def _closes_at(timeframe: str, boundary: int) -> bool:
+    timeframe_ms = TIMEFRAME_MS.get(timeframe)
+    return timeframe_ms is not None and boundary % timeframe_ms == 0
+
+
+tail_importer = TailImporter()
@@ -19,6 +19,12 @@ class Position:
         return abs(self.qty) * self.current_price
 
 class Strategy:
+    # Most candles the strategy's decisions depend on (e.g. 201 for a crossover of a 200 SMA).
+    # Streaming backtests need a window at least this long to match in-memory ones; a
+    # strategy that uses its whole history, like an EMA seeded at the first candle,
+    # declares how many candles it takes for that to stop mattering.
+    lookback = None
+
     def __init__(self, symbol, exchange, timeframe, store_instance):
         self.symbol = symbol
         self.exchange = exchange
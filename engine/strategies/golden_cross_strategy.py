@@ -7,6 +7,9 @@ class GoldenCrossStrategy(Strategy):
     - Buy when 50 SMA crosses above 200 SMA (Golden Cross).
     - Sell when 50 SMA crosses below 200 SMA (Death Cross).
     """
+    # The 200 SMA of this candle and of the previous one
+    lookback = 201
+
     def __init__(self, symbol, exchange, timeframe, store_instance):
         super().__init__(symbol, exchange, timeframe, store_instance)
 
@@ -1,6 +1,8 @@
 from engine.strategies.Strategy import Strategy
 
 class SimpleStrategy(Strategy):
+    lookback = 3
+
     def __init__(self, symbol, exchange, timeframe, store_instance):
         super().__init__(symbol, exchange, timeframe, store_instance)
 
@@ -0,0 +1,68 @@
+"""
+Candle fixtures and temporary databases shared by the test modules.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+from peewee import SqliteDatabase
+from engine.config import db
+
+MINUTE = 60000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+def make_candles(count, start=0, step=MINUTE, price=100.0, volatility=0.1, seed=0, decimals=None):
+    """
+    `count` random-walk candles every `step` ms from `start`, as an (n, 6) array. Opens
+    walk from `price` by `volatility`, highs and lows keep `volatility` clear of open and
+    close, volumes are whole numbers. Prices are rounded to `decimals` if given.
+    """
+    rng = np.random.default_rng(seed)
+    candles = np.empty((count, 6))
+    candles[:, 0] = start + np.arange(count) * step
+    candles[:, 1] = price + np.cumsum(rng.normal(0, volatility, count))
+    candles[:, 4] = candles[:, 1] + rng.normal(0, volatility / 2, count)
+    if decimals is not None:
+        candles[:, [1, 4]] = np.round(candles[:, [1, 4]], decimals)
+    candles[:, 2] = np.maximum(candles[:, 1], candles[:, 4]) + volatility
+    candles[:, 3] = np.minimum(candles[:, 1], candles[:, 4]) - volatility
+    if decimals is not None:
+        candles[:, [2, 3]] = np.round(candles[:, [2, 3]], decimals)
+    candles[:, 5] = rng.integers(1, 1000, count)
+    return candles
+
+
+def candle_rows(candles, exchange='Binance', symbol='BTC-USDT', timeframe='1m'):
+    """
+    `Candle.insert_many` rows of an (n, 6) array.
+    """
+    return [{
+        'timestamp': int(c[0]), 'open': c[1], 'high': c[2], 'low': c[3], 'close': c[4], 'volume': c[5],
+        'exchange': exchange, 'symbol': symbol, 'timeframe': timeframe
+    } for c in candles]
+
+
+def temp_dir(test):
+    """
+    A directory removed when `test` ends.
+    """
+    path = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def temp_database(test, models, path=None):
+    """
+    Bind `models` to a new database with their tables for the duration of `test`, then
+    back to the app database. In memory unless `path` is given; code writing from other
+    threads needs a file, since each thread would get its own empty :memory: database.
+    """
+    database = SqliteDatabase(path or ':memory:', check_same_thread=False)
+    database.bind(models, bind_refs=False, bind_backrefs=False)
+    database.connect()
+    database.create_tables(models)
+    test.addCleanup(db.bind, models, bind_refs=False, bind_backrefs=False)
+    test.addCleanup(database.close)
+    return database
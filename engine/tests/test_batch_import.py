@@ -0,0 +1,241 @@
+import unittest
+import sys
+import os
+import json
+import time
+import uuid
+import threading
+import numpy as np
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.main import app
+from engine.init_db import init_db
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue, Task, User
+from engine.services.candle_store import CandleStore
+from engine.services.db_writer import db_writer
+from engine.services.import_scheduler import ImportScheduler
+from engine.controllers import import_controller
+from engine.tests.helpers import HOUR, temp_database, temp_dir
+
+START_DATE = '2023-01-02'
+CANDLE_MODELS = [Candle, CandleSeries, CandleCoverage, CandleIssue]
+STATE_MODELS = [Task, User]
+
+class PagedExchange:
+    """
+    Hourly candles in pages of 10 up to `last_ts`; raises on page `fail_on` for the symbols
+    in `failing`.
+    """
+    def __init__(self, last_ts):
+        self.last_ts = last_ts
+        self.fail_on = 2
+        self.failing = set()
+        self.calls = []
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((symbol, start_ts))
+        end_ts = self.last_ts if end_ts is None else min(end_ts, self.last_ts)
+        first = -(-start_ts // HOUR) * HOUR
+        for i, page_start in enumerate(range(first, end_ts + 1, 10 * HOUR)):
+            if i == self.fail_on and symbol in self.failing:
+                raise ConnectionError("connection reset by peer")
+            timestamps = np.arange(page_start, min(page_start + 10 * HOUR, end_ts + 1), HOUR, dtype=np.float64)
+            yield np.column_stack([timestamps] + [np.full(len(timestamps), v) for v in (1.0, 2.0, 0.5, 1.5, 10.0)])
+
+class TestBatchImport(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        self.tmp_dir = temp_dir(self)
+        # Tasks and users of this test only: resume_interrupted_imports must not pick up
+        # tasks other tests or earlier runs left in the shared database
+        temp_database(self, STATE_MODELS, os.path.join(self.tmp_dir, 'state.sqlite3'))
+        # A file, not :memory:, because batch items import on their own threads
+        temp_database(self, CANDLE_MODELS, os.path.join(self.tmp_dir, 'candles.sqlite3'))
+
+        # run_import parses the date in local time; 48 closed hourly candles since then
+        self.start_ts = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+        self.exchange = PagedExchange(last_ts=self.start_ts + 47 * HOUR)
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(os.path.join(self.tmp_dir, 'store'))),
+            patch('engine.modes.import_candles_mode.time.time', return_value=(self.start_ts + 48 * HOUR + HOUR // 2) / 1000),
+            patch('engine.modes.import_candles_mode.Binance', side_effect=lambda: self.exchange),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.client = TestClient(app)
+        username = f"user_batch_{uuid.uuid4().hex}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _task(self, task_id):
+        return self.client.get(f"/api/v1/tasks/{task_id}", headers=self.headers).json()
+
+    def _batch(self, *symbols):
+        items = [{"exchange": "Binance", "symbol": s, "start_date": START_DATE, "timeframe": "1h"} for s in symbols]
+        return self.client.post("/api/v1/import/batch", json={"items": items}, headers=self.headers)
+
+    def test_batch_reports_progress_per_item(self):
+        response = self._batch("BTC-USDT", "ETH-USDT", "SOL-USDT")
+        self.assertEqual(response.status_code, 200)
+
+        task = self._task(response.json()["task_id"])
+        self.assertEqual(task["status"], "completed")
+        self.assertEqual([item["symbol"] for item in task["result"]], ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+        for item in task["result"]:
+            self.assertEqual(item["status"], "completed")
+            self.assertEqual(item["result"]["fetched"], 48)
+            self.assertEqual(item["checkpoint"], self.start_ts + 47 * HOUR)
+        self.assertEqual(Candle.select().count(), 3 * 48)
+
+    def test_failed_items_resume_from_their_checkpoints(self):
+        self.exchange.failing = {"ETH-USDT"}
+        task_id = self._batch("BTC-USDT", "ETH-USDT").json()["task_id"]
+
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "failed")
+        self.assertEqual(task["error"], "1 of 2 imports failed")
+        btc, eth = task["result"]
+        self.assertEqual(btc["status"], "completed")
+        self.assertEqual((eth["status"], eth["error"]), ("failed", "connection reset by peer"))
+        self.assertEqual(eth["checkpoint"], self.start_ts + 19 * HOUR)
+
+        self.exchange.failing = set()
+        self.exchange.calls = []
+        response = self.client.post(f"/api/v1/import/{task_id}/resume", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "completed")
+        # Only the failed item runs again, after its last committed page
+        self.assertEqual(self.exchange.calls, [("ETH-USDT", self.start_ts + 20 * HOUR)])
+        self.assertEqual(task["result"][1]["status"], "completed")
+        self.assertEqual(Candle.select().count(), 2 * 48)
+
+    def test_startup_resumes_interrupted_batches(self):
+        task_id = f"interrupted_batch_{uuid.uuid4().hex}"
+        params = [{"exchange": "Binance", "symbol": s, "start_date": START_DATE, "timeframe": "1h"}
+                  for s in ("BTC-USDT", "ETH-USDT")]
+        progress = [dict(params[0], status="completed", checkpoint=self.start_ts + 47 * HOUR),
+                    dict(params[1], status="processing", checkpoint=self.start_ts + 9 * HOUR)]
+        Task.create(id=task_id, type="import_batch", status="processing", params=json.dumps(params),
+                    result=json.dumps(progress), created_at=0, updated_at=0)
+
+        thread = import_controller.resume_interrupted_imports()
+        self.assertIsNotNone(thread)
+        thread.join(timeout=30)
+
+        self.assertEqual(Task.get_by_id(task_id).status, "completed")
+        self.assertEqual(self.exchange.calls, [("ETH-USDT", self.start_ts + 10 * HOUR)])
+
+    def test_tasks_stay_queued_until_they_hold_a_slot(self):
+        scheduler = ImportScheduler(max_concurrent=1, max_per_exchange=1)
+        params = {"exchange": "Binance", "symbol": "BTC-USDT", "start_date": START_DATE, "timeframe": "1h"}
+        progress = import_controller._batch_progress([dict(params, symbol="ETH-USDT")])
+        single_id, batch_id = uuid.uuid4().hex, uuid.uuid4().hex
+        Task.create(id=single_id, type="import", status="queued", params=json.dumps(params), created_at=0, updated_at=0)
+        Task.create(id=batch_id, type="import_batch", status="queued", params=json.dumps([progress[0]]),
+                    result=json.dumps(progress), created_at=0, updated_at=0)
+
+        with patch.object(import_controller, 'import_scheduler', scheduler):
+            with scheduler.slot('Binance'):
+                threads = [threading.Thread(target=import_controller.import_task, args=(single_id, *params.values())),
+                           threading.Thread(target=import_controller.import_batch_task, args=(batch_id, progress))]
+                for thread in threads:
+                    thread.start()
+                deadline = time.monotonic() + 5
+                while scheduler.stats()['waiting'] < 2 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                db_writer.flush()
+                self.assertEqual(Task.get_by_id(single_id).status, "queued")
+                self.assertEqual(Task.get_by_id(batch_id).status, "queued")
+                self.assertEqual(json.loads(Task.get_by_id(batch_id).result)[0]["status"], "queued")
+            for thread in threads:
+                thread.join(timeout=30)
+
+        self.assertEqual(Task.get_by_id(single_id).status, "completed")
+        self.assertEqual(Task.get_by_id(batch_id).status, "completed")
+
+    def test_empty_batch_is_rejected(self):
+        response = self.client.post("/api/v1/import/batch", json={"items": []}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+class TestImportScheduler(unittest.TestCase):
+    def test_run_all_respects_both_limits(self):
+        scheduler = ImportScheduler(max_concurrent=3, max_per_exchange=2)
+        lock = threading.Lock()
+        running = {}
+        peaks = {'total': 0}
+
+        def job(exchange):
+            def run():
+                with lock:
+                    running[exchange] = running.get(exchange, 0) + 1
+                    peaks[exchange] = max(peaks.get(exchange, 0), running[exchange])
+                    peaks['total'] = max(peaks['total'], sum(running.values()))
+                time.sleep(0.05)
+                with lock:
+                    running[exchange] -= 1
+            return exchange, run
+
+        scheduler.run_all([job('binance') for _ in range(6)] + [job('yahoo') for _ in range(6)])
+
+        self.assertEqual(peaks['binance'], 2)
+        self.assertEqual(peaks['yahoo'], 2)
+        self.assertEqual(peaks['total'], 3)
+        self.assertEqual(scheduler.stats()['completed'], 12)
+        self.assertEqual(scheduler.stats()['running'], 0)
+
+    def test_busy_exchange_does_not_hold_up_others(self):
+        scheduler = ImportScheduler(max_concurrent=4, max_per_exchange=1)
+        release = threading.Event()
+        started = []
+
+        def blocking():
+            started.append('binance')
+            release.wait(5)
+
+        def quick():
+            started.append('yahoo')
+
+        batch = threading.Thread(target=scheduler.run_all,
+                                 args=([('Binance', blocking), ('Binance', blocking), ('Yahoo', quick)],))
+        batch.start()
+        # The Yahoo job starts while the second Binance job is still waiting for its slot
+        deadline = time.monotonic() + 5
+        while 'yahoo' not in started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(started, ['binance', 'yahoo'])
+        self.assertEqual(scheduler.stats()['waiting'], 1)
+
+        release.set()
+        batch.join(timeout=5)
+        self.assertEqual(started.count('binance'), 2)
+
+    def test_slot_waits_for_a_free_one(self):
+        scheduler = ImportScheduler(max_concurrent=1, max_per_exchange=1)
+        order = []
+
+        def second():
+            with scheduler.slot('Yahoo'):
+                order.append('second')
+
+        with scheduler.slot('Binance'):
+            thread = threading.Thread(target=second)
+            thread.start()
+            time.sleep(0.05)
+            order.append('first')
+        thread.join(timeout=5)
+        self.assertEqual(order, ['first', 'second'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,277 @@
+import unittest
+import sys
+import os
+import json
+import time
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.exchanges.binance import Binance, KLINES_WEIGHT
+from engine.services.rate_limiter import TokenBucket, RequestScheduler
+
+MINUTE = 60 * 1000
+
+class KlinesServer(ThreadingHTTPServer):
+    """
+    Stand-in for Binance's /api/v3/klines: a 1m candle at every minute from 0 up to
+    `last_ts`, with a delay per request and X-MBX-USED-WEIGHT-1M in every response.
+    The first requests get the `(status, headers)` replies in `errors` instead.
+    """
+    daemon_threads = True
+
+    def __init__(self, last_ts, delay=0.0, fail_from=None, used_weight=0, errors=None):
+        super().__init__(('127.0.0.1', 0), KlinesHandler)
+        self.last_ts = last_ts
+        self.delay = delay
+        self.fail_from = fail_from
+        self.used_weight = used_weight
+        self.errors = list(errors or [])
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class KlinesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.connections.add(self.client_address)
+            error = server.errors.pop(0) if server.errors else None
+        try:
+            time.sleep(server.delay)
+            if error is not None:
+                self._reply(error[0], {'code': -1003, 'msg': 'Too many requests'}, error[1])
+                return
+            query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            start = int(query['startTime'])
+            end = min(int(query.get('endTime', server.last_ts)), server.last_ts)
+            if server.fail_from is not None and start >= server.fail_from:
+                self._reply(500, {'code': -1000, 'msg': 'unknown error'})
+                return
+            first = -(-start // MINUTE) * MINUTE
+            rows = [[ts, "1.0", "2.0", "0.5", str(ts), "10.0", ts + MINUTE - 1]
+                    for ts in range(first, end + 1, MINUTE)][:int(query['limit'])]
+            self._reply(200, rows)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-MBX-USED-WEIGHT-1M', str(self.server.used_weight))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class TestBinanceFetcher(unittest.TestCase):
+    def start_server(self, **kwargs):
+        server = KlinesServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def binance(self, server, workers=4, weight=None):
+        exchange = Binance(base_url=server.url, workers=workers, weight=weight or TokenBucket(6000, 60))
+        # Retries without the production backoff
+        exchange.requests.backoff = 0.01
+        self.addCleanup(exchange.session.close)
+        return exchange
+
+    def test_windows_are_fetched_concurrently_and_reassembled_in_order(self):
+        last_ts = 5499 * MINUTE
+        server = self.start_server(last_ts=last_ts, delay=0.05)
+        candles = self.binance(server).fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual([c['timestamp'] for c in candles], list(range(0, last_ts + 1, MINUTE)))
+        self.assertEqual(candles[7]['close'], 7.0 * MINUTE)
+        # One request per 1000-candle window, several in flight at once
+        self.assertEqual(server.requests, 6)
+        self.assertGreater(server.max_active, 1)
+        self.assertLessEqual(server.max_active, 4)
+
+    def test_connections_are_kept_alive(self):
+        last_ts = 19999 * MINUTE
+        server = self.start_server(last_ts=last_ts)
+        exchange = self.binance(server, workers=2)
+        exchange.fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+        exchange.fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual(server.requests, 40)
+        self.assertLessEqual(len(server.connections), 2)
+
+    def test_open_end_fetches_up_to_now(self):
+        now = int(time.time() * 1000)
+        start = (now // MINUTE - 2499) * MINUTE
+        server = self.start_server(last_ts=now + 10 * MINUTE)
+        candles = self.binance(server).fetch_ohlcv('BTC-USDT', '1m', start)
+
+        timestamps = [c['timestamp'] for c in candles]
+        self.assertEqual(timestamps, list(range(start, timestamps[-1] + 1, MINUTE)))
+        self.assertLessEqual(timestamps[-1], int(time.time() * 1000))
+        self.assertGreaterEqual(len(candles), 2500)
+
+    def test_irregular_interval_pages_serially(self):
+        server = self.start_server(last_ts=2499 * MINUTE)
+        candles = self.binance(server).fetch_ohlcv('BTC-USDT', '1M', 0)
+        # The stand-in serves 1m rows for any interval; paging follows the last candle
+        self.assertEqual(len(candles), 2500)
+        self.assertEqual(server.requests, 3)
+
+    def test_failed_window_raises_after_the_gap_free_prefix(self):
+        last_ts = 4999 * MINUTE
+        server = self.start_server(last_ts=last_ts, fail_from=2000 * MINUTE)
+        pages = []
+        with self.assertRaises(requests.HTTPError):
+            for page in self.binance(server).iter_ohlcv('BTC-USDT', '1m', 0, last_ts):
+                pages.append(page)
+        timestamps = [int(ts) for page in pages for ts in page[:, 0]]
+        self.assertEqual(timestamps, list(range(0, 2000 * MINUTE, MINUTE)))
+
+    def test_failed_irregular_interval_raises(self):
+        server = self.start_server(last_ts=2499 * MINUTE, fail_from=1000 * MINUTE)
+        with self.assertRaises(requests.HTTPError):
+            self.binance(server).fetch_ohlcv('BTC-USDT', '1M', 0)
+
+    def test_transient_errors_are_retried(self):
+        last_ts = 2999 * MINUTE
+        server = self.start_server(last_ts=last_ts, errors=[(503, {}), (502, {})])
+        exchange = self.binance(server, workers=1)
+        candles = exchange.fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual(len(candles), 3000)
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(exchange.requests.stats()['retries'], 2)
+
+    def test_too_many_requests_honours_retry_after(self):
+        last_ts = 1999 * MINUTE
+        server = self.start_server(last_ts=last_ts, errors=[(429, {'Retry-After': '1'})])
+        exchange = self.binance(server, workers=1)
+        started = time.perf_counter()
+        candles = exchange.fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual(len(candles), 2000)
+        self.assertGreaterEqual(time.perf_counter() - started, 1.0)
+        stats = exchange.requests.stats()
+        self.assertEqual((stats['throttled'], stats['budget']['throttles']), (1, 1))
+        # The whole budget slowed down, and recovers from there
+        self.assertLess(stats['budget']['rate_per_second'], exchange.weight.max_rate)
+
+    def test_long_ban_fails_instead_of_waiting(self):
+        server = self.start_server(last_ts=999 * MINUTE, errors=[(418, {'Retry-After': '3600'})])
+        exchange = self.binance(server, workers=1)
+        with self.assertRaises(requests.HTTPError):
+            exchange.fetch_ohlcv('BTC-USDT', '1m', 0, 999 * MINUTE)
+
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(exchange.requests.stats()['failed'], 1)
+
+    def test_reported_weight_throttles_requests(self):
+        last_ts = 5999 * MINUTE
+        # The exchange says the budget is all but spent: 2 left, refilled at 20 per second
+        server = self.start_server(last_ts=last_ts, used_weight=18)
+        weight = TokenBucket(20, 1)
+        started = time.perf_counter()
+        candles = self.binance(server, workers=1, weight=weight).fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual(len(candles), 6000)
+        self.assertGreater(time.perf_counter() - started, 0.3)
+        # How many requests wait depends on scheduling; the refill bounds the total time
+        self.assertGreater(weight.stats()['waits'], 0)
+        self.assertEqual(weight.stats()['acquired'], 6 * KLINES_WEIGHT)
+
+class TestTokenBucket(unittest.TestCase):
+    def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket(10, 1)
+        self.assertEqual(bucket.acquire(10), 0)
+        waited = bucket.acquire(5)
+        self.assertGreater(waited, 0.3)
+        self.assertEqual(bucket.stats()['waits'], 1)
+
+    def test_sync_lowers_the_local_budget(self):
+        bucket = TokenBucket(100, 60)
+        bucket.sync(90)
+        self.assertLessEqual(bucket.stats()['available'], 10.1)
+        # Usage reported below what was spent locally doesn't add budget back
+        bucket.acquire(10)
+        bucket.sync(0)
+        self.assertLess(bucket.stats()['available'], 1)
+
+    def test_throttle_pauses_and_slows_the_refill(self):
+        bucket = TokenBucket(100, 10)
+        bucket.throttle(0.2)
+        self.assertEqual(bucket.stats()['rate_per_second'], 5.0)
+        started = time.perf_counter()
+        bucket.acquire(1)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+
+class HTTPFailure(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = type('Response', (), {'status_code': status, 'headers': headers or {}})()
+
+class TestRequestScheduler(unittest.TestCase):
+    def scheduler(self, **kwargs):
+        return RequestScheduler(TokenBucket(1000, 60), backoff=0.01, **kwargs)
+
+    def test_client_errors_are_not_retried(self):
+        scheduler = self.scheduler()
+        calls = []
+
+        def send():
+            calls.append(1)
+            raise HTTPFailure(400)
+
+        with self.assertRaises(HTTPFailure):
+            scheduler.call(send)
+        self.assertEqual(len(calls), 1)
+
+    def test_gives_up_after_the_last_attempt(self):
+        scheduler = self.scheduler(attempts=3)
+        calls = []
+
+        def send():
+            calls.append(1)
+            raise HTTPFailure(500)
+
+        with self.assertRaises(HTTPFailure):
+            scheduler.call(send)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(scheduler.stats()['retries'], 2)
+
+    def test_retry_after_as_http_date(self):
+        from email.utils import formatdate
+        scheduler = self.scheduler(max_retry_after=30)
+        replies = [HTTPFailure(429, {'Retry-After': formatdate(time.time() + 3600, usegmt=True)})]
+
+        def send():
+            raise replies.pop(0)
+
+        # An hour away: not worth waiting for
+        with self.assertRaises(HTTPFailure):
+            scheduler.call(send)
+        self.assertEqual(scheduler.stats()['throttled'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
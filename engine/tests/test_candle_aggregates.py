@@ -0,0 +1,166 @@
+import unittest
+import sys
+import os
+import calendar
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries
+from engine.services.candle_cache import candle_cache
+from engine.services.candle_store import CandleStore
+from engine.services.candle_loader import load_candles
+from engine.services.candle_aggregates import candle_aggregates, resample, bucket_starts
+from engine.modes.import_candles_mode import _save_candles
+from engine.tests.helpers import MINUTE, HOUR, DAY, candle_rows, make_candles, temp_database, temp_dir
+
+def utc(*args):
+    return calendar.timegm(args + (0,) * (6 - len(args))) * 1000
+
+MONDAY = utc(2024, 1, 8)
+
+def candles_at(timestamps):
+    candles = make_candles(len(timestamps), seed=3, decimals=2)
+    candles[:, 0] = timestamps
+    return candles
+
+def naive_resample(candles, bucket_ms):
+    buckets = {}
+    for c in candles:
+        buckets.setdefault(int(c[0]) // bucket_ms * bucket_ms, []).append(c)
+    return np.array([[start, rows[0][1], max(r[2] for r in rows), min(r[3] for r in rows), rows[-1][4],
+                      sum(r[5] for r in rows)] for start, rows in sorted(buckets.items())])
+
+def insert(symbol, candles, timeframe='1m', exchange='Binance'):
+    Candle.insert_many(candle_rows(candles, exchange, symbol, timeframe)).on_conflict_replace().execute()
+
+class TestResample(unittest.TestCase):
+    def test_matches_naive_grouping(self):
+        timestamps = MONDAY + np.arange(3000) * MINUTE
+        # Holes inside and across bucket boundaries
+        timestamps = np.delete(timestamps, np.r_[100:170, 900:901, 2000:2300])
+        candles = candles_at(timestamps)
+
+        for timeframe, bucket_ms in (('5m', 5 * MINUTE), ('1h', HOUR), ('4h', 4 * HOUR)):
+            np.testing.assert_allclose(resample(candles, timeframe), naive_resample(candles, bucket_ms))
+
+    def test_weekly_buckets_open_on_monday(self):
+        sunday = MONDAY - DAY
+        np.testing.assert_array_equal(bucket_starts([MONDAY, MONDAY + 3 * DAY, sunday], 7 * DAY),
+                                      [MONDAY, MONDAY, MONDAY - 7 * DAY])
+
+    def test_fx_weekend_belongs_to_monday(self):
+        friday = MONDAY - 3 * DAY
+        timestamps = np.concatenate([
+            friday + 21 * HOUR + np.arange(60) * MINUTE,   # last hour before the weekend close
+            MONDAY - 2 * HOUR + np.arange(180) * MINUTE,   # Sunday 22:00 open into Monday
+        ])
+        candles = candles_at(timestamps)
+
+        daily = resample(candles, '1d', fx=True)
+        np.testing.assert_array_equal(daily[:, 0], [friday, MONDAY])
+        self.assertEqual(daily[1, 1], candles[60, 1])
+        self.assertEqual(daily[1, 5], candles[60:, 5].sum())
+
+        # Without the FX session rules Sunday evening is a candle of its own
+        self.assertEqual(len(resample(candles, '1d')), 3)
+
+        weekly = resample(candles, '1w', fx=True)
+        np.testing.assert_array_equal(weekly[:, 0], [MONDAY - 7 * DAY, MONDAY])
+        # Intraday buckets are not shifted, the weekend just has none
+        self.assertEqual(resample(candles, '1h', fx=True)[1, 0], MONDAY - 2 * HOUR)
+
+class TestCandleAggregates(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries])
+        candle_cache.clear()
+        self.symbol = f"AGG-{self._testMethodName}"
+        self.candles = candles_at(MONDAY + np.arange(2 * 1440) * MINUTE)
+
+    def test_higher_timeframe_is_served_from_1m(self):
+        insert(self.symbol, self.candles)
+
+        loaded = load_candles('Binance', self.symbol, '1h', MONDAY, MONDAY + 2 * DAY)
+        np.testing.assert_allclose(loaded, naive_resample(self.candles, HOUR))
+        # Reads don't materialize anything; imports do
+        self.assertEqual(candle_aggregates.materialized('Binance', self.symbol), [])
+        candle_aggregates.update('Binance', self.symbol, MONDAY, MONDAY, timeframes=['1h'])
+        self.assertEqual(candle_aggregates.materialized('Binance', self.symbol), ['1h'])
+
+        # Sub-ranges come from the table without resampling
+        with patch.object(candle_aggregates, '_iter_buckets') as iter_buckets:
+            window = candle_aggregates.read_range('Binance', self.symbol, '1h', MONDAY + 5 * HOUR, MONDAY + 7 * HOUR)
+        iter_buckets.assert_not_called()
+        np.testing.assert_allclose(window, naive_resample(self.candles, HOUR)[5:8])
+
+    def test_series_rebuild_under_their_own_lock(self):
+        lock = candle_aggregates.lock('Binance', self.symbol, '1h')
+        self.assertIs(candle_aggregates.lock('binance', self.symbol, '1h'), lock)
+        self.assertIsNot(candle_aggregates.lock('Binance', self.symbol, '4h'), lock)
+        insert(self.symbol, self.candles[:60])
+        with candle_aggregates.lock('Binance', 'OTHER', '1h'):
+            candle_aggregates.update('Binance', self.symbol, MONDAY, MONDAY, timeframes=['1h'])
+        self.assertEqual(candle_aggregates.materialized('Binance', self.symbol), ['1h'])
+
+    def test_imported_candles_take_precedence(self):
+        insert(self.symbol, self.candles)
+        imported = naive_resample(self.candles, HOUR)
+        imported[:, 4] += 1
+        insert(self.symbol, imported, timeframe='1h')
+
+        np.testing.assert_allclose(load_candles('Binance', self.symbol, '1h', MONDAY, MONDAY + 2 * DAY), imported)
+        self.assertEqual(candle_aggregates.materialized('Binance', self.symbol), [])
+
+    def test_reads_cover_base_candles_the_table_has_not_seen(self):
+        # The last hour is still open: only half of it is stored
+        insert(self.symbol, self.candles[:90])
+        candle_aggregates.update('Binance', self.symbol, MONDAY, MONDAY, timeframes=['15m'])
+        self.assertEqual(len(candle_aggregates.read_range('Binance', self.symbol, '15m', 0, 10**13)), 6)
+
+        insert(self.symbol, self.candles[90:1440])
+        with patch.object(candle_aggregates, '_rebuild') as rebuild:
+            np.testing.assert_allclose(candle_aggregates.read_range('Binance', self.symbol, '15m', 0, 10**13),
+                                       naive_resample(self.candles[:1440], 15 * MINUTE))
+
+            # Backfill before the first bucket
+            earlier = candles_at(MONDAY - 120 * MINUTE + np.arange(120) * MINUTE)
+            insert(self.symbol, earlier)
+            expected = naive_resample(np.concatenate([earlier, self.candles[:1440]]), 15 * MINUTE)
+            np.testing.assert_allclose(candle_aggregates.read_range('Binance', self.symbol, '15m', 0, 10**13), expected)
+            np.testing.assert_allclose(candle_aggregates.read_range('Binance', self.symbol, '15m', MONDAY - HOUR,
+                                                                    MONDAY + HOUR), expected[4:13])
+        rebuild.assert_not_called()
+
+        # The next import folds everything in
+        candle_aggregates.update('Binance', self.symbol, MONDAY, MONDAY, timeframes=['15m'])
+        with patch.object(candle_aggregates, '_iter_buckets') as iter_buckets:
+            iter_buckets.return_value = iter(())
+            stored = candle_aggregates.read_range('Binance', self.symbol, '15m', 0, MONDAY + DAY - 16 * MINUTE)
+        np.testing.assert_allclose(stored, expected[:-1])
+
+    def test_import_updates_touched_buckets_only(self):
+        insert(self.symbol, self.candles)
+        candle_aggregates.update('Binance', self.symbol, MONDAY, MONDAY, timeframes=['1h'])
+
+        corrected = self.candles[600:610].copy()
+        corrected[:, 2] = 500.0
+        with patch('engine.modes.import_candles_mode.candle_store', CandleStore(temp_dir(self))), \
+                patch.object(candle_aggregates, 'timeframes', ['4h']):
+            _save_candles('Binance', self.symbol, '1m', [
+                {'timestamp': int(c[0]), 'open': c[1], 'high': c[2], 'low': c[3], 'close': c[4], 'volume': c[5]}
+                for c in corrected
+            ])
+
+        hourly = candle_aggregates.read_range('Binance', self.symbol, '1h', 0, 10**13)
+        four_hourly = candle_aggregates.read_range('Binance', self.symbol, '4h', 0, 10**13)
+        self.assertEqual(hourly[10, 2], 500.0)
+        self.assertEqual(four_hourly[2, 2], 500.0)
+        self.assertEqual(sorted(candle_aggregates.materialized('Binance', self.symbol)), ['1h', '4h'])
+
+        expected = self.candles.copy()
+        expected[600:610] = corrected
+        np.testing.assert_allclose(hourly, naive_resample(expected, HOUR))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import numpy as np
+from functools import partial
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleCoverage, CandleSeries
+from engine.services import candle_archive as archive_module
+from engine.services import candle_loader
+from engine.services.candle_archive import CandleArchive, encode_block, decode_block
+from engine.services.candle_loader import load_candles_from_tiers, load_candles
+from engine.services.candle_store import CandleStore
+from engine.services.candle_coverage import candle_coverage
+from engine import archive_candles as archive_script
+from engine.tests.helpers import MINUTE, DAY, candle_rows, make_candles, temp_database, temp_dir
+
+# EURUSD-like 5-decimal quotes
+fx_candles = partial(make_candles, price=1.1, volatility=0.0001, seed=1, decimals=5)
+
+class TestCandleArchive(unittest.TestCase):
+    def setUp(self):
+        self.archive = CandleArchive(temp_dir(self))
+
+    def test_block_round_trip_is_exact(self):
+        candles = fx_candles(5000)
+        block = encode_block(candles)
+        np.testing.assert_array_equal(decode_block(block), candles)
+        self.assertLess(len(block), candles.nbytes / 2)
+
+    def test_read_decodes_only_touched_blocks(self):
+        candles = fx_candles(50000)
+        with patch.object(archive_module, 'BLOCK_ROWS', 1000):
+            self.assertEqual(self.archive.append('Yahoo', 'EURUSD=X', '1m', candles), 50)
+
+        with patch.object(archive_module, 'decode_block', wraps=decode_block) as decoder:
+            window = self.archive.read_range('Yahoo', 'EURUSD=X', '1m', 1500 * MINUTE, 2500 * MINUTE)
+        self.assertEqual(decoder.call_count, 2)
+        np.testing.assert_array_equal(window, candles[1500:2501])
+
+        self.assertIsNone(self.archive.read_range('Yahoo', 'GBPUSD=X', '1m', 0, 10**13))
+        self.assertEqual(self.archive.stats('Yahoo', 'EURUSD=X', '1m')['rows'], 50000)
+
+    def test_later_blocks_win(self):
+        candles = fx_candles(10)
+        self.archive.append('Yahoo', 'EURUSD=X', '1m', candles)
+        replacement = candles[3:5].copy()
+        replacement[:, 4] = 9.0
+        self.archive.append('Yahoo', 'EURUSD=X', '1m', replacement)
+
+        merged = self.archive.read_range('Yahoo', 'EURUSD=X', '1m', 0, 10**13)
+        self.assertEqual(len(merged), 10)
+        self.assertEqual(merged[3, 4], 9.0)
+
+class TestArchiveCandles(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleCoverage, CandleSeries])
+        self.tmp_dir = temp_dir(self)
+        self.archive = CandleArchive(self.tmp_dir)
+        self.store = CandleStore(os.path.join(self.tmp_dir, 'store'))
+        self.patches = [
+            patch.object(candle_loader, 'candle_archive', self.archive),
+            patch.object(archive_script, 'candle_archive', self.archive),
+            patch.object(candle_loader, 'candle_store', self.store),
+            patch.object(archive_script, 'candle_store', self.store),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.now = 400 * DAY
+        self.candles = fx_candles(3000, start=self.now - 3000 * MINUTE - 2 * DAY)
+        Candle.insert_many(candle_rows(self.candles, 'Yahoo', 'EURUSD=X')).execute()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_moves_old_candles_and_reads_across_tiers(self):
+        with patch('engine.archive_candles.time.time', return_value=self.now / 1000):
+            moved = archive_script.archive_candles(older_than_days=3)
+
+        cutoff = self.now - 3 * DAY
+        self.assertEqual(moved, int((self.candles[:, 0] < cutoff).sum()))
+        self.assertEqual(Candle.select().where(Candle.timestamp < cutoff).count(), 0)
+        self.assertGreater(Candle.select().count(), 0)
+
+        loaded = load_candles_from_tiers('Yahoo', 'EURUSD=X', '1m', 0, 10**13)
+        np.testing.assert_allclose(loaded, self.candles)
+
+        # Coverage was recorded before the rows left SQLite
+        self.assertEqual(candle_coverage.missing('Yahoo', 'EURUSD=X', '1m', MINUTE,
+                                                 int(self.candles[0, 0]), int(self.candles[-1, 0])), [])
+
+        # Nothing older is left: a second run moves nothing
+        with patch('engine.archive_candles.time.time', return_value=self.now / 1000):
+            self.assertEqual(archive_script.archive_candles(older_than_days=3), 0)
+
+    def test_archived_candles_leave_the_candle_store(self):
+        # The store also holds older candles that never were in SQLite
+        older = fx_candles(100, start=int(self.candles[0, 0]) - 100 * MINUTE)
+        self.store.append('Yahoo', 'EURUSD=X', '1m', np.concatenate([older, self.candles]))
+
+        with patch('engine.archive_candles.time.time', return_value=self.now / 1000):
+            moved = archive_script.archive_candles(older_than_days=3)
+
+        cutoff = self.now - 3 * DAY
+        self.assertEqual(moved, 100 + int((self.candles[:, 0] < cutoff).sum()))
+        self.assertEqual(self.store.bounds('Yahoo', 'EURUSD=X', '1m'), (cutoff, int(self.candles[-1, 0])))
+        self.assertEqual(self.archive.stats('Yahoo', 'EURUSD=X', '1m')['first_timestamp'], int(older[0, 0]))
+
+        # The archive serves what the store no longer holds
+        loaded = load_candles('Yahoo', 'EURUSD=X', '1m', 0, 10**13)
+        np.testing.assert_allclose(loaded, np.concatenate([older, self.candles]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from engine.main import app
+from engine.init_db import init_db
+from engine.services.candle_cache import CandleCache, candle_cache
+
+def make_candles(start, count, step=60000):
+    ts = start + np.arange(count) * step
+    return np.column_stack([ts, ts, ts, ts, ts, np.ones(count)]).astype(np.float64)
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, exchange, symbol, timeframe, start_ts, end_ts):
+        self.calls += 1
+        first = -(-start_ts // 60000) * 60000
+        return make_candles(first, (end_ts - first) // 60000 + 1)
+
+class TestCandleCache(unittest.TestCase):
+    def test_hit_and_subrange(self):
+        cache = CandleCache(max_bytes=10**6)
+        loader = CountingLoader()
+
+        full = cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, loader)
+        again = cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, loader)
+        sub = cache.get_or_load('Binance', 'BTC-USDT', '1m', 10 * 60000, 19 * 60000, loader)
+
+        self.assertEqual(loader.calls, 1)
+        self.assertIs(full, again)
+        self.assertEqual(len(sub), 10)
+        self.assertEqual(sub[0, 0], 10 * 60000)
+        self.assertFalse(sub.flags.writeable)
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+        # A different timeframe is a different series
+        cache.get_or_load('Binance', 'BTC-USDT', '1h', 10 * 60000, 19 * 60000, loader)
+        self.assertEqual(loader.calls, 2)
+
+    def test_lru_eviction(self):
+        one_entry = make_candles(0, 100).nbytes
+        cache = CandleCache(max_bytes=one_entry * 2)
+        loader = CountingLoader()
+
+        cache.get_or_load('Binance', 'A', '1m', 0, 99 * 60000, loader)
+        cache.get_or_load('Binance', 'B', '1m', 0, 99 * 60000, loader)
+        cache.get_or_load('Binance', 'A', '1m', 0, 99 * 60000, loader)  # A is now most recent
+        cache.get_or_load('Binance', 'C', '1m', 0, 99 * 60000, loader)  # evicts B
+
+        stats = cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['size_bytes'], stats['max_bytes'])
+        self.assertIsNotNone(cache.get('Binance', 'A', '1m', 0, 99 * 60000))
+        self.assertIsNone(cache.get('Binance', 'B', '1m', 0, 99 * 60000))
+
+    def test_invalidate(self):
+        cache = CandleCache(max_bytes=10**6)
+        loader = CountingLoader()
+        cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, loader)
+        cache.get_or_load('Binance', 'BTC-USDT', '1h', 0, 99 * 60000, loader)
+
+        self.assertEqual(cache.invalidate('Binance', 'BTC-USDT', '1m'), 1)
+        cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, loader)
+        self.assertEqual(loader.calls, 3)
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_load_racing_an_invalidate_is_not_cached(self):
+        cache = CandleCache(max_bytes=10**6)
+        loader = CountingLoader()
+
+        def load_then_write(*args):
+            candles = loader(*args)
+            # A write to the series lands while the old candles are still being returned
+            cache.invalidate('Binance', 'BTC-USDT', '1m')
+            return candles
+
+        cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, load_then_write)
+        self.assertEqual(cache.stats()['entries'], 0)
+        cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, loader)
+        self.assertEqual((loader.calls, cache.stats()['entries']), (2, 1))
+
+    def test_empty_ranges_are_not_kept(self):
+        cache = CandleCache(max_bytes=10**6)
+        empty = lambda *args: np.empty((0, 6))
+        cache.get_or_load('Binance', 'BTC-USDT', '1m', 0, 99 * 60000, empty)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+class TestCandleCacheEndpoint(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        self.client = TestClient(app)
+        username = f"user_cache_{int(time.time())}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        response = self.client.post("/api/v1/auth/login", data={"username": username, "password": "password123"})
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def test_cache_stats(self):
+        response = self.client.get("/api/v1/candles/cache-stats", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json().keys()), {'entries', 'size_bytes', 'max_bytes', 'hits', 'misses', 'evictions'})
+
+        response = self.client.post("/api/v1/candles/clear-cache", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(candle_cache.stats()['entries'], 0)
+
+    def test_cache_stats_requires_auth(self):
+        response = self.client.get("/api/v1/candles/cache-stats")
+        self.assertEqual(response.status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+import sys
+import os
+import io
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.main import app
+from engine.config import db
+from engine.init_db import init_db
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue
+from engine.services import candle_files
+from engine.services.candle_store import CandleStore
+from engine.services.candle_coverage import candle_coverage
+from engine.services.candle_files import export_candles, import_candle_file
+from engine.tests.helpers import MINUTE, candle_rows, make_candles, temp_database, temp_dir
+
+class TestCandleFiles(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries, CandleCoverage, CandleIssue])
+        self.tmp_dir = temp_dir(self)
+        self.store = CandleStore(os.path.join(self.tmp_dir, 'candles'))
+        self.store_patch = patch.object(candle_files, 'candle_store', self.store)
+        self.store_patch.start()
+
+    def tearDown(self):
+        self.store_patch.stop()
+
+    def test_round_trip_through_store(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(1000))
+        for file_format in ('parquet', 'arrow'):
+            path = os.path.join(self.tmp_dir, f'btc.{file_format}')
+            rows = export_candles('Binance', 'BTC-USDT', '1m', 100 * MINUTE, 899 * MINUTE, path, file_format, batch_rows=64)
+            self.assertEqual(rows, 800)
+
+            self.assertEqual(import_candle_file(path, symbol=f'COPY-{file_format}'), 800)
+            copied = self.store.open('Binance', f'COPY-{file_format}', '1m')
+            np.testing.assert_array_equal(copied, make_candles(1000)[100:900])
+
+    def test_parquet_layout(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(10))
+        path = os.path.join(self.tmp_dir, 'btc.parquet')
+        export_candles('Binance', 'BTC-USDT', '1m', 0, 10 * MINUTE, path)
+
+        table = pq.read_table(path)
+        self.assertEqual(table.column_names, ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(table.schema.field('timestamp').type, pa.int64())
+        self.assertEqual(table.schema.metadata[b'symbol'], b'BTC-USDT')
+
+    def test_export_from_database(self):
+        Candle.insert_many([{
+            'timestamp': i * MINUTE, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': 10,
+            'exchange': 'Yahoo', 'symbol': 'EURUSD=X', 'timeframe': '1m'
+        } for i in range(50)]).execute()
+
+        path = os.path.join(self.tmp_dir, 'eur.arrow')
+        self.assertEqual(export_candles('Yahoo', 'EURUSD=X', '1m', 0, 10**13, path, 'arrow', batch_rows=16), 50)
+        with pa.ipc.open_file(path) as reader:
+            self.assertEqual(reader.num_record_batches, 4)
+            self.assertEqual(reader.read_all().column('close').to_pylist(), [1.5] * 50)
+
+    def test_import_validates_and_covers_the_file(self):
+        candles = make_candles(300)
+        candles[150, 2] = candles[150, 3] - 1  # high < low
+        path = os.path.join(self.tmp_dir, 'btc.parquet')
+        pq.write_table(pa.Table.from_arrays([pa.array(candles[:, 0].astype(np.int64))] +
+                                            [pa.array(candles[:, i]) for i in range(1, 6)],
+                                            schema=candle_files.CANDLE_SCHEMA), path)
+
+        self.assertEqual(import_candle_file(path, 'Binance', 'BTC-USDT', '1m', batch_rows=64), 300)
+        stored = self.store.open('Binance', 'BTC-USDT', '1m')
+        self.assertEqual(len(stored), 299)
+        self.assertNotIn(150 * MINUTE, stored[:, 0])
+        self.assertIn(('ohlc', 150 * MINUTE), [(issue.rule, issue.timestamp) for issue in CandleIssue.select()])
+        # The rejected candle stays uncovered so the next import fetches it
+        self.assertEqual(candle_coverage.missing('Binance', 'BTC-USDT', '1m', MINUTE, 0, 299 * MINUTE),
+                         [(150 * MINUTE, 150 * MINUTE)])
+
+    def test_import_seeds_the_store_from_the_database_in_batches(self):
+        Candle.insert_many(candle_rows(make_candles(100))).execute()
+        path = os.path.join(self.tmp_dir, 'btc.arrow')
+        source = CandleStore(os.path.join(self.tmp_dir, 'source'))
+        source.append('Binance', 'BTC-USDT', '1m', make_candles(50, start=100 * MINUTE))
+        with patch.object(candle_files, 'candle_store', source):
+            export_candles('Binance', 'BTC-USDT', '1m', 100 * MINUTE, 10**13, path, 'arrow')
+
+        with patch.object(self.store, 'append', wraps=self.store.append) as append:
+            import_candle_file(path, batch_rows=32)
+        # 100 seeded candles in batches of 32, then the file
+        self.assertEqual([len(call.args[3]) for call in append.call_args_list], [32, 32, 32, 4, 50])
+        np.testing.assert_array_equal(self.store.open('Binance', 'BTC-USDT', '1m')[:, 0], np.arange(150) * MINUTE)
+
+    def test_import_requires_series_name(self):
+        path = os.path.join(self.tmp_dir, 'plain.parquet')
+        pq.write_table(pa.table({name: [1.0] for name in ['timestamp', 'open', 'high', 'low', 'close', 'volume']}), path)
+        with self.assertRaises(ValueError):
+            import_candle_file(path)
+        self.assertEqual(import_candle_file(path, 'Binance', 'BTC-USDT', '1m'), 1)
+
+    def test_import_rejects_missing_values(self):
+        path = os.path.join(self.tmp_dir, 'gaps.parquet')
+        columns = {name: [1.0, 2.0] for name in ['timestamp', 'open', 'high', 'low', 'volume']}
+        columns['close'] = [1.0, None]
+        pq.write_table(pa.table(columns), path)
+        with self.assertRaises(ValueError):
+            import_candle_file(path, 'Binance', 'BTC-USDT', '1m')
+
+class TestCandleFilesEndpoint(unittest.TestCase):
+    def setUp(self):
+        # Other tests leave the candle models bound to their in-memory databases
+        db.bind([Candle, CandleSeries], bind_refs=False, bind_backrefs=False)
+        init_db()
+        self.client = TestClient(app)
+        username = f"user_files_{int(time.time())}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        response = self.client.post("/api/v1/auth/login", data={"username": username, "password": "password123"})
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        self.store = CandleStore(temp_dir(self))
+        self.store_patch = patch.object(candle_files, 'candle_store', self.store)
+        self.store_patch.start()
+
+    def tearDown(self):
+        self.store_patch.stop()
+
+    def test_export_and_upload(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(20))
+        response = self.client.get("/api/v1/candles/export", headers=self.headers, params={
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1m', 'format': 'parquet'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(pq.read_table(io.BytesIO(response.content)).num_rows, 20)
+
+        response = self.client.post("/api/v1/candles/import-file", headers=self.headers,
+                                    files={'file': ('btc.parquet', response.content)}, data={'symbol': 'BTC-COPY'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows'], 20)
+        self.assertEqual(len(self.store.open('Binance', 'BTC-COPY', '1m')), 20)
+
+    def test_unknown_format(self):
+        response = self.client.get("/api/v1/candles/export", headers=self.headers, params={
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1m', 'format': 'csv'
+        })
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
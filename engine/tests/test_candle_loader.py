@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries
+from engine.services.candle_store import CandleStore
+from engine.services.candle_cache import CandleCache
+from engine.services import candle_loader
+from engine.modes import import_candles_mode
+from engine.tests.helpers import temp_database, temp_dir
+
+class TestCandleLoader(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries])
+        Candle.insert_many([{
+            'timestamp': i * 60000, 'open': 100 + i, 'high': 101 + i, 'low': 99 + i, 'close': 100.5 + i, 'volume': 3,
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1m'
+        } for i in range(25)]).execute()
+        # Same timestamps on another timeframe must not leak into 1m loads
+        Candle.insert_many([{
+            'timestamp': i * 60000, 'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1,
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1h'
+        } for i in range(5)]).execute()
+
+    def test_bulk_load_matches_orm(self):
+        candles = candle_loader.load_candles_from_db('Binance', 'BTC-USDT', '1m', 5 * 60000, 14 * 60000, chunk_size=4)
+        self.assertEqual(candles.dtype, np.float64)
+        self.assertEqual(candles.shape, (10, 6))
+
+        expected = [[c.timestamp, float(c.open), float(c.high), float(c.low), float(c.close), float(c.volume)]
+                    for c in Candle.select().where(
+                        (Candle.timeframe == '1m') & (Candle.timestamp.between(5 * 60000, 14 * 60000))
+                    ).order_by(Candle.timestamp)]
+        np.testing.assert_array_equal(candles, np.array(expected))
+
+    def test_empty_range(self):
+        candles = candle_loader.load_candles_from_db('Binance', 'ETH-USDT', '1m', 0, 10**13)
+        self.assertEqual(candles.shape, (0, 6))
+
+    def test_prefers_candle_store(self):
+        store = CandleStore(temp_dir(self))
+        store.append('Binance', 'BTC-USDT', '1m', np.array([[0, 7, 8, 6, 7.5, 1]], dtype=np.float64))
+        with patch.object(candle_loader, 'candle_store', store):
+            candles = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 0, 10**13)
+        # The store wins within its bounds, SQLite fills in the rest of the range
+        self.assertEqual(len(candles), 25)
+        self.assertEqual(candles[0, 1], 7)
+        self.assertEqual(candles[1, 1], 101)
+
+    def test_store_holding_only_a_tail_keeps_older_candles(self):
+        store = CandleStore(temp_dir(self))
+        tail = np.array([[(25 + i) * 60000, 1, 2, 0.5, 1.5, 10] for i in range(5)], dtype=np.float64)
+        with patch.object(candle_loader, 'candle_store', store), \
+             patch.object(import_candles_mode, 'candle_store', store):
+            # An incremental import of the tail is the series' first write to the store
+            import_candles_mode._save_candles('Binance', 'BTC-USDT', '1m', tail)
+            candles = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 0, 10**13)
+            chunks = list(candle_loader.iter_candle_chunks('Binance', 'BTC-USDT', '1m', 0, 60 * 60000, 7))
+
+        self.assertEqual(len(store.open('Binance', 'BTC-USDT', '1m')), 30)
+        np.testing.assert_array_equal(candles[:, 0], np.arange(30) * 60000)
+        np.testing.assert_array_equal(np.concatenate(chunks), candles)
+
+    def test_reads_outside_store_bounds_come_from_sqlite(self):
+        # e.g. a store written by a file import that never saw the SQLite candles
+        store = CandleStore(temp_dir(self))
+        store.append('Binance', 'BTC-USDT', '1m', np.array([[i * 60000, 7, 8, 6, 7.5, 1] for i in range(10, 15)]))
+        with patch.object(candle_loader, 'candle_store', store):
+            candles = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 5 * 60000, 19 * 60000)
+            inside = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 11 * 60000, 13 * 60000)
+
+        np.testing.assert_array_equal(candles[:, 0], np.arange(5, 20) * 60000)
+        np.testing.assert_array_equal(candles[:, 1], [105, 106, 107, 108, 109] + [7] * 5 + [115, 116, 117, 118, 119])
+        self.assertIsInstance(inside, np.memmap)
+
+    def test_reads_outside_the_store_go_through_the_cache(self):
+        store = CandleStore(temp_dir(self))
+        store.append('Binance', 'BTC-USDT', '1m', np.array([[i * 60000, 7, 8, 6, 7.5, 1] for i in range(20, 25)]))
+        cache = CandleCache(max_bytes=10**6)
+        with patch.object(candle_loader, 'candle_store', store), patch.object(candle_loader, 'candle_cache', cache):
+            first = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 0, 24 * 60000)
+            again = candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 0, 24 * 60000)
+            # Inside the store: sliced from the map, the cache isn't asked
+            candle_loader.load_candles('Binance', 'BTC-USDT', '1m', 21 * 60000, 23 * 60000)
+
+        np.testing.assert_array_equal(again, first)
+        self.assertEqual(len(first), 25)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (1, 1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+import sqlite3
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries, CandleCoverage
+from engine.services.candle_store import CandleStore
+from engine.services.candle_partitions import candle_partitions, CandlePartitions
+from engine.services.candle_loader import load_candles_from_db
+from engine.services.candle_coverage import candle_coverage
+from engine.modes.import_candles_mode import _save_candles
+from engine.partition_candles import partition_candles
+from engine.tests.helpers import HOUR, temp_database, temp_dir
+
+def make_candles(count):
+    return [{'timestamp': i * HOUR, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 10.0}
+            for i in range(count)]
+
+class TestCandlePartitions(unittest.TestCase):
+    def setUp(self):
+        self.db = temp_database(self, [Candle, CandleSeries, CandleCoverage])
+        self.tmp_dir = temp_dir(self)
+        self.patches = [
+            patch.object(candle_partitions, 'mode', 'symbol'),
+            patch.object(candle_partitions, 'base_dir', os.path.join(self.tmp_dir, 'partitions')),
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(os.path.join(self.tmp_dir, 'candles'))),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        candle_partitions.close_all()
+        for p in self.patches:
+            p.stop()
+
+    def test_symbols_get_their_own_file(self):
+        _save_candles('Binance', 'BTC-USDT', '1h', make_candles(10))
+        _save_candles('Binance', 'ETH/USDT', '1h', make_candles(4))
+
+        for symbol in ('BTC-USDT', 'ETH/USDT'):
+            self.assertTrue(os.path.exists(candle_partitions.path_for('Binance', symbol)))
+        self.assertEqual(Candle.select().count(), 0)
+
+        candles = load_candles_from_db('Binance', 'BTC-USDT', '1h', 0, 100 * HOUR)
+        self.assertEqual(candles.shape, (10, 6))
+        self.assertEqual(len(load_candles_from_db('Binance', 'ETH/USDT', '1h', 0, 100 * HOUR)), 4)
+
+    def test_coverage_is_kept_in_the_partition(self):
+        _save_candles('Binance', 'BTC-USDT', '1h', make_candles(10))
+        candle_coverage.add('Binance', 'BTC-USDT', '1h', HOUR, 0, 9 * HOUR)
+
+        self.assertEqual(candle_coverage.missing('Binance', 'BTC-USDT', '1h', HOUR, 0, 12 * HOUR), [(10 * HOUR, 12 * HOUR)])
+        self.assertEqual(candle_coverage.stored_count('Binance', 'BTC-USDT', '1h', 0, 12 * HOUR), 10)
+        self.assertEqual(CandleCoverage.select().count(), 0)
+
+    def test_writer_lock_is_per_symbol(self):
+        _save_candles('Binance', 'BTC-USDT', '1h', make_candles(1))
+
+        # Another process holds the BTC write lock
+        blocker = sqlite3.connect(candle_partitions.path_for('Binance', 'BTC-USDT'))
+        blocker.execute('BEGIN IMMEDIATE')
+        try:
+            _save_candles('Binance', 'ETH-USDT', '1h', make_candles(3))
+        finally:
+            blocker.rollback()
+            blocker.close()
+
+        self.assertEqual(len(load_candles_from_db('Binance', 'ETH-USDT', '1h', 0, 100 * HOUR)), 3)
+
+    def test_drop_removes_file(self):
+        _save_candles('Binance', 'BTC-USDT', '1h', make_candles(3))
+
+        self.assertTrue(candle_partitions.drop('Binance', 'BTC-USDT'))
+        self.assertFalse(os.path.exists(candle_partitions.path_for('Binance', 'BTC-USDT')))
+        self.assertFalse(candle_partitions.drop('Binance', 'BTC-USDT'))
+
+    def test_partition_existing_candles(self):
+        with patch.object(candle_partitions, 'mode', 'none'):
+            _save_candles('Binance', 'BTC-USDT', '1h', make_candles(6))
+            _save_candles('Yahoo', 'EURUSD=X', '1h', make_candles(2))
+            candle_coverage.add('Binance', 'BTC-USDT', '1h', HOUR, 0, 5 * HOUR)
+
+        self.assertEqual(partition_candles(self.db), 8)
+        self.assertEqual(Candle.select().count(), 0)
+        self.assertEqual(len(load_candles_from_db('Binance', 'BTC-USDT', '1h', 0, 100 * HOUR)), 6)
+        self.assertEqual(len(load_candles_from_db('Yahoo', 'EURUSD=X', '1h', 0, 100 * HOUR)), 2)
+        self.assertEqual(candle_coverage.missing('Binance', 'BTC-USDT', '1h', HOUR, 0, 5 * HOUR), [])
+
+        # Running it again is a no-op
+        self.assertEqual(partition_candles(self.db), 0)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            CandlePartitions(self.tmp_dir, 'year')
+
+if __name__ == '__main__':
+    unittest.main()
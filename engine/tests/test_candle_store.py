@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import threading
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import CandleSeries
+from engine.services.candle_store import CandleStore
+from engine.tests.helpers import temp_database, temp_dir
+
+def make_candles(start, count, step=60000, price=100.0):
+    rows = []
+    for i in range(count):
+        p = price + i
+        rows.append([start + i * step, p, p + 1, p - 1, p + 0.5, 10])
+    return np.array(rows, dtype=np.float64)
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [CandleSeries])
+        self.tmp_dir = temp_dir(self)
+        self.store = CandleStore(self.tmp_dir)
+
+    def test_missing_series(self):
+        self.assertIsNone(self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13))
+
+    def test_append_and_read_range(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(0, 100))
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(100 * 60000, 50, price=200.0))
+
+        candles = self.store.read_range('Binance', 'BTC-USDT', '1m', 10 * 60000, 119 * 60000)
+        self.assertIsInstance(candles, np.memmap)
+        self.assertEqual(candles.shape, (110, 6))
+        self.assertEqual(candles[0, 0], 10 * 60000)
+        self.assertEqual(candles[-1, 0], 119 * 60000)
+        self.assertEqual(candles[-1, 1], 219.0)
+
+        series = CandleSeries.get(CandleSeries.symbol == 'BTC-USDT')
+        self.assertEqual(series.count, 150)
+        self.assertEqual(series.first_timestamp, 0)
+        self.assertEqual(series.last_timestamp, 149 * 60000)
+
+    def test_overlapping_append_replaces(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(0, 10))
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(5 * 60000, 10, price=500.0))
+
+        candles = self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13)
+        self.assertEqual(len(candles), 15)
+        self.assertTrue(np.all(np.diff(candles[:, 0]) > 0))
+        self.assertEqual(candles[4, 1], 104.0)
+        self.assertEqual(candles[5, 1], 500.0)
+
+    def test_timeframes_are_separate(self):
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(0, 10))
+        self.store.append('Binance', 'BTC-USDT', '1h', make_candles(0, 3, step=3600000))
+
+        self.assertEqual(len(self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13)), 10)
+        self.assertEqual(len(self.store.read_range('Binance', 'BTC-USDT', '1h', 0, 10**13)), 3)
+
+    def test_concurrent_writes_to_a_series_lose_nothing(self):
+        # Written from several threads
+        temp_database(self, [CandleSeries], os.path.join(self.tmp_dir, 'catalog.sqlite3'))
+
+        def write(offset):
+            # Interleaved pages: most land before the tail and merge
+            for page in range(20):
+                self.store.append('Binance', 'BTC-USDT', '1m', make_candles((page * 8 + offset) * 10 * 60000, 10))
+
+        threads = [threading.Thread(target=write, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        candles = self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13)
+        self.assertEqual(len(candles), 8 * 20 * 10)
+        self.assertTrue(np.all(np.diff(candles[:, 0]) == 60000))
+        self.assertEqual(os.listdir(os.path.dirname(self.store.path_for('Binance', 'BTC-USDT', '1m'))), ['1m.f64'])
+
+    def test_writer_merges_pages_before_the_tail_once(self):
+        path = self.store.path_for('Binance', 'BTC-USDT', '1m')
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(0, 10))
+        self.store.append('Binance', 'BTC-USDT', '1m', make_candles(100 * 60000, 10))
+        inode = os.stat(path).st_ino
+
+        writer = self.store.writer('Binance', 'BTC-USDT', '1m')
+        # Filling the gap: staged, the series file is left alone
+        for start in range(10, 100, 10):
+            self.assertFalse(writer.write(make_candles(start * 60000, 10, price=300.0)))
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(len(self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13)), 20)
+        # After the tail: appended right away
+        self.assertTrue(writer.write(make_candles(110 * 60000, 5)))
+
+        self.assertEqual(writer.flush(), (10 * 60000, 99 * 60000))
+        candles = self.store.read_range('Binance', 'BTC-USDT', '1m', 0, 10**13)
+        self.assertEqual(candles[:, 0].tolist(), [i * 60000 for i in range(115)])
+        self.assertEqual(candles[10, 1], 300.0)
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['1m.f64'])
+        self.assertIsNone(writer.flush())
+
+if __name__ == '__main__':
+    unittest.main()
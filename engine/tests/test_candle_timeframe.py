@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+from peewee import SqliteDatabase
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle
+from engine.migrate_db import migrate_db
+
+test_db = SqliteDatabase(':memory:')
+
+class TestCandleTimeframe(unittest.TestCase):
+    def setUp(self):
+        test_db.bind([Candle], bind_refs=False, bind_backrefs=False)
+        test_db.connect()
+
+    def tearDown(self):
+        test_db.drop_tables([Candle])
+        test_db.close()
+
+    def _insert(self, timeframe, step, count=5):
+        Candle.insert_many([{
+            'timestamp': i * step, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': 10,
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': timeframe
+        } for i in range(count)]).on_conflict_replace().execute()
+
+    def test_timeframes_do_not_overwrite(self):
+        test_db.create_tables([Candle])
+        self._insert('1h', 3600000)
+        self._insert('1m', 60000)
+
+        self.assertEqual(Candle.select().where(Candle.timeframe == '1h').count(), 5)
+        self.assertEqual(Candle.select().where(Candle.timeframe == '1m').count(), 5)
+
+    def test_writes_go_through_the_view(self):
+        test_db.create_tables([Candle])
+        self._insert('1h', 3600000)
+        # Re-importing replaces rows instead of duplicating them
+        Candle.insert({
+            'timestamp': 0, 'open': 1, 'high': 2, 'low': 0.5, 'close': 9, 'volume': 10,
+            'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1h'
+        }).on_conflict_replace().execute()
+        Candle.update(volume=20).where(Candle.timestamp == 3600000).execute()
+        Candle.delete().where(Candle.timestamp == 7200000).execute()
+
+        self.assertEqual(test_db.execute_sql('SELECT COUNT(*) FROM candle_data').fetchone()[0], 4)
+        self.assertEqual(test_db.execute_sql('SELECT COUNT(*) FROM instrument').fetchone()[0], 1)
+        self.assertEqual(float(Candle.get(Candle.timestamp == 0).close), 9)
+        self.assertEqual(float(Candle.get(Candle.timestamp == 3600000).volume), 20)
+
+    def test_range_scan_uses_primary_key(self):
+        test_db.create_tables([Candle])
+        query = Candle.select(
+            Candle.timestamp, Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume
+        ).where(
+            (Candle.exchange == 'Binance') &
+            (Candle.symbol == 'BTC-USDT') &
+            (Candle.timeframe == '1m') &
+            (Candle.timestamp >= 0) &
+            (Candle.timestamp <= 10**13)
+        ).order_by(Candle.timestamp)
+        sql, params = query.sql()
+        plan = " ".join(str(row) for row in test_db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+        self.assertIn("PRIMARY KEY", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_migrates_legacy_table(self):
+        # Schema before the timeframe column existed
+        test_db.execute_sql("""
+            CREATE TABLE candle (
+                id INTEGER NOT NULL PRIMARY KEY, timestamp BIGINT NOT NULL,
+                open DECIMAL(20, 8) NOT NULL, high DECIMAL(20, 8) NOT NULL, low DECIMAL(20, 8) NOT NULL,
+                close DECIMAL(20, 8) NOT NULL, volume DECIMAL(20, 8) NOT NULL,
+                exchange VARCHAR(255) NOT NULL, symbol VARCHAR(255) NOT NULL)
+        """)
+        test_db.execute_sql('CREATE UNIQUE INDEX candle_exchange_symbol_timestamp ON candle (exchange, symbol, timestamp)')
+        for i in range(10):
+            test_db.execute_sql(
+                "INSERT INTO candle (timestamp, open, high, low, close, volume, exchange, symbol) VALUES (?, 1, 2, 0.5, 1.5, 10, 'Yahoo', 'EURUSD=X')",
+                (i * 900000,)
+            )
+
+        migrate_db(test_db)
+        test_db.create_tables([Candle])
+
+        self.assertTrue(Candle.table_exists())
+        self.assertIn('candle_data', test_db.get_tables())
+        self.assertEqual(Candle.select().where(Candle.timeframe == '15m').count(), 10)
+
+        # Running it again is a no-op
+        migrate_db(test_db)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import unittest
+import sys
+import os
+import time
+import numpy as np
+from functools import partial
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import db
+from engine.main import app
+from engine.init_db import init_db
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue, Task
+from engine.services.candle_store import CandleStore, candle_dicts_to_array
+from engine.services.candle_validation import validate_candles
+from engine.modes.import_candles_mode import run_import
+from engine.tests.helpers import HOUR, make_candles, temp_database, temp_dir
+
+START = 1672531200000  # 2023-01-01 00:00 UTC
+hourly_candles = partial(make_candles, start=START, step=HOUR, volatility=0.2, seed=5)
+
+def rules(issues):
+    return sorted((issue['rule'], issue['action'], issue['timestamp']) for issue in issues)
+
+class TestValidateCandles(unittest.TestCase):
+    def test_clean_batch_passes_through(self):
+        candles = hourly_candles(200)
+        clean, positions, issues = validate_candles(candles, HOUR)
+        self.assertEqual(issues, [])
+        np.testing.assert_array_equal(clean, candles)
+
+    def test_broken_rows_are_dropped(self):
+        candles = hourly_candles(10)
+        candles[2, 2] = candles[2, 3] - 1      # high < low
+        candles[4, 4] = candles[4, 2] + 1      # close above high
+        candles[6, 1] = np.nan
+        candles[7, 5] = -1
+
+        clean, positions, issues = validate_candles(candles, HOUR)
+        self.assertEqual(rules(issues), sorted([
+            ('ohlc', 'dropped', START + 2 * HOUR), ('ohlc', 'dropped', START + 4 * HOUR),
+            ('invalid', 'dropped', START + 6 * HOUR), ('invalid', 'dropped', START + 7 * HOUR),
+        ]))
+        self.assertEqual(len(clean), 6)
+        np.testing.assert_array_equal(positions, [0, 1, 3, 5, 8, 9])
+
+    def test_order_and_duplicates_are_repaired(self):
+        candles = hourly_candles(6)
+        duplicate = candles[1].copy()
+        duplicate[4] = duplicate[3]            # later row for the same hour wins
+        candles = np.vstack([candles[[0, 2, 1, 3, 4, 5]], duplicate])
+
+        clean, positions, issues = validate_candles(candles, HOUR)
+        self.assertEqual(rules(issues), sorted([
+            ('order', 'repaired', START + HOUR),
+            ('order', 'repaired', START + HOUR),
+            ('duplicate', 'dropped', START + HOUR),
+        ]))
+        np.testing.assert_array_equal(clean[:, 0], START + np.arange(6) * HOUR)
+        self.assertEqual(clean[1, 4], duplicate[4])
+        np.testing.assert_array_equal(positions, [0, 6, 1, 3, 4, 5])
+
+    def test_misaligned_bars_are_flagged_not_moved(self):
+        candles = hourly_candles(6)
+        candles[3, 0] += 60000                 # one minute off the hourly grid
+        clean, positions, issues = validate_candles(candles, HOUR)
+        self.assertEqual(rules(issues), [('alignment', 'flagged', START + 3 * HOUR + 60000)])
+        np.testing.assert_array_equal(clean, candles)
+
+        # Daily bars at the exchange's session open (05:00 UTC) are on its grid
+        daily = hourly_candles(10)
+        daily[:, 0] = START + 5 * HOUR + np.arange(10) * 24 * HOUR
+        clean, _, issues = validate_candles(daily, 24 * HOUR)
+        self.assertEqual(issues, [])
+        np.testing.assert_array_equal(clean, daily)
+
+    def test_spikes_are_flagged_not_dropped(self):
+        candles = hourly_candles(200)
+        candles[120, 2] = candles[120, 1] * 3  # wick far outside the usual range
+        candles[150, [1, 2, 3, 4]] *= 2        # price jump with no volume
+        candles[150, 5] = 0
+
+        clean, positions, issues = validate_candles(candles, HOUR)
+        flagged = {(issue['rule'], issue['timestamp']) for issue in issues}
+        self.assertIn(('outlier', START + 120 * HOUR), flagged)
+        self.assertIn(('zero_volume_spike', START + 150 * HOUR), flagged)
+        self.assertTrue(all(issue['action'] == 'flagged' for issue in issues))
+        self.assertEqual(len(clean), 200)
+
+class BadExchange:
+    """
+    Hourly candles for the first day of 2023, with one broken candle until it is fixed.
+    """
+    def __init__(self):
+        self.candles = hourly_candles(24)
+        self.candles[10, 2] = self.candles[10, 3] - 1
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((start_ts, end_ts))
+        rows = self.candles[(self.candles[:, 0] >= start_ts) & (self.candles[:, 0] <= end_ts)]
+        return [{'timestamp': int(c[0]), 'open': c[1], 'high': c[2], 'low': c[3], 'close': c[4], 'volume': c[5]}
+                for c in rows]
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        yield candle_dicts_to_array(self.fetch_ohlcv(symbol, timeframe, start_ts, end_ts))
+
+class TestImportValidation(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries, CandleCoverage, CandleIssue])
+        self.exchange = BadExchange()
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(temp_dir(self))),
+            patch('engine.modes.import_candles_mode.time.time', return_value=(START + 24 * HOUR) / 1000),
+            patch('engine.modes.import_candles_mode.Binance', return_value=self.exchange),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_rejected_candles_are_recorded_and_refetched(self):
+        # run_import parses the date in local time; pin it to START
+        start_date = '2023-01-01'
+        with patch('engine.modes.import_candles_mode.time.mktime', return_value=START / 1000):
+            first = run_import('Binance', 'BTC-USDT', start_date, '1h', task_id='task-1')
+
+        self.assertEqual(first['rejected'], 1)
+        self.assertEqual(first['issues'], {'ohlc': 1})
+        self.assertEqual(Candle.select().count(), 23)
+        issue = CandleIssue.get()
+        self.assertEqual((issue.task_id, issue.rule, issue.timestamp), ('task-1', 'ohlc', START + 10 * HOUR))
+
+        # The exchange corrected the candle; only its slot is requested again
+        self.exchange.candles[10, 2] = self.exchange.candles[10, 3] + 1
+        with patch('engine.modes.import_candles_mode.time.mktime', return_value=START / 1000):
+            second = run_import('Binance', 'BTC-USDT', start_date, '1h', task_id='task-2')
+
+        self.assertEqual(second['fetched'], 1)
+        self.assertEqual(self.exchange.calls[-1][0], START + 10 * HOUR)
+        self.assertEqual(Candle.select().count(), 24)
+
+class TestTaskIssuesEndpoint(unittest.TestCase):
+    def setUp(self):
+        # Other tests leave the candle models bound to their in-memory databases
+        db.bind([Candle, CandleSeries, CandleCoverage, CandleIssue], bind_refs=False, bind_backrefs=False)
+        init_db()
+        self.client = TestClient(app)
+        username = f"user_issues_{time.time()}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_lists_findings_of_a_task(self):
+        task_id = f"issues_{time.time()}"
+        now = int(time.time())
+        Task.create(id=task_id, type="import", status="completed", created_at=now, updated_at=now)
+        for ts, rule in ((START + HOUR, 'outlier'), (START, 'ohlc')):
+            CandleIssue.create(task_id=task_id, exchange='Binance', symbol='BTC-USDT', timeframe='1h',
+                               timestamp=ts, rule=rule, action='flagged', detail=None, created_at=now)
+
+        response = self.client.get(f"/api/v1/tasks/{task_id}/issues", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([issue['rule'] for issue in response.json()], ['ohlc', 'outlier'])
+
+        response = self.client.get(f"/api/v1/tasks/{task_id}/issues?rule=outlier", headers=self.headers)
+        self.assertEqual(len(response.json()), 1)
+
+        response = self.client.get("/api/v1/tasks/missing/issues", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
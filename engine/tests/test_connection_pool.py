@@ -0,0 +1,175 @@
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+from fastapi.testclient import TestClient
+from peewee import SqliteDatabase, OperationalError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import db, read_db
+from engine.main import app
+from engine.init_db import init_db
+from engine.models.core import Task, CandleIssue
+from engine.services.connection_pool import MeteredPooledSqliteDatabase, WriterSqliteDatabase, read_database, reading
+
+class TestMeteredPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'pool.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_connections_are_reused(self):
+        pool = MeteredPooledSqliteDatabase(self.path, max_connections=2)
+        for _ in range(5):
+            pool.connect()
+            pool.execute_sql('SELECT 1')
+            pool.close()
+
+        stats = pool.stats()
+        self.assertEqual((stats['opened'], stats['closed'], stats['checkouts']), (1, 0, 5))
+        self.assertEqual((stats['in_use'], stats['idle']), (0, 1))
+        pool.close_all()
+        self.assertEqual(pool.stats()['closed'], 1)
+
+    def test_waits_are_measured(self):
+        pool = MeteredPooledSqliteDatabase(self.path, max_connections=1, wait_timeout=5)
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            pool.connect()
+            held.set()
+            release.wait()
+            pool.close()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait()
+        threading.Timer(0.2, release.set).start()
+        pool.connect()
+        pool.close()
+        holder.join()
+
+        stats = pool.stats()
+        self.assertGreaterEqual(stats['exhausted'], 1)
+        self.assertGreaterEqual(stats['max_wait_seconds'], 0.15)
+        self.assertEqual(stats['opened'], 1)
+        pool.close_all()
+
+    def test_readers_cannot_write(self):
+        writer = MeteredPooledSqliteDatabase(self.path)
+        writer.execute_sql('CREATE TABLE "t" ("x" INTEGER)')
+        writer.close()
+        reader = MeteredPooledSqliteDatabase(self.path, pragmas={'query_only': 1})
+        with self.assertRaises(OperationalError):
+            reader.execute_sql('INSERT INTO "t" VALUES (1)')
+        self.assertEqual(reader.execute_sql('SELECT COUNT(*) FROM "t"').fetchone()[0], 0)
+        reader.close_all()
+        writer.close_all()
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.writer = WriterSqliteDatabase(os.path.join(self.tmp_dir, 'writer.sqlite3'), wait_timeout=5)
+        self.writer.execute_sql('CREATE TABLE "t" ("x" INTEGER)')
+
+    def tearDown(self):
+        self.writer.close_all()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_threads_share_one_connection(self):
+        def write(offset):
+            for i in range(20):
+                self.writer.execute_sql('INSERT INTO "t" VALUES (?)', (offset + i,))
+                with self.writer.atomic():
+                    self.writer.execute_sql('INSERT INTO "t" VALUES (?)', (-offset - i,))
+
+        threads = [threading.Thread(target=write, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.writer.execute_sql('SELECT COUNT(*) FROM "t"').fetchone()[0], 160)
+        stats = self.writer.stats()
+        self.assertEqual((stats['opened'], stats['in_use']), (1, 0))
+
+    def test_rows_outlive_the_checkout(self):
+        self.writer.execute_sql('INSERT INTO "t" VALUES (1), (2), (3)')
+        cursor = self.writer.execute_sql('SELECT "x" FROM "t" ORDER BY "x"')
+        self.assertTrue(self.writer.is_closed())
+        self.assertEqual([row[0] for row in cursor], [1, 2, 3])
+        cursor = self.writer.execute_sql('DELETE FROM "t" WHERE "x" > 1 RETURNING "x"')
+        self.assertEqual((sorted(cursor.fetchall()), cursor.rowcount), ([(2,), (3,)], 2))
+
+    def test_transaction_holds_the_connection(self):
+        others_done = threading.Event()
+        other = threading.Thread(target=lambda: (self.writer.execute_sql('INSERT INTO "t" VALUES (2)'),
+                                                 others_done.set()))
+        with self.writer.atomic():
+            self.writer.execute_sql('INSERT INTO "t" VALUES (1)')
+            other.start()
+            # The other thread waits for the connection, not on SQLite's lock
+            self.assertFalse(others_done.wait(0.2))
+            self.assertEqual(self.writer.stats()['in_use'], 1)
+        other.join()
+        self.assertTrue(self.writer.is_closed())
+        self.assertEqual(self.writer.execute_sql('SELECT COUNT(*) FROM "t"').fetchone()[0], 2)
+
+class TestReadRouting(unittest.TestCase):
+    def test_reads_go_to_the_reader_pool(self):
+        other = SqliteDatabase(':memory:')
+        self.assertIs(read_database(db), read_db)
+        self.assertIs(read_database(other), other)
+
+        with db.atomic():
+            # A writer in a transaction reads its own uncommitted rows
+            self.assertIs(read_database(db), db)
+
+    def test_reader_connection_goes_back_to_the_pool(self):
+        init_db()
+        in_use = read_db.stats()['in_use']
+        with reading(db) as reader:
+            self.assertIs(reader, read_db)
+            reader.execute_sql('SELECT 1')
+            self.assertEqual(read_db.stats()['in_use'], in_use + 1)
+        self.assertEqual(read_db.stats()['in_use'], in_use)
+
+class TestPooledEndpoints(unittest.TestCase):
+    def setUp(self):
+        # Other tests leave models bound to their in-memory databases
+        db.bind([Task, CandleIssue], bind_refs=False, bind_backrefs=False)
+        init_db()
+        self.client = TestClient(app)
+        username = f"user_pool_{time.time()}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_task_reads_reuse_pooled_connections(self):
+        task_id = f"pool_{time.time()}"
+        now = int(time.time())
+        Task.create(id=task_id, type="import", status="completed", created_at=now, updated_at=now)
+
+        self.client.get(f"/api/v1/tasks/{task_id}", headers=self.headers)
+        before = read_db.stats()
+        for _ in range(10):
+            response = self.client.get(f"/api/v1/tasks/{task_id}", headers=self.headers)
+            self.assertEqual(response.json()['status'], 'completed')
+        after = read_db.stats()
+        # One checkout for the user lookup and one for the task
+        self.assertEqual(after['checkouts'] - before['checkouts'], 20)
+        self.assertEqual(after['opened'], before['opened'])
+
+        pools = self.client.get("/api/v1/system/database", headers=self.headers).json()['pools']
+        self.assertEqual(set(pools), {'writer', 'reader'})
+        self.assertGreater(pools['reader']['checkouts'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
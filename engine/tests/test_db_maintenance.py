@@ -0,0 +1,153 @@
+import unittest
+import sys
+import os
+import time
+import threading
+import shutil
+import tempfile
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from peewee import SqliteDatabase
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import SQLITE_PRAGMAS
+from engine.main import app
+from engine.init_db import init_db
+from engine.services.connection_pool import WriterSqliteDatabase
+from engine.services.db_maintenance import DatabaseMaintenance
+from engine.services.db_writer import db_writer
+
+def fill_and_delete(database, rows=2000):
+    database.execute_sql('CREATE TABLE IF NOT EXISTS "blob" ("payload" TEXT)')
+    with database.atomic():
+        for _ in range(rows):
+            database.execute_sql('INSERT INTO "blob" VALUES (?)', ('x' * 1000,))
+    database.execute_sql('DELETE FROM "blob"')
+
+class TestDatabaseMaintenance(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'maintenance.sqlite3')
+        self.database = SqliteDatabase(self.path, pragmas=SQLITE_PRAGMAS, timeout=10)
+        self.database.connect()
+        self.maintenance = DatabaseMaintenance(interval=0, idle_seconds=0, vacuum_step_pages=64)
+
+    def tearDown(self):
+        self.database.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_frees_pages_and_truncates_wal(self):
+        fill_and_delete(self.database)
+        before = self.maintenance.report(self.database)
+        self.assertEqual(before['auto_vacuum'], 'incremental')
+        self.assertGreater(before['free_pages'], 64)
+        self.assertGreater(before['wal_bytes'], 0)
+
+        result = self.maintenance.maintain(self.database)
+        self.assertIsNone(result['stopped'])
+        self.assertTrue(result['optimized'])
+        self.assertTrue(result['wal_truncated'])
+        self.assertEqual(result['freed_pages'], before['free_pages'])
+        self.assertEqual(result['after']['free_pages'], 0)
+        self.assertEqual(result['after']['wal_bytes'], 0)
+        self.assertLess(result['after']['size_bytes'], before['size_bytes'] + before['wal_bytes'])
+
+    def test_gives_way_to_a_writer(self):
+        fill_and_delete(self.database)
+        writer = SqliteDatabase(self.path, timeout=10)
+        writer.connect()
+        writer.execute_sql('BEGIN IMMEDIATE')
+        try:
+            started = time.perf_counter()
+            result = self.maintenance.maintain(self.database)
+            elapsed = time.perf_counter() - started
+        finally:
+            writer.execute_sql('ROLLBACK')
+            writer.close()
+
+        self.assertIn('locked', result['stopped'])
+        self.assertEqual(result['freed_pages'], 0)
+        self.assertLess(elapsed, 2)
+        # The normal busy timeout is restored for the connection's other users
+        self.assertEqual(self.database.execute_sql('PRAGMA busy_timeout').fetchone()[0], 10000)
+
+    def test_waits_for_imports_to_go_quiet(self):
+        maintenance = DatabaseMaintenance(interval=0, idle_seconds=60)
+        with patch.object(maintenance, 'run') as run:
+            with maintenance.activity():
+                self.assertFalse(maintenance.tick())
+            # Finished just now: still within idle_seconds
+            self.assertFalse(maintenance.tick())
+            maintenance._last_activity -= 61
+            self.assertTrue(maintenance.tick())
+        run.assert_called_once_with()
+
+    def test_vacuum_stops_when_an_import_starts(self):
+        fill_and_delete(self.database)
+        with self.maintenance.activity():
+            result = self.maintenance.maintain(self.database)
+        self.assertEqual(result['stopped'], 'busy')
+        self.assertEqual(result['freed_pages'], 0)
+        self.assertFalse(result['wal_truncated'])
+
+    def test_queued_writes_count_as_activity(self):
+        with patch.object(db_writer, 'pending', return_value=3):
+            self.assertFalse(self.maintenance.is_idle())
+        self.assertTrue(self.maintenance.is_idle())
+
+    def test_writers_get_the_connection_between_steps(self):
+        writer = WriterSqliteDatabase(os.path.join(self.tmp_dir, 'writer.sqlite3'),
+                                      pragmas=SQLITE_PRAGMAS, wait_timeout=1)
+        fill_and_delete(writer)
+        maintenance = DatabaseMaintenance(interval=0, idle_seconds=0, vacuum_step_pages=16)
+        errors = []
+
+        def write():
+            try:
+                writer.execute_sql('INSERT INTO "blob" VALUES (?)', ('y',))
+            except Exception as e:
+                errors.append(e)
+
+        def idle():
+            # Checked between steps: another thread must be able to write right now
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            return True
+
+        try:
+            with patch.object(maintenance, 'is_idle', side_effect=idle):
+                result = maintenance.maintain(writer)
+            self.assertEqual(errors, [])
+            self.assertIsNone(result['stopped'])
+            self.assertEqual(result['after']['free_pages'], 0)
+            self.assertTrue(writer.is_closed())
+            self.assertGreater(writer.execute_sql('SELECT COUNT(*) FROM "blob"').fetchone()[0], 1)
+        finally:
+            writer.close_all()
+
+class TestDatabaseEndpoint(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        self.client = TestClient(app)
+        username = f"user_system_{time.time()}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_reports_and_runs_maintenance(self):
+        response = self.client.post("/api/v1/system/database/maintenance", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['databases'])
+
+        response = self.client.get("/api/v1/system/database", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertIn('fragmentation', body['databases'][0])
+        self.assertEqual(body['last_maintenance']['databases'][0]['before']['path'],
+                         body['databases'][0]['path'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+from peewee import SqliteDatabase, IntegrityError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import db
+from engine.models.core import Task, User
+from engine.services.db_writer import DatabaseWriter
+
+def create_task(task_id, status='queued'):
+    return Task.insert(id=task_id, type='import', status=status, created_at=0, updated_at=0)
+
+class TestDatabaseWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.database = SqliteDatabase(os.path.join(self.tmp_dir, 'writer.sqlite3'), pragmas={'journal_mode': 'wal'})
+        self.database.bind([Task], bind_refs=False, bind_backrefs=False)
+        self.database.create_tables([Task])
+        self.writer = DatabaseWriter(interval=0.05)
+
+    def tearDown(self):
+        self.writer.stop()
+        self.database.close()
+        db.bind([Task], bind_refs=False, bind_backrefs=False)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_writes_inline_until_started(self):
+        self.writer.execute(create_task('a')).result()
+        future = self.writer.update(Task, 'a', status='processing')
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 1)
+        self.assertEqual(Task.get_by_id('a').status, 'processing')
+        self.assertEqual(self.writer.update(Task, 'missing', status='processing').result(), 0)
+
+    def test_status_updates_are_coalesced_into_one_transaction(self):
+        self.writer.execute(create_task('a')).result()
+        self.writer.start()
+
+        futures = [self.writer.update(Task, 'a', status=f"step-{i}", updated_at=i) for i in range(50)]
+        futures.append(self.writer.update(Task, 'a', result='done'))
+        self.assertEqual(futures[-1].result(timeout=5), 1)
+        self.assertTrue(all(f.result(timeout=5) == 1 for f in futures))
+
+        task = Task.get_by_id('a')
+        self.assertEqual((task.status, task.updated_at, task.result), ('step-49', 49, 'done'))
+        stats = self.writer.stats()
+        self.assertEqual(stats['coalesced'], 50)
+        # The insert, then all 51 updates as one statement
+        self.assertEqual((stats['statements'], stats['transactions']), (2, 2))
+
+    def test_updates_are_not_merged_across_other_writes(self):
+        self.writer.start()
+        first = self.writer.update(Task, 'a', status='processing')
+        self.writer.execute(create_task('a'))
+        second = self.writer.update(Task, 'a', status='completed')
+
+        # The first update ran before the row existed
+        self.assertEqual(first.result(timeout=5), 0)
+        self.assertEqual(second.result(timeout=5), 1)
+        self.assertEqual(Task.get_by_id('a').status, 'completed')
+
+    def test_a_failing_write_only_fails_itself(self):
+        self.writer.execute(create_task('a')).result()
+        self.writer.start()
+        ok = self.writer.update(Task, 'a', status='processing')
+        duplicate = self.writer.execute(create_task('a'))
+        other = self.writer.execute(create_task('b'))
+
+        with self.assertRaises(IntegrityError):
+            duplicate.result(timeout=5)
+        self.assertEqual(ok.result(timeout=5), 1)
+        other.result(timeout=5)
+        self.assertEqual(Task.select().count(), 2)
+        self.assertEqual(self.writer.stats()['failed'], 1)
+
+    def test_concurrent_jobs_share_transactions(self):
+        with self.database.atomic():
+            for job in range(12):
+                create_task(f"job-{job}").execute()
+        self.writer.start()
+
+        errors = []
+        def job(n):
+            try:
+                futures = [self.writer.update(Task, f"job-{n}", status='processing', updated_at=step)
+                           for step in range(100)]
+                self.writer.update(Task, f"job-{n}", status='completed').result(timeout=10)
+                for future in futures:
+                    future.result(timeout=10)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=job, args=(n,)) for n in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Task.select().where(Task.status == 'completed').count(), 12)
+        stats = self.writer.stats()
+        self.assertEqual(stats['submitted'], 12 * 101)
+        self.assertLess(stats['transactions'], 12 * 101)
+
+    def test_stop_commits_queued_writes(self):
+        self.writer.execute(create_task('a')).result()
+        self.writer.start()
+        future = self.writer.update(Task, 'a', status='completed')
+        self.writer.stop()
+        self.assertTrue(future.done())
+        self.assertEqual(Task.get_by_id('a').status, 'completed')
+
+    def test_writes_go_to_the_database_their_model_is_bound_to(self):
+        other = SqliteDatabase(os.path.join(self.tmp_dir, 'other.sqlite3'))
+        other.bind([User], bind_refs=False, bind_backrefs=False)
+        other.create_tables([User])
+        self.addCleanup(db.bind, [User], bind_refs=False, bind_backrefs=False)
+        self.addCleanup(other.close)
+
+        # The same database whether the write runs inline or on the writer thread
+        self.writer.execute(User.insert(username='inline', password_hash='x', created_at=0)).result()
+        self.writer.start()
+        futures = [self.writer.execute(create_task('a')),
+                   self.writer.execute(User.insert(username='queued', password_hash='x', created_at=0))]
+        for future in futures:
+            future.result(timeout=5)
+
+        self.assertEqual(Task.select().count(), 1)
+        self.assertEqual(sorted(user.username for user in User.select()), ['inline', 'queued'])
+        self.assertEqual(self.database.execute_sql('SELECT COUNT(*) FROM "task"').fetchone()[0], 1)
+        self.assertEqual(other.execute_sql('SELECT COUNT(*) FROM "user"').fetchone()[0], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import sys
+import os
+from decimal import Decimal
+import numpy as np
+from peewee import SqliteDatabase, CharField
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import PRICE_ENCODING
+from engine.models.base import BaseModel
+from engine.models.core import Candle, ClosedTrade, Order, Trade, Ticker, Option
+from engine.models.fields import FixedPointField
+from engine.convert_prices import convert_prices, check_price_encoding, stored_price_encoding
+from engine.services import candle_loader
+from engine.services.candle_scales import prepare_instrument, exact_scale, fitting_scale
+
+test_db = SqliteDatabase(':memory:')
+MODELS = [Candle, ClosedTrade, Order, Trade, Ticker, Option]
+
+class FixedQuote(BaseModel):
+    symbol = CharField()
+    price = FixedPointField(decimal_places=8)
+    qty = FixedPointField(decimal_places=8, null=True)
+
+class TestFixedPointField(unittest.TestCase):
+    def setUp(self):
+        test_db.bind([FixedQuote], bind_refs=False, bind_backrefs=False)
+        test_db.connect()
+        test_db.create_tables([FixedQuote])
+
+    def tearDown(self):
+        test_db.drop_tables([FixedQuote])
+        test_db.close()
+
+    def test_round_trip(self):
+        FixedQuote.create(symbol='BTC-USDT', price=20000.12345678, qty=None)
+        raw = test_db.execute_sql('SELECT price, typeof(price) FROM fixedquote').fetchone()
+        self.assertEqual(raw, (2000012345678, 'integer'))
+
+        quote = FixedQuote.get()
+        self.assertEqual(quote.price, Decimal('20000.12345678'))
+        self.assertIsNone(quote.qty)
+        # Query parameters are encoded the same way
+        self.assertEqual(FixedQuote.select().where(FixedQuote.price > 20000).count(), 1)
+
+    def test_bulk_decode(self):
+        decoded = FixedQuote.price.to_float_array(np.array([150000000, 123456789]))
+        np.testing.assert_array_equal(decoded, np.array([1.5, 1.23456789]))
+
+    def test_overflow(self):
+        with self.assertRaises(ValueError):
+            FixedQuote.price.db_value(10 ** 12)
+
+@unittest.skipUnless(PRICE_ENCODING == 'decimal', "conversion tests start from decimal storage")
+class TestConvertPrices(unittest.TestCase):
+    def setUp(self):
+        test_db.bind(MODELS, bind_refs=False, bind_backrefs=False)
+        test_db.connect()
+        test_db.create_tables(MODELS)
+        Candle.insert_many([{
+            'timestamp': i * 60000, 'open': 100.5 + i, 'high': 101.25 + i, 'low': 99.125 + i, 'close': 100.75 + i,
+            'volume': 12.5, 'exchange': 'Binance', 'symbol': 'BTC-USDT', 'timeframe': '1m'
+        } for i in range(10)] + [{
+            'timestamp': i * 60000, 'open': 0.00001234, 'high': 0.00001235, 'low': 0.00001233, 'close': 0.00001234,
+            'volume': 1e12, 'exchange': 'Binance', 'symbol': 'SHIB-USDT', 'timeframe': '1m'
+        } for i in range(10)]).execute()
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+
+    def test_convert_round_trip(self):
+        before = {symbol: candle_loader.load_candles_from_db('Binance', symbol, '1m', 0, 10**13)
+                  for symbol in ('BTC-USDT', 'SHIB-USDT')}
+
+        convert_prices('fixed', database=test_db, vacuum=False)
+        self.assertEqual(stored_price_encoding(test_db), 'fixed')
+        raw = test_db.execute_sql('SELECT open, typeof(open), volume FROM candle_data ORDER BY instrument_id, timestamp '
+                                  'LIMIT 1').fetchone()
+        self.assertEqual(raw, (100500, 'integer', 125))
+        # Each symbol gets the scales its values need
+        scales = {symbol: (price_scale, volume_scale) for symbol, price_scale, volume_scale in
+                  test_db.execute_sql('SELECT symbol, price_scale, volume_scale FROM instrument').fetchall()}
+        self.assertEqual(scales, {'BTC-USDT': (1000, 10), 'SHIB-USDT': (10 ** 8, 1)})
+
+        # The models here use DecimalField (PRICE_ENCODING=decimal), so startup must refuse
+        with self.assertRaises(RuntimeError):
+            check_price_encoding(test_db)
+
+        # Bulk loads and the candle view decode with the stored scales
+        for symbol, candles in before.items():
+            decoded = candle_loader.load_candles_from_db('Binance', symbol, '1m', 0, 10**13)
+            np.testing.assert_array_equal(decoded, candles)
+        self.assertEqual(Candle.get(Candle.symbol == 'BTC-USDT', Candle.timestamp == 0).low, Decimal('99.125'))
+
+        convert_prices('decimal', database=test_db, vacuum=False)
+        for symbol, candles in before.items():
+            after = candle_loader.load_candles_from_db('Binance', symbol, '1m', 0, 10**13)
+            np.testing.assert_array_equal(after, candles)
+        check_price_encoding(test_db)
+
+    def test_fresh_database_records_encoding(self):
+        Candle.delete().execute()
+        check_price_encoding(test_db)
+        self.assertEqual(stored_price_encoding(test_db), 'decimal')
+
+class TestCandleScales(unittest.TestCase):
+    def setUp(self):
+        test_db.bind([Candle], bind_refs=False, bind_backrefs=False)
+        test_db.connect()
+        test_db.create_tables([Candle])
+
+    def tearDown(self):
+        test_db.drop_tables([Candle])
+        test_db.close()
+
+    def test_smallest_exact_scale(self):
+        self.assertEqual(exact_scale(np.array([20000.0, 3.0])), 1)
+        self.assertEqual(exact_scale(np.array([20000.12, 0.5])), 100)
+        self.assertEqual(exact_scale(np.array([1 / 3])), 10 ** 8)
+        # Lowered until the largest value fits in int64
+        self.assertEqual(fitting_scale(10 ** 8, 5e12), 10 ** 6)
+
+    def test_scales_grow_with_new_candles(self):
+        def save(prices, volume):
+            candles = np.array([[i, p, p, p, p, volume] for i, p in enumerate(prices)], dtype=np.float64)
+            with test_db.atomic():
+                instrument_id, scales = prepare_instrument(test_db, 'Binance', 'BTC-USDT', candles, encoding='fixed')
+                test_db.execute_sql(
+                    'INSERT OR REPLACE INTO candle_data VALUES ' +
+                    ', '.join(f"({instrument_id}, '1m', {int(c[0])}, " +
+                              ', '.join(str(round(v * scales[0])) for v in c[1:5]) +
+                              f", {round(c[5] * scales[1])})" for c in candles)
+                )
+            return scales
+
+        self.assertEqual(save([20000.0, 20001.0], 3), (1, 1))
+        # A tick of 0.01 rescales the stored candles too
+        self.assertEqual(save([20000.0, 20001.0, 20002.05], 0.5), (100, 10))
+        rows = test_db.execute_sql('SELECT open, volume FROM candle_data ORDER BY timestamp').fetchall()
+        self.assertEqual(rows, [(2000000, 5), (2000100, 5), (2000205, 5)])
+        # Scales never shrink
+        self.assertEqual(save([20003.0], 1), (100, 10))
+        self.assertEqual(candle_loader.load_candles_from_db('Binance', 'BTC-USDT', '1m', 0, 10)[:, 1].tolist(),
+                         [20003.0, 20001.0, 20002.05])
+
+if __name__ == '__main__':
+    unittest.main()
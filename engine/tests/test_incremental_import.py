@@ -0,0 +1,149 @@
+import unittest
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries, CandleCoverage
+from engine.services.candle_store import CandleStore, candle_dicts_to_array
+from engine.services.candle_coverage import candle_coverage
+from engine.modes.import_candles_mode import run_import
+from engine.tests.helpers import HOUR, temp_database, temp_dir
+
+START = 1672531200000  # 2023-01-01 00:00 UTC
+
+class FakeExchange:
+    """
+    Serves hourly candles from START up to `last_ts` and records every request. With
+    `fail_after` set, the download raises after the candles up to that timestamp.
+    """
+    def __init__(self, last_ts):
+        self.last_ts = last_ts
+        self.calls = []
+        self.fail_after = None
+
+    def fetch_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((start_ts, end_ts))
+        first = max(START, -(-start_ts // HOUR) * HOUR)
+        last = min(self.last_ts, end_ts if end_ts is not None else self.last_ts)
+        return [{'timestamp': ts, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 10.0}
+                for ts in range(first, last + 1, HOUR)]
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        # Pages of 10 candles, like a paging adapter
+        candles = candle_dicts_to_array(self.fetch_ohlcv(symbol, timeframe, start_ts, end_ts))
+        if self.fail_after is not None:
+            candles = candles[candles[:, 0] <= self.fail_after]
+        for i in range(0, len(candles), 10):
+            yield candles[i:i + 10]
+        if self.fail_after is not None:
+            raise ConnectionError("connection reset by peer")
+
+class TestIncrementalImport(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries, CandleCoverage])
+        self.tmp_dir = temp_dir(self)
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(self.tmp_dir)),
+            # Freeze "now" at 2023-01-03 00:30 UTC so the last closed 1h candle is 2023-01-02 23:00
+            patch('engine.modes.import_candles_mode.time.time', return_value=(START + 48 * HOUR + HOUR // 2) / 1000),
+        ]
+        for p in self.patches:
+            p.start()
+        self.exchange = FakeExchange(last_ts=START + 47 * HOUR)
+        self.driver_patch = patch('engine.modes.import_candles_mode.Binance', return_value=self.exchange)
+        self.driver_patch.start()
+
+    def tearDown(self):
+        self.driver_patch.stop()
+        for p in self.patches:
+            p.stop()
+
+    def _start_date(self):
+        # run_import parses dates in local time; use the same conversion
+        import time
+        return time.strftime("%Y-%m-%d", time.localtime(START / 1000 + 86400))
+
+    def test_reimport_skips_covered_range(self):
+        first = run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+        self.assertGreater(first['fetched'], 0)
+        self.assertEqual(first['skipped'], 0)
+        self.assertEqual(len(self.exchange.calls), 1)
+
+        second = run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+        self.assertEqual(second['fetched'], 0)
+        self.assertEqual(second['skipped'], first['fetched'])
+        self.assertEqual(len(self.exchange.calls), 1)
+
+    def test_only_hole_is_fetched(self):
+        run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+        stored = Candle.select().count()
+
+        # Punch a hole of 5 candles and forget its coverage
+        hole_start = START + 30 * HOUR
+        hole_end = START + 34 * HOUR
+        Candle.delete().where(Candle.timestamp.between(hole_start, hole_end)).execute()
+        candle_coverage.clear('Binance', 'BTC-USDT', '1h')
+
+        result = run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+        self.assertEqual(result['fetched'], 5)
+        self.assertEqual(self.exchange.calls[-1][0], hole_start)
+        self.assertEqual(Candle.select().count(), stored)
+
+    def test_failed_hole_fetch_covers_only_what_arrived(self):
+        run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+        hole_start = START + 30 * HOUR
+        hole_end = START + 34 * HOUR
+        Candle.delete().where(Candle.timestamp.between(hole_start, hole_end)).execute()
+        candle_coverage.clear('Binance', 'BTC-USDT', '1h')
+        candle_coverage.add('Binance', 'BTC-USDT', '1h', HOUR, START, hole_start - HOUR)
+        candle_coverage.add('Binance', 'BTC-USDT', '1h', HOUR, hole_end + HOUR, START + 47 * HOUR)
+
+        # Two candles of the hole arrive, then the download fails
+        self.exchange.fail_after = hole_start + HOUR
+        with self.assertRaises(ConnectionError):
+            run_import('Binance', 'BTC-USDT', self._start_date(), '1h')
+
+        self.assertEqual(
+            candle_coverage.missing('Binance', 'BTC-USDT', '1h', HOUR, START, START + 47 * HOUR),
+            [(hole_start + 2 * HOUR, hole_end)]
+        )
+
+    def test_missing_windows(self):
+        candle_coverage.add('Binance', 'ETH-USDT', '1h', HOUR, START, START + 9 * HOUR)
+        candle_coverage.add('Binance', 'ETH-USDT', '1h', HOUR, START + 20 * HOUR, START + 29 * HOUR)
+        # Adjacent interval merges into the first one
+        candle_coverage.add('Binance', 'ETH-USDT', '1h', HOUR, START + 10 * HOUR, START + 12 * HOUR)
+
+        self.assertEqual(
+            candle_coverage.intervals('Binance', 'ETH-USDT', '1h', HOUR),
+            [(START, START + 12 * HOUR), (START + 20 * HOUR, START + 29 * HOUR)]
+        )
+        self.assertEqual(
+            candle_coverage.missing('Binance', 'ETH-USDT', '1h', HOUR, START, START + 40 * HOUR),
+            [(START + 13 * HOUR, START + 19 * HOUR), (START + 30 * HOUR, START + 40 * HOUR)]
+        )
+
+    def test_concurrent_adds_keep_every_interval(self):
+        # Written from several threads
+        temp_database(self, [Candle, CandleCoverage], os.path.join(self.tmp_dir, 'coverage.sqlite3'))
+
+        def add(offset):
+            # Intervals two candles apart never merge
+            for i in range(10):
+                start = START + (i * 8 + offset) * 2 * HOUR
+                candle_coverage.add('Binance', 'ETH-USDT', '1h', HOUR, start, start)
+
+        threads = [threading.Thread(target=add, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(candle_coverage.intervals('Binance', 'ETH-USDT', '1h', HOUR),
+                         [(START + n * 2 * HOUR,) * 2 for n in range(80)])
+
+if __name__ == '__main__':
+    unittest.main()
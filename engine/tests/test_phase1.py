@@ -37,7 +37,7 @@ class TestPhase1(unittest.TestCase):
             symbol='BTC-USDT'
         )
         
-        retrieved = Candle.get(Candle.id == candle.id)
+        retrieved = Candle.get((Candle.symbol == 'BTC-USDT') & (Candle.timestamp == candle.timestamp))
         self.assertEqual(retrieved.symbol, 'BTC-USDT')
         self.assertEqual(retrieved.close, Decimal('102.00000000')) # Decimal precision check
 
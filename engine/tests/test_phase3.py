@@ -12,7 +12,7 @@ class TestPhase3(unittest.TestCase):
     def setUp(self):
         self.exchange = Binance()
 
-    @patch('engine.exchanges.binance.requests.get')
+    @patch('engine.exchanges.binance.requests.Session.get')
     def test_fetch_ohlcv(self, mock_get):
         # Mock response data
         # [timestamp, open, high, low, close, volume, ...]
@@ -25,6 +25,7 @@ class TestPhase3(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.json.return_value = mock_data
         mock_response.raise_for_status.return_value = None
+        mock_response.headers = {'X-MBX-USED-WEIGHT-1M': '2'}
         mock_get.return_value = mock_response
 
         # Call the method
@@ -36,7 +37,7 @@ class TestPhase3(unittest.TestCase):
         self.assertEqual(candles[0]['close'], 102.0)
         self.assertEqual(candles[1]['volume'], 600.0)
         
-        # Verify requests.get was called with correct params
+        # Verify the session GET was called with correct params
         mock_get.assert_called()
         args, kwargs = mock_get.call_args
         self.assertIn('params', kwargs)
@@ -0,0 +1,173 @@
+import unittest
+import sys
+import os
+import json
+import time
+import threading
+import requests
+import pandas as pd
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import RESPONSE_CACHE_OPEN_TTL, RESPONSE_CACHE_ADJUSTED_TTL
+from engine.exchanges.binance import Binance
+from engine.exchanges.yahoo import Yahoo
+from engine.services.rate_limiter import TokenBucket
+from engine.services.response_cache import ResponseCache, ResponseCacheMiss
+from engine.tests.helpers import MINUTE, HOUR, temp_dir
+
+class FakeKlines:
+    """
+    Stand-in for Session.get on /api/v3/klines: a 1m candle at every minute of the
+    requested window, counting requests.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, session, url, params=None, timeout=None):
+        with self.lock:
+            self.requests += 1
+        first = -(-params['startTime'] // MINUTE) * MINUTE
+        end = params.get('endTime', int(time.time() * 1000))
+        rows = [[ts, "1.0", "2.0", "0.5", str(ts), "10.0", ts + MINUTE - 1]
+                for ts in range(first, end + 1, MINUTE)][:params['limit']]
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(rows).encode()
+        response.headers['X-MBX-USED-WEIGHT-1M'] = '0'
+        return response
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = temp_dir(self)
+
+    def test_round_trip_and_expiry(self):
+        cache = ResponseCache(self.tmp_dir, 'on')
+        cache.put('binance', {'symbol': 'BTCUSDT', 'startTime': 0}, b'[1, 2]')
+        cache.put('binance', {'symbol': 'BTCUSDT', 'startTime': 1}, b'[3]', ttl=-1)
+
+        # Keyed by the parameters, whatever order they come in
+        self.assertEqual(cache.get('binance', {'startTime': 0, 'symbol': 'BTCUSDT'}), b'[1, 2]')
+        self.assertIsNone(cache.get('binance', {'symbol': 'BTCUSDT', 'startTime': 1}))
+        self.assertIsNone(cache.get('binance', {'symbol': 'ETHUSDT', 'startTime': 0}))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expired'], stats['writes']), (1, 2, 1, 2))
+
+    def test_offline_replays_expired_entries_and_fails_on_a_miss(self):
+        ResponseCache(self.tmp_dir, 'on').put('yahoo', {'start': 0}, b'old', ttl=-1)
+        offline = ResponseCache(self.tmp_dir, 'offline')
+
+        self.assertEqual(offline.get('yahoo', {'start': 0}), b'old')
+        with self.assertRaises(ResponseCacheMiss):
+            offline.get('yahoo', {'start': 1})
+        # Replaying never writes
+        offline.put('yahoo', {'start': 1}, b'new')
+        self.assertFalse(os.path.exists(offline.path_for('yahoo', {'start': 1})))
+
+    def test_off_and_torn_files_read_as_misses(self):
+        cache = ResponseCache(self.tmp_dir, 'on')
+        path = cache.path_for('binance', {'startTime': 0})
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'{"expi')
+        self.assertIsNone(cache.get('binance', {'startTime': 0}))
+
+        off = ResponseCache(self.tmp_dir, 'off')
+        off.put('binance', {'startTime': 1}, b'[]')
+        self.assertIsNone(off.get('binance', {'startTime': 1}))
+        self.assertFalse(os.path.exists(off.path_for('binance', {'startTime': 1})))
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ResponseCache(self.tmp_dir, 'replay')
+
+class TestBinanceResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = temp_dir(self)
+        self.klines = FakeKlines()
+        patcher = patch('requests.Session.get', autospec=True, side_effect=self.klines)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def binance(self, mode, weight=None):
+        exchange = Binance(base_url='http://klines.test', workers=2, weight=weight or TokenBucket(6000, 60),
+                           cache=ResponseCache(self.tmp_dir, mode))
+        self.addCleanup(exchange.session.close)
+        return exchange
+
+    def test_closed_pages_are_replayed_without_requests(self):
+        last_ts = 2999 * MINUTE
+        first = self.binance('on').fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+        self.assertEqual(self.klines.requests, 3)
+
+        weight = TokenBucket(6000, 60)
+        again = self.binance('on', weight).fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+        replayed = self.binance('offline').fetch_ohlcv('BTC-USDT', '1m', 0, last_ts)
+
+        self.assertEqual(self.klines.requests, 3)
+        self.assertEqual(again, first)
+        self.assertEqual(replayed, first)
+        # Cached pages cost no request weight
+        self.assertEqual(weight.stats()['acquired'], 0)
+
+    def test_pages_reaching_now_expire(self):
+        cache = ResponseCache(self.tmp_dir, 'on')
+        start = (int(time.time() * 1000) // MINUTE - 10) * MINUTE
+        self.binance('on').fetch_ohlcv('BTC-USDT', '1m', start)
+
+        [path] = [os.path.join(root, name) for root, _, names in os.walk(os.path.join(self.tmp_dir, 'binance'))
+                  for name in names]
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+        self.assertAlmostEqual(header['expires'], time.time() + RESPONSE_CACHE_OPEN_TTL, delta=5)
+        self.assertEqual(header['request']['startTime'], start)
+        self.assertEqual(path, cache.path_for('binance', header['request']))
+
+    def test_offline_miss_fails_the_fetch(self):
+        with self.assertRaises(ResponseCacheMiss):
+            self.binance('offline').fetch_ohlcv('BTC-USDT', '1m', 0, 999 * MINUTE)
+        self.assertEqual(self.klines.requests, 0)
+
+class TestYahooResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = temp_dir(self)
+        self.calls = 0
+
+        def download(tickers, start, end, **kwargs):
+            self.calls += 1
+            index = pd.date_range(start, end, freq='1h', inclusive='left')
+            frames = {ticker: pd.DataFrame({'Open': 1.0 + i, 'High': 2.0 + i, 'Low': 0.5, 'Close': 1.5 + i,
+                                            'Volume': 10.0}, index=index)
+                      for i, ticker in enumerate(tickers)}
+            return pd.concat(frames, axis=1)
+
+        patcher = patch('engine.exchanges.yahoo.yf.download', side_effect=download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_multi_ticker_downloads_are_replayed(self):
+        start = (int(time.time() * 1000) // HOUR - 48) * HOUR
+        end = start + 23 * HOUR
+        first = Yahoo(cache=ResponseCache(self.tmp_dir, 'on')).fetch_ohlcv_many(['AAPL', 'MSFT'], '1h', start, end)
+        replayed = Yahoo(cache=ResponseCache(self.tmp_dir, 'offline')).fetch_ohlcv_many(['AAPL', 'MSFT'], '1h', start, end)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(first['MSFT']), 24)
+        for symbol in ('AAPL', 'MSFT'):
+            np.testing.assert_array_equal(replayed[symbol], first[symbol])
+
+        # Closed candles: kept until a later adjustment could rewrite them
+        [path] = [os.path.join(root, name) for root, _, names in os.walk(os.path.join(self.tmp_dir, 'yahoo'))
+                  for name in names]
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+        self.assertAlmostEqual(header['expires'], time.time() + RESPONSE_CACHE_ADJUSTED_TTL, delta=5)
+
+        with self.assertRaises(ResponseCacheMiss):
+            Yahoo(cache=ResponseCache(self.tmp_dir, 'offline')).fetch_ohlcv('AAPL', '1h', start, end)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+import sys
+import os
+import json
+import time
+import uuid
+import numpy as np
+import requests
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from peewee import SqliteDatabase
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.main import app
+from engine.init_db import init_db
+from engine.migrate_db import migrate_task_checkpoint
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue, Task, User
+from engine.services.candle_store import CandleStore
+from engine.services.candle_coverage import candle_coverage
+from engine.controllers import import_controller
+from engine.exchanges.binance import Binance
+from engine.services.rate_limiter import TokenBucket
+from engine.modes.import_candles_mode import run_import
+from engine.tests.helpers import MINUTE, HOUR, temp_database, temp_dir
+
+START_DATE = '2023-01-02'
+CANDLE_MODELS = [Candle, CandleSeries, CandleCoverage, CandleIssue]
+STATE_MODELS = [Task, User]
+
+class PagedExchange:
+    """
+    Hourly candles in pages of 10 up to `last_ts`; raises on page `fail_on` of a call.
+    """
+    def __init__(self, last_ts, fail_on=None):
+        self.last_ts = last_ts
+        self.fail_on = fail_on
+        self.calls = []
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((start_ts, end_ts))
+        end_ts = self.last_ts if end_ts is None else min(end_ts, self.last_ts)
+        first = -(-start_ts // HOUR) * HOUR
+        for i, page_start in enumerate(range(first, end_ts + 1, 10 * HOUR)):
+            if i == self.fail_on:
+                raise ConnectionError("connection reset by peer")
+            timestamps = np.arange(page_start, min(page_start + 10 * HOUR, end_ts + 1), HOUR, dtype=np.float64)
+            yield np.column_stack([timestamps] + [np.full(len(timestamps), v) for v in (1.0, 2.0, 0.5, 1.5, 10.0)])
+
+class KlinesSession:
+    """
+    Stands in for the Binance adapter's HTTP session: 1m klines for any range, and a 500
+    for every request starting at or after `fail_from`.
+    """
+    def __init__(self, fail_from=None):
+        self.fail_from = fail_from
+        self.starts = []
+
+    def get(self, url, params, timeout):
+        self.starts.append(params['startTime'])
+        response = requests.Response()
+        response.url = url
+        if self.fail_from is not None and params['startTime'] >= self.fail_from:
+            response.status_code = 500
+            response._content = b'{"code": -1000, "msg": "unknown error"}'
+            return response
+        first = -(-params['startTime'] // MINUTE) * MINUTE
+        rows = [[ts, "1.0", "2.0", "0.5", "1.5", "10.0", ts + MINUTE - 1]
+                for ts in range(first, params['endTime'] + 1, MINUTE)][:params['limit']]
+        response.status_code = 200
+        response._content = json.dumps(rows).encode()
+        return response
+
+class TestResumableImport(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        self.tmp_dir = temp_dir(self)
+        # Tasks and users of this test only: resume_interrupted_imports must not pick up
+        # tasks other tests or earlier runs left in the shared database
+        temp_database(self, STATE_MODELS, os.path.join(self.tmp_dir, 'state.sqlite3'))
+        # A file, not :memory:, because background tasks import on another thread
+        temp_database(self, CANDLE_MODELS, os.path.join(self.tmp_dir, 'candles.sqlite3'))
+
+        # run_import parses the date in local time; 48 closed hourly candles since then
+        self.start_ts = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+        self.exchange = PagedExchange(last_ts=self.start_ts + 47 * HOUR)
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(os.path.join(self.tmp_dir, 'store'))),
+            patch('engine.modes.import_candles_mode.time.time', return_value=(self.start_ts + 48 * HOUR + HOUR // 2) / 1000),
+            patch('engine.modes.import_candles_mode.Binance', side_effect=lambda: self.exchange),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.client = TestClient(app)
+        username = f"user_resume_{uuid.uuid4().hex}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _task(self, task_id):
+        return self.client.get(f"/api/v1/tasks/{task_id}", headers=self.headers).json()
+
+    def test_failed_import_resumes_from_its_checkpoint(self):
+        self.exchange.fail_on = 3
+        payload = {"exchange": "Binance", "symbol": "BTC-USDT", "start_date": START_DATE, "timeframe": "1h"}
+        task_id = self.client.post("/api/v1/import", json=payload, headers=self.headers).json()["task_id"]
+
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "failed")
+        self.assertEqual(task["checkpoint"], self.start_ts + 29 * HOUR)
+
+        # Coverage is forgotten: only the checkpoint keeps the first 30 candles from being fetched again
+        candle_coverage.clear('Binance', 'BTC-USDT', '1h')
+        self.exchange.fail_on = None
+        response = self.client.post(f"/api/v1/import/{task_id}/resume", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "completed")
+        self.assertEqual(task["result"]["fetched"], 18)
+        self.assertEqual(task["checkpoint"], self.start_ts + 47 * HOUR)
+        self.assertEqual(self.exchange.calls[-1][0], self.start_ts + 30 * HOUR)
+        self.assertEqual(Candle.select().count(), 48)
+
+        # A completed import is not resumed again
+        response = self.client.post(f"/api/v1/import/{task_id}/resume", headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+    def test_binance_page_that_keeps_failing_fails_the_task_and_resumes(self):
+        # The real adapter, with only its HTTP session replaced
+        session = KlinesSession(fail_from=self.start_ts + 2000 * MINUTE)
+        self.exchange = Binance(workers=2, weight=TokenBucket(6000, 60))
+        self.exchange.requests.backoff = 0.01
+        self.exchange.session = session
+        payload = {"exchange": "Binance", "symbol": "BTC-USDT", "start_date": START_DATE, "timeframe": "1m"}
+        task_id = self.client.post("/api/v1/import", json=payload, headers=self.headers).json()["task_id"]
+
+        # Two windows of 1000 candles arrive; the third fails on every retry
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "failed")
+        self.assertIn("500", task["error"])
+        self.assertEqual(task["checkpoint"], self.start_ts + 1999 * MINUTE)
+        retried = [start for start in session.starts if start == session.fail_from]
+        self.assertEqual(len(retried), self.exchange.requests.attempts)
+
+        session.fail_from = None
+        session.starts = []
+        response = self.client.post(f"/api/v1/import/{task_id}/resume", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        # Only the rest is fetched, up to the last closed candle at 00:29 two days later
+        last_closed = self.start_ts + 48 * HOUR + 29 * MINUTE
+        task = self._task(task_id)
+        self.assertEqual(task["status"], "completed")
+        self.assertEqual(min(session.starts), self.start_ts + 2000 * MINUTE)
+        self.assertEqual(task["checkpoint"], last_closed)
+        self.assertEqual(Candle.select().where(Candle.timeframe == '1m').count(),
+                         (last_closed - self.start_ts) // MINUTE + 1)
+
+    def test_startup_resumes_interrupted_imports(self):
+        task_id = f"interrupted_{uuid.uuid4().hex}"
+        params = {"exchange": "Binance", "symbol": "BTC-USDT", "start_date": START_DATE, "timeframe": "1h"}
+        # Left behind by a process that died 20 candles in
+        Task.create(id=task_id, type="import", status="processing", params=json.dumps(params),
+                    checkpoint=self.start_ts + 19 * HOUR, created_at=0, updated_at=0)
+
+        thread = import_controller.resume_interrupted_imports()
+        self.assertIsNotNone(thread)
+        thread.join(timeout=30)
+
+        task = Task.get_by_id(task_id)
+        self.assertEqual(task.status, "completed")
+        self.assertEqual(json.loads(task.result)["fetched"], 28)
+        self.assertEqual(self.exchange.calls, [(self.start_ts + 20 * HOUR, self.start_ts + 48 * HOUR - 1)])
+
+    def test_irregular_timeframe_resumes_after_checkpoint(self):
+        checkpoints = []
+        run_import('Binance', 'BTC-USDT', START_DATE, '1M', resume_from=self.start_ts + 9 * HOUR,
+                   on_checkpoint=checkpoints.append)
+        # Not tracked by coverage: the checkpoint is all that moves the start
+        self.assertEqual(self.exchange.calls, [(self.start_ts + 9 * HOUR + 1, None)])
+        self.assertEqual(checkpoints, sorted(checkpoints))
+        self.assertEqual(checkpoints[-1], self.start_ts + 47 * HOUR)
+
+class TestTaskMigration(unittest.TestCase):
+    def test_checkpoint_columns_are_added(self):
+        legacy = SqliteDatabase(':memory:')
+        legacy.execute_sql('CREATE TABLE "task" ("id" VARCHAR(255) PRIMARY KEY, "type" VARCHAR(255), '
+                           '"status" VARCHAR(255), "result" TEXT, "error" TEXT, '
+                           '"created_at" INTEGER, "updated_at" INTEGER)')
+        self.assertTrue(migrate_task_checkpoint(legacy))
+        self.assertIn('checkpoint', [c.name for c in legacy.get_columns('task')])
+        self.assertFalse(migrate_task_checkpoint(legacy))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import sys
+import os
+import time
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.models.core import Candle, CandleSeries
+from engine.services import candle_loader
+from engine.services.candle_store import CandleStore
+from engine.services.candle_loader import iter_candle_chunks
+from engine.strategies.golden_cross_strategy import GoldenCrossStrategy
+from engine.strategies.simple_strategy import SimpleStrategy
+from engine.strategies.Strategy import Strategy
+import engine.indicators as ta
+from engine.modes.backtest_mode import run_backtest
+from engine.tests.helpers import HOUR, make_candles, candle_rows, temp_database, temp_dir
+
+START_DATE = '2021-01-01'
+END_DATE = '2021-06-01'
+BASE_TS = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+
+class WindowRecorder(SimpleStrategy):
+    longest = 0
+
+    def should_long(self):
+        WindowRecorder.longest = max(WindowRecorder.longest, len(self.candles))
+        return super().should_long()
+
+class EmaCrossStrategy(Strategy):
+    # The EMAs start at the first candle they see; after 20 spans its weight is below 1e-17
+    lookback = 600
+
+    def _cross(self):
+        if len(self.candles) < 31:
+            return 0
+        fast = ta.ema(self.candles, period=10)
+        slow = ta.ema(self.candles, period=30)
+        return np.sign(fast[-1] - slow[-1]) - np.sign(fast[-2] - slow[-2])
+
+    def should_long(self):
+        return self._cross() > 0
+
+    def should_short(self):
+        return self._cross() < 0
+
+    def go_long(self):
+        self.buy = (1.0, self.price)
+
+    def go_short(self):
+        self.sell = (1.0, self.price)
+
+class TestStreamingBacktest(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries])
+        self.candles = make_candles(3000, start=BASE_TS, step=HOUR, volatility=1.0, seed=7, decimals=4)
+        # Unique symbol per test: the in-memory mode goes through the process-wide cache
+        self.symbol = f"STREAM-{self._testMethodName}"
+        Candle.insert_many(candle_rows(self.candles, 'Sandbox', self.symbol, '1h')).execute()
+
+    def _assert_same_results(self, strategy_class, **stream_options):
+        in_memory = run_backtest('Sandbox', self.symbol, '1h', START_DATE, END_DATE, strategy_class)
+        streamed = run_backtest('Sandbox', self.symbol, '1h', START_DATE, END_DATE, strategy_class,
+                                stream=True, **stream_options)
+
+        self.assertGreater(len(in_memory.trades), 0)
+        self.assertEqual([t.model_dump() for t in streamed.trades], [t.model_dump() for t in in_memory.trades])
+        self.assertEqual(streamed.final_balance, in_memory.final_balance)
+
+    def test_matches_in_memory_mode(self):
+        self._assert_same_results(GoldenCrossStrategy, chunk_rows=97, window_rows=300)
+
+    def test_matches_in_memory_mode_from_candle_store(self):
+        store = CandleStore(temp_dir(self))
+        store.append('Sandbox', self.symbol, '1h', self.candles)
+        with patch.object(candle_loader, 'candle_store', store):
+            self._assert_same_results(SimpleStrategy, chunk_rows=250, window_rows=10)
+
+    def test_matches_in_memory_mode_with_ewm_indicator(self):
+        self._assert_same_results(EmaCrossStrategy, chunk_rows=97, window_rows=EmaCrossStrategy.lookback)
+
+    def test_window_shorter_than_lookback_is_refused(self):
+        with self.assertRaises(ValueError):
+            run_backtest('Sandbox', self.symbol, '1h', START_DATE, END_DATE, EmaCrossStrategy,
+                         stream=True, window_rows=EmaCrossStrategy.lookback - 1)
+        # Nothing tells how much history a strategy without a lookback needs
+        with self.assertRaises(ValueError):
+            run_backtest('Sandbox', self.symbol, '1h', START_DATE, END_DATE, Strategy, stream=True)
+
+    def test_strategy_sees_trailing_window(self):
+        WindowRecorder.longest = 0
+        run_backtest('Sandbox', self.symbol, '1h', START_DATE, END_DATE, WindowRecorder,
+                     stream=True, chunk_rows=64, window_rows=120)
+        self.assertEqual(WindowRecorder.longest, 120)
+
+    def test_chunks_are_bounded_and_ordered(self):
+        chunks = list(iter_candle_chunks('Sandbox', self.symbol, '1h', BASE_TS, BASE_TS + 3000 * HOUR, 128))
+        self.assertTrue(all(len(chunk) <= 128 for chunk in chunks))
+        np.testing.assert_allclose(np.concatenate(chunks), self.candles)
+
+    def test_empty_range(self):
+        with self.assertRaises(ValueError):
+            run_backtest('Sandbox', 'MISSING', '1h', START_DATE, END_DATE, SimpleStrategy, stream=True)
+
+if __name__ == '__main__':
+    unittest.main()
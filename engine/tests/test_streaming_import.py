@@ -0,0 +1,127 @@
+import unittest
+import sys
+import os
+import time
+import threading
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.config import IMPORT_PREFETCH_PAGES
+from engine.models.core import Candle, CandleSeries, CandleCoverage
+from engine.services.candle_store import CandleStore
+from engine.services.candle_coverage import candle_coverage
+from engine.modes import import_candles_mode
+from engine.modes.import_candles_mode import run_import, _prefetch
+from engine.tests.helpers import HOUR, temp_database, temp_dir
+
+START_DATE = '2023-01-02'
+
+class PagedExchange:
+    """
+    Hourly candles in pages of `page_size`. Raises after `fail_after` pages, and records how
+    many pages it has handed out beyond those already saved.
+    """
+    def __init__(self, page_size=10, fail_after=None):
+        self.page_size = page_size
+        self.fail_after = fail_after
+        self.calls = []
+        self.produced = 0
+        self.saved = 0
+        self.max_ahead = 0
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((start_ts, end_ts))
+        for i, page_start in enumerate(range(start_ts, end_ts + 1, self.page_size * HOUR)):
+            if i == self.fail_after:
+                raise ConnectionError("connection reset by peer")
+            timestamps = np.arange(page_start, min(page_start + self.page_size * HOUR, end_ts + 1), HOUR)
+            page = np.column_stack([timestamps] + [np.full(len(timestamps), v) for v in (1.0, 2.0, 0.5, 1.5, 10.0)])
+            self.produced += 1
+            self.max_ahead = max(self.max_ahead, self.produced - self.saved)
+            yield page.astype(np.float64)
+
+class TestStreamingImport(unittest.TestCase):
+    def setUp(self):
+        temp_database(self, [Candle, CandleSeries, CandleCoverage])
+        self.tmp_dir = temp_dir(self)
+        # run_import parses the date in local time
+        self.start_ts = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+        self.exchange = PagedExchange()
+        save_candles = import_candles_mode._save_candles
+
+        def counting_save(*args):
+            save_candles(*args)
+            self.exchange.saved += 1
+
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(self.tmp_dir)),
+            # 48 closed hourly candles since the start date
+            patch('engine.modes.import_candles_mode.time.time', return_value=(self.start_ts + 48 * HOUR + HOUR // 2) / 1000),
+            patch('engine.modes.import_candles_mode.Binance', side_effect=lambda: self.exchange),
+            patch('engine.modes.import_candles_mode._save_candles', counting_save),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_pages_are_committed_as_they_arrive(self):
+        self.exchange.fail_after = 3
+        with self.assertRaises(ConnectionError):
+            run_import('Binance', 'BTC-USDT', START_DATE, '1h')
+
+        # The three pages before the failure are stored and count as imported
+        self.assertEqual(Candle.select().count(), 30)
+        self.assertEqual(candle_coverage.intervals('Binance', 'BTC-USDT', '1h', HOUR),
+                         [(self.start_ts, self.start_ts + 29 * HOUR)])
+
+        self.exchange.fail_after = None
+        result = run_import('Binance', 'BTC-USDT', START_DATE, '1h')
+        self.assertEqual((result['fetched'], result['skipped']), (18, 30))
+        self.assertEqual(self.exchange.calls[-1][0], self.start_ts + 30 * HOUR)
+        self.assertEqual(Candle.select().count(), 48)
+
+    def test_fetching_stays_a_few_pages_ahead_of_writing(self):
+        self.exchange.page_size = 1
+        result = run_import('Binance', 'BTC-USDT', START_DATE, '1h')
+
+        self.assertEqual(result['fetched'], 48)
+        self.assertEqual(result['pages'], 48)
+        self.assertGreater(result['pages_per_second'], 0)
+        self.assertEqual(self.exchange.saved, 48)
+        # The queue, the page being written and the one the adapter is handing over
+        self.assertLessEqual(self.exchange.max_ahead, IMPORT_PREFETCH_PAGES + 2)
+
+class TestPrefetch(unittest.TestCase):
+    def test_adapter_is_closed_when_the_consumer_stops(self):
+        closed = threading.Event()
+
+        def pages():
+            try:
+                for i in range(100):
+                    yield np.full((1, 6), float(i))
+            finally:
+                closed.set()
+
+        stream = _prefetch(pages(), 2)
+        self.assertEqual(next(stream)[0, 0], 0.0)
+        stream.close()
+        self.assertTrue(closed.is_set())
+        self.assertFalse(any(t.name == 'import-fetch' for t in threading.enumerate()))
+
+    def test_adapter_errors_follow_the_pages_before_them(self):
+        def pages():
+            yield np.zeros((1, 6))
+            raise ValueError("bad page")
+
+        stream = _prefetch(pages(), 2)
+        self.assertEqual(len(next(stream)), 1)
+        with self.assertRaises(ValueError):
+            next(stream)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import unittest
+import sys
+import os
+import time
+import numpy as np
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from engine.main import app
+from engine.init_db import init_db
+from engine.models.core import Candle, CandleSeries, CandleCoverage, CandleIssue, WatchedSeries
+from engine.services.candle_store import CandleStore
+from engine.services.db_maintenance import db_maintenance
+from engine.services.tail_importer import TailImporter, next_boundary
+from engine.controllers import import_controller
+from engine.tests.helpers import MINUTE, HOUR, temp_database, temp_dir
+
+START_DATE = '2023-01-02'
+CANDLE_MODELS = [Candle, CandleSeries, CandleCoverage, CandleIssue]
+
+class LiveExchange:
+    """
+    Hourly candles up to the last one closed at the test's clock; `failing` symbols raise.
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = []
+        self.many_calls = []
+        self.failing = set()
+
+    def iter_ohlcv(self, symbol, timeframe, start_ts, end_ts=None):
+        self.calls.append((symbol, start_ts))
+        if symbol in self.failing:
+            raise ConnectionError("connection reset by peer")
+        last_closed = (self.clock() * 1000 // HOUR - 1) * HOUR
+        end_ts = last_closed if end_ts is None else min(end_ts, last_closed)
+        first = -(-start_ts // HOUR) * HOUR
+        timestamps = np.arange(first, end_ts + 1, HOUR, dtype=np.float64)
+        yield np.column_stack([timestamps] + [np.full(len(timestamps), v) for v in (1.0, 2.0, 0.5, 1.5, 10.0)])
+
+    def fetch_ohlcv_many(self, symbols, timeframe, start_ts, end_ts=None):
+        # Like Yahoo's multi-ticker download; records whether maintenance is held off meanwhile
+        self.many_calls.append((list(symbols), start_ts, db_maintenance._active > 0))
+        return {symbol: np.concatenate(list(self.iter_ohlcv(symbol, timeframe, start_ts, end_ts)))
+                for symbol in symbols}
+
+class TestTailImport(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        WatchedSeries.delete().execute()
+        self.tmp_dir = temp_dir(self)
+        # A file, not :memory:, because series are refreshed on scheduler threads
+        temp_database(self, CANDLE_MODELS, os.path.join(self.tmp_dir, 'candles.sqlite3'))
+
+        # run_import parses the date in local time; the clock starts 48 candles later
+        self.start_ts = int(time.mktime(time.strptime(START_DATE, "%Y-%m-%d"))) * 1000
+        self.now = (self.start_ts + 48 * HOUR + HOUR // 2) / 1000
+        self.exchange = LiveExchange(lambda: self.now)
+        self.drivers_created = 0
+
+        def new_driver():
+            self.drivers_created += 1
+            return self.exchange
+
+        self.patches = [
+            patch('engine.modes.import_candles_mode.candle_store', CandleStore(os.path.join(self.tmp_dir, 'store'))),
+            patch('engine.modes.import_candles_mode.time.time', side_effect=lambda: self.now),
+            patch('engine.modes.import_candles_mode.Binance', side_effect=new_driver),
+            patch('engine.modes.import_candles_mode.Yahoo', side_effect=new_driver),
+        ]
+        for p in self.patches:
+            p.start()
+        self.tail = TailImporter(delay=0, workers=2)
+
+    def tearDown(self):
+        self.tail.stop()
+        for p in self.patches:
+            p.stop()
+        WatchedSeries.delete().execute()
+
+    def _watch(self, symbol, start_date=START_DATE, exchange='Binance'):
+        return WatchedSeries.create(exchange=exchange, symbol=symbol, timeframe='1h', start_date=start_date,
+                                    created_at=int(time.time()))
+
+    def _count(self, symbol):
+        return Candle.select().where(Candle.symbol == symbol).count()
+
+    def test_refresh_appends_after_the_stored_maximum(self):
+        series = [self._watch('BTC-USDT'), self._watch('ETH-USDT')]
+        cycle = self.tail.refresh(series)
+        self.assertEqual((cycle['series'], cycle['fetched'], cycle['failed']), (2, 96, 0))
+
+        # Three more candles close
+        self.now += 3 * HOUR / 1000
+        self.exchange.calls = []
+        boundary = int(self.now * 1000) // HOUR * HOUR
+        cycle = self.tail.refresh(list(WatchedSeries.select()), boundary=boundary)
+
+        self.assertEqual(cycle['fetched'], 6)
+        self.assertEqual(sorted(self.exchange.calls), [('BTC-USDT', self.start_ts + 48 * HOUR),
+                                                      ('ETH-USDT', self.start_ts + 48 * HOUR)])
+        self.assertEqual(self._count('BTC-USDT'), 51)
+        self.assertEqual(WatchedSeries.get(WatchedSeries.symbol == 'BTC-USDT').last_timestamp,
+                         self.start_ts + 50 * HOUR)
+        # Every series of the exchange goes through one adapter
+        self.assertEqual(self.drivers_created, 1)
+
+    def test_yahoo_series_share_one_download(self):
+        self.tail.refresh([self._watch('AAPL', exchange='Yahoo'), self._watch('MSFT', exchange='Yahoo')])
+        # Nothing stored yet: each backfills from its start date
+        self.assertEqual(self.exchange.many_calls, [])
+        self.assertEqual(self._count('AAPL'), 48)
+
+        self.now += 3 * HOUR / 1000
+        cycle = self.tail.refresh(list(WatchedSeries.select()))
+
+        self.assertEqual((cycle['fetched'], cycle['failed']), (6, 0))
+        self.assertEqual(self.exchange.many_calls, [(['AAPL', 'MSFT'], self.start_ts + 48 * HOUR, True)])
+        self.assertEqual(self._count('MSFT'), 51)
+        self.assertEqual(WatchedSeries.get(WatchedSeries.symbol == 'AAPL').last_timestamp, self.start_ts + 50 * HOUR)
+
+    def test_failing_series_is_recorded_and_others_continue(self):
+        self.exchange.failing = {'ETH-USDT'}
+        cycle = self.tail.refresh([self._watch('BTC-USDT'), self._watch('ETH-USDT')])
+
+        self.assertEqual(cycle['failed'], 1)
+        self.assertEqual(self._count('BTC-USDT'), 48)
+        eth = WatchedSeries.get(WatchedSeries.symbol == 'ETH-USDT')
+        self.assertEqual(eth.last_error, "connection reset by peer")
+        self.assertIsNotNone(eth.last_refresh_at)
+
+    def test_series_without_candles_or_start_date_fails(self):
+        cycle = self.tail.refresh([self._watch('BTC-USDT', start_date=None)])
+        self.assertEqual(cycle['failed'], 1)
+        self.assertEqual(self.exchange.calls, [])
+
+    def test_background_loop_catches_up_and_picks_up_new_series(self):
+        self._watch('BTC-USDT')
+        self.tail.start()
+        self._wait_for(lambda: self._count('BTC-USDT') == 48)
+
+        self._watch('ETH-USDT')
+        self.tail.changed()
+        self._wait_for(lambda: self._count('ETH-USDT') == 48)
+        self.tail.stop()
+        self.assertFalse(self.tail._thread)
+
+    def _wait_for(self, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "timed out")
+            time.sleep(0.02)
+
+class TestWatchlistApi(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        WatchedSeries.delete().execute()
+        self.client = TestClient(app)
+        username = f"user_watch_{time.time()}"
+        self.client.post("/api/v1/auth/register", json={"username": username, "password": "password123"})
+        token = self.client.post("/api/v1/auth/login",
+                                 data={"username": username, "password": "password123"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        # Only the watchlist is under test; the background scheduler isn't running
+        patcher = patch.object(import_controller.tail_importer, 'changed')
+        self.changed = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(WatchedSeries.delete().execute)
+
+    def test_watch_list_and_unwatch(self):
+        payload = {"exchange": "Binance", "symbol": "SOL-USDT", "timeframe": "1h", "start_date": START_DATE}
+        response = self.client.post("/api/v1/import/watchlist", json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        series_id = response.json()["id"]
+        self.changed.assert_called_once()
+
+        response = self.client.post("/api/v1/import/watchlist", json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+        watchlist = self.client.get("/api/v1/import/watchlist", headers=self.headers).json()
+        self.assertEqual([(s["symbol"], s["start_date"]) for s in watchlist["series"]], [("SOL-USDT", START_DATE)])
+
+        self.assertEqual(self.client.delete(f"/api/v1/import/watchlist/{series_id}", headers=self.headers).status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/v1/import/watchlist/{series_id}", headers=self.headers).status_code, 404)
+
+    def test_rejects_series_it_cannot_keep_current(self):
+        for payload in ({"exchange": "Kraken", "symbol": "BTC-USD", "start_date": START_DATE},
+                        {"exchange": "Binance", "symbol": "BTC-USDT", "timeframe": "1M", "start_date": START_DATE},
+                        {"exchange": "Binance", "symbol": "NEVER-IMPORTED"}):
+            response = self.client.post("/api/v1/import/watchlist", json=payload, headers=self.headers)
+            self.assertEqual(response.status_code, 400, payload)
+
+class TestNextBoundary(unittest.TestCase):
+    def test_earliest_close_of_the_watched_timeframes(self):
+        now = 10 * HOUR + 7 * MINUTE + 30000
+        self.assertEqual(next_boundary(now, ['1h', '15m']), 10 * HOUR + 15 * MINUTE)
+        self.assertEqual(next_boundary(now, ['1h']), 11 * HOUR)
+        # On a boundary, the next one
+        self.assertEqual(next_boundary(11 * HOUR, ['1h']), 12 * HOUR)
+        self.assertIsNone(next_boundary(now, ['1M']))
+
+if __name__ == '__main__':
+    unittest.main()
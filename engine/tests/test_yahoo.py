@@ -3,7 +3,7 @@ import time
 from fastapi.testclient import TestClient
 from engine.main import app
 from engine.init_db import init_db
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 class TestYahooImport(unittest.TestCase):
     def setUp(self):
@@ -27,8 +27,8 @@ class TestYahooImport(unittest.TestCase):
         data = response.json()
         self.assertIn("EURUSD=X", data["symbols"])
 
-    @patch('engine.exchanges.yahoo.yf.Ticker')
-    def test_yahoo_import_logic(self, mock_ticker):
+    @patch('engine.exchanges.yahoo.yf.download')
+    def test_yahoo_import_logic(self, mock_download):
         # Mock yfinance data
         import pandas as pd
         mock_hist = pd.DataFrame({
@@ -38,17 +38,132 @@ class TestYahooImport(unittest.TestCase):
             'Close': [1.06, 1.07],
             'Volume': [1000, 2000]
         }, index=pd.to_datetime(['2023-01-01 00:00:00', '2023-01-01 01:00:00']))
-        
-        mock_instance = mock_ticker.return_value
-        mock_instance.history.return_value = mock_hist
+        mock_download.return_value = pd.concat({'EURUSD=X': mock_hist}, axis=1)
 
         from engine.exchanges.yahoo import Yahoo
         driver = Yahoo()
-        candles = driver.fetch_ohlcv("EURUSD=X", "1h", 1672531200000) # 2023-01-01
+        candles = driver.fetch_ohlcv("EURUSD=X", "1d", 1672531200000) # 2023-01-01
         
         self.assertEqual(len(candles), 2)
         self.assertEqual(candles[0]['open'], 1.05)
         self.assertEqual(candles[0]['timestamp'], 1672531200000)
 
+MINUTE = 60 * 1000
+DAY = 24 * 60 * MINUTE
+
+class FakeDownload:
+    """
+    Stand-in for yf.download: a candle every interval in [start, end) for each ticker,
+    priced by its position in the ticker list, on an America/New_York index like
+    Yahoo's equity data. `gaps` maps a ticker to timestamps it has no candle at; tickers
+    in `empty` come back without candles, as yf.download returns tickers it failed to get.
+    """
+    STEPS = {'1m': MINUTE, '5m': 5 * MINUTE, '1h': 60 * MINUTE, '1d': DAY}
+
+    def __init__(self, gaps=None):
+        self.calls = []
+        self.gaps = gaps or {}
+        self.empty = set()
+
+    def __call__(self, tickers, start, end, interval, group_by, **kwargs):
+        import pandas as pd
+        import numpy as np
+        self.calls.append((list(tickers), start, end, interval))
+        step = self.STEPS[interval]
+        first = -(-int(start.timestamp() * 1000) // step) * step
+        timestamps = np.arange(first, int(end.timestamp() * 1000), step)
+        index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='ms', utc=True)).tz_convert('America/New_York')
+        frames = {}
+        for position, ticker in enumerate(tickers):
+            price = np.full(len(timestamps), 100.0 + position)
+            frame = pd.DataFrame({'Open': price, 'High': price + 1, 'Low': price - 1, 'Close': price,
+                                  'Volume': np.arange(len(timestamps), dtype=float)}, index=index)
+            frame.loc[np.isin(timestamps, self.gaps.get(ticker, [])), :] = np.nan
+            if ticker in self.empty:
+                frame.loc[:, :] = np.nan
+            frames[ticker] = frame
+        return pd.concat(frames, axis=1)
+
+class TestYahooAdapter(unittest.TestCase):
+    def setUp(self):
+        from engine.exchanges.yahoo import Yahoo
+        self.driver = Yahoo()
+        self.download = FakeDownload()
+        self.now = (int(time.time() * 1000) // DAY) * DAY
+        patcher = patch('engine.exchanges.yahoo.yf.download', self.download)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_frames_convert_to_utc_arrays(self):
+        start = self.now - 3 * DAY
+        self.download.gaps = {'AAPL': [start + 5 * MINUTE]}
+        pages = list(self.driver.iter_ohlcv('AAPL', '1m', start, start + 59 * MINUTE))
+
+        self.assertEqual(len(pages), 1)
+        candles = pages[0]
+        # The candle without data is left out, the rest keep their UTC open time
+        self.assertEqual(len(candles), 59)
+        self.assertEqual(candles[0, 0], start)
+        self.assertNotIn(start + 5 * MINUTE, candles[:, 0])
+        self.assertEqual(candles[0, 1:5].tolist(), [100.0, 101.0, 99.0, 100.0])
+
+    def test_long_intraday_ranges_are_chunked(self):
+        start = self.now - 20 * DAY
+        end = self.now - DAY
+        candles = self.driver.fetch_ohlcv('AAPL', '1m', start, end)
+
+        # Yahoo serves at most 7 days of 1m candles per request
+        windows = [(call[1].timestamp() * 1000, call[2].timestamp() * 1000) for call in self.download.calls]
+        self.assertEqual(len(windows), 3)
+        self.assertTrue(all(e - s <= 7 * DAY for s, e in windows))
+        timestamps = [c['timestamp'] for c in candles]
+        self.assertEqual(timestamps, list(range(start, end + 1, MINUTE)))
+
+    def test_ranges_beyond_the_lookback_are_clipped_loudly(self):
+        start = self.now - 400 * DAY
+        with patch('builtins.print') as mock_print:
+            candles = self.driver.fetch_ohlcv('AAPL', '5m', start, self.now)
+
+        self.assertIn('last 60 days only', mock_print.call_args[0][0])
+        first_request = self.download.calls[0][1].timestamp() * 1000
+        self.assertGreater(first_request, self.now - 60 * DAY)
+        self.assertGreater(len(candles), 0)
+
+    def test_many_tickers_share_one_download(self):
+        symbols = ['AAPL', 'MSFT', 'SPY']
+        self.download.gaps = {'MSFT': [self.now - 10 * DAY]}
+        with patch('engine.exchanges.yahoo.YAHOO_TICKERS_PER_REQUEST', 2):
+            result = self.driver.fetch_ohlcv_many(symbols, '1d', self.now - 30 * DAY, self.now - DAY)
+
+        # Two tickers per request: two downloads for three symbols
+        self.assertEqual([call[0] for call in self.download.calls], [['AAPL', 'MSFT'], ['SPY']])
+        self.assertEqual(len(result['AAPL']), 30)
+        self.assertEqual(len(result['MSFT']), 29)
+        self.assertEqual(result['MSFT'][0, 4], 101.0)
+        self.assertEqual(result['SPY'][0, 4], 100.0)
+
+    def test_failed_ticker_raises_instead_of_coming_back_empty(self):
+        self.download.empty = {'MSFT'}
+        ticker = MagicMock()
+        ticker.return_value.history.side_effect = ConnectionError("connection reset by peer")
+        with patch('engine.exchanges.yahoo.yf.Ticker', ticker):
+            with self.assertRaises(ConnectionError):
+                self.driver.fetch_ohlcv_many(['AAPL', 'MSFT'], '1d', self.now - 30 * DAY, self.now - DAY)
+        # Only the empty ticker is asked again, on its own
+        ticker.assert_called_once_with('MSFT')
+
+    def test_ticker_without_candles_in_the_range_comes_back_empty(self):
+        from yfinance.exceptions import YFPricesMissingError
+        self.download.empty = {'MSFT'}
+        ticker = MagicMock()
+        ticker.return_value.history.side_effect = YFPricesMissingError('MSFT', '')
+        with patch('engine.exchanges.yahoo.yf.Ticker', ticker):
+            result = self.driver.fetch_ohlcv_many(['AAPL', 'MSFT'], '1d', self.now - 30 * DAY, self.now - DAY)
+        self.assertEqual((len(result['AAPL']), len(result['MSFT'])), (30, 0))
+
+    def test_unsupported_timeframe_raises(self):
+        with self.assertRaises(ValueError):
+            self.driver.fetch_ohlcv('AAPL', '3m', self.now - DAY)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+import argparse
+
+# Add the parent directory to sys.path so we can import 'engine'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.config import db
+from engine.services.candle_files import export_candles, import_candle_file, FORMATS
+from engine.services.candle_loader import MAX_TIMESTAMP
+
+def _parse_date(value):
+    try:
+        return int(time.mktime(time.strptime(value, "%Y-%m-%d"))) * 1000
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid date format. Use YYYY-MM-DD.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export candle ranges to Parquet/Arrow files or load such files into the candle store.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="Write a candle range to a file")
+    export_parser.add_argument('exchange')
+    export_parser.add_argument('symbol')
+    export_parser.add_argument('timeframe')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--start', type=_parse_date, default=0, help="YYYY-MM-DD (default: first candle)")
+    export_parser.add_argument('--end', type=_parse_date, default=MAX_TIMESTAMP, help="YYYY-MM-DD (default: last candle)")
+    export_parser.add_argument('--format', choices=FORMATS, default='parquet')
+
+    import_parser = commands.add_parser('import', help="Load a Parquet/Arrow file into the candle store")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--exchange', help="Defaults to the file metadata")
+    import_parser.add_argument('--symbol', help="Defaults to the file metadata")
+    import_parser.add_argument('--timeframe', help="Defaults to the file metadata")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    if args.command == 'export':
+        rows = export_candles(args.exchange, args.symbol, args.timeframe, args.start, args.end, args.path, args.format)
+        print(f"Exported {rows} candles to {args.path}", end='')
+    else:
+        rows = import_candle_file(args.path, args.exchange, args.symbol, args.timeframe)
+        print(f"Imported {rows} candles from {args.path}", end='')
+    elapsed = time.perf_counter() - started
+    print(f" in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s).")
+
+    if not db.is_closed():
+        db.close()